@@ -10,12 +10,18 @@ import { BlockchainService } from "./blockchain";
 import { EncryptionService } from "./encryption";
 import { StorageService } from "./storage";
 import { NautilusService } from "./nautilus";
+import { startTrace, TraceContext } from "../utils/tracing";
 
 const AI_DETECTION_URL =
   process.env.AI_DETECTION_URL || "http://localhost:8000";
 const REVERSE_SEARCH_URL =
   process.env.REVERSE_SEARCH_URL || "http://localhost:8002";
 const ENCLAVE_ID = process.env.ENCLAVE_ID || "nautilus_nitro_enclave";
+// End-to-end budget for AI detection: the service skips the stages that do not
+// fit (listed in skippedStages) instead of the request timing out
+const AI_DETECTION_LATENCY_BUDGET_MS = parseInt(
+  process.env.AI_DETECTION_LATENCY_BUDGET_MS || "20000"
+);
 
 export class OrchestrationService {
   private storage: StorageService;
@@ -38,7 +44,8 @@ export class OrchestrationService {
   async processVerificationJob(
     job: VerificationJob
   ): Promise<VerificationReport> {
-    console.log(`[Orchestrator] Processing job ${job.jobId}`);
+    const trace = startTrace();
+    console.log(`[Orchestrator] Processing job ${job.jobId} (trace ${trace.traceId})`);
 
     // 1. Retrieve and decrypt media
     const encryptedMedia = await this.storage.retrieveBlob(job.mediaCID);
@@ -50,12 +57,12 @@ export class OrchestrationService {
 
     // 2. Run AI detection first
     console.log(`[Orchestrator] Running AI detection...`);
-    const aiDetection = await this.runAIDetection(decryptedMedia);
+    const aiDetection = await this.runAIDetection(decryptedMedia, trace);
     console.log(`[Orchestrator] AI ensemble score: ${aiDetection.ensembleScore}`);
 
     // 3. Always run reverse search (for demo/hackathon)
     console.log(`[Orchestrator] Running reverse search...`);
-    const reverseSearch = await this.runReverseSearch(decryptedMedia, job.metadata);
+    const reverseSearch = await this.runReverseSearch(decryptedMedia, job.metadata, trace);
     console.log(`[Orchestrator] Found ${reverseSearch.matches.length} matches`);
 
     // 4. Build analysis data (NO verdict determination)
@@ -125,19 +132,27 @@ export class OrchestrationService {
   }
 
   private async runAIDetection(
-    mediaBuffer: Buffer
+    mediaBuffer: Buffer,
+    trace: TraceContext
   ): Promise<AIDetectionResult> {
     try {
       const response = await axios.post(
         `${AI_DETECTION_URL}/detect/base64`,
         {
           media: mediaBuffer.toString("base64"),
+          latencyBudgetMs: AI_DETECTION_LATENCY_BUDGET_MS,
         },
         {
           timeout: 120000, // 120 seconds timeout (models need time to load)
+          headers: { traceparent: trace.traceparent },
         }
       );
 
+      if (response.data.skippedStages?.length) {
+        console.warn(
+          `[Orchestrator] AI detection skipped stages to meet ${AI_DETECTION_LATENCY_BUDGET_MS}ms budget: ${response.data.skippedStages.join(", ")}`
+        );
+      }
       return response.data;
     } catch (error: any) {
       console.error("AI detection failed:", error.message);
@@ -177,7 +192,8 @@ export class OrchestrationService {
 
   private async runReverseSearch(
     mediaBuffer: Buffer,
-    metadata: any
+    metadata: any,
+    trace: TraceContext
   ): Promise<ProvenanceResult> {
     try {
       const response = await axios.post(
@@ -188,6 +204,7 @@ export class OrchestrationService {
         },
         {
           timeout: 120000, // 120 seconds timeout (Google search can be slow)
+          headers: { traceparent: trace.traceparent },
         }
       );
 
@@ -0,0 +1,21 @@
+import * as crypto from "crypto";
+
+// Share of jobs whose traces the Python services record (W3C sampled flag);
+// the services follow this decision instead of their own TRACE_SAMPLE_RATE
+const TRACE_SAMPLE_RATE = parseFloat(process.env.TRACE_SAMPLE_RATE || "1.0");
+
+export interface TraceContext {
+  traceId: string;
+  traceparent: string;
+}
+
+/**
+ * Start a trace for one verification job. Sending the same traceparent to
+ * every service call puts all of the job's spans in one trace.
+ */
+export function startTrace(): TraceContext {
+  const traceId = crypto.randomBytes(16).toString("hex");
+  const spanId = crypto.randomBytes(8).toString("hex");
+  const flags = Math.random() < TRACE_SAMPLE_RATE ? "01" : "00";
+  return { traceId, traceparent: `00-${traceId}-${spanId}-${flags}` };
+}
@@ -0,0 +1 @@
+"""Offline load testing for the ai-detection and reverse-search services"""
@@ -0,0 +1,164 @@
+"""
+Load-test statistics: latency histograms, percentiles, error rates and the
+saturation point of a series of load steps
+"""
+import bisect
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+# Latency histogram bucket upper bounds in ms (1-2-5 steps up to 2 minutes)
+BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000, 120000]
+
+# Closed loop: adding clients is past saturation once throughput grows less
+# than this while latency keeps rising
+SATURATION_MIN_GAIN = 0.10
+# Open loop: a rate is sustained while at least this share of the offered
+# load completes and errors stay below the error budget
+SATURATION_MIN_ACHIEVED = 0.95
+SATURATION_MAX_ERROR_RATE = 0.01
+
+
+def histogram(latencies_ms: List[float]) -> Dict[str, int]:
+    """Counts per bucket, keyed by upper bound ("<=100", ..., ">120000")"""
+    counts = [0] * (len(BUCKETS_MS) + 1)
+    for latency in latencies_ms:
+        counts[bisect.bisect_left(BUCKETS_MS, latency)] += 1
+    labels = [f"<={bound}" for bound in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}"]
+    return dict(zip(labels, counts))
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Linear-interpolated percentile of pre-sorted values"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def latency_summary(latencies_ms: List[float]) -> Dict[str, float]:
+    ordered = sorted(latencies_ms)
+    if not ordered:
+        return {"count": 0}
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 1),
+        "p50": round(percentile(ordered, 50), 1),
+        "p90": round(percentile(ordered, 90), 1),
+        "p99": round(percentile(ordered, 99), 1),
+        "max": round(ordered[-1], 1),
+    }
+
+
+@dataclass
+class StepResult:
+    """Outcome of one load level (concurrency or arrival rate) of a scenario"""
+
+    load: float  # Clients (closed loop) or offered requests/s (open loop)
+    duration_s: float  # Measurement window (after warm-up)
+    # Successful requests started in the window (including ones that finished
+    # after it, so overload shows up in the latencies)
+    latencies_ms: List[float] = field(default_factory=list)
+    errors: Counter = field(default_factory=Counter)  # Error kind -> count
+    finished_in_window: int = 0  # Successful requests that finished within the window
+    sent: int = 0  # All requests sent, including warm-up
+    upstream_calls: Dict[str, int] = field(default_factory=dict)  # Stub route -> calls
+
+    @property
+    def completed(self) -> int:
+        return len(self.latencies_ms)
+
+    @property
+    def error_rate(self) -> float:
+        total = self.completed + sum(self.errors.values())
+        return sum(self.errors.values()) / total if total else 0.0
+
+    @property
+    def throughput(self) -> float:
+        return self.finished_in_window / self.duration_s if self.duration_s else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = {
+            "load": self.load,
+            "duration_s": round(self.duration_s, 2),
+            "completed": self.completed,
+            "finished_in_window": self.finished_in_window,
+            "throughput_rps": round(self.throughput, 3),
+            "error_rate": round(self.error_rate, 4),
+            "errors": dict(self.errors),
+            "latency_ms": latency_summary(self.latencies_ms),
+            "histogram_ms": histogram(self.latencies_ms),
+        }
+        if self.upstream_calls:
+            result["upstream_calls_per_request"] = {
+                route: round(calls / max(self.sent, 1), 2)
+                for route, calls in self.upstream_calls.items()
+            }
+        return result
+
+
+def saturation(steps: List[StepResult], mode: str, slo_p99_ms: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Highest load level the service sustains
+
+    closed: the last step before throughput stops growing by at least
+            SATURATION_MIN_GAIN per step while the median latency rises
+    open: the last rate where SATURATION_MIN_ACHIEVED of the offered load
+          completes, errors stay under SATURATION_MAX_ERROR_RATE and (with
+          slo_p99_ms) p99 latency meets the SLO
+
+    Returns:
+        {"load", "throughput_rps", "uploads_per_minute", "reason"}; load is
+        None when even the first step is over capacity
+    """
+    sustained = None
+    reason = "not reached (increase the load)"
+    for index, step in enumerate(steps):
+        p99 = latency_summary(step.latencies_ms).get("p99", 0.0)
+        if step.error_rate > SATURATION_MAX_ERROR_RATE:
+            reason = f"error rate {step.error_rate:.1%} at load {step.load:g}"
+            break
+        if slo_p99_ms is not None and p99 > slo_p99_ms:
+            reason = f"p99 {p99:.0f} ms over the {slo_p99_ms:.0f} ms SLO at load {step.load:g}"
+            break
+        if mode == "open" and step.throughput < SATURATION_MIN_ACHIEVED * step.load:
+            reason = f"completed {step.throughput:.2f} of {step.load:g} req/s offered"
+            break
+        if mode == "closed" and index > 0:
+            previous = steps[index - 1]
+            gain = step.throughput / previous.throughput - 1 if previous.throughput else 1.0
+            p50 = latency_summary(step.latencies_ms).get("p50", 0.0)
+            previous_p50 = latency_summary(previous.latencies_ms).get("p50", 0.0)
+            if gain < SATURATION_MIN_GAIN and p50 > previous_p50:
+                reason = (
+                    f"throughput {gain:+.0%} from {previous.load:g} to {step.load:g} clients "
+                    f"while p50 rose {previous_p50:.0f} -> {p50:.0f} ms"
+                )
+                break
+        sustained = step
+
+    if sustained is None:
+        return {"load": None, "throughput_rps": 0.0, "uploads_per_minute": 0.0, "reason": reason}
+    return {
+        "load": sustained.load,
+        "throughput_rps": round(sustained.throughput, 3),
+        "uploads_per_minute": round(sustained.throughput * 60, 1),
+        "reason": reason,
+    }
+
+
+def format_histogram(latencies_ms: List[float], width: int = 40) -> List[str]:
+    """ASCII bars for the non-empty range of the histogram"""
+    counts = histogram(latencies_ms)
+    filled = [label for label, count in counts.items() if count]
+    if not filled:
+        return []
+    labels = list(counts)
+    first, last = labels.index(filled[0]), labels.index(filled[-1])
+    peak = max(counts.values())
+    return [
+        f"{label:>9} ms {'#' * max(1 if counts[label] else 0, round(counts[label] / peak * width)):<{width}} {counts[label]}"
+        for label in labels[first:last + 1]
+    ]
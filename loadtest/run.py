@@ -0,0 +1,334 @@
+"""
+Load generator for the ai-detection and reverse-search services
+
+Drives one or more scenarios (see scenarios.SCENARIOS) through a series of
+load steps and reports, per step, throughput, error rate and a latency
+histogram, and per scenario the saturation point (report.saturation):
+- closed loop (--mode closed): N clients, each sending its next request
+  when the previous one returns (plus --think-ms); --loads are client counts
+- open loop (--mode open): Poisson arrivals at a fixed rate regardless of
+  responses, as real uploads arrive; --loads are requests/second
+
+Reverse-search scenarios run fully offline: the SerpAPI, image-host and
+crawled-page stand-ins from stubs.py are served in-process, and --spawn
+starts the service itself wired to them (with a scratch pHash database).
+Without --spawn, start the service with the printed environment.
+
+Usage:
+    python -m loadtest.run --scenarios search search_phash phash_add --spawn reverse-search
+    python -m loadtest.run --scenarios detect detect_base64 --mode open --loads 0.5 1 2 4 \\
+        --ai-detection-url http://localhost:8000 --images test-images/dataset
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+from loadtest.report import StepResult, format_histogram, latency_summary, saturation
+from loadtest.scenarios import AI_DETECTION, REVERSE_SEARCH, SCENARIOS, Scenario, TestImage, load_images, synthetic_images
+from loadtest.stubs import Stubs, add_stub_arguments, service_env, start_stubs, stub_settings
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVICE_DIRS = {
+    AI_DETECTION: os.path.join(REPO_DIR, "services", "ai-detection"),
+    REVERSE_SEARCH: os.path.join(REPO_DIR, "services", "reverse-search"),
+}
+READY_PATHS = {AI_DETECTION: "/ready", REVERSE_SEARCH: "/health"}
+DEFAULT_LOADS = {"closed": [1, 2, 4, 8, 16], "open": [0.5, 1, 2, 4, 8]}
+ABORT_ERROR_RATE = 0.5  # Remaining (higher) steps of a scenario are skipped past this
+
+
+async def send_request(
+    session: aiohttp.ClientSession, scenario: Scenario, base_url: str, image: TestImage
+) -> Tuple[float, Optional[str]]:
+    """One request; returns (latency ms, error kind or None)"""
+    start = time.perf_counter()
+    try:
+        async with scenario.send(session, base_url, image) as response:
+            await response.read()
+            error = f"http_{response.status}" if response.status >= 400 else None
+    except asyncio.TimeoutError:
+        error = "timeout"
+    except aiohttp.ClientError as e:
+        error = type(e).__name__
+    return (time.perf_counter() - start) * 1000, error
+
+
+class Step:
+    """Collects the requests of one load step"""
+
+    def __init__(self, load: float, measure_from: float, measure_until: float):
+        self.result = StepResult(load=load, duration_s=measure_until - measure_from)
+        self.measure_from = measure_from
+        self.measure_until = measure_until
+
+    async def request(self, session, scenario, base_url, image):
+        started = time.perf_counter()
+        self.result.sent += 1
+        latency_ms, error = await send_request(session, scenario, base_url, image)
+        if started < self.measure_from:
+            return  # Warm-up
+        if error:
+            self.result.errors[error] += 1
+            return
+        self.result.latencies_ms.append(latency_ms)
+        if time.perf_counter() <= self.measure_until:
+            self.result.finished_in_window += 1
+
+
+async def closed_loop(session, scenario, base_url, images, clients, warmup_s, duration_s, think_ms, rng) -> StepResult:
+    start = time.perf_counter()
+    step = Step(clients, start + warmup_s, start + warmup_s + duration_s)
+
+    async def client():
+        while time.perf_counter() < step.measure_until:
+            await step.request(session, scenario, base_url, rng.choice(images))
+            if think_ms:
+                await asyncio.sleep(think_ms / 1000)
+
+    await asyncio.gather(*[client() for _ in range(int(clients))])
+    return step.result
+
+
+async def open_loop(session, scenario, base_url, images, rate, warmup_s, duration_s, max_in_flight, rng) -> StepResult:
+    start = time.perf_counter()
+    step = Step(rate, start + warmup_s, start + warmup_s + duration_s)
+    in_flight = set()
+
+    arrival = start
+    while True:
+        arrival += rng.expovariate(rate)
+        if arrival >= step.measure_until:
+            break
+        await asyncio.sleep(max(0.0, arrival - time.perf_counter()))
+        if len(in_flight) >= max_in_flight:
+            # Client-side cap (sockets/memory): counted as an error, not queued
+            if arrival >= step.measure_from:
+                step.result.errors["client_in_flight_cap"] += 1
+            continue
+        task = asyncio.ensure_future(step.request(session, scenario, base_url, rng.choice(images)))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+
+    # Requests still running are awaited: their latencies show the overload
+    if in_flight:
+        await asyncio.gather(*in_flight)
+    return step.result
+
+
+async def wait_ready(session: aiohttp.ClientSession, url: str, process: Optional[subprocess.Popen], timeout_s: float):
+    deadline = time.perf_counter() + timeout_s
+    while time.perf_counter() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode} during startup")
+        try:
+            async with session.get(url) as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"{url} not ready after {timeout_s:.0f}s")
+
+
+def spawn_service(service: str, port: int, env: Dict[str, str]) -> subprocess.Popen:
+    """Start a service with uvicorn from its directory"""
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=SERVICE_DIRS[service],
+        env={**os.environ, "LOG_LEVEL": "WARNING", **env},
+    )
+
+
+async def seed_phash(session, base_url: str, count: int, image_size: int):
+    """Fill the pHash database so searches scan a realistic number of entries"""
+    scenario = SCENARIOS["phash_add"]
+    for image in synthetic_images(count, image_size, seed=1):
+        _, error = await send_request(session, scenario, base_url, image)
+        if error:
+            raise RuntimeError(f"Seeding the pHash database failed: {error}")
+
+
+def print_step(result: StepResult, mode: str, show_histogram: bool):
+    latency = latency_summary(result.latencies_ms)
+    unit = "clients" if mode == "closed" else "req/s offered"
+    line = (
+        f"  {result.load:>6g} {unit}: {result.throughput:7.2f} req/s, "
+        f"errors {result.error_rate:6.1%}"
+    )
+    if latency["count"]:
+        line += f", p50 {latency['p50']:.0f} ms, p90 {latency['p90']:.0f} ms, p99 {latency['p99']:.0f} ms"
+    print(line)
+    if result.errors:
+        print("         " + ", ".join(f"{kind} x{count}" for kind, count in result.errors.most_common()))
+    if show_histogram:
+        for bar in format_histogram(result.latencies_ms):
+            print("         " + bar)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+async def run(args) -> dict:
+    scenarios = [SCENARIOS[name] for name in args.scenarios]
+    services = {scenario.service for scenario in scenarios}
+    loads = args.loads or DEFAULT_LOADS[args.mode]
+    rng = random.Random(args.seed)
+
+    images = load_images(args.images, args.image_count) if args.images else []
+    if not images:
+        images = synthetic_images(args.image_count, args.image_size, seed=args.seed)
+    base_urls = {AI_DETECTION: args.ai_detection_url, REVERSE_SEARCH: args.reverse_search_url}
+
+    stubs: Optional[Stubs] = None
+    stub_runner = None
+    processes = []
+    scratch = tempfile.TemporaryDirectory(prefix="loadtest-")
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    connector = aiohttp.TCPConnector(limit=args.max_in_flight)
+    results = {
+        "git_commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "settings": {
+            "mode": args.mode,
+            "loads": loads,
+            "warmup_s": args.warmup,
+            "duration_s": args.duration,
+            "think_ms": args.think_ms,
+            "images": len(images),
+            "image_bytes_mean": round(sum(len(image.data) for image in images) / len(images)),
+            "stubs": None,
+        },
+        "scenarios": {},
+    }
+
+    try:
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            if REVERSE_SEARCH in services and not args.no_stubs:
+                stubs, stub_runner = await start_stubs(stub_settings(args), port=args.stub_port)
+                stub_url = f"http://127.0.0.1:{args.stub_port}"
+                results["settings"]["stubs"] = vars(stubs.settings)
+                if REVERSE_SEARCH not in args.spawn:
+                    print("Stubs running; start reverse-search with:")
+                    for name, value in service_env(stub_url).items():
+                        print(f"  {name}={value}")
+
+            for service in args.spawn:
+                port = int(base_urls[service].rsplit(":", 1)[1])
+                env = {}
+                if service == REVERSE_SEARCH:
+                    env["PHASH_DB_PATH"] = os.path.join(scratch.name, "phash_db.json")
+                    if stubs is not None:
+                        env.update(service_env(stub_url))
+                print(f"Starting {service} on port {port}...")
+                processes.append(spawn_service(service, port, env))
+                await wait_ready(session, base_urls[service] + READY_PATHS[service], processes[-1], args.startup_timeout)
+
+            if args.seed_phash and REVERSE_SEARCH in services:
+                print(f"Seeding the pHash database with {args.seed_phash} images...")
+                await seed_phash(session, args.reverse_search_url, args.seed_phash, args.image_size)
+
+            for scenario in scenarios:
+                base_url = base_urls[scenario.service]
+                print(f"\n{scenario.name} ({scenario.service} {scenario.path}), {args.mode} loop")
+                steps: List[StepResult] = []
+                for load in loads:
+                    calls_before = Counter(stubs.calls) if stubs else Counter()
+                    if args.mode == "closed":
+                        result = await closed_loop(
+                            session, scenario, base_url, images, load,
+                            args.warmup, args.duration, args.think_ms, rng
+                        )
+                    else:
+                        result = await open_loop(
+                            session, scenario, base_url, images, load,
+                            args.warmup, args.duration, args.max_in_flight, rng
+                        )
+                    if stubs:
+                        result.upstream_calls = dict(Counter(stubs.calls) - calls_before)
+                    steps.append(result)
+                    print_step(result, args.mode, args.histograms)
+                    if result.error_rate > ABORT_ERROR_RATE:
+                        print(f"  error rate over {ABORT_ERROR_RATE:.0%}: skipping higher loads")
+                        break
+
+                point = saturation(steps, args.mode, args.slo_p99_ms)
+                results["scenarios"][scenario.name] = {
+                    "service": scenario.service,
+                    "path": scenario.path,
+                    "steps": [step.to_dict() for step in steps],
+                    "saturation": point,
+                }
+                if point["load"] is None:
+                    print(f"  saturated at the lowest load: {point['reason']}")
+                else:
+                    print(
+                        f"  saturation: ~{point['throughput_rps']:.2f} req/s "
+                        f"({point['uploads_per_minute']:.0f}/min) at load {point['load']:g}; {point['reason']}"
+                    )
+    finally:
+        for process in processes:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if stub_runner is not None:
+            await stub_runner.cleanup()
+        scratch.cleanup()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=["search_phash"])
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--loads", type=float, nargs="+", default=None, help="Clients (closed) or req/s (open) per step")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds per step")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds at the start of each step")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Closed loop: pause between a client's requests")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Open loop: client-side cap on open requests")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Request timeout in seconds")
+    parser.add_argument("--slo-p99-ms", type=float, default=None, help="p99 latency that counts as saturated")
+    parser.add_argument("--ai-detection-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--reverse-search-url", default="http://127.0.0.1:8002")
+    parser.add_argument("--spawn", nargs="*", choices=[AI_DETECTION, REVERSE_SEARCH], default=[],
+                        help="Start these services locally (reverse-search is wired to the stubs)")
+    parser.add_argument("--startup-timeout", type=float, default=600.0, help="Seconds to wait for spawned services")
+    parser.add_argument("--images", default=None, help="Directory of test images (default: synthetic)")
+    parser.add_argument("--image-count", type=int, default=20)
+    parser.add_argument("--image-size", type=int, default=1024, help="Long side of synthetic images")
+    parser.add_argument("--seed-phash", type=int, default=0, help="Images added to the pHash database first")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-stubs", action="store_true", help="Do not serve the external-API stand-ins")
+    parser.add_argument("--stub-port", type=int, default=9100)
+    add_stub_arguments(parser)
+    parser.add_argument("--histograms", action="store_true", help="Print the latency histogram of every step")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
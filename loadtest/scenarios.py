@@ -0,0 +1,116 @@
+"""
+Load-test scenarios: one endpoint of the ai-detection or reverse-search
+service and how to build a request for it from an image
+"""
+import base64
+import io
+import os
+import random
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List
+
+import aiohttp
+from PIL import Image, ImageDraw
+
+AI_DETECTION = "ai-detection"
+REVERSE_SEARCH = "reverse-search"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+@dataclass
+class TestImage:
+    name: str
+    data: bytes
+    content_type: str
+
+    @property
+    def base64(self) -> str:
+        return base64.b64encode(self.data).decode("ascii")
+
+
+@dataclass
+class Scenario:
+    name: str
+    service: str
+    path: str
+    # (session, base_url, image) -> request context manager (session.post(...))
+    send: Callable[[aiohttp.ClientSession, str, TestImage], Any]
+
+
+def _detect(session, base_url, image):
+    form = aiohttp.FormData()
+    form.add_field("image", image.data, filename=image.name, content_type=image.content_type)
+    return session.post(f"{base_url}/detect", data=form)
+
+
+def _detect_base64(session, base_url, image):
+    return session.post(f"{base_url}/detect/base64", json={"media": image.base64})
+
+
+def _search(session, base_url, image):
+    return session.post(f"{base_url}/search", json={"media": image.base64, "filename": image.name})
+
+
+def _search_phash(session, base_url, image):
+    return session.post(f"{base_url}/search/phash", json={"media": image.base64})
+
+
+def _phash_add(session, base_url, image):
+    # Unique URL per request: every call inserts (and periodically saves) an entry
+    return session.post(
+        f"{base_url}/phash/add",
+        params={"url": f"https://loadtest.example.com/{uuid.uuid4().hex}/{image.name}"},
+        json={"media": image.base64},
+    )
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    scenario.name: scenario
+    for scenario in [
+        Scenario("detect", AI_DETECTION, "/detect", _detect),
+        Scenario("detect_base64", AI_DETECTION, "/detect/base64", _detect_base64),
+        Scenario("search", REVERSE_SEARCH, "/search", _search),
+        Scenario("search_phash", REVERSE_SEARCH, "/search/phash", _search_phash),
+        Scenario("phash_add", REVERSE_SEARCH, "/phash/add", _phash_add),
+    ]
+}
+
+
+def synthetic_images(count: int, size: int, seed: int = 0) -> List[TestImage]:
+    """Distinct JPEGs (noise, gradient and shapes) so pHash entries differ"""
+    rng = random.Random(seed)
+    images = []
+    for index in range(count):
+        width, height = (size, size * 3 // 4) if index % 2 == 0 else (size * 3 // 4, size)
+        gradient = Image.linear_gradient("L").resize((width, height)).rotate(rng.randrange(360))
+        noise = Image.effect_noise((width, height), rng.uniform(20, 60))
+        image = Image.merge("RGB", (gradient, noise, gradient.transpose(Image.FLIP_LEFT_RIGHT)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(6):
+            x, y = rng.randrange(width), rng.randrange(height)
+            radius = rng.randrange(size // 20, size // 4)
+            draw.ellipse(
+                (x - radius, y - radius, x + radius, y + radius),
+                fill=tuple(rng.randrange(256) for _ in range(3)),
+            )
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=90)
+        images.append(TestImage(f"synthetic-{index}.jpg", buffer.getvalue(), "image/jpeg"))
+    return images
+
+
+def load_images(directory: str, limit: int = 0) -> List[TestImage]:
+    """Images under a directory (recursively), e.g. test-images/dataset"""
+    images = []
+    for root, _, files in sorted(os.walk(directory)):
+        for name in sorted(files):
+            extension = os.path.splitext(name)[1].lower()
+            if extension not in IMAGE_EXTENSIONS:
+                continue
+            with open(os.path.join(root, name), "rb") as f:
+                content_type = "image/jpeg" if extension in (".jpg", ".jpeg") else f"image/{extension[1:]}"
+                images.append(TestImage(name, f.read(), content_type))
+            if limit and len(images) >= limit:
+                return images
+    return images
@@ -0,0 +1,214 @@
+"""
+Local stand-ins for the reverse-search service's external dependencies
+
+One aiohttp app serving:
+- /serpapi/search        SerpAPI Google Lens (JSON with visual_matches
+                         linking to the crawled pages below)
+- /hosts/0x0             0x0.st upload (plain-text URL)
+- /hosts/catbox          catbox.moe upload (plain-text URL)
+- /hosts/imgbb           ImgBB upload (JSON)
+- /hosted/<name>         the "uploaded" images
+- /pages/<n>             crawled pages with Open Graph / article metadata
+- /_stats                calls and failures per route
+
+Each route answers after a log-normal delay around a configurable mean and
+can fail at a configurable rate, so upstream slowness and the upload
+fallback chain are part of the load test. Point reverse-search at it with
+the environment from service_env().
+
+Usage:
+    python -m loadtest.stubs --port 9100 --serpapi-ms 1500 --upload-fail-rate 0.2
+"""
+import argparse
+import asyncio
+import math
+import random
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+from aiohttp import web
+
+NOTABLE_SOURCES = ["news.example.org", "wikipedia.example.org", "archive.example.org"]
+
+
+@dataclass
+class StubSettings:
+    serpapi_ms: float = 1200.0  # Google Lens answers take seconds
+    upload_ms: float = 300.0
+    page_ms: float = 150.0
+    jitter: float = 0.5  # Log-normal sigma of the delays
+    matches: int = 12  # visual_matches per SerpAPI answer
+    serpapi_fail_rate: float = 0.0
+    upload_fail_rate: float = 0.0  # Per host: failures fall through to the next host
+    page_fail_rate: float = 0.0
+
+
+def service_env(base_url: str) -> Dict[str, str]:
+    """reverse-search environment that routes every external call to the stubs"""
+    return {
+        "SERPAPI_KEY": "loadtest",
+        "SERPAPI_BASE_URL": f"{base_url}/serpapi",
+        "IMAGE_HOST_0X0_URL": f"{base_url}/hosts/0x0",
+        "IMAGE_HOST_CATBOX_URL": f"{base_url}/hosts/catbox",
+        "IMAGE_HOST_IMGBB_URL": f"{base_url}/hosts/imgbb",
+    }
+
+
+class Stubs:
+    def __init__(self, settings: StubSettings, seed: int = 0):
+        self.settings = settings
+        self.random = random.Random(seed)
+        self.calls = Counter()
+        self.failures = Counter()
+
+    async def _respond(self, route: str, mean_ms: float, fail_rate: float) -> bool:
+        """Count, delay and decide whether this call fails"""
+        self.calls[route] += 1
+        if mean_ms > 0:
+            sigma = self.settings.jitter
+            # Log-normal with the given mean
+            delay_ms = self.random.lognormvariate(math.log(mean_ms) - sigma ** 2 / 2, sigma)
+            await asyncio.sleep(delay_ms / 1000)
+        if self.random.random() < fail_rate:
+            self.failures[route] += 1
+            return False
+        return True
+
+    async def serpapi_search(self, request: web.Request) -> web.Response:
+        if not await self._respond("serpapi", self.settings.serpapi_ms, self.settings.serpapi_fail_rate):
+            return web.json_response({"error": "stub failure"}, status=503)
+        base = f"{request.scheme}://{request.host}"
+        matches = []
+        for position in range(self.settings.matches):
+            page = self.random.randrange(100000)
+            source = (
+                NOTABLE_SOURCES[position % len(NOTABLE_SOURCES)]
+                if position % 4 == 0
+                else f"site{page % 97}.example.com"
+            )
+            matches.append({
+                "position": position + 1,
+                "title": f"Stub page {page}",
+                "link": f"{base}/pages/{page}",
+                "source": source,
+                "thumbnail": f"{base}/hosted/thumb-{page}.jpg",
+            })
+        return web.json_response({
+            "search_metadata": {"status": "Success", "id": uuid.uuid4().hex},
+            "search_parameters": {"engine": request.query.get("engine"), "url": request.query.get("url")},
+            "visual_matches": matches,
+        })
+
+    async def _upload(self, request: web.Request, route: str) -> str:
+        await request.read()  # Receive the whole upload like a real host
+        if not await self._respond(route, self.settings.upload_ms, self.settings.upload_fail_rate):
+            return ""
+        return f"{request.scheme}://{request.host}/hosted/{uuid.uuid4().hex}.jpg"
+
+    async def upload_0x0(self, request: web.Request) -> web.Response:
+        url = await self._upload(request, "upload_0x0")
+        return web.Response(text=url) if url else web.Response(status=503, text="stub failure")
+
+    async def upload_catbox(self, request: web.Request) -> web.Response:
+        url = await self._upload(request, "upload_catbox")
+        return web.Response(text=url) if url else web.Response(status=503, text="stub failure")
+
+    async def upload_imgbb(self, request: web.Request) -> web.Response:
+        url = await self._upload(request, "upload_imgbb")
+        if not url:
+            return web.json_response({"success": False}, status=503)
+        return web.json_response({"success": True, "data": {"url": url}})
+
+    async def hosted(self, request: web.Request) -> web.Response:
+        self.calls["hosted"] += 1
+        return web.Response(body=b"\xff\xd8\xff\xd9", content_type="image/jpeg")
+
+    async def page(self, request: web.Request) -> web.Response:
+        if not await self._respond("page", self.settings.page_ms, self.settings.page_fail_rate):
+            return web.Response(status=503, text="stub failure")
+        page = int(request.match_info["page"])
+        year = 2015 + page % 10
+        # Filler so BeautifulSoup parses a realistically sized document
+        paragraphs = "\n".join(f"<p>Paragraph {i} of stub article {page}.</p>" for i in range(200))
+        html = f"""<!doctype html>
+<html><head>
+<title>Stub article {page}</title>
+<meta property="og:title" content="Stub article {page}">
+<meta property="og:site_name" content="Stub Site {page % 97}">
+<meta property="og:description" content="Deterministic page served by loadtest.stubs">
+<meta property="article:published_time" content="{year}-0{1 + page % 9}-1{page % 10}T12:00:00Z">
+<meta name="author" content="Stub Author {page % 13}">
+</head><body><h1>Stub article {page}</h1>{paragraphs}</body></html>"""
+        return web.Response(text=html, content_type="text/html")
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({"calls": dict(self.calls), "failures": dict(self.failures)})
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.add_routes([
+            web.get("/serpapi/search", self.serpapi_search),
+            web.post("/hosts/0x0", self.upload_0x0),
+            web.post("/hosts/catbox", self.upload_catbox),
+            web.post("/hosts/imgbb", self.upload_imgbb),
+            web.get("/hosted/{name}", self.hosted),
+            web.get("/pages/{page}", self.page),
+            web.get("/_stats", self.stats),
+        ])
+        return app
+
+
+async def start_stubs(
+    settings: StubSettings, host: str = "127.0.0.1", port: int = 9100
+) -> Tuple[Stubs, web.AppRunner]:
+    """Serve the stubs in the running event loop (stop with `await runner.cleanup()`)"""
+    stubs = Stubs(settings)
+    runner = web.AppRunner(stubs.app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return stubs, runner
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser):
+    defaults = StubSettings()
+    parser.add_argument("--serpapi-ms", type=float, default=defaults.serpapi_ms, help="Mean SerpAPI latency")
+    parser.add_argument("--upload-ms", type=float, default=defaults.upload_ms, help="Mean image host latency")
+    parser.add_argument("--page-ms", type=float, default=defaults.page_ms, help="Mean crawled page latency")
+    parser.add_argument("--jitter", type=float, default=defaults.jitter, help="Log-normal sigma of stub delays")
+    parser.add_argument("--matches", type=int, default=defaults.matches, help="visual_matches per search")
+    parser.add_argument("--serpapi-fail-rate", type=float, default=defaults.serpapi_fail_rate)
+    parser.add_argument("--upload-fail-rate", type=float, default=defaults.upload_fail_rate)
+    parser.add_argument("--page-fail-rate", type=float, default=defaults.page_fail_rate)
+
+
+def stub_settings(args: argparse.Namespace) -> StubSettings:
+    return StubSettings(
+        serpapi_ms=args.serpapi_ms,
+        upload_ms=args.upload_ms,
+        page_ms=args.page_ms,
+        jitter=args.jitter,
+        matches=args.matches,
+        serpapi_fail_rate=args.serpapi_fail_rate,
+        upload_fail_rate=args.upload_fail_rate,
+        page_fail_rate=args.page_fail_rate,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    base_url = f"http://{args.host}:{args.port}"
+    print("reverse-search environment for these stubs:")
+    for name, value in service_env(base_url).items():
+        print(f"  {name}={value}")
+    web.run_app(Stubs(stub_settings(args)).app(), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Model cascade evaluator
+
+Runs every image of a labeled folder through the full pipeline twice — all
+models, then the cascade — and reports:
+- verdict parity: images whose side of AI_GENERATED_THRESHOLD differs
+  between the two runs (should be 0)
+- accuracy of both runs against the folder labels
+- models skipped and the measured speedup of the model phase
+
+Labels come from sub-directory names: anything containing "ai", "fake" or
+"generated" counts as AI-generated, everything else as real.
+
+Usage:
+    python -m benchmarks.cascade_eval --dataset ../../test-images/dataset
+    python -m benchmarks.cascade_eval --limit 50 --json cascade.json
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.common import DEFAULT_DATASET, load_corpus, percentiles, write_json
+
+import config
+from models import AIDetectionModels
+
+AI_LABEL_KEYWORDS = ("ai", "fake", "generated")
+
+
+def is_ai_label(label) -> bool:
+    return label is not None and any(keyword in label.lower() for keyword in AI_LABEL_KEYWORDS)
+
+
+def run(detector, image_bytes, cascade):
+    prepared = detector.preprocessor.prepare_bytes(image_bytes)
+    start = time.perf_counter()
+    result = detector.detect(prepared, image_bytes, cascade=cascade)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=DEFAULT_DATASET)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.dataset, args.limit)
+    if not corpus:
+        parser.error(f"No images found in {args.dataset}")
+
+    detector = AIDetectionModels()
+    detector.load_models()
+    threshold = config.AI_GENERATED_THRESHOLD
+
+    # Warm-up so the cascade order reflects measured model latencies
+    run(detector, corpus[0][2], cascade=False)
+
+    rows = []
+    full_ms, cascade_ms = [], []
+    for name, label, image_bytes in corpus:
+        full, full_time = run(detector, image_bytes, cascade=False)
+        fast, fast_time = run(detector, image_bytes, cascade=True)
+        full_ms.append(full_time)
+        cascade_ms.append(fast_time)
+
+        report = fast["modelScores"].get("cascade", {})
+        rows.append(
+            {
+                "image": name,
+                "label": label,
+                "full_score": full["ensembleScore"],
+                "cascade_score": fast["ensembleScore"],
+                "skipped": report.get("models_skipped", []),
+                "estimated_speedup": report.get("estimated_speedup", 1.0),
+            }
+        )
+
+    truth = np.array([is_ai_label(row["label"]) for row in rows])
+    full_ai = np.array([row["full_score"] >= threshold for row in rows])
+    cascade_ai = np.array([row["cascade_score"] >= threshold for row in rows])
+    skipped = np.array([len(row["skipped"]) for row in rows])
+    labeled = np.array([row["label"] is not None for row in rows])
+
+    results = {
+        "images": len(rows),
+        "threshold": threshold,
+        "verdict_mismatches": int(np.sum(full_ai != cascade_ai)),
+        "full_accuracy": round(float(np.mean(full_ai[labeled] == truth[labeled])), 4) if labeled.any() else None,
+        "cascade_accuracy": round(float(np.mean(cascade_ai[labeled] == truth[labeled])), 4) if labeled.any() else None,
+        "early_exits": int(np.sum(skipped > 0)),
+        "models_skipped_total": int(skipped.sum()),
+        "mean_abs_score_diff": round(float(np.mean([abs(r["full_score"] - r["cascade_score"]) for r in rows])), 5),
+        "full_latency_ms": percentiles(full_ms),
+        "cascade_latency_ms": percentiles(cascade_ms),
+        "measured_speedup": round(float(np.sum(full_ms) / max(np.sum(cascade_ms), 1e-6)), 3),
+        "rows": rows,
+    }
+
+    print(
+        f"{results['images']} images: {results['early_exits']} early exits, "
+        f"{results['models_skipped_total']} model runs skipped, "
+        f"verdict mismatches {results['verdict_mismatches']}"
+    )
+    print(f"accuracy full={results['full_accuracy']} cascade={results['cascade_accuracy']}")
+    print(
+        f"latency p50 {results['full_latency_ms']['p50']:.0f} -> "
+        f"{results['cascade_latency_ms']['p50']:.0f} ms ({results['measured_speedup']}x end-to-end)"
+    )
+
+    if args.json:
+        write_json(args.json, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Shared helpers for the ai-detection benchmark scripts
+
+Benchmarks are run from the service directory, e.g.:
+    python -m benchmarks.enhancement_benchmark --dataset ../../test-images/dataset
+"""
+import json
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVICE_DIR not in sys.path:
+    sys.path.insert(0, SERVICE_DIR)
+
+# Same layout the end-to-end test uses: <dataset>/real, <dataset>/ai-generated
+DEFAULT_DATASET = os.path.join(SERVICE_DIR, "..", "..", "test-images", "dataset")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def load_corpus(
+    dataset_dir: str, limit: Optional[int] = None
+) -> List[Tuple[str, Optional[str], bytes]]:
+    """
+    Load (name, label, raw bytes) for every image under dataset_dir
+
+    The label is the name of the immediate sub-directory (e.g. "real",
+    "ai-generated"), or None for images at the top level.
+    """
+    corpus = []
+    for root, _, files in sorted(os.walk(dataset_dir)):
+        label = None if os.path.samefile(root, dataset_dir) else os.path.basename(root)
+        for name in sorted(files):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            with open(os.path.join(root, name), "rb") as f:
+                corpus.append((name, label, f.read()))
+            if limit and len(corpus) >= limit:
+                return corpus
+    return corpus
+
+
+def decode(image_bytes: bytes) -> Image.Image:
+    """Decode raw bytes into an RGB PIL image"""
+    from io import BytesIO
+
+    image = Image.open(BytesIO(image_bytes))
+    return image.convert("RGB") if image.mode != "RGB" else image
+
+
+def percentiles(values_ms: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds"""
+    if not values_ms:
+        return {"count": 0}
+    arr = np.asarray(values_ms, dtype=np.float64)
+    return {
+        "count": int(arr.size),
+        "mean": round(float(arr.mean()), 3),
+        "p50": round(float(np.percentile(arr, 50)), 3),
+        "p90": round(float(np.percentile(arr, 90)), 3),
+        "p99": round(float(np.percentile(arr, 99)), 3),
+        "max": round(float(arr.max()), 3),
+    }
+
+
+def write_json(path: str, data: dict):
+    """Write benchmark results as pretty-printed JSON"""
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    print(f"Results written to {path}")
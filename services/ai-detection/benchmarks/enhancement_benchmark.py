@@ -0,0 +1,96 @@
+"""
+Enhancement tier benchmark
+
+Measures denoising latency per tier over a dataset and, with --with-models,
+how much each tier shifts the model AI scores relative to no denoising.
+
+Usage:
+    python -m benchmarks.enhancement_benchmark --dataset ../../test-images/dataset
+    python -m benchmarks.enhancement_benchmark --with-models --json results.json
+"""
+import argparse
+import time
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.common import DEFAULT_DATASET, decode, load_corpus, percentiles, write_json
+
+import config
+from image_quality import ImageQualityAssessor
+from preprocessing import ImagePreprocessor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=DEFAULT_DATASET)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--strength", type=float, default=10, help="NLM h (10 aggressive, 5 moderate)")
+    parser.add_argument("--tiers", nargs="+", default=list(ImageQualityAssessor.DENOISE_TIERS))
+    parser.add_argument("--with-models", action="store_true", help="Also measure model score drift per tier")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.dataset, args.limit)
+    if not corpus:
+        parser.error(f"No images found in {args.dataset}")
+
+    preprocessor = ImagePreprocessor()
+    assessor = ImageQualityAssessor()
+
+    detector = None
+    if args.with_models:
+        from models import AIDetectionModels
+
+        detector = AIDetectionModels()
+        detector.load_models()
+
+    latencies = {tier: [] for tier in args.tiers}
+    scores = {tier: [] for tier in args.tiers}  # per image: {model: ai_score}
+    megapixels = []
+
+    for name, label, image_bytes in corpus:
+        model_image = np.array(preprocessor.prepare(decode(image_bytes)).model)
+        megapixels.append(model_image.shape[0] * model_image.shape[1] / 1e6)
+        for tier in args.tiers:
+            start = time.perf_counter()
+            denoised = assessor._denoise_with_tier(model_image, tier, args.strength)
+            latencies[tier].append((time.perf_counter() - start) * 1000)
+
+            if detector:
+                enhanced = Image.fromarray(denoised)
+                scores[tier].append({
+                    key: detector._extract_ai_score(detector._run_model(enhanced, info), key)
+                    for key, info in detector.loaded_models.items()
+                })
+        print(f"  {name} ({label or '-'}) done")
+
+    megapixels = float(np.mean(megapixels))
+    results = {"images": len(corpus), "mean_megapixels": round(megapixels, 4), "tiers": {}}
+
+    print(f"\n{'tier':<16}{'p50 ms':>10}{'p90 ms':>10}{'ms/MP':>10}{'mean |dAI|':>12}{'flips':>8}")
+    for tier in args.tiers:
+        summary = percentiles(latencies[tier])
+        entry = {"latency_ms": summary, "ms_per_megapixel": round(summary["mean"] / megapixels, 1)}
+
+        if detector and "none" in scores:
+            deltas, flips = [], 0
+            for base, current in zip(scores["none"], scores[tier]):
+                for key, value in current.items():
+                    deltas.append(abs(value - base[key]))
+                    flips += (value >= config.AI_GENERATED_THRESHOLD) != (base[key] >= config.AI_GENERATED_THRESHOLD)
+            entry["mean_abs_ai_score_delta"] = round(float(np.mean(deltas)), 4) if deltas else 0.0
+            entry["threshold_flips"] = int(flips)
+
+        results["tiers"][tier] = entry
+        print(
+            f"{tier:<16}{summary['p50']:>10.1f}{summary['p90']:>10.1f}{entry['ms_per_megapixel']:>10.1f}"
+            f"{entry.get('mean_abs_ai_score_delta', float('nan')):>12.4f}{entry.get('threshold_flips', 0):>8}"
+        )
+
+    if args.json:
+        write_json(args.json, results)
+
+
+if __name__ == "__main__":
+    main()
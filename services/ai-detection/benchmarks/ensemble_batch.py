@@ -0,0 +1,111 @@
+"""
+Per-image vs columnar ensemble scoring
+
+Generates random model predictions (scores, confidences, missing models,
+quality and forensics per image) and scores them twice:
+- combine_predictions once per image (the request path)
+- combine_batch once for all images
+and reports images/second for both plus any verdict or score mismatch
+between the two (should be none).
+
+Usage:
+    python -m benchmarks.ensemble_batch --images 20000 --models 3
+"""
+import argparse
+import logging
+import time
+
+import numpy as np
+
+from benchmarks.common import write_json
+
+from ensemble import SmartEnsemble
+from results import ForensicResult, QualityReport
+
+MODEL_NAMES = ["vit_detector", "clip_detector", "resnet_detector", "sdxl_detector", "deepfake"]
+
+
+def random_batch(rng, images, models):
+    ai_scores = rng.random((images, models))
+    # A model fails on ~5% of images
+    ai_scores[rng.random((images, models)) < 0.05] = np.nan
+    return {
+        "ai_scores": ai_scores,
+        "confidences": 1.25 * np.maximum(ai_scores, 1 - ai_scores) - 0.25,
+        "weights": rng.choice([0.2, 0.25, 0.3], size=models),
+        "model_names": [MODEL_NAMES[i % len(MODEL_NAMES)] + str(i) for i in range(models)],
+        "deepfake_scores": rng.random((images, models)),
+        "overall_quality": rng.random(images),
+        "manipulation_likelihood": rng.random(images),
+    }
+
+
+def per_image(ensemble, batch, row):
+    """One image of the batch in combine_predictions format"""
+    predictions = [
+        {
+            "model": name,
+            "weight": float(batch["weights"][column]),
+            "ai_score": float(batch["ai_scores"][row, column]),
+            "deepfake_score": float(batch["deepfake_scores"][row, column]),
+            "confidence": float(batch["confidences"][row, column]),
+        }
+        for column, name in enumerate(batch["model_names"])
+        if not np.isnan(batch["ai_scores"][row, column])
+    ]
+    return ensemble.combine_predictions(
+        predictions,
+        image_quality=QualityReport(overall_quality=float(batch["overall_quality"][row])),
+        forensics=ForensicResult(manipulation_likelihood=float(batch["manipulation_likelihood"][row])),
+        verbose=False,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=20000)
+    parser.add_argument("--models", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    ensemble = SmartEnsemble()
+    batch = random_batch(np.random.default_rng(args.seed), args.images, args.models)
+
+    start = time.perf_counter()
+    single = [per_image(ensemble, batch, row) for row in range(args.images)]
+    single_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    columnar = ensemble.combine_batch(**batch)
+    batch_seconds = time.perf_counter() - start
+
+    single_scores = np.array([result["scores"]["ai_generated"] for result in single])
+    single_verdicts = np.array([result["verdict"] for result in single])
+    results = {
+        "images": args.images,
+        "models": args.models,
+        "per_image_images_per_second": round(args.images / single_seconds, 1),
+        "batch_images_per_second": round(args.images / batch_seconds, 1),
+        "speedup": round(single_seconds / batch_seconds, 1),
+        "verdict_mismatches": int(np.sum(single_verdicts != columnar["verdict"])),
+        "max_score_diff": float(np.max(np.abs(single_scores - columnar["ai_generated"]))),
+    }
+
+    print(
+        f"{args.images} images x {args.models} models: "
+        f"per-image {results['per_image_images_per_second']:.0f}/s, "
+        f"batch {results['batch_images_per_second']:.0f}/s ({results['speedup']}x)"
+    )
+    print(
+        f"verdict mismatches {results['verdict_mismatches']}, "
+        f"max score diff {results['max_score_diff']:.2e}"
+    )
+
+    if args.json:
+        write_json(args.json, results)
+
+
+if __name__ == "__main__":
+    main()
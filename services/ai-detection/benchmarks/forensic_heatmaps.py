@@ -0,0 +1,136 @@
+"""
+Cost and accuracy of the tiled forensic heatmaps
+
+For every image this times ForensicAnalyzer.analyze on the forensic variant
+without and with heatmaps (same shared statistics setup as the detection
+path), and a per-tile reference that runs the tile-local checks in a Python
+loop (the float64 NumPy formulas of the global checks on each tile crop).
+It reports:
+- global pass ms, heatmap overhead ms (and per megapixel), loop reference ms
+- the largest difference between the heatmaps and the reference, in uint8
+  levels of each map (0 = identical after quantization)
+
+Images: the test dataset (if present) plus synthetic photo/render/texture
+images at two sizes.
+
+Usage:
+    python -m benchmarks.forensic_heatmaps
+    python -m benchmarks.forensic_heatmaps --tile 16 --repeat 10 --json heatmaps.json
+"""
+import argparse
+import time
+from collections import defaultdict
+from typing import Any, Dict, Tuple
+
+import cv2
+import numpy as np
+
+from benchmarks.common import DEFAULT_DATASET, load_corpus, percentiles, write_json
+from benchmarks.run_benchmarks import synthetic_image
+
+from forensics import ForensicAnalyzer
+from image_stats import ImageStatistics
+from preprocessing import ImagePreprocessor
+
+
+def reference_maps(analyzer: ForensicAnalyzer, array: np.ndarray, tile: int) -> Dict[str, np.ndarray]:
+    """Tile-by-tile float64 version of ForensicAnalyzer._tile_maps"""
+    gray = analyzer._to_gray(array)
+    laplacian = cv2.Laplacian(gray, cv2.CV_64F)
+    sobelx = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
+    sobely = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
+    magnitude = np.sqrt(sobelx ** 2 + sobely ** 2)
+    rows, cols = gray.shape[0] // tile, gray.shape[1] // tile
+    maps = {name: np.zeros((rows, cols)) for name in analyzer.HEATMAP_SCALES}
+    for i in range(rows):
+        for j in range(cols):
+            cell = np.s_[i * tile:(i + 1) * tile, j * tile:(j + 1) * tile]
+            # _block_variances drops the last row/column of blocks: pad by one pixel
+            padded = np.pad(gray[cell].astype(np.float64), ((0, 1), (0, 1)))
+            edges = magnitude[cell][magnitude[cell] > 0]
+            maps["noise"][i, j] = laplacian[cell].var()
+            maps["block_variance"][i, j] = analyzer._block_variances(padded).std()
+            maps["edge_strength"][i, j] = edges.mean() if edges.size else 0
+            maps["color"][i, j] = np.std(array[cell])
+    return maps
+
+
+def timed(fn, repeat: int) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        value = fn()
+    return value, (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=DEFAULT_DATASET)
+    parser.add_argument("--limit", type=int, default=8, help="Dataset images to use (0 = none)")
+    parser.add_argument("--tile", type=int, default=32, help="Heatmap tile size (multiple of 8)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per image and path")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    sources = [b for _, _, b in load_corpus(args.dataset, args.limit)] if args.limit else []
+    rng = np.random.default_rng(0)
+    sources += [
+        synthetic_image(kind, size, rng)
+        for kind in ("photo", "render", "texture")
+        for size in ((800, 600), (3000, 2000))
+    ]
+
+    preprocessor = ImagePreprocessor()
+    analyzer = ForensicAnalyzer(heatmap_tile=args.tile, heatmap_format="array")
+    timings = defaultdict(list)  # path -> ms
+    max_levels = defaultdict(float)  # map -> largest difference in uint8 levels
+
+    for image_bytes in sources:
+        prepared = preprocessor.prepare_bytes(image_bytes)
+        image, tiles = prepared.forensic, prepared.forensic_tiles or None
+        megapixels = image.width * image.height / 1e6
+
+        def analyze(heatmaps: bool):
+            return analyzer.analyze(
+                image, image_bytes, native_tiles=tiles, stats=ImageStatistics(image), heatmaps=heatmaps
+            )
+
+        analyze(True)  # warm-up
+        _, global_ms = timed(lambda: analyze(False), args.repeat)
+        result, heatmap_ms = timed(lambda: analyze(True), args.repeat)
+        reference, loop_ms = timed(
+            lambda: reference_maps(analyzer, np.asarray(image), analyzer.heatmap_tile), 1
+        )
+        timings["global"].append(global_ms)
+        timings["with_heatmaps"].append(heatmap_ms)
+        timings["overhead"].append(heatmap_ms - global_ms)
+        timings["overhead_per_mp"].append((heatmap_ms - global_ms) / megapixels)
+        timings["heatmaps_compute"].append(result.heatmaps.compute_ms)
+        timings["loop_reference"].append(loop_ms)
+
+        for name, levels in result.heatmaps.maps.items():
+            expected = np.clip(np.rint(reference[name] * 255.0 / analyzer.HEATMAP_SCALES[name]), 0, 255)
+            max_levels[name] = max(max_levels[name], float(np.abs(levels - expected).max()))
+
+    results = {
+        "images": len(sources),
+        "tile": analyzer.heatmap_tile,
+        "timings_ms": {name: percentiles(values) for name, values in timings.items()},
+        "max_difference_levels": dict(max_levels),
+    }
+
+    print(f"{len(sources)} images, {analyzer.heatmap_tile}px tiles")
+    for name, values in timings.items():
+        print(f"  {name:<18} mean {np.mean(values):8.2f} ms  max {np.max(values):8.2f} ms")
+    print(
+        f"  heatmaps add {np.mean(timings['overhead']) / np.mean(timings['global']):.0%} to the global pass"
+        f" ({np.mean(timings['loop_reference']) / np.mean(timings['heatmaps_compute']):.0f}x faster than the loop)"
+    )
+    for name, levels in max_levels.items():
+        print(f"  {name:<18} max difference {levels:.2f} levels")
+
+    if args.json:
+        write_json(args.json, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Parity and speed of the forensic/quality image kernels vs their float64 originals
+
+The edge, noise and sharpness kernels moved from CV_64F filters with NumPy
+temporaries to float32/int16 OpenCV paths (cv2.magnitude, cv2.meanStdDev,
+countNonZero/sumElems, per-tile moments pooled instead of concatenated).
+This script runs the former float64 implementations next to the current
+ones on every image and checks:
+- the raw values (max absolute / relative difference)
+- the thresholded flags derived from them still classify every image the
+  same: edge_artifacts, uniform_noise_pattern (whole image and native
+  tiles), needs_sharpening and the sharpness label
+and reports the time of each kernel before/after.
+
+Images: the test dataset (if present) plus synthetic photo/render/texture
+images at two sizes (the large one takes the native-tile path), each
+blurred, noised and flattened (low contrast) to several degrees so values
+fall on both sides of the thresholds. Exits with status 1 if any flag differs.
+tests/test_kernel_parity.py asserts the same on the synthetic set.
+
+Usage:
+    python -m benchmarks.kernel_parity
+    python -m benchmarks.kernel_parity --limit 0 --json kernel_parity.json
+"""
+import argparse
+import sys
+import time
+from collections import defaultdict
+from typing import Callable, List, Tuple
+
+import cv2
+import numpy as np
+
+from benchmarks.common import DEFAULT_DATASET, load_corpus, percentiles, write_json
+from benchmarks.run_benchmarks import synthetic_image
+
+from forensics import ForensicAnalyzer
+from image_stats import ImageStatistics
+from preprocessing import ImagePreprocessor
+from results import ForensicResult
+
+
+# ----------------------------------------------------------------------
+# Former float64 implementations
+# ----------------------------------------------------------------------
+
+def legacy_edges(gray: np.ndarray) -> Tuple[float, float]:
+    edges = cv2.Canny(gray, 100, 200)
+    edge_density = np.sum(edges > 0) / edges.size
+    sobelx = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
+    sobely = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
+    edge_magnitude = np.sqrt(sobelx**2 + sobely**2)
+    avg_edge_strength = np.mean(edge_magnitude[edge_magnitude > 0]) if np.any(edge_magnitude > 0) else 0
+    return float(edge_density), float(avg_edge_strength)
+
+
+def legacy_laplacian_variance(gray: np.ndarray) -> float:
+    _, std = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_64F))
+    return float(std[0, 0] ** 2)
+
+
+def legacy_tile_noise(grays: List[np.ndarray]) -> Tuple[float, float]:
+    laplacians = [cv2.Laplacian(g, cv2.CV_64F).ravel() for g in grays]
+    laplacian_var = np.concatenate(laplacians).var()
+    std_dev = np.std(np.concatenate([g.ravel() for g in grays]))
+    return float(std_dev), float(laplacian_var)
+
+
+# ----------------------------------------------------------------------
+# Current implementations (through the analyzers)
+# ----------------------------------------------------------------------
+
+analyzer = ForensicAnalyzer()
+
+
+def current_edges(gray: np.ndarray) -> Tuple[float, float]:
+    result = ForensicResult()
+    analyzer._analyze_edges(ImageStatistics(gray), result)
+    return result.edge_density, result.average_edge_strength
+
+
+def current_laplacian_variance(gray: np.ndarray) -> float:
+    return ImageStatistics(gray).laplacian_variance
+
+
+def current_tile_noise(tiles: List[np.ndarray]) -> Tuple[float, float]:
+    result = ForensicResult()
+    analyzer._analyze_noise(None, result, tiles)
+    return result.noise_level, result.laplacian_variance
+
+
+# ----------------------------------------------------------------------
+# Flags derived from the values (thresholds as in the analyzers)
+# ----------------------------------------------------------------------
+
+def edge_artifacts(strength: float) -> bool:
+    return strength > 100 or strength < 10
+
+
+def uniform_noise(std_dev: float, laplacian_var: float) -> bool:
+    return std_dev < 25 and laplacian_var < 100
+
+
+def sharpness_label(laplacian_var: float) -> Tuple[bool, str]:
+    score = min(laplacian_var / 500.0, 1.0)
+    return score < 0.5, "sharp" if score > 0.7 else "moderate" if score > 0.4 else "blurry"
+
+
+def variants(image_bytes: bytes) -> List[bytes]:
+    """The image itself plus blurred, noised and low-contrast versions (PNG)"""
+    array = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    rng = np.random.default_rng(len(image_bytes))
+    out = [image_bytes]
+    for sigma in (0.8, 2.0, 4.0):
+        out.append(cv2.imencode(".png", cv2.GaussianBlur(array, (0, 0), sigma))[1].tobytes())
+    for noise in (3.0, 12.0):
+        noisy = np.clip(array + rng.normal(0, noise, array.shape), 0, 255).astype(np.uint8)
+        out.append(cv2.imencode(".png", noisy)[1].tobytes())
+    for contrast, sigma in ((0.2, 0.0), (0.2, 1.5), (0.1, 0.0)):
+        flat = cv2.GaussianBlur(array, (0, 0), sigma) if sigma else array
+        flat = (flat * contrast + 110).astype(np.uint8)
+        out.append(cv2.imencode(".png", flat)[1].tobytes())
+    return out
+
+
+def timed(fn: Callable, *args):
+    start = time.perf_counter()
+    value = fn(*args)
+    return value, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=DEFAULT_DATASET)
+    parser.add_argument("--limit", type=int, default=8, help="Dataset images to use (0 = none)")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    sources = [b for _, _, b in load_corpus(args.dataset, args.limit)] if args.limit else []
+    rng = np.random.default_rng(0)
+    sources += [
+        synthetic_image(kind, size, rng)
+        for kind in ("photo", "render", "texture")
+        for size in ((800, 600), (3000, 2000))
+    ]
+    images = [variant for source in sources for variant in variants(source)]
+
+    preprocessor = ImagePreprocessor()
+    diffs = defaultdict(lambda: [0.0, 0.0])  # value -> [max abs, max rel]
+    timings = defaultdict(list)  # kernel/implementation -> ms
+    flags = defaultdict(lambda: [0, 0, 0])  # flag -> [images, mismatches, legacy positives]
+    mismatches = []
+
+    def compare(name: str, legacy: float, current: float):
+        delta = abs(legacy - current)
+        diffs[name][0] = max(diffs[name][0], delta)
+        diffs[name][1] = max(diffs[name][1], delta / abs(legacy) if legacy else delta)
+
+    def check(flag: str, index: int, legacy, current):
+        flags[flag][0] += 1
+        flags[flag][2] += bool(legacy[0] if isinstance(legacy, tuple) else legacy)
+        if legacy != current:
+            flags[flag][1] += 1
+            mismatches.append({"image": index, "flag": flag, "legacy": legacy, "current": current})
+
+    for index, image_bytes in enumerate(images):
+        prepared = preprocessor.prepare_bytes(image_bytes)
+        gray = cv2.cvtColor(np.asarray(prepared.forensic), cv2.COLOR_RGB2GRAY)
+
+        (old_density, old_strength), ms = timed(legacy_edges, gray)
+        timings["edges/legacy"].append(ms)
+        (density, strength), ms = timed(current_edges, gray)
+        timings["edges/current"].append(ms)
+        compare("edge_density", old_density, density)
+        compare("average_edge_strength", old_strength, strength)
+        check("edge_artifacts", index, edge_artifacts(old_strength), edge_artifacts(strength))
+
+        old_variance, ms = timed(legacy_laplacian_variance, gray)
+        timings["laplacian/legacy"].append(ms)
+        variance, ms = timed(current_laplacian_variance, gray)
+        timings["laplacian/current"].append(ms)
+        compare("laplacian_variance", old_variance, variance)
+        check("sharpness", index, sharpness_label(old_variance), sharpness_label(variance))
+        gray_std = float(np.std(gray))
+        check("uniform_noise_pattern", index, uniform_noise(gray_std, old_variance), uniform_noise(gray_std, variance))
+
+        if prepared.forensic_tiles:
+            grays = [analyzer._to_gray(tile) for tile in prepared.forensic_tiles]
+            (old_std, old_tile_variance), ms = timed(legacy_tile_noise, grays)
+            timings["tile_noise/legacy"].append(ms)
+            (tile_std, tile_variance), ms = timed(current_tile_noise, prepared.forensic_tiles)
+            timings["tile_noise/current"].append(ms)
+            compare("tile_noise_level", old_std, tile_std)
+            compare("tile_laplacian_variance", old_tile_variance, tile_variance)
+            check(
+                "uniform_noise_pattern_tiles", index,
+                uniform_noise(old_std, old_tile_variance), uniform_noise(tile_std, tile_variance),
+            )
+
+    results = {
+        "images": len(images),
+        "value_diffs": {name: {"max_abs": a, "max_rel": r} for name, (a, r) in diffs.items()},
+        "flags": {
+            name: {"images": n, "mismatches": m, "positives": p} for name, (n, m, p) in flags.items()
+        },
+        "mismatches": mismatches,
+        "kernels_ms": {name: percentiles(values) for name, values in timings.items()},
+    }
+
+    print(f"{len(images)} images")
+    for name, (max_abs, max_rel) in diffs.items():
+        print(f"  {name:<28} max abs diff {max_abs:.3g}  max rel diff {max_rel:.3g}")
+    for name, (count, mismatched, positives) in flags.items():
+        print(f"  {name:<28} {count - mismatched}/{count} classified the same ({positives} flagged)")
+    for kernel in ("edges", "laplacian", "tile_noise"):
+        legacy, current = timings[f"{kernel}/legacy"], timings[f"{kernel}/current"]
+        if legacy:
+            print(
+                f"  {kernel:<28} {np.mean(legacy):7.2f} ms -> {np.mean(current):7.2f} ms"
+                f" ({np.mean(legacy) / np.mean(current):.1f}x)"
+            )
+
+    if args.json:
+        write_json(args.json, results)
+    if mismatches:
+        print(f"FAILED: {len(mismatches)} flag mismatch(es)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Throughput vs inference lane count
+
+Runs the full detection pipeline in-process through ResourceManager with a
+range of lane layouts and reports, per layout: throughput, latency
+percentiles and queueing. Requests are issued closed-loop with a fixed
+number in flight (default: twice the lane count), cycling over the test
+images.
+
+Run on the multi-core machine you deploy to; results on a laptop say little
+about a 16-core server.
+
+Usage:
+    python -m benchmarks.lane_throughput --lanes 1 2 4 8 --requests 64
+    python -m benchmarks.lane_throughput --no-models --json lanes.json
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import DEFAULT_DATASET, load_corpus, percentiles, write_json
+
+from models import AIDetectionModels
+from resources import ResourceManager, available_cpus
+
+
+def detect(detector: AIDetectionModels, image_bytes: bytes) -> float:
+    """One request as main.run_detection issues it; returns latency in ms"""
+    start = time.perf_counter()
+    prepared = detector.preprocessor.prepare_bytes(image_bytes)
+    detector.detect(prepared, image_bytes)
+    return (time.perf_counter() - start) * 1000
+
+
+async def run_layout(manager, detector, corpus, requests, in_flight):
+    latencies = []
+    next_index = 0
+
+    async def client():
+        nonlocal next_index
+        while next_index < requests:
+            _, _, image_bytes = corpus[next_index % len(corpus)]
+            next_index += 1
+            start = time.perf_counter()
+            await manager.run(detect, detector, image_bytes)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(in_flight)])
+    return latencies, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=DEFAULT_DATASET)
+    parser.add_argument("--limit", type=int, default=16, help="Distinct images to cycle over")
+    parser.add_argument("--lanes", type=int, nargs="+", default=None, help="Lane counts (default: 1, 2, 4, ... up to CPUs)")
+    parser.add_argument("--requests", type=int, default=32, help="Requests per layout")
+    parser.add_argument("--in-flight", type=int, default=0, help="Concurrent requests (0 = 2 x lanes)")
+    parser.add_argument("--no-pin", action="store_true", help="Do not pin lanes to cores")
+    parser.add_argument("--no-models", action="store_true", help="Skip the classifiers (analyzers only)")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.dataset, args.limit)
+    if not corpus:
+        parser.error(f"No images found in {args.dataset}")
+
+    cpus = len(available_cpus())
+    lane_counts = args.lanes or [n for n in (1, 2, 4, 8, 16, 32) if n <= cpus]
+
+    detector = AIDetectionModels()
+    if args.no_models:
+        detector.models_loaded = True
+    else:
+        detector.load_models()
+    # Warm-up outside the measurement (lazy imports, first-call allocations)
+    detect(detector, corpus[0][2])
+
+    results = {"cpus": cpus, "requests": args.requests, "models": len(detector.loaded_models), "layouts": []}
+    for lanes in lane_counts:
+        manager = ResourceManager(
+            lanes=lanes, threads_per_lane=0, pin=not args.no_pin
+        )
+        in_flight = args.in_flight or 2 * lanes
+        latencies, elapsed = asyncio.run(
+            run_layout(manager, detector, corpus, args.requests, in_flight)
+        )
+        manager.shutdown()
+
+        layout = {
+            "lanes": lanes,
+            "threads_per_lane": manager.threads_per_lane,
+            "in_flight": in_flight,
+            "throughput_rps": round(args.requests / elapsed, 3),
+            "latency_ms": percentiles(latencies),
+            "lane_busy_seconds": [lane["busy_seconds"] for lane in manager.status()["lane_status"]],
+        }
+        results["layouts"].append(layout)
+        print(
+            f"{lanes:>2} lane(s) x {manager.threads_per_lane:>2} thread(s): "
+            f"{layout['throughput_rps']:.2f} req/s, p50 {layout['latency_ms']['p50']:.0f} ms, "
+            f"p99 {layout['latency_ms']['p99']:.0f} ms"
+        )
+
+    if args.json:
+        write_json(args.json, results)
+
+
+if __name__ == "__main__":
+    main()
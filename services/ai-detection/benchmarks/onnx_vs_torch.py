@@ -0,0 +1,123 @@
+"""
+ONNX Runtime vs PyTorch pipeline benchmark
+
+For every model in config.MODELS that has an ONNX export, runs the torch
+pipeline and the ONNX Runtime classifier side by side over the test images
+and reports per model: latency percentiles, speedup, AI-score difference and
+verdict flips at AI_GENERATED_THRESHOLD.
+
+Usage:
+    python onnx_backend.py export
+    python -m benchmarks.onnx_vs_torch --dataset ../../test-images/dataset
+    python -m benchmarks.onnx_vs_torch --intra-op-threads 4 --graph-optimization extended
+"""
+import argparse
+import time
+
+import numpy as np
+import torch
+
+from benchmarks.common import DEFAULT_DATASET, decode, load_corpus, percentiles, write_json
+
+import config
+import onnx_backend
+from model_loader import ModelRegistry
+from models import AIDetectionModels
+from preprocessing import ImagePreprocessor
+
+
+def run(classifier, images, scorer):
+    scores, latencies = [], []
+    with torch.inference_mode():
+        for image in images:
+            start = time.perf_counter()
+            predictions = classifier(image)
+            latencies.append((time.perf_counter() - start) * 1000)
+            scores.append(scorer(predictions, "generic"))
+    return np.asarray(scores), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=DEFAULT_DATASET)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--quantized", action="store_true", help="Use the INT8 ONNX exports")
+    parser.add_argument("--intra-op-threads", type=int, default=config.ONNX_INTRA_OP_THREADS)
+    parser.add_argument("--inter-op-threads", type=int, default=config.ONNX_INTER_OP_THREADS)
+    parser.add_argument(
+        "--graph-optimization",
+        default=config.ONNX_GRAPH_OPTIMIZATION,
+        choices=onnx_backend.GRAPH_OPTIMIZATION_LEVELS,
+    )
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed runs per backend")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.dataset, args.limit)
+    if not corpus:
+        parser.error(f"No images found in {args.dataset}")
+
+    preprocessor = ImagePreprocessor()
+    images = [preprocessor.prepare(decode(image_bytes)).model for _, _, image_bytes in corpus]
+    scorer = AIDetectionModels()._extract_ai_score
+    threshold = config.AI_GENERATED_THRESHOLD
+
+    results = {
+        "images": len(images),
+        "threshold": threshold,
+        "onnx_options": {
+            "quantized": args.quantized,
+            "intra_op_threads": args.intra_op_threads,
+            "inter_op_threads": args.inter_op_threads,
+            "graph_optimization": args.graph_optimization,
+        },
+        "models": {},
+    }
+    for key, model_name in config.MODELS.items():
+        if not onnx_backend.is_exported(model_name):
+            print(f"{key}: no ONNX export, skipping (run: python onnx_backend.py export --models {key})")
+            continue
+
+        torch_model = ModelRegistry.load_model(model_name, device=-1, quantize=False)
+        if not torch_model:
+            continue
+        onnx_model = onnx_backend.OnnxImageClassifier(
+            model_name,
+            quantized=args.quantized,
+            intra_op_threads=args.intra_op_threads,
+            inter_op_threads=args.inter_op_threads,
+            graph_optimization=args.graph_optimization,
+        )
+
+        run(torch_model["model"], images[:args.warmup], scorer)
+        run(onnx_model, images[:args.warmup], scorer)
+        torch_scores, torch_ms = run(torch_model["model"], images, scorer)
+        onnx_scores, onnx_ms = run(onnx_model, images, scorer)
+
+        diff = np.abs(onnx_scores - torch_scores)
+        flips = int(np.sum((onnx_scores >= threshold) != (torch_scores >= threshold)))
+        torch_latency, onnx_latency = percentiles(torch_ms), percentiles(onnx_ms)
+
+        results["models"][key] = {
+            "model": model_name,
+            "onnx_quantized": onnx_model.quantized,
+            "mean_abs_diff": round(float(diff.mean()), 5),
+            "max_abs_diff": round(float(diff.max()), 5),
+            "verdict_flips": flips,
+            "torch_latency_ms": torch_latency,
+            "onnx_latency_ms": onnx_latency,
+            "speedup": round(torch_latency["p50"] / max(onnx_latency["p50"], 1e-6), 2),
+        }
+        r = results["models"][key]
+        print(
+            f"{key}: diff mean={r['mean_abs_diff']:.4f} max={r['max_abs_diff']:.4f} "
+            f"flips={flips}/{len(images)} p50 torch {torch_latency['p50']:.0f} ms, "
+            f"onnx {onnx_latency['p50']:.0f} ms ({r['speedup']}x)"
+        )
+
+    if args.json:
+        write_json(args.json, results)
+
+
+if __name__ == "__main__":
+    main()
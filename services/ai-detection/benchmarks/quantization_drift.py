@@ -0,0 +1,108 @@
+"""
+INT8 quantization accuracy-drift report
+
+Loads every model in config.MODELS twice — fp32 and with its configured CPU
+quantization — runs both over the test images and reports per model:
+AI-score drift, verdict flips at AI_GENERATED_THRESHOLD, latency and
+serialized weight size.
+
+Usage:
+    python -m benchmarks.quantization_drift --dataset ../../test-images/dataset
+    python -m benchmarks.quantization_drift --mode dynamic_int8 --json drift.json
+"""
+import argparse
+import io
+import time
+
+import numpy as np
+import torch
+
+from benchmarks.common import DEFAULT_DATASET, decode, load_corpus, percentiles, write_json
+
+import config
+from model_loader import ModelRegistry
+from models import AIDetectionModels
+from preprocessing import ImagePreprocessor
+
+
+def weight_megabytes(model) -> float:
+    """Serialized state_dict size (packed INT8 weights are not parameters)"""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / 1e6
+
+
+def run(pipe, images, scorer):
+    scores, latencies = [], []
+    with torch.inference_mode():
+        for image in images:
+            start = time.perf_counter()
+            predictions = pipe(image)
+            latencies.append((time.perf_counter() - start) * 1000)
+            scores.append(scorer(predictions, "generic"))
+    return np.asarray(scores), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=DEFAULT_DATASET)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--mode", default=None, help="Force a quantization mode for every model")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.dataset, args.limit)
+    if not corpus:
+        parser.error(f"No images found in {args.dataset}")
+
+    preprocessor = ImagePreprocessor()
+    images = [preprocessor.prepare(decode(image_bytes)).model for _, _, image_bytes in corpus]
+    scorer = AIDetectionModels()._extract_ai_score
+    threshold = config.AI_GENERATED_THRESHOLD
+
+    results = {"images": len(images), "threshold": threshold, "models": {}}
+    for key, model_name in config.MODELS.items():
+        mode = args.mode or ModelRegistry.get_model_info(model_name).get("quantization")
+        if not mode:
+            print(f"{key}: no quantization configured, skipping")
+            continue
+
+        fp32 = ModelRegistry.load_model(model_name, device=-1, quantize=False)
+        if not fp32:
+            continue
+        fp32_mb = weight_megabytes(fp32["model"].model)
+        fp32_scores, fp32_ms = run(fp32["model"], images, scorer)
+
+        ModelRegistry.quantize(fp32["model"], mode)
+        int8_mb = weight_megabytes(fp32["model"].model)
+        int8_scores, int8_ms = run(fp32["model"], images, scorer)
+
+        drift = np.abs(int8_scores - fp32_scores)
+        flips = int(np.sum((int8_scores >= threshold) != (fp32_scores >= threshold)))
+        fp32_latency, int8_latency = percentiles(fp32_ms), percentiles(int8_ms)
+
+        results["models"][key] = {
+            "model": model_name,
+            "mode": mode,
+            "mean_abs_drift": round(float(drift.mean()), 5),
+            "max_abs_drift": round(float(drift.max()), 5),
+            "verdict_flips": flips,
+            "fp32_latency_ms": fp32_latency,
+            "int8_latency_ms": int8_latency,
+            "speedup": round(fp32_latency["p50"] / max(int8_latency["p50"], 1e-6), 2),
+            "fp32_weights_mb": round(fp32_mb, 1),
+            "int8_weights_mb": round(int8_mb, 1),
+        }
+        r = results["models"][key]
+        print(
+            f"{key}: drift mean={r['mean_abs_drift']:.4f} max={r['max_abs_drift']:.4f} "
+            f"flips={flips}/{len(images)} p50 {fp32_latency['p50']:.0f}->{int8_latency['p50']:.0f} ms "
+            f"({r['speedup']}x) weights {r['fp32_weights_mb']}->{r['int8_weights_mb']} MB"
+        )
+
+    if args.json:
+        write_json(args.json, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Detection rates and cost of the recompression stage (ELA / JPEG ghosts)
+
+Builds forgeries from every source image (color, encoded like uploads):
+- clean: the image as PNG and as JPEG at qualities 60/75/90/95
+- ghost: the center ninth (16-aligned) replaced by the image's own JPEG at
+  a lower quality, then the whole saved as JPEG (60->90, 70->95, 50->85)
+- ela: a JPEG at 75 or 90 with the center ninth pasted back from the
+  uncompressed original, saved as PNG
+and runs them through the preprocessor and ForensicAnalyzer with the stage
+on (native tiles for large images, as in the detection path). Reports:
+- how often jpeg_ghost_detected / ela_inconsistent fire per case group
+  (false positives on clean images, detections on forgeries), split by
+  whole-image vs native-tile analysis (tiles only see the forgery where a
+  sampled tile overlaps it), and how many images had too few usable
+  blocks for a verdict (flat or clipped)
+- the stage's cost in ms per analyzed megapixel against the budget
+  (FORENSIC_RECOMPRESSION_MS_PER_MP) and how many qualities fit in it
+
+Usage:
+    python -m benchmarks.recompression
+    python -m benchmarks.recompression --budget 60 --json recompression.json
+"""
+import argparse
+from collections import defaultdict
+from typing import Dict
+
+import cv2
+import numpy as np
+
+from benchmarks.common import DEFAULT_DATASET, load_corpus, percentiles, write_json
+from benchmarks.run_benchmarks import synthetic_image
+
+import config
+from forensics import ForensicAnalyzer
+from preprocessing import ImagePreprocessor
+from recompression import RecompressionAnalyzer
+
+FLAGS = ("jpeg_ghost_detected", "ela_inconsistent")
+
+
+def jpeg(array: np.ndarray, quality: int) -> np.ndarray:
+    encoded = cv2.imencode(".jpg", array, [cv2.IMWRITE_JPEG_QUALITY, quality])[1]
+    return cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+
+
+def encode(array: np.ndarray, quality: int = 0) -> bytes:
+    """PNG, or JPEG at `quality`"""
+    if quality:
+        return cv2.imencode(".jpg", array, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+    return cv2.imencode(".png", array)[1].tobytes()
+
+
+def paste_center(base: np.ndarray, source: np.ndarray) -> np.ndarray:
+    """base with its center ninth (16-aligned) taken from source"""
+    h, w = base.shape[:2]
+    top, left = h // 3 // 16 * 16, w // 3 // 16 * 16
+    bottom, right = top + h // 3 // 16 * 16, left + w // 3 // 16 * 16
+    out = base.copy()
+    out[top:bottom, left:right] = source[top:bottom, left:right]
+    return out
+
+
+def cases(image_bytes: bytes) -> Dict[str, bytes]:
+    original = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    built = {"clean/png": encode(original)}
+    for quality in (60, 75, 90, 95):
+        built[f"clean/q{quality}"] = encode(original, quality)
+    for first, last in ((60, 90), (70, 95), (50, 85)):
+        built[f"ghost/{first}->{last}"] = encode(paste_center(original, jpeg(original, first)), last)
+    for quality in (75, 90):
+        built[f"ela/raw_in_q{quality}"] = encode(paste_center(jpeg(original, quality), original))
+    return built
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=DEFAULT_DATASET)
+    parser.add_argument("--limit", type=int, default=8, help="Dataset images to use (0 = none)")
+    parser.add_argument(
+        "--budget", type=float, default=config.FORENSIC_RECOMPRESSION_MS_PER_MP,
+        help="Sweep budget in ms per megapixel",
+    )
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    sources = [b for _, _, b in load_corpus(args.dataset, args.limit)] if args.limit else []
+    rng = np.random.default_rng(0)
+    sources += [
+        synthetic_image(kind, size, rng)
+        for kind in ("photo", "render", "texture")
+        for size in ((1024, 768), (3000, 2000))
+    ]
+
+    preprocessor = ImagePreprocessor()
+    analyzer = ForensicAnalyzer()
+    analyzer.recompression_analyzer = RecompressionAnalyzer(budget_ms_per_mp=args.budget)
+    flags = defaultdict(lambda: defaultdict(int))  # group -> flag -> images flagged
+    counts = defaultdict(lambda: [0, 0])  # group -> [images, without a verdict]
+    ms_per_mp, qualities = [], []
+
+    for source in sources:
+        for name, image_bytes in cases(source).items():
+            prepared = preprocessor.prepare_bytes(image_bytes)
+            tiles = prepared.forensic_tiles or None
+            result = analyzer.analyze(
+                prepared.forensic, image_bytes, native_tiles=tiles, recompression=True
+            )
+            if result.recompression_ms is None:
+                continue
+            if tiles:
+                pixels = sum(t.shape[0] * t.shape[1] for t in tiles)
+            else:
+                pixels = prepared.forensic.width * prepared.forensic.height
+            ms_per_mp.append(result.recompression_ms / (pixels / 1e6))
+            qualities.append(len(result.recompression_qualities))
+
+            path = "tiles" if tiles else "image"
+            for group in (f"{name.split('/')[0]} ({path})", f"{name} ({path})"):
+                counts[group][0] += 1
+                counts[group][1] += result.ela_inconsistent is None
+                for flag in FLAGS:
+                    flags[group][flag] += bool(result.get(flag, False))
+
+    results = {
+        "budget_ms_per_mp": args.budget,
+        "ms_per_mp": percentiles(ms_per_mp),
+        "qualities_evaluated": percentiles(qualities),
+        "groups": {
+            name: {
+                "images": count,
+                "no_verdict": skipped,
+                **{flag: flags[name][flag] / count for flag in FLAGS},
+            }
+            for name, (count, skipped) in counts.items()
+        },
+    }
+
+    print(f"{len(ms_per_mp)} images, budget {args.budget:.0f} ms/MP")
+    print(
+        f"  cost: mean {np.mean(ms_per_mp):.1f} ms/MP, max {np.max(ms_per_mp):.1f} ms/MP;"
+        f" {np.mean(qualities):.1f} qualities on average (min {np.min(qualities)})"
+    )
+    print(f"  {'case':<26} {'images':>6} {'no verdict':>10} {'ghost':>7} {'ela':>7}")
+    for name in sorted(counts, key=lambda n: ("/" in n, n)):
+        group = results["groups"][name]
+        print(
+            f"  {name:<26} {group['images']:>6} {group['no_verdict']:>10}"
+            f" {group['jpeg_ghost_detected']:>7.0%} {group['ela_inconsistent']:>7.0%}"
+        )
+
+    if args.json:
+        write_json(args.json, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,427 @@
+"""
+Detection pipeline benchmark with a per-phase breakdown
+
+Runs AIDetectionModels.detect over a synthetic and/or a real image corpus at
+several resolutions and records, per corpus and resolution:
+- latency percentiles of every phase (preprocess, quality, denoise,
+  forensics, frequency, each model, ensemble) and of the whole request
+- throughput (sequential requests per second)
+- peak memory: process peak RSS and, with --memory, the tracemalloc peak
+  of each phase (Python and NumPy allocations only; slows the run)
+
+Phase timings are taken at the points where detect() already reports them
+to its latency planner, so the production code path is measured as is.
+With --stub-models the classifiers are replaced by deterministic stand-ins
+(optionally with a fixed latency), which benchmarks the non-ML stages
+without downloading any model.
+
+Results are written as JSON tagged with the git commit; `compare` diffs two
+result files and exits non-zero when a phase got slower than the tolerance.
+
+Usage:
+    python -m benchmarks.run_benchmarks run --stub-models --json base.json
+    python -m benchmarks.run_benchmarks run --corpus real --resolutions 512 2048 --json new.json
+    python -m benchmarks.run_benchmarks compare base.json new.json --tolerance 10
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.common import DEFAULT_DATASET, SERVICE_DIR, decode, load_corpus, percentiles, write_json
+
+import config
+
+DEFAULT_RESOLUTIONS = [512, 1024, 2048]  # Long side in pixels
+SYNTHETIC_KINDS = ("photo", "render", "texture")
+
+
+class StubClassifier:
+    """
+    Stand-in for a transformers image-classification pipeline
+
+    Returns [{label, score}] like the pipeline; the score is derived from a
+    hash of a thumbnail, so it is deterministic per image and differs
+    between models.
+    """
+
+    def __init__(self, model_key: str, latency_ms: float = 0.0):
+        self.model_key = model_key
+        self.latency_ms = latency_ms
+
+    def __call__(self, image: Image.Image) -> List[Dict[str, float]]:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        thumbnail = np.asarray(image.convert("L").resize((16, 16)))
+        digest = hashlib.sha256(self.model_key.encode() + thumbnail.tobytes()).digest()
+        score = digest[0] / 255
+        return [{"label": "artificial", "score": score}, {"label": "real", "score": 1.0 - score}]
+
+
+def stub_models(latency_ms: float) -> Dict[str, Dict]:
+    """loaded_models entries for config.MODELS backed by StubClassifier"""
+    from model_loader import ModelRegistry
+
+    return {
+        key: {
+            "model": StubClassifier(key, latency_ms),
+            "name": f"stub/{name}",
+            "config": {"weight": ModelRegistry.get_model_info(name).get("weight", 0.25)},
+            "quantization": None,
+            "backend": "stub",
+        }
+        for key, name in config.MODELS.items()
+    }
+
+
+def synthetic_image(kind: str, size: Tuple[int, int], rng: np.random.Generator) -> bytes:
+    """
+    Encoded test image of a given content type:
+    - photo: gradients, shapes and sensor noise, JPEG q90
+    - render: smooth noise-free gradients, PNG
+    - texture: dense high-frequency pattern, JPEG q95
+    """
+    width, height = size
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = np.stack(
+        [
+            x / width * 255,
+            y / height * 255,
+            (np.sin(x / width * rng.uniform(2, 8)) * 0.5 + 0.5) * 255,
+        ],
+        axis=-1,
+    )
+    if kind == "photo":
+        cx, cy, radius = rng.uniform(0.2, 0.8) * width, rng.uniform(0.2, 0.8) * height, min(size) / 4
+        inside = (x - cx) ** 2 + (y - cy) ** 2 < radius ** 2
+        base[inside] = base[inside] * 0.4 + 120
+        base += rng.normal(0, 6, base.shape)
+        image_format, options = "JPEG", {"quality": 90}
+    elif kind == "render":
+        image_format, options = "PNG", {}
+    else:
+        pattern = np.sin(x * rng.uniform(0.3, 1.2)) * np.cos(y * rng.uniform(0.3, 1.2)) * 80
+        base += pattern[..., None] + rng.normal(0, 12, base.shape)
+        image_format, options = "JPEG", {"quality": 95}
+
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(base, 0, 255).astype(np.uint8)).save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def synthetic_corpus(resolution: int, count: int, seed: int) -> List[Tuple[str, bytes]]:
+    rng = np.random.default_rng(seed + resolution)
+    corpus = []
+    for index in range(count):
+        kind = SYNTHETIC_KINDS[index % len(SYNTHETIC_KINDS)]
+        # Alternate landscape and portrait at the same long side
+        size = (resolution, resolution * 3 // 4) if index % 2 == 0 else (resolution * 3 // 4, resolution)
+        corpus.append((f"{kind}-{index}", synthetic_image(kind, size, rng)))
+    return corpus
+
+
+def real_corpus(images: List[Tuple[str, Optional[str], bytes]], resolution: int) -> List[Tuple[str, bytes]]:
+    """Dataset images resized to the given long side and re-encoded in their format"""
+    corpus = []
+    for name, _, image_bytes in images:
+        image = decode(image_bytes)
+        scale = resolution / max(image.size)
+        resized = image.resize(
+            (max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+            Image.BILINEAR,
+        )
+        buffer = io.BytesIO()
+        if name.lower().endswith(".png"):
+            resized.save(buffer, "PNG")
+        else:
+            resized.save(buffer, "JPEG", quality=92)
+        corpus.append((name, buffer.getvalue()))
+    return corpus
+
+
+class PhaseRecorder:
+    """
+    Collects per-request phase timings (and tracemalloc peaks) from the
+    detector's latency-planner and model-latency reporting points
+    """
+
+    def __init__(self, detector, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.current: Dict[str, float] = {}
+        self.current_memory: Dict[str, float] = {}
+
+        planner_record = detector.latency_planner.record
+        record_model_latency = detector._record_model_latency
+
+        def record(stage, elapsed_ms):
+            self._observe(stage, elapsed_ms)
+            planner_record(stage, elapsed_ms)
+
+        def record_model(model_key, elapsed_ms):
+            self._observe(f"model:{model_key}", elapsed_ms)
+            record_model_latency(model_key, elapsed_ms)
+
+        detector.latency_planner.record = record
+        detector._record_model_latency = record_model
+
+    def start(self):
+        self.current = {}
+        self.current_memory = {}
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+
+    def _observe(self, stage: str, elapsed_ms: float):
+        # forensics and forensics_deep are one phase with two cost estimates
+        stage = "forensics" if stage == "forensics_deep" else stage
+        self.current[stage] = elapsed_ms
+        if self.trace_memory:
+            # Peak since the previous reporting point = peak of this phase
+            self.current_memory[stage] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            tracemalloc.reset_peak()
+
+
+def run_corpus(detector, recorder: PhaseRecorder, corpus: List[Tuple[str, bytes]], repeat: int) -> Dict:
+    timings = defaultdict(list)
+    memory = defaultdict(list)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, image_bytes in corpus:
+            recorder.start()
+            request_start = time.perf_counter()
+            prepared = detector.preprocessor.prepare_bytes(image_bytes)
+            preprocess_ms = (time.perf_counter() - request_start) * 1000
+            if recorder.trace_memory:
+                memory["preprocess"].append(tracemalloc.get_traced_memory()[1] / (1024 * 1024))
+                tracemalloc.reset_peak()
+
+            result = detector.detect(prepared, image_bytes)
+            timings["total"].append((time.perf_counter() - request_start) * 1000)
+            timings["preprocess"].append(preprocess_ms)
+            # Reported inside the quality phase (whose planner timing excludes it)
+            if "denoise_ms" in result["qualityMetrics"]:
+                timings["denoise"].append(result["qualityMetrics"]["denoise_ms"])
+            for stage, elapsed_ms in recorder.current.items():
+                timings[stage].append(elapsed_ms)
+            for stage, peak_mb in recorder.current_memory.items():
+                memory[stage].append(peak_mb)
+    elapsed = time.perf_counter() - start
+
+    requests = repeat * len(corpus)
+    run = {
+        "images": len(corpus),
+        "requests": requests,
+        "throughput_rps": round(requests / elapsed, 3),
+        "megapixels": round(
+            float(np.mean([np.prod(Image.open(io.BytesIO(b)).size) / 1e6 for _, b in corpus])), 3
+        ),
+        "phases_ms": {stage: percentiles(values) for stage, values in timings.items()},
+        # ru_maxrss is in KB on Linux; monotonic over the whole benchmark process
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    if memory:
+        run["phase_peak_traced_mb"] = {
+            stage: round(float(np.max(values)), 2) for stage, values in memory.items()
+        }
+    return run
+
+
+def git_revision() -> Dict[str, Optional[str]]:
+    def git(*command):
+        try:
+            return subprocess.run(
+                ["git", *command], cwd=SERVICE_DIR, capture_output=True, text=True, timeout=10
+            ).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+    status = git("status", "--porcelain", "--", ".")
+    return {
+        "commit": git("rev-parse", "HEAD") or None,
+        "branch": git("rev-parse", "--abbrev-ref", "HEAD") or None,
+        "dirty": bool(status) if status is not None else None,
+    }
+
+
+def environment() -> Dict:
+    import cv2
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+
+
+def run(args) -> int:
+    import logging
+
+    logging.basicConfig(level=args.log_level)
+    logging.getLogger("exifread").setLevel(logging.ERROR)  # "PNG file does not have exif data"
+    from models import AIDetectionModels
+
+    detector = AIDetectionModels()
+    if args.stub_models:
+        detector.loaded_models = stub_models(args.stub_model_ms)
+        detector.models_loaded = True
+    elif args.no_models:
+        detector.models_loaded = True
+    else:
+        detector.load_models()
+    recorder = PhaseRecorder(detector, trace_memory=args.memory)
+
+    dataset = []
+    if "real" in args.corpus:
+        dataset = load_corpus(args.dataset, args.limit)
+        if not dataset:
+            print(f"No images found in {args.dataset}: skipping the real corpus")
+
+    corpora = []
+    for resolution in args.resolutions:
+        if "synthetic" in args.corpus:
+            corpora.append(("synthetic", resolution, synthetic_corpus(resolution, args.synthetic_images, args.seed)))
+        if dataset:
+            corpora.append(("real", resolution, real_corpus(dataset, resolution)))
+    if not corpora:
+        print("Nothing to benchmark")
+        return 1
+
+    # Warm-up outside the measurement (lazy imports, first-call allocations)
+    for _ in range(args.warmup):
+        detector.detect(detector.preprocessor.prepare_bytes(corpora[0][2][0][1]), corpora[0][2][0][1])
+
+    if args.memory:
+        tracemalloc.start()
+
+    results = {
+        "git": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": environment(),
+        "settings": {
+            "models": "stub" if args.stub_models else "none" if args.no_models else "real",
+            "loaded_models": list(detector.loaded_models),
+            "stub_model_ms": args.stub_model_ms if args.stub_models else None,
+            "repeat": args.repeat,
+            "trace_memory": args.memory,
+            "device": detector.device,
+            "enhancement": config.ENABLE_QUALITY_ENHANCEMENT,
+            "model_cascade": config.ENABLE_MODEL_CASCADE,
+            "shared_model_inputs": config.SHARED_MODEL_INPUTS,
+        },
+        "runs": [],
+    }
+    for corpus_name, resolution, corpus in corpora:
+        result = {"corpus": corpus_name, "resolution": resolution, **run_corpus(detector, recorder, corpus, args.repeat)}
+        results["runs"].append(result)
+        phases = result["phases_ms"]
+        print(
+            f"{corpus_name:>9} @ {resolution:>4}px ({result['images']} images): "
+            f"{result['throughput_rps']:.2f} req/s, total p50 {phases['total']['p50']:.1f} ms, "
+            f"p99 {phases['total']['p99']:.1f} ms"
+        )
+        for stage, summary in sorted(phases.items()):
+            if stage != "total":
+                print(f"    {stage:<22} p50 {summary['p50']:>9.2f} ms   p90 {summary['p90']:>9.2f} ms")
+
+    if args.memory:
+        tracemalloc.stop()
+    if args.json:
+        write_json(args.json, results)
+    return 0
+
+
+def run_key(run_result: Dict) -> Tuple[str, int]:
+    return run_result["corpus"], run_result["resolution"]
+
+
+def compare(args) -> int:
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    print(
+        f"baseline  {(baseline['git'].get('commit') or '?')[:10]}  {baseline['timestamp']}\n"
+        f"candidate {(candidate['git'].get('commit') or '?')[:10]}  {candidate['timestamp']}"
+    )
+    if baseline["environment"] != candidate["environment"]:
+        print("warning: results come from different environments")
+
+    base_runs = {run_key(r): r for r in baseline["runs"]}
+    regressions = []
+    for result in candidate["runs"]:
+        base = base_runs.get(run_key(result))
+        if base is None:
+            continue
+        print(f"\n{result['corpus']} @ {result['resolution']}px")
+        print(f"    {'phase':<22} {'base ' + args.metric:>12} {'new ' + args.metric:>12} {'change':>9}")
+        for stage, summary in sorted(result["phases_ms"].items()):
+            if stage not in base["phases_ms"]:
+                print(f"    {stage:<22} {'-':>12} {summary[args.metric]:>12.2f}       new")
+                continue
+            old, new = base["phases_ms"][stage][args.metric], summary[args.metric]
+            change = (new - old) / old * 100 if old > 0 else 0.0
+            # Sub-threshold phases are all noise
+            regressed = change > args.tolerance and new - old > args.min_delta_ms
+            flag = "  REGRESSION" if regressed else ""
+            print(f"    {stage:<22} {old:>12.2f} {new:>12.2f} {change:>+8.1f}%{flag}")
+            if regressed:
+                regressions.append((run_key(result), stage, change))
+        old_rps, new_rps = base["throughput_rps"], result["throughput_rps"]
+        print(f"    {'throughput (req/s)':<22} {old_rps:>12.2f} {new_rps:>12.2f} {(new_rps - old_rps) / old_rps * 100:>+8.1f}%")
+
+    if regressions:
+        print(f"\n{len(regressions)} phase(s) slower than {args.tolerance:.0f}%")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Benchmark the pipeline")
+    run_parser.add_argument("--corpus", nargs="+", choices=["synthetic", "real"], default=["synthetic", "real"])
+    run_parser.add_argument("--dataset", default=DEFAULT_DATASET)
+    run_parser.add_argument("--limit", type=int, default=16, help="Real images per resolution")
+    run_parser.add_argument("--synthetic-images", type=int, default=12, help="Synthetic images per resolution")
+    run_parser.add_argument("--resolutions", type=int, nargs="+", default=DEFAULT_RESOLUTIONS, help="Long sides in pixels")
+    run_parser.add_argument("--repeat", type=int, default=3, help="Passes over each corpus")
+    run_parser.add_argument("--warmup", type=int, default=2, help="Unmeasured requests first")
+    run_parser.add_argument("--seed", type=int, default=0)
+    model_group = run_parser.add_mutually_exclusive_group()
+    model_group.add_argument("--stub-models", action="store_true", help="Deterministic stand-ins instead of the classifiers")
+    model_group.add_argument("--no-models", action="store_true", help="Skip the classifiers (analyzers only)")
+    run_parser.add_argument("--stub-model-ms", type=float, default=0.0, help="Simulated latency per stub model")
+    run_parser.add_argument("--memory", action="store_true", help="Trace per-phase peak allocations (slower)")
+    run_parser.add_argument("--log-level", default="WARNING")
+    run_parser.add_argument("--json", default=None, help="Write results to this JSON file")
+
+    compare_parser = subparsers.add_parser("compare", help="Diff two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--metric", choices=["mean", "p50", "p90", "p99"], default="p50")
+    compare_parser.add_argument("--tolerance", type=float, default=10.0, help="Allowed slowdown in percent")
+    compare_parser.add_argument("--min-delta-ms", type=float, default=0.5, help="Ignore smaller absolute changes")
+
+    args = parser.parse_args()
+    sys.exit(run(args) if args.command == "run" else compare(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Response serialization cost: conversion pass + Pydantic vs direct rendering
+
+Builds typical /detect payloads by running the analyzers (with stub
+classifiers, so no model weights are needed) on the test images and times
+three ways of turning one payload into response bytes:
+- legacy: the former recursive NumPy->Python conversion over the forensics,
+  model score, frequency and quality dicts, DetectionResponse(**result),
+  then what FastAPI does for a response_model (validate, dump to JSON-able
+  Python, json.dumps)
+- json: serialization.json_dumps (fallback without orjson)
+- orjson: serialization.dumps with orjson (skipped when not installed)
+
+Usage:
+    python -m benchmarks.serialization
+    python -m benchmarks.serialization --limit 8 --repeat 500 --json serialization.json
+"""
+import argparse
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from benchmarks.common import DEFAULT_DATASET, load_corpus, percentiles, write_json
+from benchmarks.run_benchmarks import stub_models, synthetic_image
+
+import serialization
+from main import DetectionResponse
+from models import AIDetectionModels
+
+
+def legacy_convert(obj: Any) -> Any:
+    """The conversion pass the detection path used to run on every response"""
+    if isinstance(obj, dict):
+        return {k: legacy_convert(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [legacy_convert(item) for item in obj]
+    elif isinstance(obj, np.integer):
+        return int(obj)
+    elif isinstance(obj, np.floating):
+        return float(obj)
+    elif isinstance(obj, np.ndarray):
+        return obj.tolist()
+    elif isinstance(obj, np.bool_):
+        return bool(obj)
+    else:
+        return obj
+
+
+_response_adapter = TypeAdapter(DetectionResponse)
+
+
+def legacy_render(result: Dict) -> bytes:
+    converted = dict(result)
+    for key in ("forensicAnalysis", "modelScores", "frequencyAnalysis", "qualityMetrics"):
+        converted[key] = legacy_convert(result[key])
+    response = DetectionResponse(**converted)
+    value = _response_adapter.validate_python(response)
+    return JSONResponse(_response_adapter.dump_python(value, mode="json")).body
+
+
+def time_path(render: Callable[[Dict], bytes], payloads: List[Dict], repeat: int) -> Dict:
+    timings_us = []
+    for _ in range(repeat):
+        for payload in payloads:
+            start = time.perf_counter()
+            render(payload)
+            timings_us.append((time.perf_counter() - start) * 1e6)
+    # percentiles() labels values in ms; here they are microseconds
+    return percentiles(timings_us)
+
+
+def build_payloads(dataset: str, limit: int) -> List[Dict]:
+    corpus = [image_bytes for _, _, image_bytes in load_corpus(dataset, limit)]
+    if not corpus:
+        rng = np.random.default_rng(0)
+        corpus = [
+            synthetic_image(kind, size, rng)
+            for kind in ("photo", "render", "texture")
+            for size in ((640, 480), (1920, 1080))
+        ]
+    detector = AIDetectionModels()
+    detector.loaded_models = stub_models(0.0)
+    detector.models_loaded = True
+    return [
+        detector.detect(detector.preprocessor.prepare_bytes(image_bytes), image_bytes)
+        for image_bytes in corpus
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=DEFAULT_DATASET)
+    parser.add_argument("--limit", type=int, default=8, help="Images (payloads) to use")
+    parser.add_argument("--repeat", type=int, default=200, help="Renders per payload and path")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    payloads = build_payloads(args.dataset, args.limit)
+    paths = {"legacy": legacy_render, "json": serialization.json_dumps}
+    if serialization.orjson is not None:
+        paths["orjson"] = serialization.dumps
+
+    for render in paths.values():
+        for payload in payloads:
+            render(payload)  # warm-up
+
+    results = {
+        "payloads": len(payloads),
+        "repeat": args.repeat,
+        "payload_bytes": percentiles([len(serialization.json_dumps(p)) for p in payloads]),
+        "paths_us": {},
+    }
+    print(f"{len(payloads)} payloads, {args.repeat} renders each")
+    print(f"{'path':<8} {'mean us':>10} {'p50 us':>10} {'p99 us':>10} {'speedup':>8}")
+    for name, render in paths.items():
+        summary = time_path(render, payloads, args.repeat)
+        results["paths_us"][name] = summary
+        speedup = results["paths_us"]["legacy"]["mean"] / summary["mean"]
+        summary["speedup_vs_legacy"] = round(speedup, 2)
+        print(f"{name:<8} {summary['mean']:>10.1f} {summary['p50']:>10.1f} {summary['p99']:>10.1f} {speedup:>7.1f}x")
+
+    if args.json:
+        write_json(args.json, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -33,15 +33,49 @@ MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", "./models")
 MAX_IMAGE_SIZE = (1024, 1024)
 MIN_IMAGE_SIZE = (32, 32)
 
+# Request preprocessing (one pass, one variant per downstream consumer)
+PREPROCESS_RESAMPLING = os.getenv("PREPROCESS_RESAMPLING", "bilinear")  # nearest|bilinear|bicubic|box|hamming|lanczos
+PREPROCESS_MIN_SIZE = 224  # Minimum size for most models
+PREPROCESS_PADDING = os.getenv("PREPROCESS_PADDING", "center")  # center (solid fill) | edge (replicate) | none
+PREPROCESS_PAD_COLOR = (255, 255, 255)
+MODEL_INPUT_SIZE = (512, 512)  # Models resize to 224 internally; enhancement runs at this size
+
+# Analysis resolution policy (fixed pixel budget per analyzer => bounded CPU per request)
+ANALYSIS_PIXEL_BUDGETS = {
+    "forensic": MAX_IMAGE_SIZE[0] * MAX_IMAGE_SIZE[1],  # Forensics needs the most detail
+    "quality": MAX_IMAGE_SIZE[0] * MAX_IMAGE_SIZE[1],  # Same pixels as forensics
+    "frequency": 512 * 512,  # DCT/FFT cost grows with pixel count
+}
+FORENSIC_NATIVE_TILE_SIZE = 256  # Full-resolution crops for noise/compression checks
+FORENSIC_NATIVE_TILES = 8  # Tiles sampled when the forensic image is downscaled
+
 # Detection thresholds (optimized for smart ensemble) - PRODUCTION TUNED
 AI_GENERATED_THRESHOLD = 0.60  # Threshold for AI detection (increased from 0.50 for fewer false positives)
 DEEPFAKE_THRESHOLD = 0.65  # Threshold for deepfake detection
 MANIPULATION_THRESHOLD = 0.35  # Threshold for manipulation detection
 ENSEMBLE_MIN_CONFIDENCE = 0.60  # Minimum confidence for ensemble verdict
 
+# Model cascade: run models cheapest-first and skip the rest once they can no
+# longer move the final score across AI_GENERATED_THRESHOLD
+ENABLE_MODEL_CASCADE = os.getenv("ENABLE_MODEL_CASCADE", "false").lower() == "true"
+CASCADE_GRID_STEP = 0.002  # Pending-model score grid for the bound (outlier windows can be < 0.01 wide)
+CASCADE_SCORE_MARGIN = 0.02  # Required distance from the threshold
+CASCADE_MAX_PENDING = 1  # Check for an exit only when at most this many models remain (exact for 1)
+
 # Forensic analysis settings
 ENABLE_FORENSICS = True  # Enable forensic analysis
 FORENSICS_DETAILED = True
+# Per-tile heatmaps (noise, block variance, edge strength, color) next to the
+# global scores; per request with ?heatmaps=true
+FORENSIC_HEATMAPS = os.getenv("FORENSIC_HEATMAPS", "false").lower() == "true"
+FORENSIC_HEATMAP_TILE = int(os.getenv("FORENSIC_HEATMAP_TILE", "32"))  # Pixels per heatmap cell (multiple of 8)
+FORENSIC_HEATMAP_FORMAT = os.getenv("FORENSIC_HEATMAP_FORMAT", "png")  # png (base64) | array (uint8 rows)
+# Recompression forensics: Error Level Analysis and JPEG ghosts (in-memory
+# JPEG re-encodes over a quality sweep; adds to manipulation_likelihood)
+FORENSIC_RECOMPRESSION = os.getenv("FORENSIC_RECOMPRESSION", "false").lower() == "true"
+FORENSIC_RECOMPRESSION_QUALITIES = list(range(50, 100, 5))  # JPEG ghost sweep
+FORENSIC_ELA_QUALITY = 90  # ELA re-encode quality (always evaluated first)
+FORENSIC_RECOMPRESSION_MS_PER_MP = float(os.getenv("FORENSIC_RECOMPRESSION_MS_PER_MP", "120"))  # Sweep budget
 
 # Advanced feature flags (NEW)
 ENABLE_FREQUENCY_ANALYSIS = True  # DCT/FFT analysis for GAN fingerprints
@@ -58,15 +92,110 @@ QUALITY_MIN_THRESHOLD = 0.3  # Below this: aggressive enhancement
 QUALITY_TARGET = 0.7  # Target quality level
 QUALITY_ADAPTIVE_ENHANCEMENT = True  # Use adaptive enhancement
 
+# Enhancement denoising tiers (strongest first) and their starting cost
+# estimates in ms per megapixel; estimates are refined from observed timings
+ENHANCEMENT_BUDGET_MS = float(os.getenv("ENHANCEMENT_BUDGET_MS", "250"))  # Denoising budget per request
+ENHANCEMENT_TIER_COST_MS_PER_MP = {
+    "nlm": 4000.0,  # Full-resolution non-local means (21 px search window)
+    "nlm_downscaled": 1200.0,  # NLM at half resolution, upsampled + attenuated residual
+    "bilateral": 250.0,  # Edge-preserving bilateral filter
+    "none": 0.0,
+}
+# Time every tier on this host at model preload, replacing the seeds above
+# (requests only re-measure the tier they run)
+ENHANCEMENT_CALIBRATE_TIERS = os.getenv("ENHANCEMENT_CALIBRATE_TIERS", "true").lower() == "true"
+
+# Latency-budget requests (latency_planner.py): stages are dropped to fit the
+# caller's budget. Starting estimates per phase in ms, refined from observed timings
+DEFAULT_LATENCY_BUDGET_MS = float(os.getenv("DEFAULT_LATENCY_BUDGET_MS", "0"))  # 0 = no budget
+LATENCY_PHASE_ESTIMATES_MS = {
+    "quality": 40.0,  # Assessment + CLAHE/sharpening (denoising is budgeted separately)
+    "frequency": 80.0,
+    "forensics": 120.0,  # Without native tiles
+    "forensics_deep": 200.0,  # With native full-resolution tiles
+    "ensemble": 10.0,  # Ensemble, blending and response assembly
+}
+LATENCY_DEFAULT_MODEL_MS = 400.0  # Models without a measured inference time
+# A stage skipped this many times since its last timing is re-timed by a
+# background probe outside any request budget, so a stale estimate cannot rule
+# it out forever (0 = never probe)
+LATENCY_PROBE_AFTER_SKIPS = int(os.getenv("LATENCY_PROBE_AFTER_SKIPS", "50"))
+
 # Smart ensemble settings
 ENSEMBLE_LOW_CONFIDENCE = 0.6  # Below: reduce model weight
 ENSEMBLE_HIGH_CONFIDENCE = 0.85  # Above: boost model weight
 ENSEMBLE_MIN_CONSENSUS = 0.5  # Minimum cross-model agreement
 ENSEMBLE_OUTLIER_THRESHOLD = 0.3  # Deviation threshold for outliers
 
+# Feature store (feature_store.py): raw model outputs and analysis features of
+# every request, replayed by rescore.py to evaluate threshold changes offline
+FEATURE_STORE_DIR = os.getenv("FEATURE_STORE_DIR", "")  # Empty = disabled
+FEATURE_STORE_FORMAT = os.getenv("FEATURE_STORE_FORMAT", "auto")  # auto (parquet if pyarrow) | parquet | npz
+FEATURE_STORE_SHARD_ROWS = int(os.getenv("FEATURE_STORE_SHARD_ROWS", "10000"))
+
 # Performance settings
 MODEL_WARM_UP = os.getenv("MODEL_WARM_UP", "false").lower() == "true"  # Disabled warm-up to avoid container restart
+# Load models in a background thread at startup; /ready returns 503 until done
+MODEL_PRELOAD = os.getenv("MODEL_PRELOAD", "true").lower() == "true"
+MODEL_LOAD_WORKERS = int(os.getenv("MODEL_LOAD_WORKERS", "3"))  # Models loaded concurrently
+# Load weights from memory-mapped safetensors (falls back to .bin when a repo has none)
+# without materializing a randomly initialized copy first
+USE_SAFETENSORS = os.getenv("USE_SAFETENSORS", "true").lower() == "true"
+
+# Pre-fork serving (python prefork.py): models loaded once in the parent and
+# shared copy-on-write by the forked workers
+PREFORK_WORKERS = int(os.getenv("PREFORK_WORKERS", "2"))
+PREFORK_THREADS_PER_WORKER = int(os.getenv("PREFORK_THREADS_PER_WORKER", "0"))  # 0 = split CPUs evenly
+PREFORK_MAX_RESTARTS_PER_MINUTE = 5  # Crash-looping workers are re-forked with a back-off
+
+# Inference lanes (resources.py): the CPUs of each worker are split into lanes,
+# each running one request at a time on its own cores
+RESOURCE_LANES = int(os.getenv("RESOURCE_LANES", "0"))  # 0 = one lane per ~4 CPUs
+RESOURCE_THREADS_PER_LANE = int(os.getenv("RESOURCE_THREADS_PER_LANE", "0"))  # 0 = CPUs / lanes
+RESOURCE_PIN_AFFINITY = os.getenv("RESOURCE_PIN_AFFINITY", "true").lower() == "true"  # Linux only
 USE_HALF_PRECISION = False  # Set to True for faster inference on GPU
+# CPU INT8 quantization for models whose MODEL_CONFIGS entry sets "quantization"
+# (see benchmarks/quantization_drift.py for the accuracy drift vs fp32)
+ENABLE_CPU_QUANTIZATION = os.getenv("ENABLE_CPU_QUANTIZATION", "false").lower() == "true"
+
+# Compute each distinct model input tensor once per image and call the models'
+# forward pass directly (models with unsupported preprocessing use their pipeline)
+SHARED_MODEL_INPUTS = os.getenv("SHARED_MODEL_INPUTS", "true").lower() == "true"
+
+# ONNX Runtime backend for models whose MODEL_CONFIGS entry sets "backend": "onnx"
+# (export first: python onnx_backend.py export [--quantize])
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "./onnx_models")
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))  # 0 = ONNX Runtime default
+ONNX_INTER_OP_THREADS = int(os.getenv("ONNX_INTER_OP_THREADS", "0"))
+ONNX_GRAPH_OPTIMIZATION = os.getenv("ONNX_GRAPH_OPTIMIZATION", "all")  # disabled|basic|extended|all
+
+# Prometheus metrics at /metrics (metrics.py; needs prometheus_client). Under
+# prefork.py set PROMETHEUS_MULTIPROC_DIR so /metrics aggregates all workers
+ENABLE_METRICS = os.getenv("ENABLE_METRICS", "true").lower() == "true"
+METRICS_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Tracing (tracing.py): W3C traceparent propagation, spans exported as
+# OTLP/JSON ("otlp"), one JSON log line per span ("log") or kept in memory
+# for tests ("memory"); "none" disables tracing. TRACE_SAMPLE_RATE applies to
+# traces started here, propagated traces follow the caller's sampled flag
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "ai-detection")
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none")  # none|log|otlp|memory
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_EXPORT_BATCH_SIZE = int(os.getenv("TRACE_EXPORT_BATCH_SIZE", "256"))
+TRACE_EXPORT_INTERVAL = float(os.getenv("TRACE_EXPORT_INTERVAL", "5"))  # seconds
+TRACE_EXPORT_QUEUE_SIZE = int(os.getenv("TRACE_EXPORT_QUEUE_SIZE", "4096"))  # spans; extras are dropped
+
+# Admin profiling endpoints (/admin/profile/*, profiling.py): disabled (404)
+# unless ADMIN_TOKEN is set; callers send it in the X-Admin-Token header
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))  # Longest cpu/memory capture
+PROFILE_MAX_REQUESTS = int(os.getenv("PROFILE_MAX_REQUESTS", "100"))  # Most requests per cProfile capture
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+PROFILE_TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "25"))
 
-# Logging
+# Logging (log_setup.py)
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # text|json (one JSON object per record)
+LOG_QUEUE = os.getenv("LOG_QUEUE", "false").lower() == "true"  # Write records from a background thread
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))  # Records beyond this are dropped
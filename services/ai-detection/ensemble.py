@@ -6,423 +6,651 @@ This module implements advanced ensemble logic:
 2. Outlier detection and removal
 3. Cross-model consistency checking
 4. Dynamic threshold adjustment based on image quality
+
+All steps run column-wise on (n_images x n_models) arrays (combine_batch);
+combine_predictions is the per-image view of the same computation.
 """
+import itertools
 import numpy as np
 import logging
-from typing import Dict, List, Any, Tuple, Optional
+from typing import Callable, Dict, List, Any, Sequence, Tuple, Optional, Union
+
+import config
+from results import ForensicResult, QualityReport
 
 logger = logging.getLogger(__name__)
 
 
+# Per-image outcome of combine_batch
+STATUS_OK = 0
+STATUS_NO_PREDICTIONS = 1  # No model produced a prediction
+STATUS_GATED = 2  # All models filtered by confidence gating
+STATUS_DISAGREEMENT = 3  # Models disagree too much for a verdict
+
+
+def blend_frequency(
+    ensemble_ai_score: Union[float, np.ndarray],
+    frequency_ai_score: Union[float, np.ndarray, None],
+    weight: float = config.FREQUENCY_ANALYSIS_WEIGHT
+) -> Union[float, np.ndarray]:
+    """
+    Phase 6 blend of the ensemble and frequency AI scores
+
+    Works on scalars and arrays; a missing frequency score (None/NaN,
+    frequency analysis skipped) leaves the ensemble score unchanged.
+    """
+    if frequency_ai_score is None:
+        return ensemble_ai_score
+    blended = (1.0 - weight) * ensemble_ai_score + weight * frequency_ai_score
+    if isinstance(blended, np.ndarray):
+        return np.where(np.isnan(frequency_ai_score), ensemble_ai_score, blended)
+    return blended
+
+
+def masked_median(values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """
+    Row-wise median of the masked entries (each row needs at least one)
+
+    Same result as np.median per row; np.nanmedian goes through masked
+    arrays and is an order of magnitude slower on short rows.
+    """
+    ordered = np.sort(np.where(mask, values, np.inf), axis=1)
+    count = mask.sum(axis=1)
+    rows = np.arange(len(ordered))
+    return (ordered[rows, (count - 1) // 2] + ordered[rows, count // 2]) / 2
+
+
 class SmartEnsemble:
     """Advanced ensemble voting with confidence gating"""
-    
+
     def __init__(self):
         # Confidence thresholds
-        self.LOW_CONFIDENCE_THRESHOLD = 0.6
-        self.HIGH_CONFIDENCE_THRESHOLD = 0.85
-        
+        self.LOW_CONFIDENCE_THRESHOLD = config.ENSEMBLE_LOW_CONFIDENCE
+        self.HIGH_CONFIDENCE_THRESHOLD = config.ENSEMBLE_HIGH_CONFIDENCE
+
         # Consensus thresholds
-        self.MIN_CONSENSUS_STRENGTH = 0.5
-        self.OUTLIER_DEVIATION_THRESHOLD = 0.3
-        
-        # Verdict thresholds
+        self.MIN_CONSENSUS_STRENGTH = config.ENSEMBLE_MIN_CONSENSUS
+        self.OUTLIER_DEVIATION_THRESHOLD = config.ENSEMBLE_OUTLIER_THRESHOLD
+
+        # Verdict thresholds (the ensemble's internal verdict; the service-level
+        # cut on the final score is config.AI_GENERATED_THRESHOLD)
         self.AI_GENERATED_THRESHOLD = 0.50
-        self.DEEPFAKE_THRESHOLD = 0.65
-        self.MANIPULATION_THRESHOLD = 0.35
-        
+        self.DEEPFAKE_THRESHOLD = config.DEEPFAKE_THRESHOLD
+        self.MANIPULATION_THRESHOLD = config.MANIPULATION_THRESHOLD
+
     def combine_predictions(
         self,
         model_predictions: List[Dict[str, Any]],
-        image_quality: Optional[Dict[str, Any]] = None,
-        forensics: Optional[Dict[str, Any]] = None
+        image_quality: Optional[QualityReport] = None,
+        forensics: Optional[ForensicResult] = None,
+        verbose: bool = True
     ) -> Dict[str, Any]:
         """
         Combine predictions from multiple models using smart ensemble
-        
+
         Args:
             model_predictions: List of {model, predictions, weight, confidence}
             image_quality: Optional quality assessment results
             forensics: Optional forensic analysis results
-            
+            verbose: Log filtered models and outliers
+
         Returns:
             Combined verdict with confidence and metadata
         """
         try:
             if not model_predictions:
-                logger.warning("No model predictions provided")
+                if verbose:
+                    logger.warning("No model predictions provided")
                 return self._fallback_verdict()
-            
-            # 1. Apply confidence gating
-            gated_predictions = self._apply_confidence_gating(
-                model_predictions, image_quality
-            )
-            
-            if not gated_predictions:
-                logger.warning("All models filtered by confidence gating")
-                return self._uncertain_verdict("Low confidence across all models")
-            
-            # 2. Detect and remove outliers
-            filtered_predictions = self._remove_outliers(gated_predictions)
-            
-            # 3. Calculate cross-model consistency
-            consistency_info = self._check_cross_model_consistency(filtered_predictions)
-            
-            # 4. Check if consensus is strong enough
-            if consistency_info["avg_agreement"] < self.MIN_CONSENSUS_STRENGTH:
-                return self._uncertain_verdict(
-                    "Models disagree significantly",
-                    {
-                        "consistency": consistency_info,
-                        "predictions": filtered_predictions
-                    }
-                )
-            
-            # 5. Combine scores with adjusted weights
-            combined_scores = self._weighted_combination(filtered_predictions)
-            
-            # 6. Incorporate forensics if available
-            if forensics:
-                combined_scores = self._incorporate_forensics(combined_scores, forensics)
-            
-            # 7. Determine final verdict
-            verdict_info = self._determine_verdict(
-                combined_scores,
-                consistency_info,
-                len(filtered_predictions),
-                len(model_predictions)
+
+            batch = self.combine_batch(
+                **self._columns([model_predictions], image_quality, forensics)
             )
-            
-            # Add metadata
-            verdict_info.update({
-                "ensemble_metadata": {
-                    "total_models": len(model_predictions),
-                    "active_models": len(filtered_predictions),
-                    "outliers_removed": len(gated_predictions) - len(filtered_predictions),
-                    "confidence_gating_removed": len(model_predictions) - len(gated_predictions),
-                    "cross_model_agreement": consistency_info["avg_agreement"],
-                    "consensus_strength": consistency_info["consensus_strength"],
-                    "prediction_clusters": consistency_info["clusters"]
-                }
-            })
-            
-            return verdict_info
-            
+            if verbose:
+                self._log_filtered(model_predictions, batch)
+            return self._result(model_predictions, batch)
+
         except Exception as e:
-            logger.error(f"Smart ensemble error: {e}")
+            logger.error("Smart ensemble error: %s", e)
             return self._fallback_verdict()
-    
-    def _apply_confidence_gating(
+
+    def combine_batch(
         self,
-        predictions: List[Dict[str, Any]],
-        image_quality: Optional[Dict[str, Any]]
-    ) -> List[Dict[str, Any]]:
-        """
-        Apply confidence-based gating to filter unreliable predictions
-        
-        Adjusts model weights based on:
-        - Model's own confidence
-        - Image quality (low quality reduces weight)
-        - Model-specific quality factors
-        """
-        gated = []
-        
-        for pred in predictions:
-            model_name = pred["model"]
-            base_weight = pred["weight"]
-            confidence = pred.get("confidence", 0.5)
-            
-            # 1. Confidence factor
-            if confidence < self.LOW_CONFIDENCE_THRESHOLD:
-                # Model is uncertain, reduce weight significantly
-                confidence_factor = 0.3
-            elif confidence > self.HIGH_CONFIDENCE_THRESHOLD:
-                # Model is very confident, boost weight
-                confidence_factor = 1.5
-            else:
-                # Normal confidence
-                confidence_factor = 1.0
-            
-            # 2. Quality factor (if available)
-            quality_factor = 1.0
-            if image_quality:
-                quality_factor = self._calculate_quality_factor(
-                    model_name, 
-                    image_quality
-                )
-            
-            # 3. Calculate final weight
-            final_weight = base_weight * confidence_factor * quality_factor
-            
-            # 4. Filter out if weight is too low
-            if final_weight > 0.1:  # Minimum threshold
-                pred_copy = pred.copy()
-                pred_copy["adjusted_weight"] = final_weight
-                pred_copy["confidence_factor"] = confidence_factor
-                pred_copy["quality_factor"] = quality_factor
-                gated.append(pred_copy)
-            else:
-                logger.info(f"Filtering {model_name}: weight too low ({final_weight:.2f})")
-        
-        return gated
-    
-    def _calculate_quality_factor(
-        self, 
-        model_name: str, 
-        quality: Dict[str, Any]
-    ) -> float:
+        ai_scores: np.ndarray,
+        confidences: np.ndarray,
+        weights: np.ndarray,
+        model_names: Sequence[str],
+        deepfake_scores: Optional[np.ndarray] = None,
+        present: Optional[np.ndarray] = None,
+        overall_quality: Optional[np.ndarray] = None,
+        manipulation_likelihood: Optional[np.ndarray] = None
+    ) -> Dict[str, np.ndarray]:
         """
-        Calculate quality-based adjustment factor for specific model
-        
-        Different models perform better/worse on low quality images
+        Combine the predictions of many images in one vectorized pass
+
+        Args:
+            ai_scores: (n_images, n_models) AI scores (NaN = model did not run)
+            confidences: (n_images, n_models) model confidences
+            weights: (n_models,) or (n_images, n_models) base model weights
+            model_names: Model name per column (sets the quality factor)
+            deepfake_scores: Optional (n_images, n_models) deepfake scores
+                             (default: half the AI score)
+            present: Optional (n_images, n_models) mask of models that ran
+                     (default: ai_scores not NaN)
+            overall_quality: Optional (n_images,) overall image quality
+                             (NaN = no quality report)
+            manipulation_likelihood: Optional (n_images,) forensic
+                                     manipulation likelihood (NaN = none)
+
+        Returns:
+            Dict of arrays: verdict, confidence, status, the four scores and
+            consistency metrics per image, plus (n_images, n_models) masks
+            and factors (gated, active, adjusted_weight, ...)
         """
-        overall_quality = quality.get("overall_quality", 0.7)
-        
-        # Model-specific adjustments
-        if "clip" in model_name.lower():
-            # CLIP is robust to low quality
-            if overall_quality < 0.5:
-                return 1.2  # Boost CLIP on low quality
-            else:
-                return 1.0
-        
-        elif "vit" in model_name.lower() or "transformer" in model_name.lower():
-            # ViT needs good quality
-            if overall_quality < 0.5:
-                return 0.7  # Reduce ViT on low quality
-            else:
-                return 1.1  # Boost on high quality
-        
-        elif "resnet" in model_name.lower() or "cnn" in model_name.lower():
-            # CNNs are moderately affected
-            if overall_quality < 0.4:
-                return 0.8
-            else:
-                return 1.0
-        
+        ai_scores = np.atleast_2d(np.asarray(ai_scores, dtype=np.float64))
+        n, m = ai_scores.shape
+        if present is None:
+            present = ~np.isnan(ai_scores)
+        present = np.asarray(present, dtype=bool)
+        scores = np.where(present, ai_scores, 0.0)
+        if deepfake_scores is None:
+            deepfake = scores * 0.5
         else:
-            # Default: slight penalty for low quality
-            return max(0.7, overall_quality)
-    
-    def _remove_outliers(self, predictions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """
-        Remove outlier predictions using median absolute deviation
-        """
-        if len(predictions) < 3:
-            # Not enough predictions to detect outliers
-            return predictions
-        
-        # Extract scores
-        scores = [pred["ai_score"] for pred in predictions]
-        median_score = np.median(scores)
-        
-        # Calculate MAD (Median Absolute Deviation)
-        mad = np.median([abs(s - median_score) for s in scores])
-        
-        # Filter outliers
-        filtered = []
-        for pred in predictions:
-            score = pred["ai_score"]
-            deviation = abs(score - median_score)
-            
-            # Check if outlier
-            if mad > 0:
-                z_score = deviation / (mad * 1.4826)  # Convert to Z-score equivalent
-                is_outlier = z_score > 2.5  # ~98% confidence
-            else:
-                # If MAD is 0, all scores are identical (no outliers)
-                is_outlier = deviation > self.OUTLIER_DEVIATION_THRESHOLD
-            
-            if not is_outlier:
-                filtered.append(pred)
-            else:
-                logger.warning(
-                    f"Outlier detected: {pred['model']} "
-                    f"score={score:.3f} vs median={median_score:.3f}"
-                )
-        
-        return filtered if filtered else predictions  # Keep all if all are outliers
-    
-    def _check_cross_model_consistency(
-        self, 
-        predictions: List[Dict[str, Any]]
+            deepfake = np.where(present, deepfake_scores, 0.0)
+        confidences = np.where(present, confidences, 0.5)
+        weights = np.broadcast_to(np.asarray(weights, dtype=np.float64), (n, m))
+
+        # 1. Confidence gating
+        confidence_factor = np.select(
+            [confidences < self.LOW_CONFIDENCE_THRESHOLD,
+             confidences > self.HIGH_CONFIDENCE_THRESHOLD],
+            [0.3, 1.5],
+            1.0
+        )
+        quality_factor = self._quality_factors(model_names, overall_quality, n)
+        final_weight = weights * confidence_factor * quality_factor
+        gated = present & (final_weight > 0.1)  # Minimum threshold
+        n_present = present.sum(axis=1)
+        n_gated = gated.sum(axis=1)
+
+        # 2. Outlier removal (median absolute deviation)
+        active = self._remove_outliers(scores, gated, n_gated)
+        n_active = active.sum(axis=1)
+
+        # 3. Cross-model consistency
+        consistency = self._check_cross_model_consistency(scores, active, n_active)
+
+        status = np.full(n, STATUS_OK)
+        status[consistency["avg_agreement"] < self.MIN_CONSENSUS_STRENGTH] = STATUS_DISAGREEMENT
+        status[n_gated == 0] = STATUS_GATED
+        status[n_present == 0] = STATUS_NO_PREDICTIONS
+
+        # 4. Weighted combination
+        adjusted_weight = np.where(active, final_weight, 0.0)
+        total_weight = adjusted_weight.sum(axis=1)
+        uniform = (total_weight == 0) & (n_active > 0)
+        if uniform.any():
+            logger.warning("Total weight is 0, using uniform weights")
+            adjusted_weight[uniform] = active[uniform]
+            total_weight[uniform] = n_active[uniform]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ai_score = (scores * adjusted_weight).sum(axis=1) / total_weight
+            deepfake_score = (deepfake * adjusted_weight).sum(axis=1) / total_weight
+
+        # 5. Forensics: strong manipulation evidence is kept, weak is halved
+        if manipulation_likelihood is None:
+            manipulation = np.zeros(n)
+        else:
+            manipulation = np.nan_to_num(
+                np.broadcast_to(np.asarray(manipulation_likelihood, dtype=np.float64), (n,))
+            )
+        manipulation_score = np.where(manipulation > 0.6, manipulation, manipulation * 0.5)
+
+        # 6. Verdict
+        verdict, confidence = self._determine_verdict(
+            ai_score, deepfake_score, manipulation_score,
+            consistency["consensus_strength"], n_active, n_present
+        )
+        authenticity = 1.0 - np.maximum(ai_score, np.maximum(deepfake_score, manipulation_score))
+
+        # Images without a verdict fall back to UNCERTAIN at 0.5
+        undecided = status != STATUS_OK
+        verdict[undecided] = "UNCERTAIN"
+        for column in (confidence, ai_score, deepfake_score, manipulation_score, authenticity):
+            column[undecided] = 0.5
+
+        return {
+            "verdict": verdict,
+            "confidence": confidence,
+            "status": status,
+            "ai_generated": ai_score,
+            "deepfake": deepfake_score,
+            "manipulation": manipulation_score,
+            "authenticity": authenticity,
+            "present": present,
+            "gated": gated,
+            "active": active,
+            "confidence_factor": confidence_factor,
+            "quality_factor": quality_factor,
+            "adjusted_weight": adjusted_weight,
+            "total_models": n_present,
+            "active_models": n_active,
+            "outliers_removed": n_gated - n_active,
+            "confidence_gating_removed": n_present - n_gated,
+            **consistency,
+        }
+
+    @staticmethod
+    def _columns(
+        rows: List[List[Dict[str, Any]]],
+        image_quality: Optional[QualityReport],
+        forensics: Optional[ForensicResult]
     ) -> Dict[str, Any]:
         """
-        Analyze agreement patterns across models
+        combine_batch arguments for rows of prediction dicts (one row per
+        image, same models in the same order) sharing one quality report
+        and one forensics result
         """
-        if len(predictions) < 2:
-            return {
-                "avg_agreement": 1.0,
-                "consensus_strength": 1.0,
-                "clusters": 1,
-                "edge_case": False
-            }
-        
-        scores = [pred["ai_score"] for pred in predictions]
-        
-        # Calculate pairwise agreement
-        agreements = []
-        for i in range(len(scores)):
-            for j in range(i + 1, len(scores)):
-                agreement = 1.0 - abs(scores[i] - scores[j])
-                agreements.append(agreement)
-        
-        avg_agreement = np.mean(agreements) if agreements else 1.0
-        
-        # Calculate consensus strength (inverse of std)
-        std = np.std(scores)
-        consensus_strength = max(0, 1.0 - std * 2)  # Normalize
-        
-        # Detect clusters (simple: check if bimodal distribution)
-        # If scores split into 2 groups, it's an edge case
-        median = np.median(scores)
-        below_median = [s for s in scores if s < median]
-        above_median = [s for s in scores if s >= median]
-        
-        # Check if clear separation
-        if below_median and above_median:
-            gap = min(above_median) - max(below_median)
-            has_clusters = gap > 0.3  # Significant gap
-        else:
-            has_clusters = False
-        
-        clusters = 2 if has_clusters else 1
-        edge_case = clusters > 1 and avg_agreement < 0.6
-        
+        n = len(rows)
+        overall_quality = (
+            image_quality.get("overall_quality", 0.7) if image_quality else np.nan
+        )
+        manipulation = forensics.get("manipulation_likelihood", 0.0) if forensics else 0.0
         return {
-            "avg_agreement": float(avg_agreement),
-            "consensus_strength": float(consensus_strength),
-            "clusters": clusters,
-            "edge_case": edge_case,
-            "score_std": float(std),
-            "score_range": float(max(scores) - min(scores))
+            "ai_scores": np.array([[p["ai_score"] for p in row] for row in rows], dtype=np.float64),
+            "confidences": np.array(
+                [[p.get("confidence", 0.5) for p in row] for row in rows], dtype=np.float64
+            ),
+            "weights": np.array([[p["weight"] for p in row] for row in rows], dtype=np.float64),
+            "deepfake_scores": np.array(
+                [[p.get("deepfake_score", p["ai_score"] * 0.5) for p in row] for row in rows],
+                dtype=np.float64
+            ),
+            "model_names": [p["model"] for p in rows[0]],
+            "overall_quality": np.full(n, overall_quality, dtype=np.float64),
+            "manipulation_likelihood": np.full(n, manipulation, dtype=np.float64),
         }
-    
-    def _weighted_combination(self, predictions: List[Dict[str, Any]]) -> Dict[str, float]:
+
+    @staticmethod
+    def _regime_keys(batch: Dict[str, np.ndarray]) -> np.ndarray:
         """
-        Combine predictions using adjusted weights
+        One row per image identifying its regime: which predictions survived
+        gating and outlier removal with which weights, or which fallback was
+        taken. The regime is constant over ranges of a prediction's score;
+        within one regime the combined AI score is monotone in each score.
         """
-        total_weight = sum(pred["adjusted_weight"] for pred in predictions)
-        
-        if total_weight == 0:
-            logger.warning("Total weight is 0, using uniform weights")
-            total_weight = len(predictions)
-            for pred in predictions:
-                pred["adjusted_weight"] = 1.0
-        
-        # Calculate weighted scores
-        ai_score = sum(
-            pred["ai_score"] * pred["adjusted_weight"] 
-            for pred in predictions
-        ) / total_weight
-        
-        deepfake_score = sum(
-            pred.get("deepfake_score", pred["ai_score"] * 0.5) * pred["adjusted_weight"]
-            for pred in predictions
-        ) / total_weight
-        
+        decided = batch["status"] == STATUS_OK
+        return np.column_stack(
+            [batch["status"], np.where(decided[:, None], batch["adjusted_weight"], 0.0)]
+        )
+
+    def _result(
+        self,
+        model_predictions: List[Dict[str, Any]],
+        batch: Dict[str, np.ndarray],
+        row: int = 0
+    ) -> Dict[str, Any]:
+        """Result dict of one image (combine_predictions format) from a batch row"""
+        status = batch["status"][row]
+        if status == STATUS_NO_PREDICTIONS:
+            return self._fallback_verdict()
+        if status == STATUS_GATED:
+            return self._uncertain_verdict("Low confidence across all models")
+
+        consistency_info = {
+            "avg_agreement": float(batch["avg_agreement"][row]),
+            "consensus_strength": float(batch["consensus_strength"][row]),
+            "clusters": int(batch["clusters"][row]),
+            "edge_case": bool(batch["edge_case"][row]),
+        }
+        if batch["active_models"][row] >= 2:
+            consistency_info["score_std"] = float(batch["score_std"][row])
+            consistency_info["score_range"] = float(batch["score_range"][row])
+
+        if status == STATUS_DISAGREEMENT:
+            filtered_predictions = []
+            for column in np.flatnonzero(batch["active"][row]):
+                pred_copy = model_predictions[column].copy()
+                pred_copy["adjusted_weight"] = float(batch["adjusted_weight"][row, column])
+                pred_copy["confidence_factor"] = float(batch["confidence_factor"][row, column])
+                pred_copy["quality_factor"] = float(batch["quality_factor"][row, column])
+                filtered_predictions.append(pred_copy)
+            return self._uncertain_verdict(
+                "Models disagree significantly",
+                {
+                    "consistency": consistency_info,
+                    "predictions": filtered_predictions
+                }
+            )
+
         return {
-            "ai_generated_score": float(ai_score),
-            "deepfake_score": float(deepfake_score),
+            "verdict": str(batch["verdict"][row]),
+            "confidence": float(batch["confidence"][row]),
+            "scores": {
+                "ai_generated": float(batch["ai_generated"][row]),
+                "deepfake": float(batch["deepfake"][row]),
+                "manipulation": float(batch["manipulation"][row]),
+                "authenticity": float(batch["authenticity"][row])
+            },
+            "ensemble_metadata": {
+                "total_models": int(batch["total_models"][row]),
+                "active_models": int(batch["active_models"][row]),
+                "outliers_removed": int(batch["outliers_removed"][row]),
+                "confidence_gating_removed": int(batch["confidence_gating_removed"][row]),
+                "cross_model_agreement": consistency_info["avg_agreement"],
+                "consensus_strength": consistency_info["consensus_strength"],
+                "prediction_clusters": consistency_info["clusters"]
+            }
         }
-    
-    def _incorporate_forensics(
-        self, 
-        combined_scores: Dict[str, float],
-        forensics: Dict[str, Any]
-    ) -> Dict[str, float]:
+
+    def _log_filtered(
+        self,
+        model_predictions: List[Dict[str, Any]],
+        batch: Dict[str, np.ndarray],
+        row: int = 0
+    ):
+        """Log the models one image lost to gating and outlier removal"""
+        gated = batch["gated"][row]
+        for column in np.flatnonzero(~gated):
+            weight = (
+                model_predictions[column]["weight"]
+                * batch["confidence_factor"][row, column]
+                * batch["quality_factor"][row, column]
+            )
+            logger.debug("Filtering %s: weight too low (%.2f)", model_predictions[column]["model"], weight)
+        if not gated.any():
+            logger.warning("All models filtered by confidence gating")
+            return
+
+        outliers = gated & ~batch["active"][row]
+        if outliers.any():
+            median_score = np.median([model_predictions[c]["ai_score"] for c in np.flatnonzero(gated)])
+            for column in np.flatnonzero(outliers):
+                logger.warning(
+                    "Outlier detected: %s score=%.3f vs median=%.3f",
+                    model_predictions[column]["model"],
+                    model_predictions[column]["ai_score"],
+                    median_score,
+                )
+
+    def ai_score_bounds(
+        self,
+        completed: List[Dict[str, Any]],
+        pending: List[Callable[[float], Dict[str, Any]]],
+        image_quality: Optional[QualityReport] = None,
+        forensics: Optional[ForensicResult] = None,
+        grid_step: float = 0.002
+    ) -> Tuple[float, float]:
         """
-        Blend forensic analysis into combined scores
+        Range of the combined AI score over possible outcomes of models not run yet
+
+        Outcomes are combined with the completed predictions through the full
+        ensemble (gating, outlier removal, consensus check, weighting), so the
+        range includes the UNCERTAIN fallback whenever some outcome leads there.
+
+        With one pending model its score is scanned over a grid; wherever the
+        ensemble regime (see _regime_keys) changes between two grid points
+        the boundary is located by repeated subdivision and both sides are
+        evaluated. The score is monotone within a regime, so this finds the
+        extremes unless a whole regime fits between two grid points (outlier
+        removal can open windows narrower than 0.01, hence the fine grid). With several pending models
+        only the grid product is evaluated. The grid and each refinement
+        round (all boundaries at once, 8 points per boundary) are one
+        combine_batch call each.
+
+        Args:
+            completed: Predictions of the models already run
+            pending: For each pending model, a function mapping its AI score
+                     in [0, 1] to a prediction dict (same shape as
+                     `completed` entries)
+            image_quality: Optional quality assessment results
+            forensics: Optional forensic analysis results
+            grid_step: Score grid resolution
+
+        Returns:
+            (min, max) of the combined ai_generated score
         """
-        # Get forensic indicators
-        manipulation_score = forensics.get("manipulation_likelihood", 0.0)
-        
-        # Forensics are good at detecting manipulation but not AI generation
-        # Use them to adjust scores, not replace them
-        
-        # If forensics strongly suggest manipulation, boost manipulation score
-        if manipulation_score > 0.6:
-            combined_scores["manipulation_score"] = manipulation_score
-        else:
-            combined_scores["manipulation_score"] = manipulation_score * 0.5
-        
-        return combined_scores
-    
-    def _determine_verdict(
+        steps = int(round(1.0 / grid_step))
+        grid = [i / steps for i in range(steps + 1)]
+
+        fixed = self._columns([completed], image_quality, forensics) if completed else None
+
+        def evaluate(points):
+            # Only the pending columns vary between rows
+            columns = self._columns(
+                [[fn(x) for fn, x in zip(pending, point)] for point in points],
+                image_quality,
+                forensics
+            )
+            if fixed is not None:
+                for key in ("ai_scores", "confidences", "weights", "deepfake_scores"):
+                    columns[key] = np.hstack(
+                        [np.repeat(fixed[key], len(points), axis=0), columns[key]]
+                    )
+                columns["model_names"] = fixed["model_names"] + columns["model_names"]
+            batch = self.combine_batch(**columns)
+            return batch["ai_generated"], self._regime_keys(batch)
+
+        if len(pending) != 1:
+            values, _ = evaluate(list(itertools.product(grid, repeat=len(pending))))
+            return float(values.min()), float(values.max())
+
+        # Near-duplicates of the completed scores: the outlier check switches
+        # between its zero-MAD and MAD-based rules around exact ties
+        ties = {
+            min(max(pred["ai_score"] + delta, 0.0), 1.0)
+            for pred in completed
+            for delta in (-1e-6, 0.0, 1e-6)
+        }
+        points = np.array(sorted(set(grid) | ties))
+        values, keys = evaluate([(x,) for x in points])
+        low, high = values.min(), values.max()
+
+        # Narrow all regime boundaries together, keeping both sides: each
+        # round splits every bracket into 9 and keeps the first sub-interval
+        # where the regime changes
+        changed = np.flatnonzero(np.any(keys[1:] != keys[:-1], axis=1))
+        start, end, start_keys = points[changed], points[changed + 1], keys[changed]
+        splits = 8
+        fractions = np.arange(1, splits + 1) / (splits + 1)
+        while len(start):
+            inner = start[:, None] + (end - start)[:, None] * fractions
+            values, keys = evaluate([(x,) for x in inner.ravel()])
+            low, high = min(low, values.min()), max(high, values.max())
+
+            differs = np.any(
+                keys.reshape(len(start), splits, -1) != start_keys[:, None, :], axis=2
+            )
+            change = np.where(differs.any(axis=1), differs.argmax(axis=1), splits)
+            edges = np.column_stack([start, inner, end])
+            rows = np.arange(len(start))
+            start, end = edges[rows, change], edges[rows, change + 1]
+            # Within a regime the score moves at most ~1x the pending score, so
+            # 1e-10 wide brackets keep the bounds exact to well below 1e-9
+            keep = end - start > 1e-10
+            start, end, start_keys = start[keep], end[keep], start_keys[keep]
+
+        return float(low), float(high)
+
+    def _quality_factors(
         self,
-        scores: Dict[str, float],
-        consistency: Dict[str, Any],
-        active_models: int,
-        total_models: int
-    ) -> Dict[str, Any]:
+        model_names: Sequence[str],
+        overall_quality: Optional[np.ndarray],
+        n: int
+    ) -> np.ndarray:
         """
-        Determine final verdict based on scores and consensus
+        Calculate quality-based adjustment factors, shape (n_images, n_models)
+
+        Different models perform better/worse on low quality images. Images
+        without a quality report (NaN) get 1.0.
         """
-        ai_score = scores["ai_generated_score"]
-        deepfake_score = scores.get("deepfake_score", 0.0)
-        manipulation_score = scores.get("manipulation_score", 0.0)
-        
-        consensus_strength = consistency["consensus_strength"]
-        
-        # Apply consensus penalty to confidence
-        # Weak consensus = lower confidence
-        consensus_penalty = max(0.7, consensus_strength)
-        
-        # Determine verdict
-        if ai_score >= self.AI_GENERATED_THRESHOLD:
-            verdict = "AI_GENERATED"
-            confidence = ai_score * consensus_penalty
-            
-        elif deepfake_score >= self.DEEPFAKE_THRESHOLD:
-            verdict = "MANIPULATED"
-            confidence = deepfake_score * consensus_penalty
-            
-        elif manipulation_score >= self.MANIPULATION_THRESHOLD:
-            # Complex logic: check if AI score is also elevated
-            if ai_score >= 0.65:
-                verdict = "AI_GENERATED"
-                confidence = ai_score * 0.8 * consensus_penalty
-            elif ai_score > 0.5:
-                # Uncertain zone
-                verdict = "UNCERTAIN"
-                confidence = 0.5
-            else:
-                verdict = "MANIPULATED"
-                confidence = manipulation_score * consensus_penalty
-                
-        else:
-            # All scores low
-            max_score = max(ai_score, deepfake_score, manipulation_score)
-            if max_score < 0.4:
-                verdict = "REAL"
-                confidence = (1.0 - max_score) * consensus_penalty
-            elif ai_score >= 0.65:
-                # AI score is high enough despite threshold
-                verdict = "AI_GENERATED"
-                confidence = ai_score * 0.7 * consensus_penalty
+        if overall_quality is None:
+            return np.ones((n, len(model_names)))
+        quality = np.broadcast_to(np.asarray(overall_quality, dtype=np.float64), (n,))
+
+        columns = []
+        for model_name in model_names:
+            name = model_name.lower()
+            if "clip" in name:
+                # CLIP is robust to low quality: boost it on low quality
+                factor = np.where(quality < 0.5, 1.2, 1.0)
+            elif "vit" in name or "transformer" in name:
+                # ViT needs good quality
+                factor = np.where(quality < 0.5, 0.7, 1.1)
+            elif "resnet" in name or "cnn" in name:
+                # CNNs are moderately affected
+                factor = np.where(quality < 0.4, 0.8, 1.0)
             else:
-                # Uncertain
-                verdict = "UNCERTAIN"
-                confidence = 0.5
-        
-        # Final confidence adjustment based on model coverage
-        coverage_penalty = active_models / max(total_models, 1)
-        confidence *= max(0.8, coverage_penalty)  # Max 20% penalty
-        
+                # Default: slight penalty for low quality
+                factor = np.maximum(0.7, quality)
+            columns.append(np.where(np.isnan(quality), 1.0, factor))
+
+        return np.stack(columns, axis=1) if columns else np.ones((n, 0))
+
+    def _remove_outliers(
+        self, scores: np.ndarray, gated: np.ndarray, n_gated: np.ndarray
+    ) -> np.ndarray:
+        """
+        Remove outlier predictions using median absolute deviation
+
+        Returns the mask of predictions kept. Images with fewer than three
+        gated predictions keep all of them, as do images where every
+        prediction would be an outlier.
+        """
+        active = gated.copy()
+        rows = n_gated >= 3
+        if not rows.any():
+            return active
+
+        mask = gated[rows]
+        median_score = masked_median(scores[rows], mask)[:, None]
+        deviation = np.abs(scores[rows] - median_score)
+        mad = masked_median(deviation, mask)[:, None]
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            z_score = deviation / (mad * 1.4826)  # Convert to Z-score equivalent
+        # If MAD is 0, most scores are identical: only large deviations count
+        is_outlier = np.where(
+            mad > 0, z_score > 2.5, deviation > self.OUTLIER_DEVIATION_THRESHOLD
+        )
+        kept = mask & ~is_outlier
+        none_kept = ~kept.any(axis=1)
+        kept[none_kept] = mask[none_kept]  # Keep all if all are outliers
+        active[rows] = kept
+        return active
+
+    def _check_cross_model_consistency(
+        self, scores: np.ndarray, active: np.ndarray, n_active: np.ndarray
+    ) -> Dict[str, np.ndarray]:
+        """
+        Analyze agreement patterns across models, per image
+
+        Images with fewer than two active predictions count as full agreement.
+        """
+        n, m = scores.shape
+        multi = n_active >= 2
+        count = np.maximum(n_active, 1)
+
+        # Mean pairwise agreement (1 - |difference|) over active pairs
+        pairs = active[:, :, None] & active[:, None, :] & np.triu(np.ones((m, m), dtype=bool), k=1)
+        agreement = 1.0 - np.abs(scores[:, :, None] - scores[:, None, :])
+        n_pairs = np.maximum(n_active * (n_active - 1) // 2, 1)
+        avg_agreement = np.where(
+            multi, np.where(pairs, agreement, 0.0).sum(axis=(1, 2)) / n_pairs, 1.0
+        )
+
+        # Consensus strength (inverse of std)
+        mean = np.where(active, scores, 0.0).sum(axis=1) / count
+        std = np.sqrt(np.where(active, (scores - mean[:, None]) ** 2, 0.0).sum(axis=1) / count)
+        consensus_strength = np.where(multi, np.maximum(0, 1.0 - std * 2), 1.0)
+
+        # Clusters: a gap of more than 0.3 between the scores below the
+        # median and those at or above it
+        clusters = np.ones(n, dtype=int)
+        if multi.any():
+            median = masked_median(scores[multi], active[multi])[:, None]
+            below = active[multi] & (scores[multi] < median)
+            above = active[multi] & (scores[multi] >= median)
+            gap = (
+                np.where(above, scores[multi], np.inf).min(axis=1)
+                - np.where(below, scores[multi], -np.inf).max(axis=1)
+            )
+            has_clusters = below.any(axis=1) & above.any(axis=1) & (gap > 0.3)
+            clusters[multi] = np.where(has_clusters, 2, 1)
+
+        score_range = (
+            np.where(active, scores, -np.inf).max(axis=1)
+            - np.where(active, scores, np.inf).min(axis=1)
+        )
         return {
-            "verdict": verdict,
-            "confidence": float(np.clip(confidence, 0, 1)),
-            "scores": {
-                "ai_generated": float(ai_score),
-                "deepfake": float(deepfake_score),
-                "manipulation": float(manipulation_score),
-                "authenticity": float(1.0 - max(ai_score, deepfake_score, manipulation_score))
-            }
+            "avg_agreement": avg_agreement,
+            "consensus_strength": consensus_strength,
+            "clusters": clusters,
+            "edge_case": (clusters > 1) & (avg_agreement < 0.6),
+            "score_std": np.where(multi, std, 0.0),
+            "score_range": np.where(multi, score_range, 0.0),
         }
-    
+
+    def _determine_verdict(
+        self,
+        ai_score: np.ndarray,
+        deepfake_score: np.ndarray,
+        manipulation_score: np.ndarray,
+        consensus_strength: np.ndarray,
+        active_models: np.ndarray,
+        total_models: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Determine final verdicts and confidences based on scores and consensus
+        """
+        # Weak consensus = lower confidence
+        consensus_penalty = np.maximum(0.7, consensus_strength)
+        max_score = np.maximum(ai_score, np.maximum(deepfake_score, manipulation_score))
+
+        is_ai = ai_score >= self.AI_GENERATED_THRESHOLD
+        is_deepfake = ~is_ai & (deepfake_score >= self.DEEPFAKE_THRESHOLD)
+        # Manipulation: check if the AI score is also elevated
+        is_manipulation = ~is_ai & ~is_deepfake & (manipulation_score >= self.MANIPULATION_THRESHOLD)
+        low_scores = ~is_ai & ~is_deepfake & ~is_manipulation
+
+        conditions = [
+            is_ai,
+            is_deepfake,
+            is_manipulation & (ai_score >= 0.65),
+            is_manipulation & (ai_score > 0.5),  # Uncertain zone
+            is_manipulation,
+            low_scores & (max_score < 0.4),
+            low_scores & (ai_score >= 0.65),  # AI score high enough despite threshold
+        ]
+        verdict = np.select(
+            conditions,
+            ["AI_GENERATED", "MANIPULATED", "AI_GENERATED", "UNCERTAIN",
+             "MANIPULATED", "REAL", "AI_GENERATED"],
+            "UNCERTAIN"
+        ).astype(object)
+        confidence = np.select(
+            conditions,
+            [
+                ai_score * consensus_penalty,
+                deepfake_score * consensus_penalty,
+                ai_score * 0.8 * consensus_penalty,
+                np.full_like(ai_score, 0.5),
+                manipulation_score * consensus_penalty,
+                (1.0 - max_score) * consensus_penalty,
+                ai_score * 0.7 * consensus_penalty,
+            ],
+            0.5
+        )
+
+        # Final confidence adjustment based on model coverage (max 20% penalty)
+        coverage_penalty = active_models / np.maximum(total_models, 1)
+        confidence = confidence * np.maximum(0.8, coverage_penalty)
+
+        return verdict, np.clip(confidence, 0, 1)
+
     def _uncertain_verdict(
-        self, 
-        reason: str, 
+        self,
+        reason: str,
         metadata: Optional[Dict] = None
     ) -> Dict[str, Any]:
         """Return an UNCERTAIN verdict"""
@@ -437,12 +665,12 @@ class SmartEnsemble:
                 "authenticity": 0.5
             }
         }
-        
+
         if metadata:
             result.update(metadata)
-        
+
         return result
-    
+
     def _fallback_verdict(self) -> Dict[str, Any]:
         """Fallback when ensemble fails"""
         return {
@@ -457,4 +685,3 @@ class SmartEnsemble:
             },
             "error": True
         }
-
@@ -0,0 +1,247 @@
+"""
+Columnar Feature Store for Offline Re-scoring
+
+Persists, per detection request, everything the ensemble and the Phase 6
+frequency blend consume, so threshold changes can be evaluated by replaying
+stored rows (rescore.py) instead of re-running inference:
+- per model: AI score, deepfake score, confidence, weight and the raw label
+  probabilities (model__<key>__...)
+- quality, forensic and frequency scalars (quality__..., forensic__...,
+  frequency__...)
+- the served ensemble score and request metadata
+
+Rows are buffered in memory and written as shards of FEATURE_STORE_SHARD_ROWS
+rows: Parquet when pyarrow is installed, compressed NumPy archives otherwise.
+Shards from different workers and model sets are merged on load (columns a
+shard lacks read as NaN).
+"""
+import atexit
+import glob
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+import config
+from results import ForensicResult, FrequencyResult, QualityReport
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Optional: NumPy archives are used instead
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+SHARD_EXTENSIONS = {"parquet": ".parquet", "npz": ".npz"}
+MODEL_FIELDS = ("ai_score", "deepfake_score", "confidence", "weight")
+STRING_COLUMNS = ("image_sha256", "models_run")
+
+
+def model_column(model_key: str, field: str) -> str:
+    return f"model__{model_key}__{field}"
+
+
+def stored_models(columns: Dict[str, np.ndarray]) -> List[str]:
+    """Model keys present in a loaded store, in column order"""
+    keys = []
+    for name in columns:
+        parts = name.split("__")
+        if len(parts) == 3 and parts[0] == "model" and parts[2] == "ai_score":
+            keys.append(parts[1])
+    return keys
+
+
+def feature_row(
+    all_predictions: List[Dict[str, Any]],
+    quality_report: QualityReport,
+    forensics: Optional[ForensicResult],
+    frequency_analysis: FrequencyResult,
+    ensemble_score: float,
+    image_bytes: Optional[bytes] = None,
+) -> Dict[str, Any]:
+    """
+    One store row from the inputs and output of a detection
+
+    Args:
+        all_predictions: Phase 4 model predictions (models that ran)
+        quality_report: Phase 1 quality report
+        forensics: Phase 2 forensic results (None if skipped)
+        frequency_analysis: Phase 3 results (skipped=True if skipped)
+        ensemble_score: Served (frequency-blended) AI score
+        image_bytes: Optional raw image, hashed to join rows with labels
+
+    Returns:
+        Dict of column name -> scalar
+    """
+    row = {
+        "timestamp": time.time(),
+        "image_sha256": hashlib.sha256(image_bytes).hexdigest() if image_bytes else "",
+        "ensemble_score": float(ensemble_score),
+        "models_run": ",".join(pred["model"] for pred in all_predictions),
+        # NaN marks a missing input: forensics skipped / frequency skipped
+        "overall_quality": float(quality_report.overall_quality),
+        "manipulation_likelihood": float(forensics.get("manipulation_likelihood", 0.0))
+        if forensics is not None else np.nan,
+        "frequency_ai_score": float(frequency_analysis.get("frequency_ai_score", np.nan)),
+    }
+    for pred in all_predictions:
+        for field in MODEL_FIELDS:
+            row[model_column(pred["model"], field)] = float(pred[field])
+        for label_score in pred.get("predictions", []):
+            label = str(label_score["label"]).lower().replace(" ", "_")
+            row[model_column(pred["model"], f"p_{label}")] = float(label_score["score"])
+
+    quality_report.to_row("quality", row)
+    if forensics is not None:
+        forensics.to_row("forensic", row)
+    frequency_analysis.to_row("frequency", row)
+    return row
+
+
+def _columns_from_rows(rows: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Rows -> columns over the union of their keys (missing = NaN / "")"""
+    names = sorted({name for row in rows for name in row})
+    columns = {}
+    for name in names:
+        if name in STRING_COLUMNS:
+            columns[name] = np.array([str(row.get(name, "")) for row in rows])
+        else:
+            columns[name] = np.array([row.get(name, np.nan) for row in rows], dtype=np.float64)
+    return columns
+
+
+class FeatureStore:
+    """Buffers feature rows and writes them as columnar shards"""
+
+    def __init__(
+        self,
+        directory: str,
+        shard_rows: int = 10000,
+        file_format: str = "auto",
+    ):
+        if file_format == "auto":
+            file_format = "parquet" if pq is not None else "npz"
+        if file_format == "parquet" and pq is None:
+            logger.warning("pyarrow not installed - writing the feature store as .npz")
+            file_format = "npz"
+
+        self.directory = directory
+        self.shard_rows = shard_rows
+        self.file_format = file_format
+        self._rows: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._shards_written = 0
+        os.makedirs(directory, exist_ok=True)
+        atexit.register(self.flush)
+        logger.info(f"Feature store: {directory} ({file_format}, {shard_rows} rows/shard)")
+
+    @classmethod
+    def from_config(cls) -> Optional["FeatureStore"]:
+        """Store configured by FEATURE_STORE_DIR, or None when disabled"""
+        if not config.FEATURE_STORE_DIR:
+            return None
+        return cls(
+            config.FEATURE_STORE_DIR,
+            shard_rows=config.FEATURE_STORE_SHARD_ROWS,
+            file_format=config.FEATURE_STORE_FORMAT,
+        )
+
+    def append(self, row: Dict[str, Any]):
+        """Buffer a row; writes a shard once the buffer is full"""
+        with self._lock:
+            self._rows.append(row)
+            if len(self._rows) < self.shard_rows:
+                return
+            rows, self._rows = self._rows, []
+        self._write(rows)
+
+    def flush(self):
+        """Write buffered rows (at shutdown)"""
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if rows:
+            self._write(rows)
+
+    def _write(self, rows: List[Dict[str, Any]]):
+        with self._lock:
+            self._shards_written += 1
+            sequence = self._shards_written
+        name = f"features-{int(time.time())}-{os.getpid()}-{sequence:05d}"
+        path = os.path.join(self.directory, name + SHARD_EXTENSIONS[self.file_format])
+        try:
+            write_shard(path, _columns_from_rows(rows))
+            logger.info(f"Feature store: wrote {len(rows)} rows to {path}")
+        except Exception as e:
+            logger.error(f"Feature store write failed ({path}): {e}")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "directory": self.directory,
+            "format": self.file_format,
+            "buffered_rows": len(self._rows),
+            "shards_written": self._shards_written,
+        }
+
+
+def write_shard(path: str, columns: Dict[str, np.ndarray]):
+    """Write one shard; the format follows the file extension"""
+    tmp_path = path + ".tmp"
+    if path.endswith(".parquet"):
+        pq.write_table(pa.table(columns), tmp_path, compression="zstd")
+    else:
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, **columns)
+    # Readers never see a partially written shard
+    os.replace(tmp_path, path)
+
+
+def read_shard(path: str) -> Dict[str, np.ndarray]:
+    if path.endswith(".parquet"):
+        if pq is None:
+            raise RuntimeError(f"pyarrow is required to read {path}")
+        table = pq.read_table(path)
+        return {name: table.column(name).to_numpy() for name in table.column_names}
+    with np.load(path, allow_pickle=False) as archive:
+        return {name: archive[name] for name in archive.files}
+
+
+def load_features(directory: str, limit: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Load all shards of a store as one set of columns
+
+    Args:
+        directory: Store directory
+        limit: Optional maximum number of shards (oldest first)
+
+    Returns:
+        Dict of column name -> array over all rows
+    """
+    paths = sorted(
+        path
+        for extension in SHARD_EXTENSIONS.values()
+        for path in glob.glob(os.path.join(directory, f"*{extension}"))
+    )[:limit]
+    shards = [read_shard(path) for path in paths]
+    if not shards:
+        return {}
+
+    names = sorted({name for shard in shards for name in shard})
+    columns = {}
+    for name in names:
+        parts = []
+        for shard in shards:
+            rows = len(next(iter(shard.values())))
+            if name in shard:
+                parts.append(shard[name])
+            elif name in STRING_COLUMNS:
+                parts.append(np.full(rows, ""))
+            else:
+                parts.append(np.full(rows, np.nan))
+        columns[name] = np.concatenate(parts)
+    return columns
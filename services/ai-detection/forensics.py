@@ -5,9 +5,22 @@ import numpy as np
 import cv2
 from PIL import Image
 import exifread
+import base64
 from io import BytesIO
 import logging
-from typing import Dict, Any, Optional
+import time
+from typing import Dict, List, Optional
+
+import config
+from image_stats import (
+    ImageStatistics,
+    block_means,
+    laplacian_mean_std,
+    mean_std,
+    pooled_mean_std,
+)
+from recompression import RecompressionAnalyzer
+from results import ForensicHeatmaps, ForensicResult
 
 logger = logging.getLogger(__name__)
 
@@ -15,87 +28,130 @@ logger = logging.getLogger(__name__)
 class ForensicAnalyzer:
     """Performs forensic analysis on images to detect manipulation"""
     
-    def __init__(self):
+    # Value mapped to 255 in each heatmap (larger values saturate), in the
+    # units of the global field: about twice its suspicion threshold
+    HEATMAP_SCALES = {
+        "noise": 1000.0,  # Laplacian variance (uniform noise below 100)
+        "block_variance": 2000.0,  # Std of 8x8 block variances (inconsistent above 1000)
+        "edge_strength": 200.0,  # Mean gradient magnitude (artifacts above 100)
+        "color": 128.0,  # Std over all RGB values (max 127.5)
+    }
+    
+    def __init__(
+        self,
+        heatmap_tile: int = config.FORENSIC_HEATMAP_TILE,
+        heatmap_format: str = config.FORENSIC_HEATMAP_FORMAT,
+    ):
+        if heatmap_format not in ("png", "array"):
+            raise ValueError(f"Unknown heatmap format: {heatmap_format}")
+        
         self.analysis_enabled = True
+        # Heatmap cells cover whole 8x8 JPEG blocks
+        self.heatmap_tile = max(8, heatmap_tile - heatmap_tile % 8)
+        self.heatmap_format = heatmap_format
+        self.recompression_analyzer = RecompressionAnalyzer()
         
-    def analyze(self, image: Image.Image, image_bytes: Optional[bytes] = None) -> Dict[str, Any]:
+    def analyze(
+        self,
+        image: Image.Image,
+        image_bytes: Optional[bytes] = None,
+        native_tiles: Optional[List[np.ndarray]] = None,
+        stats: Optional[ImageStatistics] = None,
+        heatmaps: Optional[bool] = None,
+        recompression: Optional[bool] = None,
+    ) -> ForensicResult:
         """
         Perform comprehensive forensic analysis
         
         Args:
             image: PIL Image object
             image_bytes: Optional raw image bytes for EXIF analysis
+            native_tiles: Optional full-resolution crops used by the noise and
+                          compression checks when `image` has been downscaled
+            stats: Optional shared statistics for `image` (e.g. already
+                   computed by the quality assessor)
+            heatmaps: Also compute per-tile heatmaps of `image` (defaults to
+                      FORENSIC_HEATMAPS)
+            recompression: Run Error Level Analysis and JPEG ghost detection
+                           (defaults to FORENSIC_RECOMPRESSION)
             
         Returns:
-            Dictionary with forensic analysis results
+            ForensicResult (checks that failed leave their fields unset and
+            report a *_error field)
         """
-        results = {}
+        results = ForensicResult()
         
         try:
             # Basic image properties
-            results.update(self._get_basic_properties(image))
+            self._get_basic_properties(image, results)
             
             # EXIF analysis
             if image_bytes:
-                exif_data = self._analyze_exif(image_bytes)
-                results.update(exif_data)
+                self._analyze_exif(image_bytes, results)
             else:
-                results["exif_data"] = {}
-                results["exif_data_present"] = False
+                results.exif_data = {}
+                results.exif_data_present = False
             
-            # Convert to numpy for analysis
-            img_array = np.array(image)
+            # Pixel statistics shared with the quality assessor
+            if stats is None:
+                stats = ImageStatistics(image)
+            img_array = stats.array
             
-            # Noise analysis
-            noise_results = self._analyze_noise(img_array)
-            results.update(noise_results)
+            # Noise analysis (on native tiles when given: downscaling averages
+            # sensor noise away and destroys the 8x8 JPEG block grid)
+            self._analyze_noise(stats, results, native_tiles)
             
             # Compression artifacts
-            compression_results = self._analyze_compression(img_array)
-            results.update(compression_results)
+            self._analyze_compression(stats, results, native_tiles)
             # Map to standard fields
-            if "block_variance_std" in compression_results:
-                results["compression_artifacts"] = min(compression_results["block_variance_std"] / 1000.0, 1.0)
+            if results.block_variance_std is not None:
+                results.compression_artifacts = min(results.block_variance_std / 1000.0, 1.0)
             
             # Color consistency
-            color_results = self._analyze_color_consistency(img_array)
-            results.update(color_results)
+            self._analyze_color_consistency(img_array, stats, results)
             # Add standard fields
-            if len(img_array.shape) == 3:
-                results["color_saturation"] = float(np.mean(np.std(img_array, axis=(0,1))) / 255.0)
-                results["brightness"] = float(np.mean(img_array) / 255.0)
-                results["contrast"] = float(np.std(img_array) / 128.0)
+            mean, std = stats.overall_mean_std
+            if stats.is_color:
+                results.color_saturation = float(np.mean(stats.channel_mean_std[1]) / 255.0)
             else:
-                results["color_saturation"] = 0.0
-                results["brightness"] = float(np.mean(img_array) / 255.0)
-                results["contrast"] = float(np.std(img_array) / 128.0)
+                results.color_saturation = 0.0
+            results.brightness = float(mean / 255.0)
+            results.contrast = float(std / 128.0)
             
             # Edge analysis (for sharpness)
-            edge_results = self._analyze_edges(img_array)
-            results.update(edge_results)
+            self._analyze_edges(stats, results)
             # Map to standard fields
-            if "edge_density" in edge_results:
-                results["sharpness"] = edge_results["edge_density"]
+            results.sharpness = results.edge_density
+            
+            # Recompression (ELA / JPEG ghosts), on native tiles when given
+            if recompression is None:
+                recompression = config.FORENSIC_RECOMPRESSION
+            if recompression:
+                self._analyze_recompression(stats, results, native_tiles)
+            
+            # Per-tile heatmaps (reuse the gray, Laplacian and gradient images)
+            if heatmaps is None:
+                heatmaps = config.FORENSIC_HEATMAPS
+            if heatmaps:
+                self._compute_heatmaps(stats, results)
             
             # Overall manipulation score
-            results["manipulation_likelihood"] = self._calculate_manipulation_score(results)
+            results.manipulation_likelihood = self._calculate_manipulation_score(results)
             
         except Exception as e:
             logger.error(f"Forensic analysis error: {e}", exc_info=True)
-            results["error"] = str(e)
+            results.error = str(e)
         
         return results
     
-    def _get_basic_properties(self, image: Image.Image) -> Dict[str, Any]:
+    def _get_basic_properties(self, image: Image.Image, results: ForensicResult):
         """Extract basic image properties"""
-        return {
-            "width": image.width,
-            "height": image.height,
-            "format": image.format,
-            "mode": image.mode,
-        }
+        results.width = image.width
+        results.height = image.height
+        results.format = image.format
+        results.mode = image.mode
     
-    def _analyze_exif(self, image_bytes: bytes) -> Dict[str, Any]:
+    def _analyze_exif(self, image_bytes: bytes, results: ForensicResult):
         """Analyze EXIF metadata"""
         try:
             tags = exifread.process_file(BytesIO(image_bytes), details=False)
@@ -125,94 +181,109 @@ class ForensicAnalyzer:
                 software = exif_data['Image Software'].lower()
                 has_editing_software = any(s in software for s in suspicious_software)
             
-            return {
-                "has_exif": has_exif,
-                "exif_fields_count": len(tags),
-                "exif_data": exif_data,
-                "has_editing_software": has_editing_software,
-                "exif_suspicious": not has_exif or has_editing_software,
-            }
+            results.has_exif = has_exif
+            results.exif_fields_count = len(tags)
+            results.exif_data = exif_data
+            results.has_editing_software = has_editing_software
+            results.exif_suspicious = not has_exif or has_editing_software
         except Exception as e:
             logger.warning(f"EXIF analysis failed: {e}")
-            return {
-                "has_exif": False,
-                "exif_fields_count": 0,
-                "exif_data": {},
-                "exif_error": str(e)
-            }
+            results.has_exif = False
+            results.exif_fields_count = 0
+            results.exif_data = {}
+            results.exif_error = str(e)
     
-    def _analyze_noise(self, img_array: np.ndarray) -> Dict[str, Any]:
-        """Analyze noise patterns"""
+    def _to_gray(self, img_array: np.ndarray) -> np.ndarray:
+        """Convert to grayscale if needed"""
+        if len(img_array.shape) == 3:
+            return cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
+        return img_array
+    
+    def _analyze_noise(
+        self,
+        stats: ImageStatistics,
+        results: ForensicResult,
+        native_tiles: Optional[List[np.ndarray]] = None,
+    ):
+        """Analyze noise patterns over the whole image or a set of native tiles"""
         try:
-            # Convert to grayscale if needed
-            if len(img_array.shape) == 3:
-                gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
+            if native_tiles:
+                grays = [self._to_gray(a) for a in native_tiles]
+                
+                # Calculate noise level using Laplacian variance (pooled over
+                # tiles from per-tile moments, without concatenating them)
+                _, laplacian_std = pooled_mean_std(
+                    (g.size, *laplacian_mean_std(g)) for g in grays
+                )
+                laplacian_var = laplacian_std ** 2
+                
+                # Calculate standard deviation
+                _, std_dev = pooled_mean_std((g.size, *mean_std(g)) for g in grays)
             else:
-                gray = img_array
-            
-            # Calculate noise level using Laplacian variance
-            laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
-            
-            # Calculate standard deviation
-            std_dev = np.std(gray)
+                laplacian_var = stats.laplacian_variance
+                _, std_dev = stats.gray_mean_std
             
             # AI-generated images often have very uniform noise
             uniform_noise = std_dev < 25 and laplacian_var < 100
             
-            return {
-                "noise_level": float(std_dev),
-                "laplacian_variance": float(laplacian_var),
-                "uniform_noise_pattern": uniform_noise,
-            }
+            results.noise_level = float(std_dev)
+            results.laplacian_variance = float(laplacian_var)
+            results.uniform_noise_pattern = bool(uniform_noise)
         except Exception as e:
             logger.warning(f"Noise analysis failed: {e}")
-            return {"noise_analysis_error": str(e)}
+            results.noise_analysis_error = str(e)
     
-    def _analyze_compression(self, img_array: np.ndarray) -> Dict[str, Any]:
+    def _block_variances(self, gray: np.ndarray, block_size: int = 8) -> np.ndarray:
+        """Variance of every full block_size x block_size block (last row/column of blocks excluded)"""
+        h, w = gray.shape
+        rows = (h - block_size - 1) // block_size + 1 if h > block_size else 0
+        cols = (w - block_size - 1) // block_size + 1 if w > block_size else 0
+        if rows == 0 or cols == 0:
+            return np.empty(0)
+        
+        blocks = gray[:rows * block_size, :cols * block_size].reshape(
+            rows, block_size, cols, block_size
+        )
+        return blocks.var(axis=(1, 3)).ravel()
+    
+    def _analyze_compression(
+        self,
+        stats: ImageStatistics,
+        results: ForensicResult,
+        native_tiles: Optional[List[np.ndarray]] = None,
+    ):
         """Detect compression artifacts and inconsistencies"""
         try:
-            # Convert to grayscale
-            if len(img_array.shape) == 3:
-                gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-            else:
-                gray = img_array
+            grays = [self._to_gray(a) for a in native_tiles] if native_tiles else [stats.gray]
             
             # Detect blocking artifacts (typical in JPEG)
             # Calculate variance in 8x8 blocks
-            h, w = gray.shape
-            block_size = 8
-            variances = []
+            variances = np.concatenate([self._block_variances(g) for g in grays])
             
-            for i in range(0, h - block_size, block_size):
-                for j in range(0, w - block_size, block_size):
-                    block = gray[i:i+block_size, j:j+block_size]
-                    variances.append(np.var(block))
-            
-            variance_std = np.std(variances) if variances else 0
+            variance_std = np.std(variances) if variances.size else 0
             
             # Low variance in block differences suggests uniform compression
             # High variance suggests multiple compressions or manipulation
             inconsistent_compression = variance_std > 1000
             
-            return {
-                "block_variance_std": float(variance_std),
-                "inconsistent_compression": inconsistent_compression,
-                "compression_artifacts_detected": variance_std > 500,
-            }
+            results.block_variance_std = float(variance_std)
+            results.inconsistent_compression = bool(inconsistent_compression)
+            results.compression_artifacts_detected = bool(variance_std > 500)
         except Exception as e:
             logger.warning(f"Compression analysis failed: {e}")
-            return {"compression_analysis_error": str(e)}
+            results.compression_analysis_error = str(e)
     
-    def _analyze_color_consistency(self, img_array: np.ndarray) -> Dict[str, Any]:
+    def _analyze_color_consistency(
+        self, img_array: np.ndarray, stats: ImageStatistics, results: ForensicResult
+    ):
         """Analyze color distribution and consistency"""
         try:
             if len(img_array.shape) != 3:
-                return {"color_analysis": "skipped_grayscale"}
+                results.color_analysis = "skipped_grayscale"
+                return
             
             # Calculate color channel statistics
-            r_std = np.std(img_array[:, :, 0])
-            g_std = np.std(img_array[:, :, 1])
-            b_std = np.std(img_array[:, :, 2])
+            r_std, g_std, b_std = stats.channel_mean_std[1][:3]
             
             # Calculate color variance across image regions
             h, w = img_array.shape[:2]
@@ -232,52 +303,150 @@ class ForensicAnalyzer:
             # Very consistent colors across regions might indicate AI generation
             color_too_consistent = region_consistency < 10
             
-            return {
-                "color_channel_std": {
-                    "red": float(r_std),
-                    "green": float(g_std),
-                    "blue": float(b_std),
-                },
-                "region_color_consistency": float(region_consistency),
-                "color_inconsistencies": region_consistency > 50,
-                "unnaturally_consistent": color_too_consistent,
+            results.color_channel_std = {
+                "red": float(r_std),
+                "green": float(g_std),
+                "blue": float(b_std),
             }
+            results.region_color_consistency = float(region_consistency)
+            results.color_inconsistencies = bool(region_consistency > 50)
+            results.unnaturally_consistent = bool(color_too_consistent)
         except Exception as e:
             logger.warning(f"Color analysis failed: {e}")
-            return {"color_analysis_error": str(e)}
+            results.color_analysis_error = str(e)
     
-    def _analyze_edges(self, img_array: np.ndarray) -> Dict[str, Any]:
+    def _analyze_edges(self, stats: ImageStatistics, results: ForensicResult):
         """Detect edge artifacts that might indicate splicing"""
         try:
-            # Convert to grayscale
-            if len(img_array.shape) == 3:
-                gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-            else:
-                gray = img_array
-            
             # Edge detection using Canny
-            edges = cv2.Canny(gray, 100, 200)
-            edge_density = np.sum(edges > 0) / edges.size
+            edges = cv2.Canny(stats.gray, 100, 200)
+            edge_density = cv2.countNonZero(edges) / edges.size
             
-            # Calculate edge sharpness
-            sobelx = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
-            sobely = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
-            edge_magnitude = np.sqrt(sobelx**2 + sobely**2)
-            avg_edge_strength = np.mean(edge_magnitude[edge_magnitude > 0]) if np.any(edge_magnitude > 0) else 0
+            # Calculate edge sharpness: mean gradient magnitude over pixels
+            # with a gradient
+            edge_magnitude = stats.gradient_magnitude
+            nonzero = cv2.countNonZero(edge_magnitude)
+            avg_edge_strength = cv2.sumElems(edge_magnitude)[0] / nonzero if nonzero else 0
             
             # Suspicious if edges are too sharp or too smooth
             suspicious_edges = avg_edge_strength > 100 or avg_edge_strength < 10
             
-            return {
-                "edge_density": float(edge_density),
-                "average_edge_strength": float(avg_edge_strength),
-                "edge_artifacts": suspicious_edges,
-            }
+            results.edge_density = float(edge_density)
+            results.average_edge_strength = float(avg_edge_strength)
+            results.edge_artifacts = bool(suspicious_edges)
         except Exception as e:
             logger.warning(f"Edge analysis failed: {e}")
-            return {"edge_analysis_error": str(e)}
+            results.edge_analysis_error = str(e)
+    
+    def _analyze_recompression(
+        self,
+        stats: ImageStatistics,
+        results: ForensicResult,
+        native_tiles: Optional[List[np.ndarray]] = None,
+    ):
+        """Error Level Analysis and JPEG ghosts (see recompression.py)"""
+        try:
+            if native_tiles:
+                # One strip of 8-aligned tiles: one encode per quality, grids intact
+                self.recompression_analyzer.analyze(np.vstack(native_tiles), results)
+            else:
+                self.recompression_analyzer.analyze(stats.array, results, gray=stats.gray)
+        except Exception as e:
+            logger.warning(f"Recompression analysis failed: {e}")
+            results.recompression_analysis_error = str(e)
+    
+    def _compute_heatmaps(self, stats: ImageStatistics, results: ForensicResult):
+        """Per-tile noise, block variance, edge strength and color maps"""
+        try:
+            start = time.perf_counter()
+            tile = self.heatmap_tile
+            h, w = stats.gray.shape
+            rows, cols = h // tile, w // tile
+            if rows == 0 or cols == 0:
+                logger.debug(f"Image smaller than one {tile}px heatmap tile, skipping heatmaps")
+                return
+            
+            maps = self._tile_maps(stats, tile, rows * tile, cols * tile)
+            encoded = {}
+            for name, values in maps.items():
+                # Scale to uint8 (rounded, saturating at 255)
+                levels = cv2.convertScaleAbs(values, alpha=255.0 / self.HEATMAP_SCALES[name])
+                encoded[name] = self._encode_heatmap(levels)
+            
+            results.heatmaps = ForensicHeatmaps(
+                tile=tile,
+                rows=rows,
+                cols=cols,
+                format=self.heatmap_format,
+                maps=encoded,
+                scales=dict(self.HEATMAP_SCALES),
+                compute_ms=round((time.perf_counter() - start) * 1000, 3),
+            )
+        except Exception as e:
+            logger.warning(f"Heatmap computation failed: {e}")
+            results.heatmaps_error = str(e)
+    
+    def _tile_maps(
+        self, stats: ImageStatistics, tile: int, height: int, width: int
+    ) -> Dict[str, np.ndarray]:
+        """
+        Raw per-tile values (float32, rows x cols) over the top-left
+        height x width crop, each the tile-local version of a global check
+        
+        Every map is built from block means or sums over strided views,
+        variances as E[x^2] - E[x]^2, so each input image is read a couple
+        of times in total instead of once per tile in a Python loop.
+        """
+        def tile_variance(values: np.ndarray, block: int) -> np.ndarray:
+            mean = block_means(values, block)
+            variance = block_means(np.square(values), block) - mean * mean
+            return np.maximum(variance, 0, out=variance)
+        
+        gray = stats.gray[:height, :width].astype(np.float32)
+        
+        # Noise: Laplacian variance (as _analyze_noise)
+        laplacian = stats.laplacian[:height, :width].astype(np.float32)
+        noise = tile_variance(laplacian, tile)
+        
+        # Compression: std of the 8x8 block variances (as _analyze_compression)
+        block_variance = np.sqrt(tile_variance(tile_variance(gray, 8), tile // 8))
+        
+        # Edges: mean gradient magnitude over pixels with a gradient (as _analyze_edges)
+        magnitude = stats.gradient_magnitude[:height, :width]
+        edge_sum = block_means(magnitude, tile)
+        edge_fraction = block_means((magnitude > 0).astype(np.float32), tile)
+        edge_strength = np.divide(
+            edge_sum, edge_fraction, out=np.zeros_like(edge_sum), where=edge_fraction > 0
+        )
+        
+        # Color: std over all values of the tile (as the region stds of
+        # _analyze_color_consistency). A tile's RGB values form a
+        # tile x (3 * tile) block of the row-major pixels, summed exactly in
+        # integers on a strided view (uint8 squares fit uint16)
+        pixels = stats.array[:height, :width, :3] if stats.is_color else stats.gray[:height, :width]
+        cells = pixels.reshape(height // tile, tile, width // tile, -1)
+        count = cells.shape[1] * cells.shape[3]
+        mean = cells.sum(axis=(1, 3), dtype=np.uint32) / count
+        second_moment = np.square(cells, dtype=np.uint16).sum(axis=(1, 3), dtype=np.uint64) / count
+        color = np.sqrt(np.maximum(second_moment - mean * mean, 0))
+        
+        return {
+            "noise": noise,
+            "block_variance": block_variance,
+            "edge_strength": edge_strength,
+            "color": color.astype(np.float32),
+        }
     
-    def _calculate_manipulation_score(self, results: Dict[str, Any]) -> float:
+    def _encode_heatmap(self, levels: np.ndarray):
+        """uint8 map as a base64 PNG, or the array itself (serialized as nested lists)"""
+        if self.heatmap_format == "png":
+            ok, png = cv2.imencode(".png", levels)
+            if not ok:
+                raise ValueError("PNG encoding failed")
+            return base64.b64encode(png).decode("ascii")
+        return levels
+    
+    def _calculate_manipulation_score(self, results: ForensicResult) -> float:
         """
         Calculate overall manipulation likelihood score (0-1)
         Higher score = more likely manipulated
@@ -310,6 +479,16 @@ class ForensicAnalyzer:
             score += 0.20
             factors += 1
         
+        # Recompression: a region with its own JPEG history (only set when
+        # the recompression stage ran)
+        if results.get("jpeg_ghost_detected", False):
+            score += 0.25
+            factors += 1
+        
+        if results.get("ela_inconsistent", False):
+            score += 0.15
+            factors += 1
+        
         # Normalize score
         if factors > 0:
             score = min(score, 1.0)
@@ -11,9 +11,11 @@ References:
 import numpy as np
 import cv2
 import logging
-from typing import Dict, Any, Tuple
+from typing import Tuple
 from PIL import Image
 
+from results import FrequencyResult
+
 logger = logging.getLogger(__name__)
 
 
@@ -25,7 +27,7 @@ class FrequencyAnalyzer:
         self.DCT_HIGH_FREQ_THRESHOLD = 15.0  # For uniformity detection
         self.FFT_PERIODICITY_THRESHOLD = 0.3  # For GAN artifact detection
         
-    def analyze(self, image: Image.Image) -> Dict[str, Any]:
+    def analyze(self, image: Image.Image) -> FrequencyResult:
         """
         Perform comprehensive frequency analysis
         
@@ -33,30 +35,30 @@ class FrequencyAnalyzer:
             image: PIL Image object
             
         Returns:
-            Dictionary with frequency analysis results
+            FrequencyResult with DCT, FFT and combined scores
         """
-        results = {}
+        results = FrequencyResult()
         
         try:
             img_array = np.array(image)
             
             # DCT Analysis (JPEG-like, detects smoothness artifacts)
-            results.update(self._analyze_dct(img_array))
+            self._analyze_dct(img_array, results)
             
             # FFT Analysis (detects periodic GAN artifacts)
-            results.update(self._analyze_fft(img_array))
+            self._analyze_fft(img_array, results)
             
             # Combined frequency score
-            results["frequency_ai_score"] = self._calculate_frequency_score(results)
+            results.frequency_ai_score = self._calculate_frequency_score(results)
             
         except Exception as e:
             logger.error(f"Frequency analysis error: {e}")
-            results["frequency_analysis_error"] = str(e)
-            results["frequency_ai_score"] = 0.5  # Neutral fallback
+            results.frequency_analysis_error = str(e)
+            results.frequency_ai_score = 0.5  # Neutral fallback
         
         return results
     
-    def _analyze_dct(self, img_array: np.ndarray) -> Dict[str, Any]:
+    def _analyze_dct(self, img_array: np.ndarray, results: FrequencyResult):
         """
         Analyze DCT (Discrete Cosine Transform) coefficients
         
@@ -129,23 +131,19 @@ class FrequencyAnalyzer:
             
             dct_ai_score = min(dct_ai_score, 1.0)
             
-            return {
-                "dct_avg_high_freq_energy": float(avg_high_freq),
-                "dct_high_freq_uniformity": float(std_high_freq),
-                "dct_high_to_low_ratio": float(high_to_low_ratio),
-                "dct_mid_to_low_ratio": float(mid_to_low_ratio),
-                "dct_ai_smoothness": ai_smoothness_indicator,
-                "dct_ai_score": float(dct_ai_score),
-            }
+            results.dct_avg_high_freq_energy = float(avg_high_freq)
+            results.dct_high_freq_uniformity = float(std_high_freq)
+            results.dct_high_to_low_ratio = float(high_to_low_ratio)
+            results.dct_mid_to_low_ratio = float(mid_to_low_ratio)
+            results.dct_ai_smoothness = bool(ai_smoothness_indicator)
+            results.dct_ai_score = float(dct_ai_score)
             
         except Exception as e:
             logger.warning(f"DCT analysis failed: {e}")
-            return {
-                "dct_analysis_error": str(e),
-                "dct_ai_score": 0.5
-            }
+            results.dct_analysis_error = str(e)
+            results.dct_ai_score = 0.5
     
-    def _analyze_fft(self, img_array: np.ndarray) -> Dict[str, Any]:
+    def _analyze_fft(self, img_array: np.ndarray, results: FrequencyResult):
         """
         Analyze FFT (Fast Fourier Transform) spectrum
         
@@ -208,21 +206,17 @@ class FrequencyAnalyzer:
             
             fft_ai_score = min(fft_ai_score, 1.0)
             
-            return {
-                "fft_periodic_peaks": len(peaks),
-                "fft_checkerboard_score": float(checkerboard_score),
-                "fft_spectrum_uniformity": float(spectrum_std),
-                "fft_spectrum_mean": float(spectrum_mean),
-                "fft_ai_score": float(fft_ai_score),
-                "fft_gan_artifacts_detected": len(peaks) > 2 or checkerboard_score > 0.5,
-            }
+            results.fft_periodic_peaks = len(peaks)
+            results.fft_checkerboard_score = float(checkerboard_score)
+            results.fft_spectrum_uniformity = float(spectrum_std)
+            results.fft_spectrum_mean = float(spectrum_mean)
+            results.fft_ai_score = float(fft_ai_score)
+            results.fft_gan_artifacts_detected = len(peaks) > 2 or checkerboard_score > 0.5
             
         except Exception as e:
             logger.warning(f"FFT analysis failed: {e}")
-            return {
-                "fft_analysis_error": str(e),
-                "fft_ai_score": 0.5
-            }
+            results.fft_analysis_error = str(e)
+            results.fft_ai_score = 0.5
     
     def _detect_periodic_peaks(self, radial_profile: list) -> list:
         """
@@ -301,7 +295,7 @@ class FrequencyAnalyzer:
             logger.warning(f"Checkerboard detection failed: {e}")
             return 0.0
     
-    def _calculate_frequency_score(self, results: Dict[str, Any]) -> float:
+    def _calculate_frequency_score(self, results: FrequencyResult) -> float:
         """
         Calculate combined frequency-based AI detection score
         
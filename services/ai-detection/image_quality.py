@@ -5,67 +5,111 @@ This module provides:
 1. Comprehensive image quality assessment
 2. Adaptive image enhancement based on quality
 3. Preprocessing for optimal model performance
+4. Tiered denoising that picks the strongest denoiser fitting a time budget
 """
 import numpy as np
 import cv2
 import logging
-from typing import Dict, Any, Tuple
+import threading
+import time
+from typing import Optional, Tuple
 from PIL import Image, ImageEnhance
 
+import config
+from image_stats import ImageStatistics
+from results import (
+    BrightnessScore,
+    ColorScore,
+    ContrastScore,
+    NoiseScore,
+    QualityReport,
+    ResolutionScore,
+    SharpnessScore,
+)
+
 logger = logging.getLogger(__name__)
 
 
 class ImageQualityAssessor:
     """Assesses and enhances image quality for optimal detection"""
     
+    # Denoising tiers, strongest (and slowest) first
+    DENOISE_TIERS = ("nlm", "nlm_downscaled", "bilateral", "none")
+    DOWNSCALED_DETAIL_GAIN = 0.25  # Share of the high-frequency residual kept by nlm_downscaled
+    
     def __init__(self):
         self.min_quality_threshold = 0.3
         self.target_quality = 0.7
         
-    def assess_and_enhance(self, image: Image.Image) -> Tuple[Image.Image, Dict[str, Any]]:
+        # Live cost estimates (ms per megapixel), refined from the tiers that
+        # run (and calibrate_denoise_tiers); shared by the inference lanes, so
+        # guarded by a lock
+        self.tier_cost_ms_per_mp = dict(config.ENHANCEMENT_TIER_COST_MS_PER_MP)
+        self._tier_cost_lock = threading.Lock()
+        
+    def assess_and_enhance(
+        self,
+        image: Image.Image,
+        assess_image: Optional[Image.Image] = None,
+        enhance: bool = True,
+        budget_ms: Optional[float] = None,
+        stats: Optional[ImageStatistics] = None,
+    ) -> Tuple[Image.Image, QualityReport]:
         """
         Assess image quality and apply adaptive enhancement
         
         Args:
-            image: PIL Image
+            image: PIL Image to enhance
+            assess_image: Optional image to assess instead of `image`
+                          (e.g. the quality variant sized by the resolution policy)
+            enhance: If False, only assess quality and return `image` unchanged
+            budget_ms: Denoising time budget (defaults to ENHANCEMENT_BUDGET_MS)
+            stats: Optional shared statistics of the assessed image
             
         Returns:
             Tuple of (enhanced_image, quality_report)
         """
         try:
             # 1. Assess current quality
-            quality_report = self.assess_quality(image)
-            quality_score = quality_report["overall_quality"]
+            quality_report = self.assess_quality(assess_image or image, stats)
+            quality_score = quality_report.overall_quality
+            
+            logger.debug("Image quality: %.2f", quality_score)
             
-            logger.info(f"Image quality: {quality_score:.2f}")
+            if not enhance:
+                quality_report.enhancement_applied = "disabled"
+                return image, quality_report
+            
+            if budget_ms is None:
+                budget_ms = config.ENHANCEMENT_BUDGET_MS
             
             # 2. Determine enhancement strategy
             if quality_score < 0.3:
                 # Very low quality - aggressive enhancement
-                enhanced = self._aggressive_enhancement(image, quality_report)
+                enhanced = self._aggressive_enhancement(image, quality_report, budget_ms)
                 enhancement_level = "aggressive"
             elif quality_score < 0.6:
                 # Medium quality - moderate enhancement
-                enhanced = self._moderate_enhancement(image, quality_report)
+                enhanced = self._moderate_enhancement(image, quality_report, budget_ms)
                 enhancement_level = "moderate"
             else:
                 # High quality - minimal processing
                 enhanced = self._minimal_enhancement(image)
                 enhancement_level = "minimal"
             
-            quality_report["enhancement_applied"] = enhancement_level
+            quality_report.enhancement_applied = enhancement_level
             
             return enhanced, quality_report
             
         except Exception as e:
             logger.error(f"Quality assessment failed: {e}")
-            return image, {
-                "error": str(e),
-                "overall_quality": 0.5,
-                "enhancement_applied": "none"
-            }
+            return image, QualityReport(
+                overall_quality=0.5, enhancement_applied="none", error=str(e)
+            )
     
-    def assess_quality(self, image: Image.Image) -> Dict[str, Any]:
+    def assess_quality(
+        self, image: Image.Image, stats: Optional[ImageStatistics] = None
+    ) -> QualityReport:
         """
         Comprehensive image quality assessment
         
@@ -76,67 +120,64 @@ class ImageQualityAssessor:
         - Resolution adequacy
         - Brightness
         - Color distribution
+        
+        Args:
+            image: PIL Image
+            stats: Optional shared statistics for `image`; statistics already
+                   computed by another analyzer are reused, not recomputed
         """
         try:
-            img_array = np.array(image)
-            
-            # Convert to grayscale for analysis
-            if len(img_array.shape) == 3:
-                gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-            else:
-                gray = img_array
+            if stats is None:
+                stats = ImageStatistics(image)
             
             # 1. Sharpness (Laplacian variance)
-            sharpness = self._assess_sharpness(gray)
+            sharpness = self._assess_sharpness(stats)
             
             # 2. Contrast
-            contrast = self._assess_contrast(gray)
+            contrast = self._assess_contrast(stats)
             
             # 3. Noise level
-            noise_level = self._assess_noise(gray)
+            noise_level = self._assess_noise(stats)
             
             # 4. Resolution adequacy
             resolution_score = self._assess_resolution(image)
             
             # 5. Brightness
-            brightness_score = self._assess_brightness(gray)
+            brightness_score = self._assess_brightness(stats)
             
             # 6. Color distribution (if color image)
-            if len(img_array.shape) == 3:
-                color_score = self._assess_color_distribution(img_array)
+            if stats.is_color:
+                color_score = self._assess_color_distribution(stats)
             else:
-                color_score = 0.5  # Neutral for grayscale
+                color_score = ColorScore(score=0.5)  # Neutral for grayscale
             
             # Calculate overall quality (weighted average)
             overall = (
-                sharpness["score"] * 0.30 +
-                contrast["score"] * 0.25 +
-                noise_level["score"] * 0.15 +
-                resolution_score["score"] * 0.15 +
-                brightness_score["score"] * 0.10 +
-                color_score["score"] * 0.05
+                sharpness.score * 0.30 +
+                contrast.score * 0.25 +
+                noise_level.score * 0.15 +
+                resolution_score.score * 0.15 +
+                brightness_score.score * 0.10 +
+                color_score.score * 0.05
             )
             
-            return {
-                "overall_quality": round(overall, 3),
-                "sharpness": sharpness,
-                "contrast": contrast,
-                "noise": noise_level,
-                "resolution": resolution_score,
-                "brightness": brightness_score,
-                "color": color_score,
-            }
+            return QualityReport(
+                overall_quality=round(overall, 3),
+                sharpness=sharpness,
+                contrast=contrast,
+                noise=noise_level,
+                resolution=resolution_score,
+                brightness=brightness_score,
+                color=color_score,
+            )
             
         except Exception as e:
             logger.error(f"Quality assessment error: {e}")
-            return {
-                "error": str(e),
-                "overall_quality": 0.5
-            }
+            return QualityReport(overall_quality=0.5, error=str(e))
     
-    def _assess_sharpness(self, gray: np.ndarray) -> Dict[str, Any]:
+    def _assess_sharpness(self, stats: ImageStatistics) -> SharpnessScore:
         """Assess image sharpness using Laplacian variance"""
-        laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
+        laplacian_var = stats.laplacian_variance
         
         # Score: 0 (very blurry) to 1 (very sharp)
         # Typical range: 0-1000, normalize to 0-1
@@ -144,20 +185,20 @@ class ImageQualityAssessor:
         
         quality = "sharp" if score > 0.7 else "moderate" if score > 0.4 else "blurry"
         
-        return {
-            "laplacian_variance": float(laplacian_var),
-            "score": float(score),
-            "quality": quality,
-            "needs_sharpening": score < 0.5
-        }
+        return SharpnessScore(
+            laplacian_variance=float(laplacian_var),
+            score=float(score),
+            quality=quality,
+            needs_sharpening=score < 0.5,
+        )
     
-    def _assess_contrast(self, gray: np.ndarray) -> Dict[str, Any]:
+    def _assess_contrast(self, stats: ImageStatistics) -> ContrastScore:
         """Assess image contrast"""
         # Standard deviation as contrast measure
-        std = np.std(gray)
+        _, std = stats.gray_mean_std
         
         # Also check dynamic range
-        min_val, max_val = np.min(gray), np.max(gray)
+        min_val, max_val = stats.gray_min_max
         dynamic_range = max_val - min_val
         
         # Score based on std (optimal around 50-80)
@@ -172,21 +213,19 @@ class ImageQualityAssessor:
         
         quality = "good" if score > 0.7 else "moderate" if score > 0.4 else "poor"
         
-        return {
-            "std_dev": float(std),
-            "dynamic_range": int(dynamic_range),
-            "score": float(score),
-            "quality": quality,
-            "needs_enhancement": score < 0.5
-        }
+        return ContrastScore(
+            std_dev=float(std),
+            dynamic_range=int(dynamic_range),
+            score=float(score),
+            quality=quality,
+            needs_enhancement=bool(score < 0.5),
+        )
     
-    def _assess_noise(self, gray: np.ndarray) -> Dict[str, Any]:
+    def _assess_noise(self, stats: ImageStatistics) -> NoiseScore:
         """Assess noise level"""
         # Estimate noise using high-pass filter
         # Subtract smoothed from original to get noise
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-        noise = gray.astype(float) - blurred.astype(float)
-        noise_std = np.std(noise)
+        noise_std = stats.noise_std
         
         # Score: lower noise = higher score
         # Typical noise std: 0-50
@@ -194,14 +233,14 @@ class ImageQualityAssessor:
         
         quality = "clean" if score > 0.7 else "moderate" if score > 0.4 else "noisy"
         
-        return {
-            "noise_std": float(noise_std),
-            "score": float(score),
-            "quality": quality,
-            "needs_denoising": score < 0.5
-        }
+        return NoiseScore(
+            noise_std=float(noise_std),
+            score=float(score),
+            quality=quality,
+            needs_denoising=score < 0.5,
+        )
     
-    def _assess_resolution(self, image: Image.Image) -> Dict[str, Any]:
+    def _assess_resolution(self, image: Image.Image) -> ResolutionScore:
         """Assess if resolution is adequate"""
         width, height = image.size
         pixel_count = width * height
@@ -222,17 +261,17 @@ class ImageQualityAssessor:
             score = 0.3
             quality = "very_low"
         
-        return {
-            "width": width,
-            "height": height,
-            "pixel_count": pixel_count,
-            "score": float(score),
-            "quality": quality
-        }
+        return ResolutionScore(
+            width=width,
+            height=height,
+            pixel_count=pixel_count,
+            score=float(score),
+            quality=quality,
+        )
     
-    def _assess_brightness(self, gray: np.ndarray) -> Dict[str, Any]:
+    def _assess_brightness(self, stats: ImageStatistics) -> BrightnessScore:
         """Assess brightness level"""
-        mean_brightness = np.mean(gray)
+        mean_brightness, _ = stats.gray_mean_std
         
         # Optimal: 100-150 (on 0-255 scale)
         if 100 <= mean_brightness <= 150:
@@ -246,19 +285,18 @@ class ImageQualityAssessor:
         
         quality = "good" if score > 0.7 else "moderate" if score > 0.5 else "poor"
         
-        return {
-            "mean": float(mean_brightness),
-            "score": float(score),
-            "quality": quality,
-            "too_dark": mean_brightness < 80,
-            "too_bright": mean_brightness > 170
-        }
+        return BrightnessScore(
+            mean=float(mean_brightness),
+            score=float(score),
+            quality=quality,
+            too_dark=mean_brightness < 80,
+            too_bright=mean_brightness > 170,
+        )
     
-    def _assess_color_distribution(self, img_array: np.ndarray) -> Dict[str, Any]:
+    def _assess_color_distribution(self, stats: ImageStatistics) -> ColorScore:
         """Assess color distribution"""
-        r_std = np.std(img_array[:, :, 0])
-        g_std = np.std(img_array[:, :, 1])
-        b_std = np.std(img_array[:, :, 2])
+        _, channel_stds = stats.channel_mean_std
+        r_std, g_std, b_std = channel_stds[:3]
         
         # Check balance between channels
         channel_balance = max(r_std, g_std, b_std) - min(r_std, g_std, b_std)
@@ -271,74 +309,177 @@ class ImageQualityAssessor:
         else:
             score = 0.5
         
-        return {
-            "channel_std": {
+        return ColorScore(
+            score=float(score),
+            channel_std={
                 "r": float(r_std),
                 "g": float(g_std),
                 "b": float(b_std)
             },
-            "channel_balance": float(channel_balance),
-            "score": float(score)
-        }
+            channel_balance=float(channel_balance),
+        )
     
-    def _aggressive_enhancement(self, image: Image.Image, quality_report: Dict) -> Image.Image:
+    def select_denoise_tier(self, size: Tuple[int, int], budget_ms: float) -> str:
+        """Strongest denoising tier whose estimated cost fits the budget"""
+        megapixels = size[0] * size[1] / 1e6
+        with self._tier_cost_lock:
+            for tier in self.DENOISE_TIERS:
+                if self.tier_cost_ms_per_mp[tier] * megapixels <= budget_ms:
+                    return tier
+        return "none"
+    
+    def denoise(
+        self, img_array: np.ndarray, strength: float, budget_ms: float
+    ) -> Tuple[np.ndarray, str, float]:
+        """
+        Denoise with the strongest tier that fits the budget
+        
+        Args:
+            img_array: RGB or grayscale uint8 array
+            strength: Filter strength (NLM `h`, 10 = aggressive, 5 = moderate)
+            budget_ms: Time budget in milliseconds
+            
+        Returns:
+            Tuple of (denoised array, tier used, elapsed ms)
+        """
+        h, w = img_array.shape[:2]
+        tier = self.select_denoise_tier((w, h), budget_ms)
+        
+        start = time.perf_counter()
+        denoised = self._denoise_with_tier(img_array, tier, strength)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        
+        # Refine the cost estimate for this tier (exponential moving average)
+        if tier != "none":
+            observed = elapsed_ms / max(w * h / 1e6, 1e-6)
+            with self._tier_cost_lock:
+                self.tier_cost_ms_per_mp[tier] = (
+                    0.8 * self.tier_cost_ms_per_mp[tier] + 0.2 * observed
+                )
+        
+        return denoised, tier, elapsed_ms
+    
+    def calibrate_denoise_tiers(self, size: Tuple[int, int] = (512, 512)):
+        """
+        Replace the tier cost estimates with timings on this host
+        
+        Requests only ever measure the tier they run, so a tier whose seed
+        estimate is too high for the host would never be picked. Run once
+        outside any request (model preload): each tier is timed on a noisy
+        synthetic image after a small warm-up run.
+        """
+        rng = np.random.default_rng(0)
+        width, height = size
+        gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+        noisy = np.clip(
+            np.broadcast_to(gradient, (height, width, 3)) + rng.normal(0, 12, (height, width, 3)),
+            0, 255,
+        ).astype(np.uint8)
+        measured = {}
+        for tier in self.DENOISE_TIERS:
+            if tier == "none":
+                continue
+            self._denoise_with_tier(noisy[:64, :64], tier, 10)  # Warm-up (lazy init)
+            start = time.perf_counter()
+            self._denoise_with_tier(noisy, tier, 10)
+            measured[tier] = (time.perf_counter() - start) * 1000 / (width * height / 1e6)
+        with self._tier_cost_lock:
+            self.tier_cost_ms_per_mp.update(measured)
+        logger.info(
+            "Denoise tier costs (ms/MP): %s",
+            {tier: round(ms) for tier, ms in measured.items()},
+        )
+    
+    def _denoise_with_tier(self, img_array: np.ndarray, tier: str, strength: float) -> np.ndarray:
+        """Run a specific denoising tier"""
+        is_color = len(img_array.shape) == 3
+        
+        if tier == "nlm":
+            if is_color:
+                return cv2.fastNlMeansDenoisingColored(img_array, None, strength, strength, 7, 21)
+            return cv2.fastNlMeansDenoising(img_array, None, strength, 7, 21)
+        
+        if tier == "nlm_downscaled":
+            # Denoise at half resolution (4x fewer pixels), upsample the result
+            # and add back the high-frequency residual at reduced gain so fine
+            # detail survives without reintroducing most of the noise
+            h, w = img_array.shape[:2]
+            small = cv2.resize(img_array, (max(w // 2, 1), max(h // 2, 1)), interpolation=cv2.INTER_AREA)
+            if is_color:
+                small_denoised = cv2.fastNlMeansDenoisingColored(small, None, strength, strength, 7, 21)
+            else:
+                small_denoised = cv2.fastNlMeansDenoising(small, None, strength, 7, 21)
+            base = cv2.resize(small_denoised, (w, h), interpolation=cv2.INTER_LINEAR).astype(np.float32)
+            residual = img_array.astype(np.float32)
+            residual -= cv2.resize(small, (w, h), interpolation=cv2.INTER_LINEAR)
+            base += self.DOWNSCALED_DETAIL_GAIN * residual
+            return np.clip(base, 0, 255).astype(np.uint8)
+        
+        if tier == "bilateral":
+            # Edge-preserving smoothing; sigma scaled with the NLM strength
+            return cv2.bilateralFilter(img_array, 5 if strength < 8 else 9, strength * 7.5, strength * 7.5)
+        
+        return img_array
+    
+    def _aggressive_enhancement(
+        self, image: Image.Image, quality_report: QualityReport, budget_ms: float
+    ) -> Image.Image:
         """Apply aggressive enhancement for very low quality images"""
-        logger.info("Applying aggressive enhancement")
+        logger.debug("Applying aggressive enhancement")
         
         # Convert to numpy for OpenCV processing
         img_array = np.array(image)
         
-        # 1. Denoise aggressively
-        if len(img_array.shape) == 3:
-            denoised = cv2.fastNlMeansDenoisingColored(img_array, None, 10, 10, 7, 21)
-        else:
-            denoised = cv2.fastNlMeansDenoising(img_array, None, 10, 7, 21)
+        # 1. Denoise aggressively (strongest tier that fits the budget)
+        denoised, tier, elapsed_ms = self.denoise(img_array, 10, budget_ms)
+        quality_report.denoise_tier = tier
+        quality_report.denoise_ms = round(elapsed_ms, 1)
         
         # Convert back to PIL
         enhanced = Image.fromarray(denoised)
         
         # 2. Enhance contrast
-        contrast_factor = 1.5 if quality_report["contrast"]["needs_enhancement"] else 1.2
+        contrast_factor = 1.5 if quality_report.contrast.needs_enhancement else 1.2
         enhancer = ImageEnhance.Contrast(enhanced)
         enhanced = enhancer.enhance(contrast_factor)
         
         # 3. Sharpen
-        if quality_report["sharpness"]["needs_sharpening"]:
+        if quality_report.sharpness.needs_sharpening:
             enhancer = ImageEnhance.Sharpness(enhanced)
             enhanced = enhancer.enhance(1.8)
         
         # 4. Adjust brightness if needed
-        if quality_report["brightness"]["too_dark"]:
+        if quality_report.brightness.too_dark:
             enhancer = ImageEnhance.Brightness(enhanced)
             enhanced = enhancer.enhance(1.3)
-        elif quality_report["brightness"]["too_bright"]:
+        elif quality_report.brightness.too_bright:
             enhancer = ImageEnhance.Brightness(enhanced)
             enhanced = enhancer.enhance(0.8)
         
         return enhanced
     
-    def _moderate_enhancement(self, image: Image.Image, quality_report: Dict) -> Image.Image:
+    def _moderate_enhancement(
+        self, image: Image.Image, quality_report: QualityReport, budget_ms: float
+    ) -> Image.Image:
         """Apply moderate enhancement"""
-        logger.info("Applying moderate enhancement")
+        logger.debug("Applying moderate enhancement")
         
         enhanced = image.copy()
         
         # 1. Moderate denoising if needed
-        if quality_report["noise"]["needs_denoising"]:
-            img_array = np.array(enhanced)
-            if len(img_array.shape) == 3:
-                denoised = cv2.fastNlMeansDenoisingColored(img_array, None, 5, 5, 7, 21)
-            else:
-                denoised = cv2.fastNlMeansDenoising(img_array, None, 5, 7, 21)
+        if quality_report.noise.needs_denoising:
+            denoised, tier, elapsed_ms = self.denoise(np.array(enhanced), 5, budget_ms)
+            quality_report.denoise_tier = tier
+            quality_report.denoise_ms = round(elapsed_ms, 1)
             enhanced = Image.fromarray(denoised)
         
         # 2. Moderate contrast enhancement
-        if quality_report["contrast"]["needs_enhancement"]:
+        if quality_report.contrast.needs_enhancement:
             enhancer = ImageEnhance.Contrast(enhanced)
             enhanced = enhancer.enhance(1.2)
         
         # 3. Light sharpening
-        if quality_report["sharpness"]["needs_sharpening"]:
+        if quality_report.sharpness.needs_sharpening:
             enhancer = ImageEnhance.Sharpness(enhanced)
             enhanced = enhancer.enhance(1.3)
         
@@ -346,7 +487,7 @@ class ImageQualityAssessor:
     
     def _minimal_enhancement(self, image: Image.Image) -> Image.Image:
         """Apply minimal enhancement (mostly normalization)"""
-        logger.info("Applying minimal enhancement")
+        logger.debug("Applying minimal enhancement")
         
         # Just normalize color/brightness slightly
         img_array = np.array(image)
@@ -0,0 +1,179 @@
+"""
+Shared Image Statistics
+
+Pixel statistics used by both ImageQualityAssessor and ForensicAnalyzer,
+computed lazily, at most once per image, in fused OpenCV passes:
+1. Grayscale conversion
+2. Gray moments (mean/std) and min/max
+3. Per-channel means and standard deviations (one meanStdDev pass)
+4. Laplacian (and its variance) and Sobel gradient magnitude, kept for the
+   forensic heatmaps
+5. High-pass noise estimate (gray minus Gaussian blur)
+
+Filters write the narrowest exact type (the 3x3 Laplacian and high-pass of
+a uint8 image fit in int16) and moments come from cv2.meanStdDev, which
+accumulates in double precision without NumPy temporaries.
+
+Every statistic records how long it took, so the cost of the shared layer is
+visible per request via `timings`.
+"""
+import logging
+import time
+from typing import Dict, Iterable, Tuple, Union
+
+import cv2
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+def mean_std(gray: np.ndarray) -> Tuple[float, float]:
+    """Mean and (population) standard deviation of a single-channel image"""
+    mean, std = cv2.meanStdDev(gray)
+    return float(mean[0, 0]), float(std[0, 0])
+
+
+def laplacian_mean_std(gray: np.ndarray) -> Tuple[float, float]:
+    """Mean and standard deviation of the Laplacian of a uint8 gray image"""
+    # |Laplacian| <= 4 * 255: int16 holds it exactly
+    return mean_std(cv2.Laplacian(gray, cv2.CV_16S))
+
+
+def pooled_mean_std(moments: Iterable[Tuple[int, float, float]]) -> Tuple[float, float]:
+    """
+    Mean and (population) standard deviation of several samples taken
+    together, from each sample's (count, mean, std)
+    """
+    counts, means, stds = (np.asarray(values, dtype=np.float64) for values in zip(*moments))
+    total = counts.sum()
+    mean = float((counts * means).sum() / total)
+    second_moment = float((counts * (stds ** 2 + means ** 2)).sum() / total)
+    return mean, float(np.sqrt(max(second_moment - mean ** 2, 0.0)))
+
+
+def block_means(values: np.ndarray, block: int) -> np.ndarray:
+    """
+    Mean of every full block x block cell of a float32 image (partial cells
+    on the right/bottom edge are dropped), per channel
+
+    INTER_AREA with an integer shrink factor averages exactly the pixels of
+    each cell, in one pass over a strided view of the crop.
+    """
+    rows, cols = values.shape[0] // block, values.shape[1] // block
+    return cv2.resize(
+        values[:rows * block, :cols * block], (cols, rows), interpolation=cv2.INTER_AREA
+    )
+
+
+class ImageStatistics:
+    """Lazily computed, cached pixel statistics for a single image"""
+
+    def __init__(self, image: Union[Image.Image, np.ndarray]):
+        self.array = image if isinstance(image, np.ndarray) else np.asarray(image)
+        self.is_color = len(self.array.shape) == 3
+        self.timings: Dict[str, float] = {}  # stat name -> ms
+        self.hits = 0  # Lookups served from the cache
+        self._cache: Dict[str, object] = {}
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.array.shape
+
+    @property
+    def misses(self) -> int:
+        """Statistics computed (each one once)"""
+        return len(self._cache)
+
+    def _get(self, name: str, compute):
+        """Return a cached statistic, computing and timing it on first use"""
+        if name not in self._cache:
+            start = time.perf_counter()
+            self._cache[name] = compute()
+            self.timings[name] = round((time.perf_counter() - start) * 1000, 3)
+        else:
+            self.hits += 1
+        return self._cache[name]
+
+    @property
+    def gray(self) -> np.ndarray:
+        """Grayscale image (uint8)"""
+        return self._get(
+            "gray",
+            lambda: cv2.cvtColor(self.array, cv2.COLOR_RGB2GRAY) if self.is_color else self.array,
+        )
+
+    @property
+    def gray_mean_std(self) -> Tuple[float, float]:
+        """Mean and (population) standard deviation of the gray image"""
+        return self._get("gray_mean_std", lambda: mean_std(self.gray))
+
+    @property
+    def gray_min_max(self) -> Tuple[int, int]:
+        """Minimum and maximum gray level"""
+        def compute():
+            min_val, max_val, _, _ = cv2.minMaxLoc(self.gray)
+            return int(min_val), int(max_val)
+
+        return self._get("gray_min_max", compute)
+
+    @property
+    def channel_mean_std(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Per-channel means and standard deviations (R, G, B)"""
+        def compute():
+            mean, std = cv2.meanStdDev(self.array)
+            return mean.ravel(), std.ravel()
+
+        return self._get("channel_mean_std", compute)
+
+    @property
+    def overall_mean_std(self) -> Tuple[float, float]:
+        """Mean and standard deviation over all pixels and channels"""
+        def compute():
+            if not self.is_color:
+                return self.gray_mean_std
+            # Pool the per-channel moments instead of another full pass:
+            # var = E[x^2] - E[x]^2 with E[x^2] = mean(std_c^2 + mean_c^2)
+            means, stds = self.channel_mean_std
+            mean = float(means.mean())
+            second_moment = float(np.mean(stds ** 2 + means ** 2))
+            return mean, float(np.sqrt(max(second_moment - mean ** 2, 0.0)))
+
+        return self._get("overall_mean_std", compute)
+
+    @property
+    def laplacian(self) -> np.ndarray:
+        """Laplacian of the gray image (int16: |Laplacian| <= 4 * 255)"""
+        return self._get("laplacian", lambda: cv2.Laplacian(self.gray, cv2.CV_16S))
+
+    @property
+    def laplacian_variance(self) -> float:
+        """Variance of the Laplacian of the gray image (sharpness / noise)"""
+        def compute():
+            _, std = mean_std(self.laplacian)
+            return std ** 2
+
+        return self._get("laplacian_variance", compute)
+
+    @property
+    def gradient_magnitude(self) -> np.ndarray:
+        """Sobel gradient magnitude of the gray image (float32, 3x3 kernels)"""
+        def compute():
+            # float32 Sobel is exact for uint8 input; the magnitude is
+            # written over sobelx instead of a new temporary
+            sobelx = cv2.Sobel(self.gray, cv2.CV_32F, 1, 0, ksize=3)
+            sobely = cv2.Sobel(self.gray, cv2.CV_32F, 0, 1, ksize=3)
+            return cv2.magnitude(sobelx, sobely, sobelx)
+
+        return self._get("gradient_magnitude", compute)
+
+    @property
+    def noise_std(self) -> float:
+        """Standard deviation of the high-pass residual (gray - 5x5 Gaussian blur)"""
+        def compute():
+            blurred = cv2.GaussianBlur(self.gray, (5, 5), 0)
+            residual = cv2.subtract(self.gray, blurred, dtype=cv2.CV_16S)
+            _, std = cv2.meanStdDev(residual)
+            return float(std[0, 0])
+
+        return self._get("noise_std", compute)
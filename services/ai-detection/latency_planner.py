@@ -0,0 +1,223 @@
+"""
+Latency-Budget Planning for the Detection Pipeline
+
+Callers may pass a latency budget instead of waiting on a fixed timeout.
+LatencyPlanner then:
+1. Keeps live per-phase and per-model latency estimates (exponential
+   moving averages of observed timings, seeded from
+   LATENCY_PHASE_ESTIMATES_MS / LATENCY_DEFAULT_MODEL_MS). The first timing
+   of each phase and model is a cold start (lazy initialization, first
+   allocations) and is not folded in. Estimates only ever change from
+   measured timings: a stage skipped LATENCY_PROBE_AFTER_SKIPS times since
+   its last timing is listed in the plan's probes, and the caller re-times
+   it outside the request (and its budget) so a stale estimate is refreshed
+   instead of ruling the stage out forever
+2. Reserves the mandatory phases (quality assessment, ensemble), then adds
+   optional stages in order of their value to the final score while they
+   fit: frequency analysis, models (highest weight first), forensics
+   (native-tile depth only if the basic pass also fits)
+3. Gives whatever remains to enhancement denoising, whose tier selection
+   already adapts to a time budget
+4. Reports every stage it dropped, so the response states what the score
+   is based on
+"""
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import config
+
+
+@dataclass
+class ExecutionPlan:
+    """Stages to run for one request"""
+
+    budget_ms: Optional[float] = None
+    enhance: bool = True
+    enhancement_budget_ms: Optional[float] = None
+    forensics: bool = True
+    forensic_tiles: bool = True
+    frequency: bool = True
+    models: Optional[List[str]] = None  # None = all loaded models
+    skipped_stages: List[str] = field(default_factory=list)
+    estimated_ms: float = 0.0
+    # Skipped stages due for a re-timing outside the request (see finish_probe)
+    probes: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {
+            "budget_ms": self.budget_ms,
+            "estimated_ms": round(self.estimated_ms, 1),
+            "enhancement_budget_ms": (
+                round(self.enhancement_budget_ms, 1)
+                if self.enhancement_budget_ms is not None
+                else None
+            ),
+            "skipped_stages": list(self.skipped_stages),
+        }
+
+
+class LatencyPlanner:
+    """Live per-phase latency estimates and budget planning"""
+
+    def __init__(
+        self,
+        smoothing: float = 0.2,
+        probe_after_skips: int = config.LATENCY_PROBE_AFTER_SKIPS,
+    ):
+        self.smoothing = smoothing
+        self.probe_after_skips = probe_after_skips
+        self.estimates_ms: Dict[str, float] = dict(config.LATENCY_PHASE_ESTIMATES_MS)
+        self.model_estimates_ms: Dict[str, float] = {}  # model key -> EWMA inference time
+        self._timed = set()  # Phases and models whose cold first timing was seen
+        self._skips: Dict[str, int] = {}  # stage -> plans that skipped it since its last timing
+        self._probing = set()  # Stages handed out for a probe that has not finished
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, elapsed_ms: float):
+        """Fold an observed stage timing into its estimate"""
+        with self._lock:
+            self._fold(self.estimates_ms, stage, stage, elapsed_ms)
+
+    def record_model(self, model_key: str, elapsed_ms: float):
+        """Fold an observed model inference time into its estimate"""
+        with self._lock:
+            self._fold(self.model_estimates_ms, model_key, f"model:{model_key}", elapsed_ms)
+
+    def _fold(self, estimates: Dict[str, float], key: str, name: str, elapsed_ms: float):
+        if name not in self._timed:
+            # Cold start: would replace the seed with an outlier (the skip
+            # count stays, so a probed stage is probed again for a warm timing)
+            self._timed.add(name)
+            return
+        self._skips.pop(name, None)
+        previous = estimates.get(key)
+        estimates[key] = (
+            elapsed_ms
+            if previous is None
+            else (1 - self.smoothing) * previous + self.smoothing * elapsed_ms
+        )
+
+    def estimate(self, stage: str) -> float:
+        return self.estimates_ms.get(stage, 0.0)
+
+    def model_estimate(self, model_key: str) -> float:
+        return self.model_estimates_ms.get(model_key) or config.LATENCY_DEFAULT_MODEL_MS
+
+    def finish_probe(self, stages: List[str]):
+        """Release stages handed out in ExecutionPlan.probes (after timing them)"""
+        with self._lock:
+            self._probing.difference_update(stages)
+
+    def _skip(self, plan: "ExecutionPlan", name: str, *stages: str):
+        """Record a skipped stage; stages skipped too often since their last timing are probed"""
+        plan.skipped_stages.append(name)
+        for stage in stages:
+            skips = self._skips.get(stage, 0) + 1
+            self._skips[stage] = skips
+            if (
+                self.probe_after_skips > 0
+                and skips >= self.probe_after_skips
+                and stage not in self._probing
+            ):
+                self._probing.add(stage)
+                plan.probes.append(stage)
+
+    def plan(
+        self,
+        budget_ms: Optional[float],
+        model_weights: Dict[str, float],
+        enhance: bool = True,
+        forensics_enabled: bool = True,
+        forensic_tiles: bool = True,
+    ) -> ExecutionPlan:
+        """
+        Choose the stages that fit a latency budget
+
+        Args:
+            budget_ms: Remaining time for the pipeline (None = no budget, run everything)
+            model_weights: Ensemble weight per loaded model (sets model priority)
+            enhance: Whether enhancement was requested
+            forensics_enabled: Whether forensics are enabled at all
+            forensic_tiles: Whether the image has native forensic tiles (the
+                            forensic variant was downscaled)
+
+        Returns:
+            ExecutionPlan with the selected stages and the skipped ones
+        """
+        if budget_ms is None:
+            return ExecutionPlan(enhance=enhance, forensics=forensics_enabled)
+
+        with self._lock:
+            return self._plan(budget_ms, model_weights, enhance, forensics_enabled, forensic_tiles)
+
+    def _plan(
+        self,
+        budget_ms: float,
+        model_weights: Dict[str, float],
+        enhance: bool,
+        forensics_enabled: bool,
+        forensic_tiles: bool,
+    ) -> ExecutionPlan:
+        plan = ExecutionPlan(
+            budget_ms=budget_ms,
+            enhance=enhance,
+            forensics=False,
+            forensic_tiles=False,
+            frequency=False,
+            models=[],
+        )
+        # Mandatory: quality assessment feeds the ensemble gating
+        remaining = budget_ms - self.estimate("quality") - self.estimate("ensemble")
+
+        def take(cost: float) -> bool:
+            nonlocal remaining
+            if cost <= remaining:
+                remaining -= cost
+                return True
+            return False
+
+        if take(self.estimate("frequency")):
+            plan.frequency = True
+        else:
+            self._skip(plan, "frequency", "frequency")
+
+        for key in sorted(model_weights, key=lambda k: -model_weights[k]):
+            if take(self.model_estimate(key)):
+                plan.models.append(key)
+            else:
+                self._skip(plan, f"model:{key}", f"model:{key}")
+
+        if forensics_enabled:
+            deep, basic = self.estimate("forensics_deep"), self.estimate("forensics")
+            if not forensic_tiles:
+                if take(basic):
+                    plan.forensics = True
+                else:
+                    self._skip(plan, "forensics", "forensics")
+            elif take(deep):
+                plan.forensics = plan.forensic_tiles = True
+            elif take(basic):
+                plan.forensics = True
+                self._skip(plan, "forensics_native_tiles", "forensics_deep")
+            else:
+                self._skip(plan, "forensics", "forensics", "forensics_deep")
+
+        if enhance:
+            if remaining > 0:
+                plan.enhancement_budget_ms = min(config.ENHANCEMENT_BUDGET_MS, remaining)
+                remaining -= plan.enhancement_budget_ms
+            else:
+                plan.enhance = False
+                plan.skipped_stages.append("enhancement")
+
+        plan.estimated_ms = budget_ms - remaining
+        return plan
+
+    def status(self) -> Dict[str, float]:
+        with self._lock:
+            return {stage: round(ms, 1) for stage, ms in self.estimates_ms.items()}
+
+    def model_status(self) -> Dict[str, float]:
+        with self._lock:
+            return {key: round(ms, 1) for key, ms in self.model_estimates_ms.items()}
@@ -0,0 +1,118 @@
+"""
+Logging Setup for the AI Detection Service
+
+- LOG_FORMAT=text (default) keeps the classic one-line format; json writes
+  one JSON object per record, including the fields passed with `extra=`
+  (e.g. the per-request detection summary) and the active trace ID
+- LOG_QUEUE=true hands records to a QueueHandler; a listener thread
+  formats and writes them, so a slow stdout or log collector never blocks
+  a request
+
+Hot-path code logs with %-style arguments, which are only formatted when
+a handler accepts the record.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+from typing import Optional
+
+import config
+import tracing
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "trace_id"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class TraceContextFilter(logging.Filter):
+    """Stamps records with the active trace ID (in the emitting thread)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = tracing.current_trace_id()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "trace_id", None):
+            entry["trace_id"] = record.trace_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure(
+    level: str = config.LOG_LEVEL,
+    log_format: str = config.LOG_FORMAT,
+    use_queue: bool = config.LOG_QUEUE,
+):
+    """Install the root handler (idempotent: later calls only reset the level)"""
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, level.upper(), logging.INFO))
+    if any(getattr(handler, "_log_setup", False) for handler in root.handlers):
+        return
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT))
+
+    if use_queue:
+        handler = _DroppingQueueHandler(None)
+        _start_listener(handler, output)
+        atexit.register(stop)
+        # Threads do not survive fork: pre-fork workers start their own listener
+        os.register_at_fork(after_in_child=lambda: _start_listener(handler, output))
+    else:
+        handler = output
+
+    handler.addFilter(TraceContextFilter())
+    handler._log_setup = True
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+
+
+def _start_listener(handler: logging.handlers.QueueHandler, output: logging.Handler):
+    global _listener
+    # A fresh queue: the parent's may have been locked mid-operation at fork
+    handler.queue = queue.Queue(maxsize=config.LOG_QUEUE_SIZE)
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Drops records instead of blocking when the listener falls behind"""
+
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DroppingQueueHandler.dropped += 1
+
+
+def stop():
+    """Flush and stop the queue listener (service shutdown)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,20 +1,27 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from pydantic import BaseModel, Field
+import asyncio
 import base64
-from io import BytesIO
-from PIL import Image
+import hmac
 import logging
-from typing import Optional
+import os
+import threading
+import time
+from typing import List, Optional
 
+import metrics
+import profiling
 from models import AIDetectionModels
+from resources import ResourceManager
+from serialization import DetectionJSONResponse
 import config
+import log_setup
+import tracing
 
 # Configure logging
-logging.basicConfig(
-    level=getattr(logging, config.LOG_LEVEL),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+log_setup.configure()
 logger = logging.getLogger(__name__)
 
 app = FastAPI(
@@ -32,23 +39,58 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize models (lazy loading)
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Server span per request, continuing the caller's traceparent"""
+    if not tracing.enabled() or request.url.path in tracing.UNTRACED_PATHS:
+        return await call_next(request)
+    with tracing.server_span(
+        request.method, request.url.path, request.headers.get(tracing.TRACEPARENT)
+    ) as span:
+        response = await call_next(request)
+        span.set_attribute("http.status_code", response.status_code)
+        if response.status_code >= 500:
+            span.set_error(f"HTTP {response.status_code}")
+        return response
+
+# Initialize models (lazy loading, or in the background at startup with MODEL_PRELOAD)
 models = None
+_models_lock = threading.Lock()
 
 
 def get_models():
     global models
     if models is None:
-        logger.info("Initializing AI detection models...")
-        models = AIDetectionModels()
-        if config.MODEL_WARM_UP:
-            logger.info("Warming up models...")
-            models.load_models()
+        with _models_lock:
+            if models is None:
+                logger.info("Initializing AI detection models...")
+                models = AIDetectionModels()
+                if config.MODEL_WARM_UP:
+                    logger.info("Warming up models...")
+                    models.load_models()
     return models
 
 
+# Inference lanes (created on first use so pre-fork workers size them after forking)
+resource_manager = None
+
+
+def get_resource_manager():
+    global resource_manager
+    if resource_manager is None:
+        with _models_lock:
+            if resource_manager is None:
+                resource_manager = ResourceManager()
+    return resource_manager
+
+
 class DetectionRequest(BaseModel):
     media: str  # base64 encoded image
+    enhance: Optional[bool] = None  # Override ENABLE_QUALITY_ENHANCEMENT
+    enhancementBudgetMs: Optional[float] = None  # Denoising time budget
+    latencyBudgetMs: Optional[float] = Field(None, gt=0)  # End-to-end budget; stages that do not fit are skipped
+    heatmaps: Optional[bool] = None  # Override FORENSIC_HEATMAPS (per-tile forensic maps)
 
 
 class DetectionResponse(BaseModel):
@@ -58,6 +100,7 @@ class DetectionResponse(BaseModel):
     frequencyAnalysis: dict  # DCT/FFT analysis
     qualityMetrics: dict  # Image quality scores
     metadata: dict  # EXIF, file info
+    skippedStages: List[str] = []  # Stages dropped to fit latencyBudgetMs
 
 
 @app.on_event("startup")
@@ -66,6 +109,22 @@ async def startup_event():
     if config.MODEL_WARM_UP:
         logger.info("Warming up models on startup...")
         get_models()
+    elif config.MODEL_PRELOAD:
+        # Load in the background so /health answers immediately; /ready
+        # reports 503 until loading completes
+        logger.info("Loading models in the background...")
+        threading.Thread(
+            target=get_models().load_models, name="model-preload", daemon=True
+        ).start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Write rows still buffered in the feature store, queued spans and log records"""
+    if models is not None and models.feature_store is not None:
+        models.feature_store.flush()
+    tracing.shutdown()
+    log_setup.stop()
 
 
 @app.get("/health")
@@ -78,6 +137,19 @@ async def health():
     }
 
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once models are loaded, 503 while loading"""
+    detector = models
+    if detector is None or not detector.models_loaded:
+        return JSONResponse(status_code=503, content={"status": "loading"})
+    return {
+        "status": "ready",
+        "num_models": len(detector.loaded_models),
+        "cold_start_seconds": detector.cold_start_seconds,
+    }
+
+
 @app.get("/models/status")
 async def models_status():
     """Get status of loaded models"""
@@ -88,6 +160,28 @@ async def models_status():
     }
 
 
+@app.get("/resources/status")
+async def resources_status():
+    """CPU lane layout and per-lane load"""
+    return {
+        "status": "ok",
+        **get_resource_manager().status()
+    }
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus exposition of request, phase, model and cache metrics"""
+    rendered = metrics.render()
+    if rendered is None:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "disabled", "detail": "Set ENABLE_METRICS and install prometheus_client"},
+        )
+    content, content_type = rendered
+    return Response(content=content, media_type=content_type)
+
+
 @app.post("/models/warm-up")
 async def warm_up_models():
     """Explicitly warm up models"""
@@ -104,8 +198,158 @@ async def warm_up_models():
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/detect", response_model=DetectionResponse)
-async def detect(image: UploadFile = File(...)):
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Admin endpoints exist only with ADMIN_TOKEN set and require it"""
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, config.ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+async def run_profiler(fn, *args):
+    """Run a blocking capture off the event loop, one at a time per worker"""
+    try:
+        with profiling.exclusive():
+            return await asyncio.to_thread(fn, *args)
+    except profiling.ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+def worker_info() -> dict:
+    return {"pid": os.getpid(), "prefork_worker": os.getenv("PREFORK_WORKER_ID")}
+
+
+@app.post("/admin/profile/cpu", dependencies=[Depends(require_admin)])
+async def profile_cpu(
+    seconds: float = Query(10.0, gt=0, le=config.PROFILE_MAX_SECONDS),
+    intervalMs: float = Query(config.PROFILE_SAMPLE_INTERVAL_MS, ge=1, le=1000),
+    includeIdle: bool = False,
+    format: str = Query("json", pattern="^(json|collapsed)$"),
+):
+    """
+    Sample this worker's thread stacks for `seconds`
+
+    format=collapsed returns folded stacks for flamegraph.pl / speedscope
+    """
+    result = await run_profiler(profiling.sample_cpu, seconds, intervalMs, includeIdle)
+    if format == "collapsed":
+        return PlainTextResponse(result["collapsed"])
+    return {**worker_info(), **result}
+
+
+@app.post("/admin/profile/requests", dependencies=[Depends(require_admin)])
+async def profile_requests(
+    count: int = Query(10, gt=0, le=config.PROFILE_MAX_REQUESTS),
+    timeout: float = Query(60.0, gt=0, le=config.PROFILE_MAX_SECONDS),
+    sort: str = Query("cumulative", pattern="^(cumulative|tottime|calls)$"),
+    format: str = Query("json", pattern="^(json|text|prof)$"),
+):
+    """
+    cProfile the next `count` detection requests this worker serves (or
+    those that arrive within `timeout` seconds)
+
+    format=prof returns a pstats file for snakeviz / flameprof
+    """
+    stats, profiled = await run_profiler(profiling.profile_requests, count, timeout)
+    if stats is None:
+        raise HTTPException(status_code=408, detail="No detection request arrived before the timeout")
+    if format == "prof":
+        return Response(
+            content=profiling.stats_file(stats),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": 'attachment; filename="requests.prof"'},
+        )
+    table = profiling.stats_table(stats, sort)
+    if format == "text":
+        return PlainTextResponse(table)
+    return {**worker_info(), "requests": profiled, "sort": sort, "table": table}
+
+
+@app.post("/admin/profile/memory", dependencies=[Depends(require_admin)])
+async def profile_memory(
+    seconds: float = Query(10.0, gt=0, le=config.PROFILE_MAX_SECONDS),
+    format: str = Query("json", pattern="^(json|collapsed)$"),
+):
+    """
+    Trace allocations for `seconds` and report what is still alive
+
+    format=collapsed returns bytes per allocation stack for flame graphs
+    """
+    result = await run_profiler(profiling.capture_memory, seconds)
+    if format == "collapsed":
+        return PlainTextResponse(result["collapsed"])
+    return {**worker_info(), **result}
+
+
+def run_detection(
+    image_bytes: bytes,
+    enhance: Optional[bool] = None,
+    enhancement_budget_ms: Optional[float] = None,
+    latency_budget_ms: Optional[float] = None,
+    received_at: Optional[float] = None,
+    heatmaps: Optional[bool] = None,
+) -> dict:
+    """
+    Preprocess raw image bytes once and run the detection pipeline
+
+    Time spent queueing for a lane and decoding counts against
+    latency_budget_ms (measured from received_at, a perf_counter value).
+    """
+    args = (image_bytes, enhance, enhancement_budget_ms, latency_budget_ms, received_at, heatmaps)
+    if profiling.requests.active:
+        with profiling.requests.profile():
+            return _run_detection(*args)
+    return _run_detection(*args)
+
+
+def _run_detection(
+    image_bytes: bytes,
+    enhance: Optional[bool],
+    enhancement_budget_ms: Optional[float],
+    latency_budget_ms: Optional[float],
+    received_at: Optional[float],
+    heatmaps: Optional[bool],
+) -> dict:
+    # Get models
+    detector = get_models()
+
+    start = time.perf_counter()
+    with tracing.span("preprocess", bytes=len(image_bytes)) as span:
+        prepared = detector.preprocessor.prepare_bytes(image_bytes)
+        span.set_attribute("image.size", f"{prepared.original_size[0]}x{prepared.original_size[1]}")
+    metrics.observe_phase("preprocess", (time.perf_counter() - start) * 1000)
+    width, height = prepared.original_size
+    metrics.IMAGE_BYTES.observe(len(image_bytes))
+    metrics.IMAGE_MEGAPIXELS.observe(width * height / 1e6)
+    logger.debug(
+        "Processing image: %s -> variants %s, %d bytes",
+        prepared.original_size, prepared.variant_sizes, len(image_bytes),
+    )
+
+    if latency_budget_ms is None and config.DEFAULT_LATENCY_BUDGET_MS > 0:
+        latency_budget_ms = config.DEFAULT_LATENCY_BUDGET_MS
+    if latency_budget_ms is not None and received_at is not None:
+        latency_budget_ms -= (time.perf_counter() - received_at) * 1000
+
+    # Run detection (pass image_bytes for EXIF analysis)
+    return detector.detect(
+        prepared,
+        image_bytes,
+        enhance=enhance,
+        enhancement_budget_ms=enhancement_budget_ms,
+        latency_budget_ms=latency_budget_ms,
+        heatmaps=heatmaps,
+    )
+
+
+@app.post("/detect", response_model=DetectionResponse, response_class=DetectionJSONResponse)
+async def detect(
+    image: UploadFile = File(...),
+    enhance: Optional[bool] = None,
+    enhancementBudgetMs: Optional[float] = None,
+    latencyBudgetMs: Optional[float] = Query(None, gt=0),
+    heatmaps: Optional[bool] = None,
+):
     """
     Analyze media and return raw detection metrics (File Upload)
     
@@ -115,54 +359,24 @@ async def detect(image: UploadFile = File(...)):
     3. Perform forensic analysis
     4. Return comprehensive raw metrics (no verdict)
     """
+    received_at = time.perf_counter()
     try:
-        # Read image file
-        image_bytes = await image.read()
-        pil_image = Image.open(BytesIO(image_bytes))
-        
-        # Convert to RGB if needed
-        if pil_image.mode != 'RGB':
-            pil_image = pil_image.convert('RGB')
-        
-        # Validate and resize image
-        MIN_SIZE = 224  # Minimum size for most models
-        
-        # Resize if too small (pad to minimum size)
-        if pil_image.width < MIN_SIZE or pil_image.height < MIN_SIZE:
-            logger.warning(f"Image too small ({pil_image.size}), padding to {MIN_SIZE}x{MIN_SIZE}")
-            new_image = Image.new('RGB', (MIN_SIZE, MIN_SIZE), (255, 255, 255))
-            # Center the image
-            offset = ((MIN_SIZE - pil_image.width) // 2, (MIN_SIZE - pil_image.height) // 2)
-            new_image.paste(pil_image, offset)
-            pil_image = new_image
-        
-        # Resize if too large
-        if pil_image.width > config.MAX_IMAGE_SIZE[0] or pil_image.height > config.MAX_IMAGE_SIZE[1]:
-            logger.info(f"Resizing image from {pil_image.size} to {config.MAX_IMAGE_SIZE}")
-            pil_image.thumbnail(config.MAX_IMAGE_SIZE, Image.Resampling.LANCZOS)
-        
-        logger.info(f"Processing image: {pil_image.size}, mode: {pil_image.mode}")
-        logger.info(f"[DEBUG] About to call detector.detect()...")
-        logger.info(f"[DEBUG] Image bytes size: {len(image_bytes)} bytes")
-        
-        # Get models
-        detector = get_models()
-        
-        # Run detection (pass image_bytes for EXIF analysis)
-        result = detector.detect(pil_image, image_bytes)
-        logger.info(f"[DEBUG] detect() returned successfully")
-        logger.info(f"[DEBUG] Result keys: {list(result.keys())}")
-        
-        logger.info(f"Detection complete: ensemble score={result.get('ensembleScore', 0):.3f}, models={result.get('modelScores', {}).get('ensemble_model_count', 0)}")
-        
-        return DetectionResponse(**result)
+        with metrics.track_request("detect"):
+            # Read image file
+            image_bytes = await image.read()
+            result = await get_resource_manager().run(
+                run_detection, image_bytes, enhance, enhancementBudgetMs,
+                latencyBudgetMs, received_at, heatmaps
+            )
+            # Returned as a response: FastAPI skips response_model validation
+            return DetectionJSONResponse(result)
         
     except Exception as e:
         logger.error(f"Detection error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/detect/base64", response_model=DetectionResponse)
+@app.post("/detect/base64", response_model=DetectionResponse, response_class=DetectionJSONResponse)
 async def detect_base64(request: DetectionRequest):
     """
     Analyze media and return raw detection metrics (Base64 Input)
@@ -173,47 +387,16 @@ async def detect_base64(request: DetectionRequest):
     3. Perform forensic analysis
     4. Return comprehensive raw metrics (no verdict)
     """
+    received_at = time.perf_counter()
     try:
-        # Decode base64 image
-        image_bytes = base64.b64decode(request.media)
-        image = Image.open(BytesIO(image_bytes))
-        
-        # Convert to RGB if needed
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # Validate and resize image
-        MIN_SIZE = 224  # Minimum size for most models
-        
-        # Resize if too small (pad to minimum size)
-        if image.width < MIN_SIZE or image.height < MIN_SIZE:
-            logger.warning(f"Image too small ({image.size}), padding to {MIN_SIZE}x{MIN_SIZE}")
-            new_image = Image.new('RGB', (MIN_SIZE, MIN_SIZE), (255, 255, 255))
-            # Center the image
-            offset = ((MIN_SIZE - image.width) // 2, (MIN_SIZE - image.height) // 2)
-            new_image.paste(image, offset)
-            image = new_image
-        
-        # Resize if too large
-        if image.width > config.MAX_IMAGE_SIZE[0] or image.height > config.MAX_IMAGE_SIZE[1]:
-            logger.info(f"Resizing image from {image.size} to {config.MAX_IMAGE_SIZE}")
-            image.thumbnail(config.MAX_IMAGE_SIZE, Image.Resampling.LANCZOS)
-        
-        logger.info(f"Processing image: {image.size}, mode: {image.mode}")
-        logger.info(f"[DEBUG] About to call detector.detect()...")
-        logger.info(f"[DEBUG] Image bytes size: {len(image_bytes)} bytes")
-        
-        # Get models
-        detector = get_models()
-        
-        # Run detection (pass image_bytes for EXIF analysis)
-        result = detector.detect(image, image_bytes)
-        logger.info(f"[DEBUG] detect() returned successfully")
-        logger.info(f"[DEBUG] Result keys: {list(result.keys())}")
-        
-        logger.info(f"Detection complete: ensemble score={result.get('ensembleScore', 0):.3f}, models={result.get('modelScores', {}).get('ensemble_model_count', 0)}")
-        
-        return DetectionResponse(**result)
+        with metrics.track_request("detect_base64"):
+            # Decode base64 image
+            image_bytes = base64.b64decode(request.media)
+            result = await get_resource_manager().run(
+                run_detection, image_bytes, request.enhance, request.enhancementBudgetMs,
+                request.latencyBudgetMs, received_at, request.heatmaps
+            )
+            return DetectionJSONResponse(result)
         
     except Exception as e:
         logger.error(f"Detection error: {str(e)}", exc_info=True)
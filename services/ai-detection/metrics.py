@@ -0,0 +1,178 @@
+"""
+Prometheus Metrics for the AI Detection Service
+
+Exposed at /metrics:
+- requests by endpoint and outcome, request latency, requests in flight
+- inference lane queue depth and busy lanes
+- latency histograms per pipeline phase and per model
+- uploaded image size (bytes, megapixels)
+- cache lookups (shared image statistics, shared model inputs) by hit/miss
+- stages skipped for latency budgets, models skipped by the cascade
+- model load time and cold start
+
+Each update is a single locked add on a preallocated child, so the request
+path pays microseconds. Without prometheus_client (or with ENABLE_METRICS
+off) every metric is a no-op and /metrics answers 503.
+
+Pre-fork workers each have their own counters; with PROMETHEUS_MULTIPROC_DIR
+set, values are kept in per-process files and /metrics aggregates all
+workers (gauges sum over live workers).
+"""
+import contextlib
+import logging
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+import config
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST,
+        REGISTRY,
+        CollectorRegistry,
+        Counter,
+        Gauge,
+        Histogram,
+        generate_latest,
+        multiprocess,
+    )
+except ImportError:  # Optional: metrics become no-ops
+    Counter = None
+
+logger = logging.getLogger(__name__)
+
+ENABLED = config.ENABLE_METRICS and Counter is not None
+MULTIPROCESS = ENABLED and bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+IMAGE_BYTES_BUCKETS = (1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7, 2.5e7, 5e7)
+IMAGE_MEGAPIXELS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+MODEL_LOAD_BUCKETS = (1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+
+class _NoOpMetric:
+    """Stands in for every metric type when metrics are disabled"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount: float = 1):
+        pass
+
+    def dec(self, amount: float = 1):
+        pass
+
+    def set(self, value: float):
+        pass
+
+    def observe(self, value: float):
+        pass
+
+
+def _counter(name, documentation, labels=()):
+    return Counter(name, documentation, labels) if ENABLED else _NoOpMetric()
+
+
+def _gauge(name, documentation, labels=(), mode="livesum"):
+    if not ENABLED:
+        return _NoOpMetric()
+    return Gauge(name, documentation, labels, multiprocess_mode=mode)
+
+
+def _histogram(name, documentation, labels=(), buckets=config.METRICS_LATENCY_BUCKETS):
+    if not ENABLED:
+        return _NoOpMetric()
+    return Histogram(name, documentation, labels, buckets=buckets)
+
+
+REQUESTS = _counter(
+    "ai_detection_requests_total", "Detection requests by endpoint and outcome", ["endpoint", "status"]
+)
+REQUEST_SECONDS = _histogram(
+    "ai_detection_request_duration_seconds", "End-to-end detection request latency", ["endpoint"]
+)
+IN_FLIGHT = _gauge("ai_detection_requests_in_flight", "Detection requests being served (incl. queued)")
+QUEUE_DEPTH = _gauge("ai_detection_lane_queue_depth", "Requests waiting for a free inference lane")
+LANES_BUSY = _gauge("ai_detection_lanes_busy", "Inference lanes running a request")
+
+PHASE_SECONDS = _histogram(
+    "ai_detection_phase_duration_seconds", "Pipeline phase latency", ["phase"]
+)
+MODEL_SECONDS = _histogram(
+    "ai_detection_model_inference_seconds", "Inference latency per model", ["model"]
+)
+
+IMAGE_BYTES = _histogram(
+    "ai_detection_image_bytes", "Uploaded image size in bytes", buckets=IMAGE_BYTES_BUCKETS
+)
+IMAGE_MEGAPIXELS = _histogram(
+    "ai_detection_image_megapixels", "Uploaded image resolution", buckets=IMAGE_MEGAPIXELS_BUCKETS
+)
+
+CACHE_LOOKUPS = _counter(
+    "ai_detection_cache_lookups_total", "Per-request cache lookups", ["cache", "result"]
+)
+SKIPPED_STAGES = _counter(
+    "ai_detection_skipped_stages_total", "Stages dropped to fit a latency budget", ["stage"]
+)
+CASCADE_SKIPPED_MODELS = _counter(
+    "ai_detection_cascade_skipped_models_total", "Models skipped by a cascade early exit", ["model"]
+)
+
+MODEL_LOAD_SECONDS = _histogram(
+    "ai_detection_model_load_seconds", "Time to load one model", ["model"], buckets=MODEL_LOAD_BUCKETS
+)
+COLD_START_SECONDS = _gauge(
+    "ai_detection_cold_start_seconds", "Wall time of the (parallel) model load", mode="max"
+)
+MODELS_LOADED = _gauge("ai_detection_models_loaded", "Models loaded", mode="max")
+
+
+def observe_phase(phase: str, elapsed_ms: float):
+    PHASE_SECONDS.labels(phase=phase).observe(elapsed_ms / 1000)
+
+
+def observe_cache(cache: str, hits: int, misses: int):
+    if hits:
+        CACHE_LOOKUPS.labels(cache=cache, result="hit").inc(hits)
+    if misses:
+        CACHE_LOOKUPS.labels(cache=cache, result="miss").inc(misses)
+
+
+@contextlib.contextmanager
+def track_request(endpoint: str):
+    """Count, time and track in-flight state of one detection request"""
+    IN_FLIGHT.inc()
+    start = time.perf_counter()
+    status = "error"
+    try:
+        yield
+        status = "ok"
+    finally:
+        IN_FLIGHT.dec()
+        REQUEST_SECONDS.labels(endpoint=endpoint).observe(time.perf_counter() - start)
+        REQUESTS.labels(endpoint=endpoint, status=status).inc()
+
+
+def render() -> Optional[Tuple[bytes, str]]:
+    """Exposition payload and content type, or None when metrics are disabled"""
+    if not ENABLED:
+        return None
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int):
+    """Drop a dead pre-fork worker's live gauges from the aggregate"""
+    if MULTIPROCESS:
+        try:
+            multiprocess.mark_process_dead(pid)
+        except Exception as e:
+            logger.warning(f"Could not clear metrics of worker {pid}: {e}")
+
+
+def status() -> Dict[str, bool]:
+    return {"enabled": ENABLED, "multiprocess": MULTIPROCESS}
@@ -0,0 +1,258 @@
+"""
+Shared Model Inputs for the Detection Ensemble
+
+Every image-classification model in the ensemble would otherwise run its own
+HuggingFace image processor on the same image, producing nearly identical
+224x224 tensors once per model. This module:
+1. Reduces each model's processor to a hashable InputSpec, so models with the
+   same preprocessing fall into the same group
+2. Computes each distinct pixel tensor once per image, vectorized, into a
+   reused float32 buffer (models that only differ in mean/std also share the
+   resize)
+3. Wraps the model's forward pass (torch or ONNX Runtime) in a
+   DirectClassifier that maps logits to the pipeline's [{label, score}] list
+   in NumPy
+
+Models whose processor cannot be reproduced exactly (shortest-edge resize,
+center crop, ...) get no InputSpec and keep running through their pipeline.
+"""
+import logging
+import threading
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class InputSpec:
+    """Preprocessing parameters of an image-classification model"""
+
+    height: int
+    width: int
+    resample: int
+    do_resize: bool
+    do_rescale: bool
+    rescale_factor: float
+    do_normalize: bool
+    image_mean: Tuple[float, ...]
+    image_std: Tuple[float, ...]
+
+    @classmethod
+    def from_params(cls, params: Dict[str, Any]) -> "InputSpec":
+        return cls(
+            height=int(params["height"]),
+            width=int(params["width"]),
+            resample=int(params["resample"]),
+            do_resize=bool(params["do_resize"]),
+            do_rescale=bool(params["do_rescale"]),
+            rescale_factor=float(params["rescale_factor"]),
+            do_normalize=bool(params["do_normalize"]),
+            image_mean=tuple(float(v) for v in params["image_mean"]),
+            image_std=tuple(float(v) for v in params["image_std"]),
+        )
+
+    @classmethod
+    def from_processor(cls, processor) -> Optional["InputSpec"]:
+        """InputSpec of a HuggingFace image processor, or None if unsupported"""
+        try:
+            return cls.from_params(processor_params(processor))
+        except ValueError as e:
+            logger.info(f"{type(processor).__name__}: {e}")
+            return None
+
+    def to_params(self) -> Dict[str, Any]:
+        params = asdict(self)
+        params["image_mean"] = list(self.image_mean)
+        params["image_std"] = list(self.image_std)
+        return params
+
+    @property
+    def resize_key(self) -> Tuple[int, int, int, bool]:
+        """Specs with the same resize_key share the resized image"""
+        return (self.width, self.height, self.resample, self.do_resize)
+
+
+def processor_params(processor) -> Dict[str, Any]:
+    """
+    Preprocessing parameters of a HuggingFace image processor
+
+    Only fixed-size resize + rescale + normalize processors (ViT, Swin, ...)
+    are supported.
+
+    Raises:
+        ValueError: If the processor does anything else
+    """
+    size = processor.size if isinstance(processor.size, dict) else {"height": processor.size, "width": processor.size}
+    if "height" not in size or "width" not in size:
+        raise ValueError(f"unsupported resize {size}")
+    if getattr(processor, "do_center_crop", False):
+        raise ValueError("center crop not supported")
+    if getattr(processor, "rescale_offset", False):
+        raise ValueError("rescale offset not supported")
+
+    return {
+        "height": int(size["height"]),
+        "width": int(size["width"]),
+        "resample": int(getattr(processor, "resample", Image.Resampling.BILINEAR)),
+        "do_resize": bool(getattr(processor, "do_resize", True)),
+        "do_rescale": bool(getattr(processor, "do_rescale", True)),
+        "rescale_factor": float(getattr(processor, "rescale_factor", 1 / 255)),
+        "do_normalize": bool(getattr(processor, "do_normalize", True)),
+        "image_mean": [float(v) for v in getattr(processor, "image_mean", [0.5, 0.5, 0.5])],
+        "image_std": [float(v) for v in getattr(processor, "image_std", [0.5, 0.5, 0.5])],
+    }
+
+
+def pixel_values(
+    image: Image.Image, spec: InputSpec, out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Resize, rescale and normalize an RGB image into a (1, 3, H, W) float32 tensor
+
+    Rescale and normalize are fused into one multiply-subtract per channel:
+    (x * rescale - mean) / std == x * (rescale / std) - mean / std
+    """
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    if spec.do_resize and image.size != (spec.width, spec.height):
+        image = image.resize((spec.width, spec.height), spec.resample)
+    return _normalize(np.asarray(image), spec, out)
+
+
+def _normalize(pixels: np.ndarray, spec: InputSpec, out: Optional[np.ndarray]) -> np.ndarray:
+    """Fused rescale/normalize of an (H, W, 3) uint8 array into (1, 3, H, W) float32"""
+    height, width = pixels.shape[:2]
+    if out is None or out.shape != (1, 3, height, width):
+        out = np.empty((1, 3, height, width), dtype=np.float32)
+
+    scale = np.full(3, spec.rescale_factor if spec.do_rescale else 1.0, dtype=np.float32)
+    offset = np.zeros(3, dtype=np.float32)
+    if spec.do_normalize:
+        std = np.asarray(spec.image_std, dtype=np.float32)
+        scale /= std
+        offset = np.asarray(spec.image_mean, dtype=np.float32) / std
+
+    chw = pixels.transpose(2, 0, 1)
+    np.multiply(chw, scale[:, None, None], out=out[0], casting="unsafe")
+    np.subtract(out[0], offset[:, None, None], out=out[0])
+    return out
+
+
+class SharedPixelValues:
+    """
+    Per-image cache of model input tensors, one per distinct InputSpec
+
+    Buffers are reused across requests (one set per thread), so the tensors
+    returned by `get` are only valid until the same thread prepares its next
+    image.
+    """
+
+    _buffers = threading.local()
+
+    def __init__(self, image: Image.Image):
+        self.image = image if image.mode == "RGB" else image.convert("RGB")
+        self._resized: Dict[Tuple, np.ndarray] = {}
+        self._tensors: Dict[InputSpec, np.ndarray] = {}
+        self.hits = 0  # Models served an already computed tensor
+
+    @property
+    def misses(self) -> int:
+        """Tensors computed (one per distinct spec)"""
+        return len(self._tensors)
+
+    @classmethod
+    def _buffer_for(cls, spec: InputSpec) -> Optional[np.ndarray]:
+        if not hasattr(cls._buffers, "by_spec"):
+            cls._buffers.by_spec = {}
+        return cls._buffers.by_spec.get(spec)
+
+    def get(self, spec: InputSpec) -> np.ndarray:
+        """Input tensor for spec, computed at most once per image"""
+        tensor = self._tensors.get(spec)
+        if tensor is not None:
+            self.hits += 1
+            return tensor
+
+        pixels = self._resized.get(spec.resize_key)
+        if pixels is None:
+            image = self.image
+            if spec.do_resize and image.size != (spec.width, spec.height):
+                image = image.resize((spec.width, spec.height), spec.resample)
+            pixels = np.asarray(image)
+            self._resized[spec.resize_key] = pixels
+
+        tensor = _normalize(pixels, spec, self._buffer_for(spec))
+        self._buffers.by_spec[spec] = tensor
+        self._tensors[spec] = tensor
+        return tensor
+
+
+def is_multi_label(problem_type: Optional[str], num_labels: int) -> bool:
+    """Whether a head is scored with a sigmoid per label (as the pipeline does) instead of a softmax"""
+    return problem_type == "multi_label_classification" or num_labels == 1
+
+
+class DirectClassifier:
+    """Forward pass on a precomputed tensor with NumPy logits-to-label mapping"""
+
+    def __init__(
+        self,
+        forward: Callable[[np.ndarray], np.ndarray],
+        spec: InputSpec,
+        labels: List[str],
+        multi_label: bool = False,
+        top_k: int = 5,
+    ):
+        self.forward = forward
+        self.spec = spec
+        self.labels = labels
+        self.multi_label = multi_label
+        self.top_k = min(top_k, len(labels))
+
+    @classmethod
+    def from_pipeline(cls, pipe) -> Optional["DirectClassifier"]:
+        """DirectClassifier for a transformers image-classification pipeline"""
+        processor = getattr(pipe, "image_processor", None)
+        if processor is None:
+            return None
+        spec = InputSpec.from_processor(processor)
+        if spec is None:
+            return None
+
+        import torch
+
+        model = pipe.model
+        model_config = model.config
+        device = pipe.device
+
+        def forward(values: np.ndarray) -> np.ndarray:
+            with torch.inference_mode():
+                logits = model(pixel_values=torch.from_numpy(values).to(device)).logits
+            return logits.float().cpu().numpy()
+
+        labels = [model_config.id2label[i] for i in range(len(model_config.id2label))]
+        multi_label = is_multi_label(getattr(model_config, "problem_type", None), len(labels))
+        return cls(forward, spec, labels, multi_label)
+
+    @classmethod
+    def from_onnx(cls, classifier) -> "DirectClassifier":
+        """DirectClassifier for an onnx_backend.OnnxImageClassifier"""
+        return classifier.direct
+
+    def __call__(self, values: np.ndarray) -> List[Dict[str, Any]]:
+        return self.to_predictions(self.forward(values)[0])
+
+    def to_predictions(self, logits: np.ndarray) -> List[Dict[str, Any]]:
+        """Scores for one row of logits in the pipeline's [{label, score}] shape"""
+        logits = logits.astype(np.float64)
+        if self.multi_label:
+            probs = 1.0 / (1.0 + np.exp(-logits))
+        else:
+            shifted = np.exp(logits - logits.max())
+            probs = shifted / shifted.sum()
+        order = np.argsort(-probs, kind="stable")[:self.top_k]
+        return [{"label": self.labels[i], "score": float(probs[i])} for i in order]
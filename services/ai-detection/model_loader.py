@@ -3,10 +3,15 @@ Model Registry and Loader for verified AI detection models
 """
 
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Optional
 
+import torch
 from transformers import pipeline
 import config
+import metrics
+import onnx_backend
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +23,10 @@ class ModelRegistry:
     VERIFIED_MODELS = config.MODELS
 
     # Model configurations (NEW: Balanced weights for ensemble)
+    # "quantization": CPU quantization mode applied when ENABLE_CPU_QUANTIZATION
+    #                 is set ("dynamic_int8" or None for fp32)
+    # "backend": "torch" (transformers pipeline) or "onnx" (ONNX Runtime export,
+    #            falls back to torch when the model has not been exported)
     MODEL_CONFIGS = {
         "Dafilab/ai-image-detector": {
             "type": "image-classification",
@@ -25,6 +34,8 @@ class ModelRegistry:
             "labels_mapping": {},
             "threshold": 0.5,
             "weight": 0.25,  # Balanced weight
+            "quantization": None,
+            "backend": "torch",
         },
         "Smogy/SMOGY-Ai-images-detector": {
             "type": "image-classification",
@@ -32,6 +43,8 @@ class ModelRegistry:
             "labels_mapping": {},
             "threshold": 0.5,
             "weight": 0.20,
+            "quantization": None,
+            "backend": "torch",
         },
         "Hemg/AI-VS-REAL-IMAGE-DETECTION": {
             "type": "image-classification",
@@ -39,6 +52,8 @@ class ModelRegistry:
             "labels_mapping": {},
             "threshold": 0.5,
             "weight": 0.18,
+            "quantization": "dynamic_int8",  # ViT: Linear layers dominate
+            "backend": "torch",
         },
         "Organika/sdxl-detector": {
             "type": "image-classification",
@@ -46,6 +61,8 @@ class ModelRegistry:
             "labels_mapping": {},
             "threshold": 0.5,
             "weight": 0.15,
+            "quantization": None,
+            "backend": "torch",
         },
         "dima806/deepfake_vs_real_image_detection": {
             "type": "image-classification",
@@ -53,6 +70,8 @@ class ModelRegistry:
             "labels_mapping": {},
             "threshold": 0.5,
             "weight": 0.12,
+            "quantization": "dynamic_int8",  # ViT: Linear layers dominate
+            "backend": "torch",
         },
         "mmdbes/Fake-image-detection": {
             "type": "image-classification",
@@ -60,6 +79,8 @@ class ModelRegistry:
             "labels_mapping": {},
             "threshold": 0.5,
             "weight": 0.07,
+            "quantization": None,
+            "backend": "torch",
         },
         "openai/clip-vit-base-patch32": {
             "type": "zero-shot-image-classification",
@@ -67,35 +88,122 @@ class ModelRegistry:
             "labels_mapping": {},
             "threshold": 0.5,
             "weight": 0.03,
+            "quantization": None,
+            "backend": "torch",
         },
     }
 
     @classmethod
-    def load_model(cls, model_name: str, device: int = -1) -> Optional[Dict]:
+    def load_model(
+        cls, model_name: str, device: int = -1, quantize: Optional[bool] = None
+    ) -> Optional[Dict]:
         """
         Load a specific model
 
         Args:
             model_name: Name of the model to load
             device: Device to load on (-1 for CPU, 0+ for GPU)
+            quantize: Apply the model's configured CPU quantization
+                      (defaults to config.ENABLE_CPU_QUANTIZATION)
 
         Returns:
-            Dictionary with model, name, and config, or None if failed
+            Dictionary with model, name, config, applied quantization,
+            backend and load time, or None if failed
         """
         try:
             logger.info(f"Loading model: {model_name}")
+            start = time.perf_counter()
 
-            config = cls.MODEL_CONFIGS.get(model_name, {})
-            model_type = config.get("type", "image-classification")
+            model_config = cls.MODEL_CONFIGS.get(model_name, {})
+            model_type = model_config.get("type", "image-classification")
 
-            model = pipeline(model_type, model=model_name, device=device)
+            if quantize is None:
+                quantize = config.ENABLE_CPU_QUANTIZATION
+            backend = cls._resolve_backend(model_name, model_config, device)
 
-            logger.info(f"✓ Successfully loaded: {model_name}")
-            return {"model": model, "name": model_name, "config": config}
+            if backend == "onnx":
+                # INT8 export when quantizing and one exists (else fp32 with a warning)
+                model = onnx_backend.OnnxImageClassifier(model_name, quantized=quantize)
+                quantization = "onnx_int8" if model.quantized else None
+            else:
+                model = pipeline(
+                    model_type,
+                    model=model_name,
+                    device=device,
+                    model_kwargs=cls.weight_loading_kwargs(),
+                )
+                quantization = model_config.get("quantization") if quantize else None
+                if quantization and device != -1:
+                    logger.warning(f"Skipping {quantization} for {model_name}: CPU only")
+                    quantization = None
+                if quantization:
+                    cls.quantize(model, quantization)
+
+            load_seconds = time.perf_counter() - start
+            metrics.MODEL_LOAD_SECONDS.labels(model=model_name).observe(load_seconds)
+            logger.info(f"✓ Successfully loaded: {model_name} [{backend}] in {load_seconds:.1f}s"
+                        + (f" ({quantization})" if quantization else ""))
+            return {
+                "model": model,
+                "name": model_name,
+                "config": model_config,
+                "quantization": quantization,
+                "backend": backend,
+                "load_seconds": round(load_seconds, 2),
+            }
         except Exception as e:
             logger.error(f"✗ Failed to load {model_name}: {e}")
             return None
 
+    @staticmethod
+    def weight_loading_kwargs() -> Dict:
+        """from_pretrained kwargs for memory-mapped, low-peak-memory weight loading"""
+        if not config.USE_SAFETENSORS:
+            return {}
+        # use_safetensors=None prefers model.safetensors (read through mmap, so
+        # the file pages live in the shared page cache) and falls back to
+        # pytorch_model.bin; low_cpu_mem_usage skips the random-init copy
+        return {"use_safetensors": None, "low_cpu_mem_usage": True}
+
+    @staticmethod
+    def _resolve_backend(model_name: str, model_config: Dict, device: int) -> str:
+        """Configured backend, falling back to torch when ONNX cannot be used"""
+        backend = model_config.get("backend", "torch")
+        if backend != "onnx":
+            return "torch"
+
+        if model_config.get("type", "image-classification") != "image-classification":
+            logger.warning(f"ONNX backend only supports image-classification, using torch for {model_name}")
+            return "torch"
+        if device != -1:
+            logger.warning(f"ONNX backend is CPU only, using torch for {model_name}")
+            return "torch"
+        if not onnx_backend.is_exported(model_name):
+            logger.warning(
+                f"No ONNX export for {model_name} in {config.ONNX_MODEL_DIR}, using torch "
+                f"(run: python onnx_backend.py export)"
+            )
+            return "torch"
+        return "onnx"
+
+    @staticmethod
+    def quantize(model, mode: str):
+        """
+        Quantize a loaded pipeline's model in place
+
+        dynamic_int8: weights of every nn.Linear stored as INT8, activations
+        quantized on the fly. Transformer classifiers (ViT) spend nearly all
+        their time and memory in Linear layers, so this roughly halves both
+        on CPU without calibration data.
+        """
+        if mode != "dynamic_int8":
+            raise ValueError(f"Unknown quantization mode: {mode}")
+
+        model.model = torch.quantization.quantize_dynamic(
+            model.model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+        model.model.eval()
+
     @classmethod
     def load_best_available(cls, device: int = -1, try_all: bool = False) -> Dict:
         """
@@ -111,10 +219,18 @@ class ModelRegistry:
         loaded_models = {}
 
         if try_all:
-            # Try to load all models for ensemble
-            for key, model_name in cls.VERIFIED_MODELS.items():
-                if model_name:
-                    result = cls.load_model(model_name, device)
+            # Load all models for ensemble concurrently: downloads and
+            # deserialization release the GIL
+            to_load = {key: name for key, name in cls.VERIFIED_MODELS.items() if name}
+            workers = max(1, min(config.MODEL_LOAD_WORKERS, len(to_load)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="model-load") as pool:
+                futures = {
+                    key: pool.submit(cls.load_model, model_name, device)
+                    for key, model_name in to_load.items()
+                }
+                # Keep config order regardless of completion order
+                for key, future in futures.items():
+                    result = future.result()
                     if result:
                         loaded_models[key] = result
         else:
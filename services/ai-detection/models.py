@@ -1,22 +1,79 @@
+import functools
 import logging
-from typing import Dict, Optional
+import os
+import resource
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Union
 
 import config
 import numpy as np
 import torch
-from ensemble import SmartEnsemble
+from ensemble import SmartEnsemble, blend_frequency
+from feature_store import FeatureStore, feature_row
 from forensics import ForensicAnalyzer
 
 # Import new advanced modules
 from frequency_analysis import FrequencyAnalyzer
 from image_quality import ImageQualityAssessor
+from image_stats import ImageStatistics
+from latency_planner import LatencyPlanner
+import metrics
+import tracing
+from model_inputs import DirectClassifier, SharedPixelValues
 from model_loader import ModelRegistry
 from PIL import Image
+from preprocessing import ImagePreprocessor, PreparedImage
+from results import ForensicResult, FrequencyResult, QualityReport
 from transformers import pipeline
 
 logger = logging.getLogger(__name__)
 
 
+def process_memory_mb() -> Dict[str, Optional[float]]:
+    """
+    Memory of this worker process in MB
+
+    rss/shared come from /proc/self/statm (shared = file-backed pages, e.g.
+    mmapped weights). pss/private come from smaps_rollup and also account
+    for anonymous pages shared copy-on-write with a pre-fork parent: pss
+    splits shared pages between the processes mapping them, private is what
+    this worker alone holds.
+    """
+    memory = {
+        "pid": os.getpid(),
+        # ru_maxrss is in KB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "rss_mb": None,
+        "shared_mb": None,
+        "pss_mb": None,
+        "private_mb": None,
+    }
+    try:
+        with open("/proc/self/statm") as f:
+            _, resident, shared = (int(v) for v in f.read().split()[:3])
+        page_mb = os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+        memory["rss_mb"] = round(resident * page_mb, 1)
+        memory["shared_mb"] = round(shared * page_mb, 1)
+    except (OSError, ValueError):
+        pass
+    try:
+        fields = {}
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1])
+        memory["pss_mb"] = round(fields["Pss"] / 1024, 1)
+        memory["private_mb"] = round(
+            (fields["Private_Clean"] + fields["Private_Dirty"]) / 1024, 1
+        )
+    except (OSError, ValueError, KeyError):
+        pass
+    return memory
+
+
 class AIDetectionModels:
     def __init__(self):
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
@@ -25,21 +82,54 @@ class AIDetectionModels:
 
         self.models_loaded = False
         self.loaded_models = {}  # Dictionary of loaded models
+        self.cold_start_seconds = None  # Wall time of the (parallel) model load
+        self._load_lock = threading.Lock()
+        self.direct_classifiers = {}  # model key -> DirectClassifier (shared inputs)
         self.forensic_analyzer = ForensicAnalyzer()
         self.device_id = device_id
+        self.preprocessor = ImagePreprocessor()
 
         # Initialize new advanced analyzers
         self.frequency_analyzer = FrequencyAnalyzer()
         self.quality_assessor = ImageQualityAssessor()
         self.smart_ensemble = SmartEnsemble()
+        self.latency_planner = LatencyPlanner()
+        # Re-times stages the planner keeps skipping, outside any request budget
+        self._probe_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="latency-probe")
+        self.model_latency_ms = {}  # model key -> EWMA inference time (cascade order)
+        # Raw model outputs and features for offline re-scoring (rescore.py)
+        self.feature_store = FeatureStore.from_config()
 
         logger.info("Advanced AI detection modules initialized")
 
     def load_models(self):
-        """Load verified models from registry"""
+        """Load verified models from registry (thread-safe, loads once)"""
         if self.models_loaded:
             return
 
+        # A request arriving during the background startup load waits for it
+        # instead of starting a second load
+        with self._load_lock:
+            if self.models_loaded:
+                return
+            start = time.perf_counter()
+            loaded = self._load_models()
+            self.cold_start_seconds = round(time.perf_counter() - start, 2)
+            logger.info(f"Model loading took {self.cold_start_seconds:.1f}s")
+            metrics.COLD_START_SECONDS.set(self.cold_start_seconds)
+            metrics.MODELS_LOADED.set(len(self.loaded_models))
+            if config.ENABLE_QUALITY_ENHANCEMENT and config.ENHANCEMENT_CALIBRATE_TIERS:
+                # Outside any request: the seed costs may not fit this host
+                try:
+                    self.quality_assessor.calibrate_denoise_tiers()
+                except Exception as e:
+                    logger.warning(f"Denoise tier calibration failed: {e}")
+            # Set last: /ready and the fast path above read the flag without
+            # the lock, so everything it vouches for must already be in place
+            self.models_loaded = loaded
+
+    def _load_models(self) -> bool:
+        """Load verified models from registry (False if loading failed)"""
         try:
             logger.info("Loading verified AI detection models...")
 
@@ -67,7 +157,8 @@ class AIDetectionModels:
                     device=self.device_id, try_all=config.LOAD_ALL_MODELS
                 )
 
-            self.models_loaded = True
+            if config.SHARED_MODEL_INPUTS:
+                self._build_direct_classifiers()
 
             if not self.loaded_models:
                 logger.warning("⚠️  No models loaded - using forensics only")
@@ -76,12 +167,24 @@ class AIDetectionModels:
                 logger.info(
                     f"✓ Loaded {len(self.loaded_models)} model(s): {model_names}"
                 )
+            return True
 
         except Exception as e:
             logger.error(f"Error loading models: {e}")
             logger.info("Continuing with forensics-only mode")
-
-    def detect(self, image: Image.Image, image_bytes: Optional[bytes] = None) -> dict:
+            return False
+
+    @tracing.traced("detect")
+    def detect(
+        self,
+        image: Union[Image.Image, PreparedImage],
+        image_bytes: Optional[bytes] = None,
+        enhance: Optional[bool] = None,
+        enhancement_budget_ms: Optional[float] = None,
+        cascade: Optional[bool] = None,
+        latency_budget_ms: Optional[float] = None,
+        heatmaps: Optional[bool] = None,
+    ) -> dict:
         """
         Detect if image is AI-generated or manipulated
 
@@ -92,133 +195,280 @@ class AIDetectionModels:
         - Cross-model consistency checking
 
         Args:
-            image: PIL Image
+            image: PreparedImage from ImagePreprocessor, or a PIL Image
+                   (prepared here)
             image_bytes: Optional raw image bytes for forensic analysis
+            enhance: Enable quality enhancement (defaults to
+                     ENABLE_QUALITY_ENHANCEMENT)
+            enhancement_budget_ms: Denoising time budget (defaults to
+                                   ENHANCEMENT_BUDGET_MS)
+            cascade: Run models cheapest-first with early exit (defaults to
+                     ENABLE_MODEL_CASCADE)
+            latency_budget_ms: Time left for the pipeline; stages that do not
+                               fit are skipped and listed in skippedStages
+                               (defaults to no budget)
+            heatmaps: Add per-tile forensic heatmaps to forensicAnalysis
+                      (defaults to FORENSIC_HEATMAPS)
 
         Returns:
             dict with verdict, confidence, model_scores, and forensic_analysis
         """
         self.load_models()
-        logger.info("[DEBUG] ===== STARTING DETECTION =====")
-        logger.info(f"[DEBUG] Image size: {image.size}, mode: {image.mode}")
-        logger.info(f"[DEBUG] Models loaded: {len(self.loaded_models)}")
-        logger.info(f"[DEBUG] Forensics enabled: {config.ENABLE_FORENSICS}")
+        prepared = (
+            image
+            if isinstance(image, PreparedImage)
+            else self.preprocessor.prepare(image)
+        )
+        logger.debug(
+            "Detecting on variants %s with %d model(s), forensics %s",
+            prepared.variant_sizes, len(self.loaded_models), config.ENABLE_FORENSICS,
+        )
+
+        if enhance is None:
+            enhance = config.ENABLE_QUALITY_ENHANCEMENT
+        # Plan the stages that fit the latency budget from live phase estimates
+        started = time.perf_counter()
+        deadline = (
+            started + latency_budget_ms / 1000 if latency_budget_ms is not None else None
+        )
+        plan = self.latency_planner.plan(
+            latency_budget_ms,
+            model_weights={
+                key: info["config"].get("weight", 0.25)
+                for key, info in self.loaded_models.items()
+            },
+            enhance=enhance,
+            forensics_enabled=config.ENABLE_FORENSICS,
+            forensic_tiles=bool(prepared.forensic_tiles),
+        )
+        skipped_stages = list(plan.skipped_stages)
+        timings = {}  # phase -> ms, for the request summary
+        if plan.budget_ms is not None:
+            logger.debug(
+                "Latency budget %.0f ms: estimated %.0f ms, skipping %s",
+                plan.budget_ms, plan.estimated_ms, skipped_stages or "nothing",
+            )
+        if enhancement_budget_ms is None:
+            enhancement_budget_ms = plan.enhancement_budget_ms
+        elif plan.enhancement_budget_ms is not None:
+            enhancement_budget_ms = min(enhancement_budget_ms, plan.enhancement_budget_ms)
 
         # ============================================================
         # PHASE 1: IMAGE QUALITY ASSESSMENT AND ENHANCEMENT
         # ============================================================
-        logger.info("[DEBUG] ===== PHASE 1 START =====")
-        logger.info("Phase 1: Quality assessment and enhancement...")
-        enhanced_image, quality_report = self.quality_assessor.assess_and_enhance(image)
-        logger.info(
-            f"Quality: {quality_report['overall_quality']:.2f}, "
-            f"Enhancement: {quality_report.get('enhancement_applied', 'none')}"
+        # Pixel statistics computed once and shared by quality assessment and
+        # forensics whenever both analyze the same variant
+        forensic_stats = ImageStatistics(prepared.forensic)
+        quality_stats = (
+            forensic_stats
+            if prepared.quality is prepared.forensic
+            else ImageStatistics(prepared.quality)
+        )
+        phase_start = time.perf_counter()
+        with tracing.span("quality", enhance=plan.enhance) as span:
+            enhanced_image, quality_report = self.quality_assessor.assess_and_enhance(
+                prepared.model,
+                assess_image=prepared.quality,
+                enhance=plan.enhance,
+                budget_ms=enhancement_budget_ms,
+                stats=quality_stats,
+            )
+            span.set_attributes(
+                enhancement=str(quality_report.get("enhancement_applied", "none")),
+                denoise_ms=float(quality_report.get("denoise_ms", 0.0)),
+            )
+        # Denoising has its own budgeted cost model; the phase estimate covers the rest
+        denoise_ms = quality_report.get("denoise_ms", 0.0)
+        self._record_phase("quality", (time.perf_counter() - phase_start) * 1000 - denoise_ms, timings)
+        if denoise_ms:
+            metrics.observe_phase("denoise", denoise_ms)
+            timings["denoise"] = denoise_ms
+        quality_report.analysis_tiers = prepared.tiers
+        logger.debug(
+            "Quality: %.2f, enhancement: %s",
+            quality_report.overall_quality, quality_report.get("enhancement_applied", "none"),
         )
-        logger.info("[DEBUG] ===== PHASE 1 COMPLETE =====")
 
         # ============================================================
-        # PHASE 2: FORENSIC ANALYSIS (on original image)
+        # PHASE 2: FORENSIC ANALYSIS (on forensic-sized image)
         # ============================================================
-        forensics = {}
-        if config.ENABLE_FORENSICS:
-            logger.info("[DEBUG] ===== PHASE 2 START =====")
-            logger.info("Phase 2: Forensic analysis...")
-            logger.info(f"[DEBUG] Calling forensic_analyzer.analyze()...")
-            forensics = self.forensic_analyzer.analyze(image, image_bytes)
-            logger.info(
-                f"Manipulation likelihood: {forensics.get('manipulation_likelihood', 0):.3f}"
+        forensics = None
+        if plan.forensics:
+            native_tiles = prepared.forensic_tiles if plan.forensic_tiles else None
+            phase_start = time.perf_counter()
+            with tracing.span("forensics", deep=bool(native_tiles)):
+                forensics = self.forensic_analyzer.analyze(
+                    prepared.forensic,
+                    image_bytes,
+                    native_tiles=native_tiles,
+                    stats=forensic_stats,
+                    heatmaps=heatmaps,
+                )
+            self._record_phase(
+                "forensics_deep" if native_tiles else "forensics",
+                (time.perf_counter() - phase_start) * 1000,
+                timings,
             )
-            logger.info("[DEBUG] ===== PHASE 2 COMPLETE =====")
-        else:
-            logger.info("[DEBUG] ===== PHASE 2 SKIPPED (FORENSICS DISABLED) =====")
+            logger.debug(
+                "Manipulation likelihood: %.3f", forensics.get("manipulation_likelihood", 0)
+            )
+
+        # Per-stat timing breakdown of the shared statistics layer
+        quality_report.statistics_timing_ms = {
+            "shared": quality_stats is forensic_stats,
+            "quality": dict(quality_stats.timings),
+            "forensic": dict(forensic_stats.timings),
+        }
 
         # ============================================================
-        # PHASE 3: FREQUENCY DOMAIN ANALYSIS (on enhanced image)
+        # PHASE 3: FREQUENCY DOMAIN ANALYSIS (on frequency-sized image)
         # ============================================================
-        logger.info("[DEBUG] ===== PHASE 3 START =====")
-        logger.info("Phase 3: Frequency domain analysis...")
-        frequency_analysis = self.frequency_analyzer.analyze(enhanced_image)
-        logger.info(
-            f"Frequency AI score: {frequency_analysis.get('frequency_ai_score', 0):.3f}"
-        )
-        logger.info("[DEBUG] ===== PHASE 3 COMPLETE =====")
+        # Runs on the un-enhanced variant: denoising/CLAHE alter exactly the
+        # high-frequency statistics the DCT/FFT checks measure
+        if plan.frequency:
+            phase_start = time.perf_counter()
+            with tracing.span("frequency"):
+                frequency_analysis = self.frequency_analyzer.analyze(prepared.frequency)
+            self._record_phase("frequency", (time.perf_counter() - phase_start) * 1000, timings)
+            frequency_ai_score = frequency_analysis.get("frequency_ai_score", 0.5)
+            logger.debug("Frequency AI score: %.3f", frequency_ai_score)
+        else:
+            # Over budget: the final score is the ensemble score alone
+            frequency_analysis = FrequencyResult(skipped=True)
+            frequency_ai_score = None
 
         # ============================================================
         # PHASE 4: MODEL-BASED DETECTION (on enhanced image)
         # ============================================================
-        logger.info("[DEBUG] ===== PHASE 4 START =====")
-        logger.info("Phase 4: Running detection models...")
         model_scores = {}
         all_predictions = []
-
-        # Run all loaded models on enhanced image
-        for model_key, model_info in self.loaded_models.items():
-            try:
-                logger.info(f"[DEBUG] Running model: {model_key}")
-                logger.info(f"Running {model_key} model: {model_info['name']}")
-                predictions = self._run_model(enhanced_image, model_info)
-
-                if predictions:
-                    # Extract AI score and confidence for this model
-                    ai_score = self._extract_ai_score_from_predictions(predictions)
-                    confidence = self._calculate_model_confidence(predictions)
-                    deepfake_score = self._extract_deepfake_score(
-                        predictions, model_key
-                    )
-
-                    all_predictions.append(
-                        {
-                            "model": model_key,
-                            "predictions": predictions,
-                            "weight": model_info["config"].get("weight", 0.25),
-                            "ai_score": ai_score,
-                            "deepfake_score": deepfake_score,
-                            "confidence": confidence,
-                        }
+        # One input tensor per distinct preprocessing, shared by its model group
+        pixel_values = SharedPixelValues(enhanced_image)
+        models_start = time.perf_counter()
+
+        if cascade is None:
+            cascade = config.ENABLE_MODEL_CASCADE
+        # Cascade: cheapest models first, stop as soon as the remaining ones
+        # can no longer move the final score across the AI threshold
+        order = self._cascade_order() if cascade else list(self.loaded_models)
+        if plan.models is not None:
+            order = [key for key in order if key in plan.models]
+        skipped = []
+        bounds = None
+        bounds_ms = 0.0
+
+        with tracing.span("models", cascade=bool(cascade), planned=len(order)) as span:
+            # Run all loaded models on enhanced image
+            for index, model_key in enumerate(order):
+                model_info = self.loaded_models[model_key]
+                if deadline is not None and not self._fits_deadline(model_key, deadline):
+                    # Earlier phases ran over their estimates: drop what no longer fits
+                    skipped_stages.append(f"model:{model_key}")
+                    logger.debug("Skipping %s: over latency budget", model_key)
+                    continue
+                try:
+                    logger.debug("Running %s model: %s", model_key, model_info["name"])
+                    start = time.perf_counter()
+                    direct = self.direct_classifiers.get(model_key)
+                    with tracing.span(
+                        f"model:{model_key}",
+                        model=model_info["name"],
+                        backend=model_info.get("backend", "torch"),
+                        direct=direct is not None,
+                    ):
+                        if direct is not None:
+                            predictions = self._run_direct(direct, pixel_values)
+                        else:
+                            predictions = self._run_model(enhanced_image, model_info)
+                    elapsed_ms = (time.perf_counter() - start) * 1000
+                    self._record_model_latency(model_key, elapsed_ms)
+                    timings[f"model:{model_key}"] = elapsed_ms
+
+                    if predictions:
+                        # Extract AI score and confidence for this model
+                        ai_score = self._extract_ai_score_from_predictions(predictions)
+                        confidence = self._calculate_model_confidence(predictions)
+                        deepfake_score = self._extract_deepfake_score(
+                            predictions, model_key
+                        )
+
+                        all_predictions.append(
+                            {
+                                "model": model_key,
+                                "predictions": predictions,
+                                "weight": model_info["config"].get("weight", 0.25),
+                                "ai_score": ai_score,
+                                "deepfake_score": deepfake_score,
+                                "confidence": confidence,
+                            }
+                        )
+                        model_scores[f"{model_key}_predictions"] = predictions
+
+                except Exception as e:
+                    logger.error(f"Error running {model_key}: {e}")
+
+                pending = order[index + 1:]
+                if (
+                    cascade
+                    and all_predictions
+                    and 0 < len(pending) <= config.CASCADE_MAX_PENDING
+                ):
+                    start = time.perf_counter()
+                    bounds = self._cascade_bounds(
+                        all_predictions, pending, quality_report, forensics, frequency_ai_score
                     )
-                    model_scores[f"{model_key}_predictions"] = predictions
-
-            except Exception as e:
-                logger.error(f"Error running {model_key}: {e}")
-
-        logger.info(f"[DEBUG] ===== PHASE 4 COMPLETE (ran {len(all_predictions)} models) =====")
+                    bounds_ms += (time.perf_counter() - start) * 1000
+                    margin = config.CASCADE_SCORE_MARGIN
+                    if (
+                        bounds[0] - margin >= config.AI_GENERATED_THRESHOLD
+                        or bounds[1] + margin < config.AI_GENERATED_THRESHOLD
+                    ):
+                        skipped = pending
+                        logger.debug(
+                            "Cascade exit after %s: final score in [%.3f, %.3f], skipping %s",
+                            model_key, bounds[0], bounds[1], skipped,
+                        )
+                        break
+            span.set_attributes(ran=len(all_predictions), cascade_skipped=len(skipped))
+
+        timings["models"] = (time.perf_counter() - models_start) * 1000
+        metrics.observe_phase("models", timings["models"])
 
         # ============================================================
         # PHASE 5: SMART ENSEMBLE COMBINATION
         # ============================================================
-        logger.info("[DEBUG] ===== PHASE 5 START =====")
-        logger.info("Phase 5: Smart ensemble combination...")
+        phase_start = time.perf_counter()
 
         # Use smart ensemble instead of simple weighted average
-        ensemble_result = self.smart_ensemble.combine_predictions(
-            model_predictions=all_predictions,
-            image_quality=quality_report,
-            forensics=forensics,
-        )
+        with tracing.span("ensemble", models=len(all_predictions)):
+            ensemble_result = self.smart_ensemble.combine_predictions(
+                model_predictions=all_predictions,
+                image_quality=quality_report,
+                forensics=forensics,
+            )
 
         verdict = ensemble_result["verdict"]
         confidence = ensemble_result["confidence"]
         scores = ensemble_result["scores"]
-        logger.info(f"[DEBUG] Ensemble verdict: {verdict}, confidence: {confidence:.3f}")
-        logger.info("[DEBUG] ===== PHASE 5 COMPLETE =====")
+        logger.debug("Ensemble verdict: %s, confidence: %.3f", verdict, confidence)
 
         # ============================================================
         # PHASE 6: INCORPORATE FREQUENCY ANALYSIS
         # ============================================================
         # Frequency analysis provides additional signal
-        frequency_ai_score = frequency_analysis.get("frequency_ai_score", 0.5)
-
-        # Blend frequency score into AI score (20% weight)
-        adjusted_ai_score = 0.8 * scores["ai_generated"] + 0.2 * frequency_ai_score
+        # Blend frequency score into AI score (FREQUENCY_ANALYSIS_WEIGHT)
+        adjusted_ai_score = self._blend_frequency(scores["ai_generated"], frequency_ai_score)
         scores["ai_generated"] = float(adjusted_ai_score)
 
         # Re-evaluate verdict if frequency analysis is strongly conclusive
-        if frequency_ai_score > 0.8 and scores["ai_generated"] < 0.6:
-            logger.info("Frequency analysis suggests AI - adjusting verdict")
+        if frequency_ai_score is None:
+            pass
+        elif frequency_ai_score > 0.8 and scores["ai_generated"] < 0.6:
+            logger.debug("Frequency analysis suggests AI - adjusting verdict")
             verdict = "AI_GENERATED"
             confidence = max(confidence, frequency_ai_score * 0.8)
         elif frequency_ai_score < 0.2 and scores["ai_generated"] > 0.4:
-            logger.info("Frequency analysis suggests REAL - adjusting verdict")
+            logger.debug("Frequency analysis suggests REAL - adjusting verdict")
             if verdict == "AI_GENERATED":
                 verdict = "UNCERTAIN"
                 confidence = 0.5
@@ -229,9 +479,10 @@ class AIDetectionModels:
             "deepfake_score": scores["deepfake"],
             "manipulation_score": scores["manipulation"],
             "authenticity_score": scores["authenticity"],
-            "frequency_ai_score": frequency_ai_score,
             "ensemble_model_count": len(all_predictions),
         }
+        if frequency_ai_score is not None:
+            model_scores["frequency_ai_score"] = frequency_ai_score
 
         # Track individual model scores for transparency (no verdicts)
         individual_model_scores = {}
@@ -249,29 +500,77 @@ class AIDetectionModels:
         if "ensemble_metadata" in ensemble_result:
             model_scores["ensemble_metadata"] = ensemble_result["ensemble_metadata"]
 
+        if cascade:
+            model_scores["cascade"] = self._cascade_report(order, skipped, bounds, bounds_ms)
+
         # Calculate ensemble score (0-1 scale, where higher = more likely AI)
         ensemble_score = float(scores["ai_generated"])
 
-        # Convert numpy types to Python natives for JSON serialization
-        forensics_clean = self._convert_numpy_types(forensics)
-        model_scores_clean = self._convert_numpy_types(model_scores)
-        frequency_clean = self._convert_numpy_types(frequency_analysis)
-        quality_clean = self._convert_numpy_types(quality_report)
+        self._record_phase("ensemble", (time.perf_counter() - phase_start) * 1000, timings)
+        self._observe_request(forensic_stats, quality_stats, pixel_values, skipped_stages, skipped)
+        if plan.probes:
+            self._probe_executor.submit(
+                self._probe_stages, plan.probes, prepared, image_bytes, enhanced_image
+            )
+
+        if self.feature_store is not None:
+            try:
+                self.feature_store.append(
+                    feature_row(
+                        all_predictions,
+                        quality_report,
+                        forensics,
+                        frequency_analysis,
+                        ensemble_score,
+                        image_bytes,
+                    )
+                )
+            except Exception as e:
+                logger.warning(f"Feature store append failed: {e}")
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if logger.isEnabledFor(logging.INFO):
+            # One record per request; LOG_FORMAT=json emits "detection" as fields
+            logger.info(
+                "Detection complete in %.0f ms: ensemble score %.3f, %d model(s)",
+                elapsed_ms, ensemble_score, len(all_predictions),
+                extra={"detection": {
+                    "elapsed_ms": round(elapsed_ms, 1),
+                    "timings_ms": {phase: round(ms, 1) for phase, ms in timings.items()},
+                    "image_bytes": len(image_bytes) if image_bytes else None,
+                    "image_size": list(prepared.original_size),
+                    "enhancement": quality_report.get("enhancement_applied", "none"),
+                    "models": [prediction["model"] for prediction in all_predictions],
+                    "cascade_skipped": skipped,
+                    "skipped_stages": skipped_stages,
+                    "ensemble_score": round(ensemble_score, 4),
+                    "frequency_score": frequency_ai_score,
+                    "manipulation_score": round(float(scores["manipulation"]), 4),
+                }},
+            )
+
+        metadata = {
+            "models_used": len(all_predictions),
+            "forensics_enabled": config.ENABLE_FORENSICS,
+            "device": self.device,
+        }
+        if plan.budget_ms is not None:
+            metadata["latency_plan"] = {
+                **plan.to_dict(),
+                "skipped_stages": skipped_stages,
+                "elapsed_ms": round(elapsed_ms, 1),
+            }
 
-        logger.info("[DEBUG] ===== DETECTION COMPLETE - RETURNING RESULT =====")
-        
         # Return RAW METRICS ONLY - no verdict or confidence
+        # (native Python types throughout: rendered as-is by serialization.py)
         return {
-            "modelScores": model_scores_clean,
+            "modelScores": model_scores,
             "ensembleScore": ensemble_score,
-            "forensicAnalysis": forensics_clean,
-            "frequencyAnalysis": frequency_clean,
-            "qualityMetrics": quality_clean,
-            "metadata": {
-                "models_used": len(all_predictions),
-                "forensics_enabled": config.ENABLE_FORENSICS,
-                "device": self.device,
-            },
+            "forensicAnalysis": forensics.to_dict() if forensics is not None else {},
+            "frequencyAnalysis": frequency_analysis.to_dict(),
+            "qualityMetrics": quality_report.to_dict(),
+            "metadata": metadata,
+            "skippedStages": skipped_stages,
         }
 
     def _run_model(self, image: Image.Image, model_info: Dict) -> list:
@@ -280,14 +579,208 @@ class AIDetectionModels:
             model = model_info["model"]
             results = model(image)
 
-            # Log raw predictions
-            logger.info(f"Raw predictions: {results[:3]}")  # Log top 3
+            logger.debug("Raw predictions: %s", results[:3])
+
+            return results
+        except Exception as e:
+            logger.error(f"Error running model: {e}")
+            return []
+
+    @staticmethod
+    def _blend_frequency(
+        ensemble_ai_score: float, frequency_ai_score: Optional[float]
+    ) -> float:
+        """Phase 6 blend of the ensemble and frequency AI scores (None = frequency skipped)"""
+        return blend_frequency(ensemble_ai_score, frequency_ai_score)
+
+    def _fits_deadline(self, model_key: str, deadline: float) -> bool:
+        """Whether the model (plus the ensemble phase after it) fits before the deadline"""
+        remaining_ms = (deadline - time.perf_counter()) * 1000
+        cost_ms = self.latency_planner.model_estimate(model_key)
+        return cost_ms + self.latency_planner.estimate("ensemble") <= remaining_ms
+
+    def _probe_stages(
+        self,
+        stages: List[str],
+        prepared: PreparedImage,
+        image_bytes: Optional[bytes],
+        enhanced_image: Image.Image,
+    ):
+        """
+        Re-time stages the latency planner keeps skipping (background thread)
+
+        Runs after the request that was planned without them, so the timing
+        is outside any request budget; results are discarded and only the
+        planner estimates are updated (request metrics are not).
+        """
+        try:
+            for stage in stages:
+                start = time.perf_counter()
+                if stage == "frequency":
+                    self.frequency_analyzer.analyze(prepared.frequency)
+                elif stage == "forensics":
+                    self.forensic_analyzer.analyze(prepared.forensic, image_bytes)
+                elif stage == "forensics_deep":
+                    if not prepared.forensic_tiles:
+                        continue  # Probed again with the next image that has native tiles
+                    self.forensic_analyzer.analyze(
+                        prepared.forensic, image_bytes, native_tiles=prepared.forensic_tiles
+                    )
+                elif stage.startswith("model:"):
+                    model_key = stage[len("model:"):]
+                    model_info = self.loaded_models.get(model_key)
+                    if model_info is None:
+                        continue
+                    direct = self.direct_classifiers.get(model_key)
+                    if direct is not None:
+                        self._run_direct(direct, SharedPixelValues(enhanced_image))
+                    else:
+                        self._run_model(enhanced_image, model_info)
+                    self.latency_planner.record_model(
+                        model_key, (time.perf_counter() - start) * 1000
+                    )
+                    continue
+                else:
+                    continue
+                self.latency_planner.record(stage, (time.perf_counter() - start) * 1000)
+            logger.debug("Latency probe re-timed %s", stages)
+        except Exception as e:
+            logger.warning("Latency probe failed: %s", e)
+        finally:
+            self.latency_planner.finish_probe(stages)
+
+    def _record_phase(self, stage: str, elapsed_ms: float, timings: Optional[dict] = None):
+        """Feed a phase timing to the latency planner, the phase histogram and timings"""
+        self.latency_planner.record(stage, elapsed_ms)
+        if timings is not None:
+            timings[stage] = elapsed_ms
+        # Tiled forensics is a planner cost model, not a separate phase
+        metrics.observe_phase("forensics" if stage == "forensics_deep" else stage, elapsed_ms)
+
+    @staticmethod
+    def _observe_request(
+        forensic_stats: ImageStatistics,
+        quality_stats: ImageStatistics,
+        pixel_values: SharedPixelValues,
+        skipped_stages: list,
+        cascade_skipped: list,
+    ):
+        """Per-request cache hit/miss counts and skipped work for /metrics"""
+        for stats in {id(s): s for s in (forensic_stats, quality_stats)}.values():
+            metrics.observe_cache("image_stats", stats.hits, stats.misses)
+        metrics.observe_cache("model_inputs", pixel_values.hits, pixel_values.misses)
+        for stage in skipped_stages:
+            metrics.SKIPPED_STAGES.labels(stage=stage).inc()
+        for model_key in cascade_skipped:
+            metrics.CASCADE_SKIPPED_MODELS.labels(model=model_key).inc()
+
+    def _record_model_latency(self, model_key: str, elapsed_ms: float):
+        """Update the running inference-time estimate used to order the cascade"""
+        metrics.MODEL_SECONDS.labels(model=model_key).observe(elapsed_ms / 1000)
+        self.latency_planner.record_model(model_key, elapsed_ms)
+        previous = self.model_latency_ms.get(model_key)
+        self.model_latency_ms[model_key] = (
+            elapsed_ms if previous is None else 0.8 * previous + 0.2 * elapsed_ms
+        )
+
+    def _cascade_order(self) -> list:
+        """Model keys cheapest first (models not timed yet go first to get measured)"""
+        return sorted(
+            self.loaded_models, key=lambda key: self.model_latency_ms.get(key, 0.0)
+        )
+
+    def _cascade_outcome(self, model_key: str, score: float) -> dict:
+        """
+        Hypothetical prediction of a pending model with the given AI score
+
+        Pending models are assumed to be binary AI/real classifiers (as all
+        configured models are), so their confidence follows from the score.
+        """
+        predictions = [
+            {"label": "fake", "score": score},
+            {"label": "real", "score": 1.0 - score},
+        ]
+        return {
+            "model": model_key,
+            "weight": self.loaded_models[model_key]["config"].get("weight", 0.25),
+            "ai_score": self._extract_ai_score_from_predictions(predictions),
+            "deepfake_score": self._extract_deepfake_score(predictions, model_key),
+            "confidence": self._calculate_model_confidence(predictions),
+        }
+
+    def _cascade_bounds(
+        self,
+        completed: list,
+        pending: list,
+        quality_report: QualityReport,
+        forensics: Optional[ForensicResult],
+        frequency_ai_score: Optional[float],
+    ) -> tuple:
+        """Range of the final (frequency-blended) AI score over the pending models' outcomes"""
+        low, high = self.smart_ensemble.ai_score_bounds(
+            completed,
+            [functools.partial(self._cascade_outcome, key) for key in pending],
+            image_quality=quality_report,
+            forensics=forensics,
+            grid_step=config.CASCADE_GRID_STEP,
+        )
+        return (
+            self._blend_frequency(low, frequency_ai_score),
+            self._blend_frequency(high, frequency_ai_score),
+        )
+
+    def _cascade_report(self, order: list, skipped: list, bounds, bounds_ms: float) -> dict:
+        """Models run/skipped and the estimated speedup of the model phase"""
+        def estimate(keys):
+            return sum(self.model_latency_ms.get(key, 0.0) for key in keys)
+
+        run = [key for key in order if key not in skipped]
+        run_ms = estimate(run) + bounds_ms
+        return {
+            "order": order,
+            "models_run": run,
+            "models_skipped": skipped,
+            "skipped_count": len(skipped),
+            "final_score_bounds": list(bounds) if bounds else None,
+            "bounds_ms": round(bounds_ms, 2),
+            "estimated_speedup": round(estimate(order) / run_ms, 3) if run_ms > 0 else 1.0,
+        }
+
+    def _run_direct(self, direct: DirectClassifier, pixel_values: SharedPixelValues) -> list:
+        """Run a model's forward pass on its group's shared input tensor"""
+        try:
+            results = direct(pixel_values.get(direct.spec))
+
+            logger.debug("Raw predictions: %s", results[:3])
 
             return results
         except Exception as e:
             logger.error(f"Error running model: {e}")
             return []
 
+    def _build_direct_classifiers(self):
+        """Group loaded models by input preprocessing for the shared-input path"""
+        self.direct_classifiers = {}
+        groups = {}
+        for model_key, model_info in self.loaded_models.items():
+            try:
+                if model_info.get("backend") == "onnx":
+                    direct = DirectClassifier.from_onnx(model_info["model"])
+                else:
+                    direct = DirectClassifier.from_pipeline(model_info["model"])
+            except Exception as e:
+                logger.warning(f"Shared inputs unavailable for {model_key}: {e}")
+                direct = None
+
+            if direct is None:
+                logger.info(f"{model_key}: preprocessing not shareable, using pipeline")
+                continue
+            self.direct_classifiers[model_key] = direct
+            groups.setdefault(direct.spec, []).append(model_key)
+
+        for spec, keys in groups.items():
+            logger.info(f"Shared input {spec.width}x{spec.height} (mean={spec.image_mean}): {keys}")
+
     def _ensemble_predict(self, all_predictions: list) -> tuple:
         """
         Combine predictions from multiple models using weighted ensemble
@@ -328,8 +821,8 @@ class AIDetectionModels:
             else 0.5
         )
 
-        logger.info(
-            f"Ensemble - AI score: {final_ai_score:.3f}, Deepfake score: {final_deepfake_score:.3f}"
+        logger.debug(
+            "Ensemble - AI score: %.3f, Deepfake score: %.3f", final_ai_score, final_deepfake_score
         )
 
         return float(final_ai_score), float(final_deepfake_score)
@@ -482,23 +975,6 @@ class AIDetectionModels:
         # Default to REAL with lower confidence for ambiguous cases
         return ("REAL", 1.0 - max_score)
 
-    def _convert_numpy_types(self, obj):
-        """Convert numpy types to Python native types for JSON serialization"""
-        if isinstance(obj, dict):
-            return {k: self._convert_numpy_types(v) for k, v in obj.items()}
-        elif isinstance(obj, list):
-            return [self._convert_numpy_types(item) for item in obj]
-        elif isinstance(obj, np.integer):
-            return int(obj)
-        elif isinstance(obj, np.floating):
-            return float(obj)
-        elif isinstance(obj, np.ndarray):
-            return obj.tolist()
-        elif isinstance(obj, np.bool_):
-            return bool(obj)
-        else:
-            return obj
-
     def get_model_status(self) -> dict:
         """Get status of loaded models"""
         loaded_model_names = [info["name"] for info in self.loaded_models.values()]
@@ -510,4 +986,28 @@ class AIDetectionModels:
             "device": self.device,
             "forensics_enabled": config.ENABLE_FORENSICS,
             "ensemble_enabled": config.USE_ENSEMBLE,
+            "quantization": {
+                info["name"]: info.get("quantization") or "fp32"
+                for info in self.loaded_models.values()
+            },
+            "backends": {
+                info["name"]: info.get("backend", "torch")
+                for info in self.loaded_models.values()
+            },
+            "shared_input_groups": len(
+                {direct.spec for direct in self.direct_classifiers.values()}
+            ),
+            "direct_models": sorted(self.direct_classifiers),
+            "cold_start_seconds": self.cold_start_seconds,
+            "model_load_seconds": {
+                info["name"]: info.get("load_seconds")
+                for info in self.loaded_models.values()
+            },
+            "memory": process_memory_mb(),
+            "prefork_worker": os.getenv("PREFORK_WORKER_ID"),
+            "phase_latency_ms": self.latency_planner.status(),
+            "feature_store": self.feature_store.status() if self.feature_store else None,
+            "metrics": metrics.status(),
+            "tracing": tracing.status(),
+            "model_latency_ms": self.latency_planner.model_status(),
         }
@@ -0,0 +1,213 @@
+"""
+ONNX Runtime Inference Backend
+
+Alternative to the PyTorch `transformers.pipeline` for image-classification
+models:
+1. `export` converts each model in config.MODELS to ONNX, saving the image
+   processor parameters and label mapping next to it (optionally also a
+   dynamically quantized INT8 copy)
+2. OnnxImageClassifier loads an export and returns the same
+   `[{label, score}]` list as the pipeline, with configurable intra/inter-op
+   threads and graph optimization level
+
+Usage:
+    python onnx_backend.py export                 # all models in config.MODELS
+    python onnx_backend.py export --models hemg --quantize
+"""
+import argparse
+import json
+import logging
+import os
+from typing import Any, Dict, List
+
+import numpy as np
+from PIL import Image
+
+import config
+from model_inputs import DirectClassifier, InputSpec, is_multi_label, pixel_values, processor_params
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model_int8.onnx"
+META_FILE = "meta.json"
+
+GRAPH_OPTIMIZATION_LEVELS = ("disabled", "basic", "extended", "all")
+
+
+def export_dir(model_name: str, output_dir: str = config.ONNX_MODEL_DIR) -> str:
+    """Directory holding the ONNX export of a HuggingFace model"""
+    return os.path.join(output_dir, model_name.replace("/", "__"))
+
+
+def is_exported(model_name: str, output_dir: str = config.ONNX_MODEL_DIR) -> bool:
+    directory = export_dir(model_name, output_dir)
+    return os.path.exists(os.path.join(directory, MODEL_FILE)) and os.path.exists(
+        os.path.join(directory, META_FILE)
+    )
+
+
+def export_model(
+    model_name: str,
+    output_dir: str = config.ONNX_MODEL_DIR,
+    opset: int = 14,
+    quantize: bool = False,
+) -> str:
+    """
+    Export a HuggingFace image-classification model to ONNX
+
+    Args:
+        model_name: HuggingFace model id
+        output_dir: Root directory for exports
+        opset: ONNX opset version
+        quantize: Also write a dynamically quantized INT8 model
+
+    Returns:
+        Export directory
+    """
+    import torch
+    from transformers import AutoImageProcessor, AutoModelForImageClassification
+
+    directory = export_dir(model_name, output_dir)
+    os.makedirs(directory, exist_ok=True)
+
+    logger.info(f"Exporting {model_name} to {directory}")
+    model = AutoModelForImageClassification.from_pretrained(model_name).eval()
+    processor = AutoImageProcessor.from_pretrained(model_name)
+    params = processor_params(processor)
+
+    class LogitsOnly(torch.nn.Module):
+        def __init__(self, wrapped):
+            super().__init__()
+            self.wrapped = wrapped
+
+        def forward(self, pixel_values):
+            return self.wrapped(pixel_values=pixel_values).logits
+
+    dummy = torch.zeros(1, 3, params["height"], params["width"])
+    torch.onnx.export(
+        LogitsOnly(model),
+        (dummy,),
+        os.path.join(directory, MODEL_FILE),
+        input_names=["pixel_values"],
+        output_names=["logits"],
+        dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=opset,
+    )
+
+    meta = {
+        "model_name": model_name,
+        "id2label": {str(k): v for k, v in model.config.id2label.items()},
+        # Score activation: sigmoid for multi-label / single-logit heads
+        "problem_type": model.config.problem_type,
+        "num_labels": model.config.num_labels,
+        "preprocessing": params,
+    }
+    with open(os.path.join(directory, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(
+            os.path.join(directory, MODEL_FILE),
+            os.path.join(directory, QUANTIZED_MODEL_FILE),
+            weight_type=QuantType.QInt8,
+        )
+
+    logger.info(f"✓ Exported {model_name}" + (" (+ INT8)" if quantize else ""))
+    return directory
+
+
+class OnnxImageClassifier:
+    """ONNX Runtime image classifier with the pipeline's call signature"""
+
+    def __init__(
+        self,
+        model_name: str,
+        output_dir: str = config.ONNX_MODEL_DIR,
+        quantized: bool = False,
+        intra_op_threads: int = config.ONNX_INTRA_OP_THREADS,
+        inter_op_threads: int = config.ONNX_INTER_OP_THREADS,
+        graph_optimization: str = config.ONNX_GRAPH_OPTIMIZATION,
+    ):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("onnxruntime package required for the ONNX backend") from e
+
+        if graph_optimization not in GRAPH_OPTIMIZATION_LEVELS:
+            raise ValueError(f"Unknown graph optimization level: {graph_optimization}")
+
+        directory = export_dir(model_name, output_dir)
+        with open(os.path.join(directory, META_FILE)) as f:
+            meta = json.load(f)
+
+        self.model_name = model_name
+        self.labels = [meta["id2label"][str(i)] for i in range(len(meta["id2label"]))]
+        self.spec = InputSpec.from_params(meta["preprocessing"])
+        # Exports without problem_type/num_labels predate them: softmax unless single-logit
+        self.multi_label = is_multi_label(
+            meta.get("problem_type"), meta.get("num_labels", len(self.labels))
+        )
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        options.graph_optimization_level = {
+            "disabled": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+            "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+            "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+            "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+        }[graph_optimization]
+
+        if quantized and not os.path.exists(os.path.join(directory, QUANTIZED_MODEL_FILE)):
+            logger.warning(f"No INT8 export for {model_name}, using fp32 (export with --quantize)")
+            quantized = False
+
+        model_file = QUANTIZED_MODEL_FILE if quantized else MODEL_FILE
+        self.session = ort.InferenceSession(
+            os.path.join(directory, model_file),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.quantized = quantized
+        self.direct = DirectClassifier(self.predict_logits, self.spec, self.labels, self.multi_label)
+
+    def preprocess(self, image: Image.Image) -> np.ndarray:
+        """Resize, rescale and normalize into a (1, 3, H, W) float32 tensor"""
+        return pixel_values(image, self.spec)
+
+    def predict_logits(self, pixel_values: np.ndarray) -> np.ndarray:
+        """Raw logits for a (N, 3, H, W) float32 batch"""
+        return self.session.run(["logits"], {"pixel_values": pixel_values})[0]
+
+    def __call__(self, image: Image.Image) -> List[Dict[str, Any]]:
+        return self.direct(self.preprocess(image))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX Runtime backend tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Export models in config.MODELS to ONNX")
+    export_parser.add_argument("--models", nargs="+", default=None, help="Model keys (default: all)")
+    export_parser.add_argument("--output-dir", default=config.ONNX_MODEL_DIR)
+    export_parser.add_argument("--opset", type=int, default=14)
+    export_parser.add_argument("--quantize", action="store_true", help="Also write an INT8 model")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    if args.command == "export":
+        keys = args.models or list(config.MODELS)
+        for key in keys:
+            try:
+                export_model(config.MODELS[key], args.output_dir, args.opset, args.quantize)
+            except ValueError as e:
+                # Preprocessing the runtime adapter cannot reproduce exactly
+                logger.warning(f"Skipping {key}: {e}")
+
+
+if __name__ == "__main__":
+    main()
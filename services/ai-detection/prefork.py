@@ -0,0 +1,224 @@
+"""
+Pre-fork Server for the AI Detection Service
+
+Runs N uvicorn workers that share one copy of the model weights:
+1. The parent process loads every model once, then freezes the GC so
+   collections in the workers do not touch (and thereby copy) the objects
+   created during loading
+2. The parent binds the listening socket and forks N workers; model
+   tensors are shared copy-on-write, so RAM grows with per-request working
+   memory instead of with the number of workers
+3. Each worker is pinned to its own slice of the CPUs, with torch
+   intra-op and OpenCV thread counts to match (its inference lanes are
+   carved out of that slice)
+4. The parent supervises the workers and re-forks crashed ones from its
+   already loaded state, without reading weights from disk again
+
+Usage:
+    python prefork.py --workers 4 --port 8000
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from collections import deque
+from typing import Dict
+
+import config
+import log_setup
+import metrics
+from resources import available_cpus, partition_cpus
+
+logger = logging.getLogger("prefork")
+
+
+def threads_per_worker(workers: int, configured: int = config.PREFORK_THREADS_PER_WORKER) -> int:
+    """Torch intra-op threads per worker: configured, or an even split of the CPUs"""
+    if configured > 0:
+        return configured
+    return max(1, len(available_cpus()) // workers)
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """Listening socket shared by all workers"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def configure_worker_threads(worker_id: int, workers: int, threads: int):
+    """Partition CPUs and threads for this worker (called in the child after fork)"""
+    import cv2
+    import torch
+
+    if config.RESOURCE_PIN_AFFINITY and hasattr(os, "sched_setaffinity"):
+        # Pin the worker to its share of the CPUs; its inference lanes are
+        # then carved out of this share
+        cpus = available_cpus()
+        if len(cpus) >= workers:
+            os.sched_setaffinity(0, partition_cpus(cpus, worker_id, workers))
+
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Inter-op pool already started in the parent; keep its size
+        pass
+    cv2.setNumThreads(threads)
+
+
+def run_worker(
+    worker_id: int, workers: int, sock: socket.socket, threads: int, log_level: str
+):
+    """Worker process body: serve the already loaded app on the shared socket"""
+    import uvicorn
+
+    import main
+
+    os.environ["PREFORK_WORKER_ID"] = str(worker_id)
+    configure_worker_threads(worker_id, workers, threads)
+    logger.info(f"Worker {worker_id} (pid {os.getpid()}) serving with {threads} torch thread(s)")
+
+    server = uvicorn.Server(
+        uvicorn.Config(main.app, log_level=log_level.lower(), access_log=False)
+    )
+    server.run(sockets=[sock])
+
+
+class Supervisor:
+    """Forks workers from the loaded parent and re-forks them when they die"""
+
+    def __init__(self, sock: socket.socket, workers: int, threads: int, log_level: str):
+        self.sock = sock
+        self.workers = workers
+        self.threads = threads
+        self.log_level = log_level
+        self.children: Dict[int, int] = {}  # pid -> worker id
+        self.restarts = deque()  # restart timestamps in the last minute
+        self.stopping = False
+
+    def spawn(self, worker_id: int):
+        pid = os.fork()
+        if pid == 0:
+            # Child: default signal handling, then serve until told to stop
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                run_worker(worker_id, self.workers, self.sock, self.threads, self.log_level)
+            except Exception:
+                logger.exception(f"Worker {worker_id} crashed")
+                code = 1
+            finally:
+                os._exit(code)
+
+        self.children[pid] = worker_id
+        logger.info(f"Forked worker {worker_id} (pid {pid})")
+
+    def stop(self, signum, frame):
+        if self.stopping:
+            return
+        self.stopping = True
+        logger.info(f"Received signal {signum}, stopping {len(self.children)} worker(s)")
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _allow_restart(self) -> bool:
+        """Rate-limit re-forks so a worker that crashes on start cannot spin"""
+        now = time.monotonic()
+        while self.restarts and now - self.restarts[0] > 60:
+            self.restarts.popleft()
+        if len(self.restarts) >= config.PREFORK_MAX_RESTARTS_PER_MINUTE:
+            return False
+        self.restarts.append(now)
+        return True
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        for worker_id in range(self.workers):
+            self.spawn(worker_id)
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+
+            worker_id = self.children.pop(pid, None)
+            metrics.mark_process_dead(pid)
+            if worker_id is None or self.stopping:
+                continue
+
+            logger.warning(
+                f"Worker {worker_id} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)}"
+            )
+            if self._allow_restart():
+                self.spawn(worker_id)
+            else:
+                logger.error(
+                    f"Worker {worker_id} restarting too often "
+                    f"(>{config.PREFORK_MAX_RESTARTS_PER_MINUTE}/min), backing off"
+                )
+                time.sleep(5)
+                self.restarts.clear()
+                self.spawn(worker_id)
+
+        logger.info("All workers stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork server for the AI detection service")
+    parser.add_argument("--workers", type=int, default=config.PREFORK_WORKERS)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--threads-per-worker",
+        type=int,
+        default=config.PREFORK_THREADS_PER_WORKER,
+        help="Torch intra-op threads per worker (0 = split available CPUs evenly)",
+    )
+    args = parser.parse_args()
+
+    log_setup.configure()
+
+    # Load everything once in the parent, before any worker exists
+    import main as service
+
+    detector = service.get_models()
+    detector.load_models()
+    if not detector.loaded_models:
+        logger.warning("No models loaded - workers will run forensics only")
+
+    # Objects created so far live for the whole process lifetime: move them
+    # out of the collector's generations so GC passes in the workers never
+    # write to their pages
+    gc.collect()
+    gc.freeze()
+
+    threads = threads_per_worker(args.workers, args.threads_per_worker)
+    sock = bind_socket(args.host, args.port)
+    logger.info(
+        f"Models loaded in {detector.cold_start_seconds}s; forking {args.workers} worker(s) "
+        f"on {args.host}:{args.port} with {threads} thread(s) each ({len(available_cpus())} CPUs)"
+    )
+
+    Supervisor(sock, args.workers, threads, config.LOG_LEVEL).run()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
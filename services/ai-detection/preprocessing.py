@@ -0,0 +1,196 @@
+"""
+Request Preprocessing for the AI Detection Pipeline
+
+This module turns an uploaded image into the variants each downstream
+consumer needs, in a single pass:
+1. Decode and convert to RGB once
+2. Pad small images according to the configured padding policy
+3. Produce model-input, forensic, quality and frequency variants, largest
+   first, deriving each smaller variant from the previous one and sharing
+   the same image object whenever two consumers need the same size
+4. Size the analyzer variants with AnalysisResolutionPolicy and sample
+   native-resolution forensic tiles when the forensic variant is downscaled
+"""
+import logging
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+
+import config
+from resolution import AnalysisResolutionPolicy
+
+logger = logging.getLogger(__name__)
+
+
+RESAMPLING_FILTERS = {
+    "nearest": Image.Resampling.NEAREST,
+    "bilinear": Image.Resampling.BILINEAR,
+    "bicubic": Image.Resampling.BICUBIC,
+    "box": Image.Resampling.BOX,
+    "hamming": Image.Resampling.HAMMING,
+    "lanczos": Image.Resampling.LANCZOS,
+}
+
+PADDING_POLICIES = ("center", "edge", "none")
+
+
+@dataclass
+class PreparedImage:
+    """Image variants produced for a single detection request"""
+
+    source: Image.Image  # Decoded RGB image at native resolution (after padding)
+    model: Image.Image  # Input for the classification models / enhancement
+    forensic: Image.Image  # Input for forensic analysis
+    quality: Image.Image  # Input for quality assessment
+    frequency: Image.Image  # Input for DCT/FFT analysis
+    original_size: Tuple[int, int] = (0, 0)  # Size as uploaded
+    format: Optional[str] = None  # Upload format (JPEG, PNG, ...); also set on every variant
+    padded: bool = False
+    variant_sizes: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+    forensic_tiles: List[np.ndarray] = field(default_factory=list)  # Native-resolution crops
+    tiers: Dict[str, Dict[str, Any]] = field(default_factory=dict)  # Analysis tier per analyzer
+
+
+class ImagePreprocessor:
+    """Single, configurable preprocessing stage shared by all endpoints"""
+
+    def __init__(
+        self,
+        resampling: str = config.PREPROCESS_RESAMPLING,
+        min_size: int = config.PREPROCESS_MIN_SIZE,
+        padding: str = config.PREPROCESS_PADDING,
+        pad_color: Tuple[int, int, int] = config.PREPROCESS_PAD_COLOR,
+        model_size: Tuple[int, int] = config.MODEL_INPUT_SIZE,
+        policy: Optional[AnalysisResolutionPolicy] = None,
+    ):
+        if resampling not in RESAMPLING_FILTERS:
+            raise ValueError(f"Unknown resampling filter: {resampling}")
+        if padding not in PADDING_POLICIES:
+            raise ValueError(f"Unknown padding policy: {padding}")
+
+        self.resample = RESAMPLING_FILTERS[resampling]
+        self.min_size = min_size
+        self.padding = padding
+        self.pad_color = pad_color
+        self.model_size = model_size
+        self.policy = policy or AnalysisResolutionPolicy()
+
+    def prepare_bytes(self, image_bytes: bytes) -> PreparedImage:
+        """Decode raw upload bytes and prepare all variants"""
+        return self.prepare(Image.open(BytesIO(image_bytes)))
+
+    def prepare(self, image: Image.Image) -> PreparedImage:
+        """
+        Prepare all consumer variants of an image
+
+        Args:
+            image: PIL Image in any mode
+
+        Returns:
+            PreparedImage with one variant per downstream consumer
+        """
+        original_size = image.size
+        # Converted, padded and resized images have no format: carried over below
+        source_format = image.format
+
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+
+        image, padded = self._pad(image)
+
+        targets = {"model": self._fit_box(image.size, self.model_size)}
+        targets.update(self.policy.target_sizes(image.size))
+
+        # Resize largest targets first so each smaller variant is derived from
+        # an already reduced image instead of from the full-resolution source
+        variants = {}
+        current = image
+        for name, size in sorted(
+            targets.items(), key=lambda item: item[1][0] * item[1][1], reverse=True
+        ):
+            if current.size != size:
+                current = current.resize(size, self.resample, reducing_gap=3.0)
+            variants[name] = current
+
+        for variant in (image, *variants.values()):
+            variant.format = source_format
+
+        # Noise/compression checks need native pixels the downscaled forensic
+        # variant no longer has: give them a bounded set of full-resolution crops
+        forensic_tiles = []
+        if variants["forensic"] is not image:
+            # Crop before converting so only the tiles are copied, not the source
+            forensic_tiles = [
+                np.asarray(image.crop(box)) for box in self.policy.tile_boxes(image.size)
+            ]
+
+        tiers = {
+            name: self.policy.describe(
+                name,
+                image.size,
+                variants[name].size,
+                native_tiles=len(forensic_tiles) if name == "forensic" else 0,
+            )
+            for name in self.policy.pixel_budgets
+        }
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Prepared image %s -> %s, %d native forensic tiles",
+                original_size,
+                {name: img.size for name, img in variants.items()},
+                len(forensic_tiles),
+            )
+
+        return PreparedImage(
+            source=image,
+            model=variants["model"],
+            forensic=variants["forensic"],
+            quality=variants["quality"],
+            frequency=variants["frequency"],
+            original_size=original_size,
+            format=source_format,
+            padded=padded,
+            variant_sizes={name: img.size for name, img in variants.items()},
+            forensic_tiles=forensic_tiles,
+            tiers=tiers,
+        )
+
+    def _pad(self, image: Image.Image) -> Tuple[Image.Image, bool]:
+        """Pad images smaller than the minimum model size"""
+        width, height = image.size
+        if self.padding == "none" or (width >= self.min_size and height >= self.min_size):
+            return image, False
+
+        logger.warning(
+            f"Image too small ({image.size}), padding to at least "
+            f"{self.min_size}x{self.min_size} ({self.padding})"
+        )
+
+        pad_w = max(self.min_size - width, 0)
+        pad_h = max(self.min_size - height, 0)
+        border = (pad_w // 2, pad_h // 2, pad_w - pad_w // 2, pad_h - pad_h // 2)
+
+        if self.padding == "edge":
+            # Replicate border pixels so no artificial flat region is introduced
+            array = np.pad(
+                np.asarray(image),
+                ((border[1], border[3]), (border[0], border[2]), (0, 0)),
+                mode="edge",
+            )
+            return Image.fromarray(array), True
+
+        return ImageOps.expand(image, border=border, fill=self.pad_color), True
+
+    @staticmethod
+    def _fit_box(size: Tuple[int, int], box: Tuple[int, int]) -> Tuple[int, int]:
+        """Size that fits inside box keeping the aspect ratio (never upscales)"""
+        width, height = size
+        if width <= box[0] and height <= box[1]:
+            return size
+
+        scale = min(box[0] / width, box[1] / height)
+        return (max(1, round(width * scale)), max(1, round(height * scale)))
@@ -0,0 +1,282 @@
+"""
+On-demand Profiling of a Live Worker
+
+Backs the /admin/profile/* endpoints (ADMIN_TOKEN):
+1. cpu: samples the Python stack of every thread for a fixed time
+   (py-spy style, from inside the process) and folds the samples into
+   collapsed stacks ("frame;frame;frame count"), the input format of
+   flamegraph.pl, speedscope and inferno
+2. requests: cProfile of the next N detection requests, merged into one
+   pstats table (or the marshalled .prof file for snakeviz/flameprof)
+3. memory: tracemalloc for a fixed time, allocations still alive at the end
+   as collapsed stacks weighted by bytes, plus the top allocation sites
+
+Nothing is installed until a profile is requested: the request path only
+reads `requests.active`, and the sampler thread and tracemalloc exist only
+while a capture runs. One capture runs at a time per worker; under
+prefork.py the worker that receives the call profiles itself.
+"""
+import contextlib
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import config
+
+# Leaf frames of threads parked in a blocking wait (no CPU being spent)
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+_capture_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """Another capture is already running in this worker"""
+
+
+@contextlib.contextmanager
+def exclusive():
+    """Hold the per-worker capture slot for one profile"""
+    if not _capture_lock.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already being captured in this worker")
+    try:
+        yield
+    finally:
+        _capture_lock.release()
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)})"
+
+
+def fold(stacks: Dict[str, float]) -> str:
+    """Collapsed-stack text, heaviest stacks first"""
+    ordered = sorted(stacks.items(), key=lambda item: item[1], reverse=True)
+    return "\n".join(f"{stack} {int(weight)}" for stack, weight in ordered) + "\n"
+
+
+def _leaf_functions(stacks: Dict[str, float], limit: int) -> List[Dict]:
+    """Functions at the top of the sampled stacks (where time is spent)"""
+    leaves = Counter()
+    for stack, weight in stacks.items():
+        leaves[stack.rsplit(";", 1)[-1]] += weight
+    return [{"frame": frame, "samples": count} for frame, count in leaves.most_common(limit)]
+
+
+def sample_cpu(
+    seconds: float,
+    interval_ms: float = config.PROFILE_SAMPLE_INTERVAL_MS,
+    include_idle: bool = False,
+) -> Dict:
+    """
+    Sample every thread's stack for `seconds` (blocking; run off the event loop)
+
+    Args:
+        seconds: Capture length
+        interval_ms: Time between samples
+        include_idle: Keep samples of threads parked in a blocking wait
+
+    Returns:
+        {"samples", "duration_s", "interval_ms", "collapsed" (thread name
+        as root frame), "top" (leaf functions by samples)}
+    """
+    sampler = threading.get_ident()
+    interval = interval_ms / 1000
+    stacks = Counter()
+    samples = 0
+    started = time.monotonic()
+    deadline = started + seconds
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == sampler:
+                continue
+            code = frame.f_code
+            if not include_idle and (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                continue
+            frames = []
+            while frame is not None:
+                frames.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            frames.append(names.get(ident, f"thread-{ident}"))
+            stacks[";".join(reversed(frames))] += 1
+        samples += 1
+        time.sleep(interval)
+
+    return {
+        "samples": samples,
+        "duration_s": round(time.monotonic() - started, 3),
+        "interval_ms": interval_ms,
+        "collapsed": fold(stacks),
+        "top": _leaf_functions(stacks, 25),
+    }
+
+
+class RequestProfiler:
+    """cProfile of the next N requests, each profiled on its own lane thread"""
+
+    def __init__(self):
+        self.active = False  # Read on every request: the only cost when idle
+        self._remaining = 0
+        self._running = 0
+        self._profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def arm(self, count: int):
+        with self._lock:
+            self._profiles = []
+            self._remaining = count
+            self._done.clear()
+            self.active = True
+
+    def disarm(self) -> List[cProfile.Profile]:
+        with self._lock:
+            self.active = False
+            self._remaining = 0
+            profiles, self._profiles = self._profiles, []
+        return profiles
+
+    def wait(self, timeout: float) -> bool:
+        """Block until N requests were profiled or the timeout passed"""
+        return self._done.wait(timeout)
+
+    @contextlib.contextmanager
+    def profile(self):
+        """Profile the enclosed request if a capture still needs one"""
+        with self._lock:
+            claimed = self.active and self._remaining > 0
+            if claimed:
+                self._remaining -= 1
+                self._running += 1
+        if not claimed:
+            yield
+            return
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+            enabled = True
+        except ValueError:
+            # Another profiler already owns this thread
+            enabled = False
+        try:
+            yield
+        finally:
+            if enabled:
+                profile.disable()
+            with self._lock:
+                self._running -= 1
+                if self.active and enabled:
+                    self._profiles.append(profile)
+                if self._remaining == 0 and self._running == 0:
+                    self._done.set()
+
+
+requests = RequestProfiler()
+
+
+def profile_requests(count: int, timeout: float) -> Tuple[Optional[pstats.Stats], int]:
+    """
+    Profile the next `count` requests (blocking; run off the event loop)
+
+    Returns:
+        (merged stats or None when no request arrived, requests profiled)
+    """
+    requests.arm(count)
+    requests.wait(timeout)
+    # Requests that started in the last moment are dropped, not waited for
+    profiles = requests.disarm()
+    if not profiles:
+        return None, 0
+    stats = pstats.Stats(profiles[0])
+    for profile in profiles[1:]:
+        stats.add(profile)
+    return stats, len(profiles)
+
+
+def stats_table(stats: pstats.Stats, sort: str = "cumulative", limit: int = 40) -> str:
+    """pstats report text"""
+    buffer = io.StringIO()
+    stats.stream = buffer
+    stats.sort_stats(sort).print_stats(limit)
+    return buffer.getvalue()
+
+
+def stats_file(stats: pstats.Stats) -> bytes:
+    """Contents of a .prof file (what Stats.dump_stats writes)"""
+    return marshal.dumps(stats.stats)
+
+
+def _allocation_stacks(snapshot: tracemalloc.Snapshot) -> Dict[str, float]:
+    stacks = Counter()
+    for stat in snapshot.statistics("traceback"):
+        # tracemalloc keeps the most recent frame first
+        frames = [
+            f"{os.path.basename(frame.filename)}:{frame.lineno}"
+            for frame in reversed(stat.traceback)
+        ]
+        stacks[";".join(frames)] += stat.size
+    return stacks
+
+
+def _tracemalloc_filters() -> Iterable[tracemalloc.Filter]:
+    return (
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        tracemalloc.Filter(False, __file__),
+    )
+
+
+def capture_memory(seconds: float, frames: int = config.PROFILE_TRACEMALLOC_FRAMES) -> Dict:
+    """
+    Trace allocations for `seconds` (blocking; run off the event loop)
+
+    Only memory allocated during the capture and still alive at its end is
+    attributed. tracemalloc is stopped again unless it was already running
+    (PYTHONTRACEMALLOC).
+
+    Returns:
+        {"duration_s", "traced_mb", "peak_mb", "collapsed" (bytes per
+        stack), "top" (allocation sites)}
+    """
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start(frames)
+    try:
+        tracemalloc.reset_peak()
+        started = time.monotonic()
+        time.sleep(seconds)
+        snapshot = tracemalloc.take_snapshot().filter_traces(_tracemalloc_filters())
+        traced, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started_here:
+            tracemalloc.stop()
+
+    return {
+        "duration_s": round(time.monotonic() - started, 3),
+        "traced_mb": round(traced / 1e6, 2),
+        "peak_mb": round(peak / 1e6, 2),
+        "collapsed": fold(_allocation_stacks(snapshot)),
+        "top": [
+            {
+                "site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                "kb": round(stat.size / 1024, 1),
+                "blocks": stat.count,
+            }
+            for stat in snapshot.statistics("lineno")[:25]
+        ],
+    }
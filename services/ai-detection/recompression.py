@@ -0,0 +1,200 @@
+"""
+Recompression Forensics: Error Level Analysis and JPEG Ghosts
+
+Both checks re-encode the image as JPEG in memory and measure how much each
+16x16 block changes:
+1. Error Level Analysis (ELA): one re-encode at FORENSIC_ELA_QUALITY. In a
+   uniformly compressed image every block changes by a similar amount
+   relative to its texture; pasted or retouched regions stand out
+2. JPEG ghosts: the same difference over a sweep of qualities. A block last
+   quantized at quality q barely changes when re-encoded at q, so a region
+   compressed at a lower quality than the rest shows a second minimum
+   ("ghost") at that quality (Farid, 2009)
+
+Runs on luminance (JPEG quantizes luma at full resolution; the gray
+conversion uses the same BT.601 weights), on native tiles when the forensic
+image was downscaled since resampling destroys the 8x8 grid. Flat blocks and
+blocks with clipped pixels (where decoding clamped RGB, so gray no longer
+matches the stored luma) are left out. Each quality
+costs one encode/decode plus a few vectorized passes into work buffers
+shared by the whole sweep. Qualities are visited coarse to fine, ELA
+quality first, and the sweep stops before a quality that would exceed
+FORENSIC_RECOMPRESSION_MS_PER_MP.
+"""
+import logging
+import time
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+import config
+from image_stats import block_means
+from results import ForensicResult
+
+logger = logging.getLogger(__name__)
+
+
+def coarse_to_fine(qualities: List[int]) -> List[int]:
+    """Sorted qualities reordered so every prefix spans the range evenly"""
+    qualities = sorted(qualities)
+    if len(qualities) <= 2:
+        return qualities
+
+    order = [qualities[0], qualities[-1]]
+    intervals = [(0, len(qualities) - 1)]
+    while intervals:
+        next_intervals = []
+        for low, high in intervals:
+            if high - low > 1:
+                middle = (low + high) // 2
+                order.append(qualities[middle])
+                next_intervals += [(low, middle), (middle, high)]
+        intervals = next_intervals
+    return order
+
+
+class RecompressionAnalyzer:
+    """ELA and JPEG ghost analysis over a budgeted JPEG quality sweep"""
+
+    BLOCK_SIZE = 16  # Blocks compared (two JPEG blocks per side)
+    MIN_BLOCK_STD = 2.0  # Flat blocks barely change at any quality: ignored
+    MIN_BLOCKS = 64  # Fewer usable (textured, unclipped) blocks: no verdicts
+    ELA_RATIO_TOLERANCE = 3.0  # Error this many times off the block's expected error: outlier
+    ELA_MIN_DEVIATION = 1.0  # ... and off by at least this many gray levels (RMS)
+    ELA_OUTLIER_FRACTION = 0.05  # Outlier blocks above this fraction: inconsistent error levels
+    MIN_GHOST_QUALITIES = 4  # Fewer qualities in budget: no ghost analysis
+    GHOST_LEVEL = 0.15  # Normalized difference below which a block ghosts at a quality
+    GHOST_MIN_GAP = 10  # Ghost quality at least this far below the estimated quality
+    GHOST_MIN_BLOCKS = 16  # Ghosting blocks needed (a 64x64 region)
+    GHOST_MAX_FRACTION = 0.5  # More ghosting blocks: the image itself, not a region
+
+    def __init__(
+        self,
+        qualities: Optional[List[int]] = None,
+        ela_quality: int = config.FORENSIC_ELA_QUALITY,
+        budget_ms_per_mp: float = config.FORENSIC_RECOMPRESSION_MS_PER_MP,
+    ):
+        qualities = set(qualities or config.FORENSIC_RECOMPRESSION_QUALITIES)
+        self.ela_quality = ela_quality
+        self.budget_ms_per_mp = budget_ms_per_mp
+        self.sweep_order = [ela_quality] + [
+            q for q in coarse_to_fine(list(qualities)) if q != ela_quality
+        ]
+
+    def analyze(self, image: np.ndarray, results: ForensicResult, gray: Optional[np.ndarray] = None):
+        """
+        Run the quality sweep and fill the ela_* and jpeg_* fields of `results`
+
+        Args:
+            image: RGB or gray uint8 image (or vertically stacked native
+                   tiles) with its 8x8 JPEG grid at the origin
+            results: ForensicResult to fill
+            gray: Optional gray version of `image` (already computed)
+        """
+        start = time.perf_counter()
+        block = self.BLOCK_SIZE
+        rows, cols = image.shape[0] // block, image.shape[1] // block
+        if rows == 0 or cols == 0:
+            logger.debug("Image smaller than one block, skipping recompression analysis")
+            return
+        if gray is None:
+            gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if image.ndim == 3 else image
+        image = image[:rows * block, :cols * block]
+        gray = np.ascontiguousarray(gray[:rows * block, :cols * block])
+        budget_ms = self.budget_ms_per_mp * gray.size / 1e6
+
+        # Work buffers shared by every quality of the sweep
+        diff = np.empty_like(gray)
+        work = np.empty(gray.shape, np.float32)
+
+        # Usable blocks: textured (block std, from the same buffer) and with
+        # no clipped pixel
+        np.copyto(work, gray)
+        mean = block_means(work, block)
+        cv2.multiply(gray, gray, work, dtype=cv2.CV_32F)
+        texture = np.sqrt(np.maximum(block_means(work, block) - mean * mean, 0))
+        channels = image.shape[2] if image.ndim == 3 else 1
+        unclipped = cv2.inRange(image, (1,) * channels, (254,) * channels)
+        usable = (texture >= self.MIN_BLOCK_STD) & (
+            unclipped.reshape(rows, block, cols, block).min(axis=(1, 3)) > 0
+        )
+
+        errors: Dict[int, np.ndarray] = {}  # quality -> block mean squared difference
+        sweep_start = time.perf_counter()
+        for quality in self.sweep_order:
+            if errors:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                per_quality_ms = (time.perf_counter() - sweep_start) * 1000 / len(errors)
+                if elapsed_ms + per_quality_ms > budget_ms:
+                    break
+
+            ok, encoded = cv2.imencode(".jpg", gray, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            if not ok:
+                raise ValueError(f"JPEG encoding failed at quality {quality}")
+            cv2.absdiff(gray, cv2.imdecode(encoded, cv2.IMREAD_GRAYSCALE), diff)
+            if quality == self.ela_quality:
+                results.ela_mean_error = float(cv2.mean(diff)[0])
+            cv2.multiply(diff, diff, work, dtype=cv2.CV_32F)
+            errors[quality] = block_means(work, block)
+
+        results.ela_quality = self.ela_quality
+        if np.count_nonzero(usable) >= self.MIN_BLOCKS:
+            self._error_levels(errors[self.ela_quality], texture, usable, results)
+            if len(errors) >= self.MIN_GHOST_QUALITIES:
+                self._ghosts(errors, usable, results)
+        results.recompression_qualities = sorted(errors)
+        results.recompression_ms = round((time.perf_counter() - start) * 1000, 3)
+
+    def _error_levels(
+        self, errors: np.ndarray, texture: np.ndarray, usable: np.ndarray, results: ForensicResult
+    ):
+        """ELA: blocks whose error level, relative to their texture, is off the image's norm"""
+        # Expected error of a block: the image's median error/texture ratio
+        # times its texture. Outliers are off by a factor and by enough
+        # gray levels to rule out rounding noise (images that re-encode
+        # almost losslessly have none)
+        rms_errors = np.sqrt(errors[usable])
+        expected = float(np.median(rms_errors / texture[usable])) * texture[usable]
+        tolerance = self.ELA_RATIO_TOLERANCE
+        outliers = (np.abs(rms_errors - expected) > self.ELA_MIN_DEVIATION) & (
+            (rms_errors > expected * tolerance) | (rms_errors < expected / tolerance)
+        )
+        outlier_fraction = float(np.mean(outliers))
+
+        results.ela_outlier_fraction = outlier_fraction
+        results.ela_inconsistent = bool(outlier_fraction > self.ELA_OUTLIER_FRACTION)
+
+    def _ghosts(self, errors: Dict[int, np.ndarray], usable: np.ndarray, results: ForensicResult):
+        """JPEG ghosts: regions with a difference minimum well below the image's quality"""
+        qualities = sorted(errors)
+        stacked = np.stack([errors[q] for q in qualities])[:, usable]  # qualities x blocks
+
+        # Normalize each block's differences to [0, 1] over the sweep
+        low = stacked.min(axis=0)
+        span = np.maximum(stacked.max(axis=0) - low, 1e-6)
+        normalized = (stacked - low) / span
+
+        # Quality the image was last saved at: re-encoding at or above it
+        # changes most blocks about as little as anything in the sweep (the
+        # first quality where the median block is at its floor; an argmin
+        # is unstable there since gray from decoded RGB carries rounding noise)
+        at_floor = np.median(normalized, axis=1) < self.GHOST_LEVEL
+        estimated = qualities[int(at_floor.argmax())] if at_floor.any() else qualities[-1]
+
+        # Strongest ghost well below that quality
+        ghost_blocks, ghost_quality = 0, None
+        for index, quality in enumerate(qualities):
+            if quality > estimated - self.GHOST_MIN_GAP:
+                break
+            count = int(np.count_nonzero(normalized[index] < self.GHOST_LEVEL))
+            if count > ghost_blocks:
+                ghost_blocks, ghost_quality = count, quality
+        ghost_fraction = ghost_blocks / stacked.shape[1]
+
+        results.jpeg_estimated_quality = estimated
+        results.jpeg_ghost_fraction = ghost_fraction
+        results.jpeg_ghost_quality = ghost_quality
+        results.jpeg_ghost_detected = bool(
+            ghost_blocks >= self.GHOST_MIN_BLOCKS and ghost_fraction <= self.GHOST_MAX_FRACTION
+        )
@@ -0,0 +1,233 @@
+"""
+Offline Re-scoring over the Feature Store
+
+Replays the smart ensemble (Phase 5) and the frequency blend (Phase 6) over
+rows written by feature_store.FeatureStore, with threshold and weight
+overrides, and reports how the served scores and verdicts would change -
+no model inference involved.
+
+Models that did not run for a request (cascade exit, latency budget,
+failure) are NaN in the store and stay absent in the replay, so a replay
+without overrides reproduces the served scores.
+
+Usage:
+    python rescore.py --store ./feature_store
+    python rescore.py --store ./feature_store --set AI_GENERATED_THRESHOLD=0.55 \\
+        --set ENSEMBLE_LOW_CONFIDENCE=0.65 --weight hemg=0.3 --labels labels.csv
+"""
+import argparse
+import csv
+import json
+import logging
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import config
+from ensemble import SmartEnsemble, blend_frequency
+from feature_store import load_features, model_column, stored_models
+
+# config name -> SmartEnsemble attribute
+ENSEMBLE_SETTINGS = {
+    "ENSEMBLE_LOW_CONFIDENCE": "LOW_CONFIDENCE_THRESHOLD",
+    "ENSEMBLE_HIGH_CONFIDENCE": "HIGH_CONFIDENCE_THRESHOLD",
+    "ENSEMBLE_MIN_CONSENSUS": "MIN_CONSENSUS_STRENGTH",
+    "ENSEMBLE_OUTLIER_THRESHOLD": "OUTLIER_DEVIATION_THRESHOLD",
+    "ENSEMBLE_AI_THRESHOLD": "AI_GENERATED_THRESHOLD",
+    "DEEPFAKE_THRESHOLD": "DEEPFAKE_THRESHOLD",
+    "MANIPULATION_THRESHOLD": "MANIPULATION_THRESHOLD",
+}
+SERVICE_SETTINGS = ("AI_GENERATED_THRESHOLD", "FREQUENCY_ANALYSIS_WEIGHT")
+
+CHUNK_ROWS = 200000  # Rows per combine_batch call (bounds peak memory)
+
+
+def parse_assignments(values: List[str], option: str) -> Dict[str, float]:
+    assignments = {}
+    for value in values:
+        name, sep, number = value.partition("=")
+        if not sep:
+            raise SystemExit(f"{option} expects NAME=VALUE, got {value!r}")
+        assignments[name.strip()] = float(number)
+    return assignments
+
+
+def load_labels(path: str) -> Dict[str, int]:
+    """sha256,label CSV (label: 1/ai/fake = AI-generated, 0/real = authentic)"""
+    labels = {}
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            if len(row) < 2 or row[0] == "sha256":
+                continue
+            labels[row[0].strip()] = int(row[1].strip().lower() in ("1", "ai", "fake"))
+    return labels
+
+
+def rescore(
+    columns: Dict[str, np.ndarray],
+    ensemble: SmartEnsemble,
+    weight_overrides: Optional[Dict[str, float]] = None,
+    frequency_weight: float = config.FREQUENCY_ANALYSIS_WEIGHT,
+    chunk_rows: int = CHUNK_ROWS
+) -> Dict[str, np.ndarray]:
+    """
+    Recompute the served AI score and ensemble verdict of every stored row
+
+    Args:
+        columns: Store columns (load_features)
+        ensemble: SmartEnsemble with the thresholds to evaluate
+        weight_overrides: Optional model key -> base weight
+        frequency_weight: Phase 6 blend weight
+        chunk_rows: Rows per vectorized pass
+
+    Returns:
+        Dict with per-row "ai_score" (served score) and "verdict"
+    """
+    weight_overrides = weight_overrides or {}
+    model_keys = stored_models(columns)
+    rows = len(columns["ensemble_score"])
+    ai_score = np.empty(rows)
+    verdict = np.empty(rows, dtype=object)
+
+    for start in range(0, rows, chunk_rows):
+        chunk = slice(start, min(start + chunk_rows, rows))
+        ai_scores = np.column_stack(
+            [columns[model_column(key, "ai_score")][chunk] for key in model_keys]
+        ).reshape(chunk.stop - start, len(model_keys))
+        present = ~np.isnan(ai_scores)
+        weights = np.column_stack([
+            np.full(chunk.stop - start, weight_overrides[key])
+            if key in weight_overrides
+            else columns[model_column(key, "weight")][chunk]
+            for key in model_keys
+        ]).reshape(ai_scores.shape)
+
+        batch = ensemble.combine_batch(
+            ai_scores=ai_scores,
+            confidences=np.column_stack(
+                [columns[model_column(key, "confidence")][chunk] for key in model_keys]
+            ).reshape(ai_scores.shape),
+            weights=np.where(present, weights, 0.0),
+            model_names=model_keys,
+            deepfake_scores=np.column_stack(
+                [columns[model_column(key, "deepfake_score")][chunk] for key in model_keys]
+            ).reshape(ai_scores.shape),
+            present=present,
+            overall_quality=columns["overall_quality"][chunk],
+            manipulation_likelihood=columns["manipulation_likelihood"][chunk],
+        )
+        ai_score[chunk] = blend_frequency(
+            batch["ai_generated"], columns["frequency_ai_score"][chunk], frequency_weight
+        )
+        verdict[chunk] = batch["verdict"]
+
+    return {"ai_score": ai_score, "verdict": verdict}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", default=config.FEATURE_STORE_DIR, help="Feature store directory")
+    parser.add_argument("--limit", type=int, default=None, help="Read at most this many shards")
+    parser.add_argument(
+        "--set", action="append", default=[], metavar="NAME=VALUE",
+        help=f"Threshold override: {', '.join(SERVICE_SETTINGS + tuple(ENSEMBLE_SETTINGS))}"
+    )
+    parser.add_argument(
+        "--weight", action="append", default=[], metavar="MODEL=WEIGHT",
+        help="Base weight override for a model key"
+    )
+    parser.add_argument("--labels", default=None, help="CSV of sha256,label for accuracy")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    if not args.store:
+        raise SystemExit("No feature store: pass --store or set FEATURE_STORE_DIR")
+    settings = parse_assignments(args.set, "--set")
+    weights = parse_assignments(args.weight, "--weight")
+    unknown = set(settings) - set(SERVICE_SETTINGS) - set(ENSEMBLE_SETTINGS)
+    if unknown:
+        raise SystemExit(f"Unknown setting(s): {', '.join(sorted(unknown))}")
+
+    start = time.perf_counter()
+    columns = load_features(args.store, limit=args.limit)
+    load_seconds = time.perf_counter() - start
+    if not columns:
+        raise SystemExit(f"No shards found in {args.store}")
+    rows = len(columns["ensemble_score"])
+    unknown = set(weights) - set(stored_models(columns))
+    if unknown:
+        raise SystemExit(f"Model(s) not in the store: {', '.join(sorted(unknown))}")
+
+    ensemble = SmartEnsemble()
+    for name, value in settings.items():
+        if name in ENSEMBLE_SETTINGS:
+            setattr(ensemble, ENSEMBLE_SETTINGS[name], value)
+    threshold = settings.get("AI_GENERATED_THRESHOLD", config.AI_GENERATED_THRESHOLD)
+    frequency_weight = settings.get("FREQUENCY_ANALYSIS_WEIGHT", config.FREQUENCY_ANALYSIS_WEIGHT)
+
+    start = time.perf_counter()
+    rescored = rescore(columns, ensemble, weights, frequency_weight)
+    rescore_seconds = time.perf_counter() - start
+
+    served = columns["ensemble_score"]
+    delta = rescored["ai_score"] - served
+    was_ai = served >= config.AI_GENERATED_THRESHOLD
+    now_ai = rescored["ai_score"] >= threshold
+    verdicts, counts = np.unique(rescored["verdict"].astype(str), return_counts=True)
+    results = {
+        "rows": rows,
+        "models": stored_models(columns),
+        "settings": settings,
+        "weights": weights,
+        "load_seconds": round(load_seconds, 3),
+        "rescore_seconds": round(rescore_seconds, 3),
+        "rows_per_second": round(rows / max(rescore_seconds, 1e-9), 1),
+        "threshold": threshold,
+        "ai_rate_served": float(was_ai.mean()),
+        "ai_rate_rescored": float(now_ai.mean()),
+        "flipped_to_ai": int(np.sum(now_ai & ~was_ai)),
+        "flipped_to_real": int(np.sum(was_ai & ~now_ai)),
+        "mean_abs_score_delta": float(np.mean(np.abs(delta))),
+        "max_abs_score_delta": float(np.max(np.abs(delta))),
+        "ensemble_verdicts": dict(zip(verdicts.tolist(), counts.tolist())),
+    }
+
+    print(
+        f"{rows} rows, {len(results['models'])} models: loaded in {load_seconds:.2f}s, "
+        f"rescored in {rescore_seconds:.2f}s ({results['rows_per_second']:.0f} rows/s)"
+    )
+    if not settings and not weights:
+        # Nothing changed: the replay must match what was served
+        print(f"replay parity: max |served - replayed| = {results['max_abs_score_delta']:.2e}")
+    print(
+        f"AI rate at {threshold:.3f}: served {results['ai_rate_served']:.1%} "
+        f"-> rescored {results['ai_rate_rescored']:.1%} "
+        f"(+{results['flipped_to_ai']} / -{results['flipped_to_real']}), "
+        f"mean |score delta| {results['mean_abs_score_delta']:.4f}"
+    )
+    print("ensemble verdicts: " + ", ".join(f"{v} {c}" for v, c in results["ensemble_verdicts"].items()))
+
+    if args.labels:
+        labels = load_labels(args.labels)
+        truth = np.array([labels.get(sha, -1) for sha in columns["image_sha256"]])
+        labeled = truth >= 0
+        if labeled.any():
+            results["labeled_rows"] = int(labeled.sum())
+            results["accuracy_served"] = float(np.mean(was_ai[labeled] == truth[labeled]))
+            results["accuracy_rescored"] = float(np.mean(now_ai[labeled] == truth[labeled]))
+            print(
+                f"accuracy on {results['labeled_rows']} labeled rows: "
+                f"served {results['accuracy_served']:.2%} -> rescored {results['accuracy_rescored']:.2%}"
+            )
+        else:
+            print("no stored row matches a label")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Analysis Resolution Policy
+
+Bounds the CPU cost of the pixel-level analyzers by giving each one a fixed
+pixel budget instead of letting it run at whatever resolution the upload has:
+1. Images within an analyzer's budget are analyzed natively ("native" tier)
+2. Larger images are downscaled to the budget ("downscaled" tier)
+3. Checks that need native pixels (noise, compression blocks) get a fixed
+   number of full-resolution tiles sampled across the source image
+"""
+import logging
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisResolutionPolicy:
+    """Chooses analysis resolution per analyzer from a pixel budget"""
+
+    def __init__(
+        self,
+        pixel_budgets: Optional[Dict[str, int]] = None,
+        tile_size: int = config.FORENSIC_NATIVE_TILE_SIZE,
+        max_tiles: int = config.FORENSIC_NATIVE_TILES,
+    ):
+        self.pixel_budgets = pixel_budgets or dict(config.ANALYSIS_PIXEL_BUDGETS)
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles
+
+    def target_size(self, analyzer: str, size: Tuple[int, int]) -> Tuple[int, int]:
+        """Largest size with the source aspect ratio that fits the analyzer's budget"""
+        width, height = size
+        budget = self.pixel_budgets[analyzer]
+        if width * height <= budget:
+            return size
+
+        scale = math.sqrt(budget / float(width * height))
+        return (max(1, int(width * scale)), max(1, int(height * scale)))
+
+    def target_sizes(self, size: Tuple[int, int]) -> Dict[str, Tuple[int, int]]:
+        """Target size for every analyzer with a budget"""
+        return {name: self.target_size(name, size) for name in self.pixel_budgets}
+
+    def describe(
+        self,
+        analyzer: str,
+        source_size: Tuple[int, int],
+        analysis_size: Tuple[int, int],
+        native_tiles: int = 0,
+    ) -> Dict[str, Any]:
+        """Tier report for qualityMetrics"""
+        source_pixels = source_size[0] * source_size[1]
+        analysis_pixels = analysis_size[0] * analysis_size[1]
+
+        return {
+            "tier": "native" if analysis_pixels >= source_pixels else "downscaled",
+            "pixel_budget": self.pixel_budgets[analyzer],
+            "source_size": list(source_size),
+            "analysis_size": list(analysis_size),
+            "scale": round(analysis_size[0] / max(source_size[0], 1), 4),
+            "native_tiles": native_tiles,
+        }
+
+    def tile_boxes(self, size: Tuple[int, int]) -> List[Tuple[int, int, int, int]]:
+        """
+        Full-resolution tile boxes (left, top, right, bottom) spread evenly
+        across the image
+
+        Tile origins are aligned to the 8x8 JPEG grid so block-based
+        compression checks see the same blocks as a whole-image pass.
+        """
+        w, h = size
+        tile = self.tile_size
+        if h < tile or w < tile or self.max_tiles <= 0:
+            return []
+
+        # Grid as close to square as possible with at most max_tiles cells
+        cols = max(1, int(math.sqrt(self.max_tiles * w / h)))
+        cols = min(cols, self.max_tiles)
+        rows = max(1, self.max_tiles // cols)
+
+        return [
+            (x, y, x + tile, y + tile)
+            for y in self._spread(h, tile, rows)
+            for x in self._spread(w, tile, cols)
+        ]
+
+    @staticmethod
+    def _spread(length: int, tile: int, count: int) -> List[int]:
+        """Evenly spaced, 8-aligned tile origins along one axis"""
+        span = length - tile
+        if count <= 1 or span <= 0:
+            return [(span // 2) // 8 * 8]
+
+        origins = {int(span * k / (count - 1)) // 8 * 8 for k in range(count)}
+        return sorted(origins)
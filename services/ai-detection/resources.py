@@ -0,0 +1,192 @@
+"""
+CPU Resource Management for Inference
+
+Without limits, torch, OpenCV and the BLAS behind NumPy each size their thread
+pools to every core, and concurrent requests multiply that: cores end up
+oversubscribed and latency collapses under load. ResourceManager:
+1. Partitions the CPUs available to this process into inference lanes
+2. Runs each lane on one dedicated thread, pinned to its cores, with torch
+   intra-op threads set to the lane size for that thread
+3. Caps OpenCV and BLAS pools at the lane size and torch inter-op threads at 1
+4. Admits requests onto free lanes (waiting requests queue instead of
+   competing for cores) and reports the layout and lane load
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+import cv2
+import torch
+
+import config
+import metrics
+import tracing
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:  # Optional: BLAS pools keep their default size
+    threadpool_limits = None
+
+logger = logging.getLogger(__name__)
+
+
+def available_cpus() -> List[int]:
+    """CPU ids this process may run on (respects container cpusets)"""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+def partition_cpus(cpus: List[int], index: int, count: int) -> List[int]:
+    """Contiguous share `index` of `count` of a CPU list"""
+    per_part = len(cpus) / count
+    return cpus[int(index * per_part):int((index + 1) * per_part)]
+
+
+@dataclass
+class Lane:
+    """One inference lane: a pinned worker thread and its cores"""
+
+    index: int
+    cpus: List[int]
+    threads: int
+    executor: Optional[ThreadPoolExecutor] = None
+    busy: bool = False
+    completed: int = 0
+    busy_seconds: float = 0.0
+    pinned: bool = False
+
+
+class ResourceManager:
+    """Partitions cores into inference lanes and runs work on them"""
+
+    def __init__(
+        self,
+        lanes: int = config.RESOURCE_LANES,
+        threads_per_lane: int = config.RESOURCE_THREADS_PER_LANE,
+        pin: bool = config.RESOURCE_PIN_AFFINITY,
+    ):
+        cpus = available_cpus()
+        if lanes <= 0:
+            lanes = max(1, len(cpus) // 4)  # auto: lanes of ~4 cores
+        lanes = min(lanes, len(cpus))
+        if threads_per_lane <= 0:
+            threads_per_lane = max(1, len(cpus) // lanes)
+
+        self.cpus = cpus
+        self.threads_per_lane = threads_per_lane
+        self.pin = pin and hasattr(os, "sched_setaffinity")
+        self.lanes = [
+            Lane(index=i, cpus=partition_cpus(cpus, i, lanes), threads=threads_per_lane)
+            for i in range(lanes)
+        ]
+        self._free: Optional[asyncio.Queue] = None
+        self._waiting = 0
+
+        self._apply_process_limits()
+        for lane in self.lanes:
+            lane.executor = ThreadPoolExecutor(
+                max_workers=1,
+                thread_name_prefix=f"lane-{lane.index}",
+                initializer=self._init_lane_thread,
+                initargs=(lane,),
+            )
+
+        logger.info(
+            f"Resource layout: {len(self.lanes)} lane(s) x {threads_per_lane} thread(s) "
+            f"on {len(cpus)} CPU(s)" + (" (pinned)" if self.pin else "")
+        )
+
+    def _apply_process_limits(self):
+        """Process-wide pool sizes (OpenCV and BLAS pools are global)"""
+        cv2.setNumThreads(self.threads_per_lane)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            # Inter-op pool already started (e.g. in a pre-fork parent)
+            pass
+        if threadpool_limits is not None:
+            threadpool_limits(limits=self.threads_per_lane)
+
+    def _init_lane_thread(self, lane: Lane):
+        """Runs once on the lane's worker thread"""
+        if self.pin:
+            try:
+                # pid 0 = calling thread; pool threads it creates inherit this mask
+                os.sched_setaffinity(0, lane.cpus)
+                lane.pinned = True
+            except OSError as e:
+                logger.warning(f"Could not pin lane {lane.index} to {lane.cpus}: {e}")
+        # OpenMP thread count is per calling thread
+        torch.set_num_threads(lane.threads)
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn on the next free lane, queueing while all lanes are busy"""
+        if self._free is None:
+            self._free = asyncio.Queue()
+            for lane in self.lanes:
+                self._free.put_nowait(lane)
+
+        self._waiting += 1
+        metrics.QUEUE_DEPTH.inc()
+        try:
+            with tracing.span("lane_wait", waiting=self._waiting) as span:
+                lane = await self._free.get()
+                span.set_attribute("lane", lane.index)
+        finally:
+            self._waiting -= 1
+            metrics.QUEUE_DEPTH.dec()
+
+        lane.busy = True
+        metrics.LANES_BUSY.inc()
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            # run_in_executor does not carry context variables over: copy them
+            # so spans opened on the lane join the request's trace
+            return await loop.run_in_executor(
+                lane.executor,
+                functools.partial(contextvars.copy_context().run, fn, *args, **kwargs),
+            )
+        finally:
+            lane.busy = False
+            metrics.LANES_BUSY.dec()
+            lane.completed += 1
+            lane.busy_seconds += time.perf_counter() - start
+            self._free.put_nowait(lane)
+
+    def status(self) -> Dict[str, Any]:
+        """Layout and load of every lane"""
+        return {
+            "cpus": self.cpus,
+            "lanes": len(self.lanes),
+            "threads_per_lane": self.threads_per_lane,
+            "pinned": self.pin,
+            "waiting": self._waiting,
+            "opencv_threads": cv2.getNumThreads(),
+            "torch_interop_threads": torch.get_num_interop_threads(),
+            "blas_limited": threadpool_limits is not None,
+            "lane_status": [
+                {
+                    "index": lane.index,
+                    "cpus": lane.cpus,
+                    "threads": lane.threads,
+                    "pinned": lane.pinned,
+                    "busy": lane.busy,
+                    "completed": lane.completed,
+                    "busy_seconds": round(lane.busy_seconds, 3),
+                }
+                for lane in self.lanes
+            ],
+        }
+
+    def shutdown(self):
+        for lane in self.lanes:
+            lane.executor.shutdown(wait=False)
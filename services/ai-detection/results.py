@@ -0,0 +1,259 @@
+"""
+Typed Analyzer Results
+
+ForensicAnalyzer, FrequencyAnalyzer and ImageQualityAssessor each fill one
+of these per image instead of building, merging and copying nested dicts:
+- fixed fields (__slots__): no per-instance dict, and the analyzers write
+  values straight into the result
+- to_dict(): the API payload, built in one pass. Fields left at None were
+  not computed (check skipped or failed) and are omitted, as before
+- to_row(prefix): the numeric fields flattened into feature store columns
+  (prefix__field, prefix__component__field)
+- get(key, default): dict.get-style read for code that tolerates missing
+  values (None reads as missing)
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+_NUMERIC = (bool, int, float, np.bool_, np.integer, np.floating)
+
+
+class AnalysisResult:
+    """Shared to_dict / to_row / get of the result dataclasses"""
+
+    __slots__ = ()
+
+    # Fields emitted by to_dict() even when None
+    KEEP_NONE = ()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = getattr(self, key, None)
+        return default if value is None else value
+
+    def to_dict(self) -> Dict[str, Any]:
+        payload = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if value is None:
+                if name in self.KEEP_NONE:
+                    payload[name] = None
+            elif isinstance(value, AnalysisResult):
+                payload[name] = value.to_dict()
+            else:
+                payload[name] = value
+        return payload
+
+    def to_row(self, prefix: str, row: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+        """Numeric fields as prefix__name -> float (added to `row` if given)"""
+        if row is None:
+            row = {}
+        for name in self.__slots__:
+            _flatten(f"{prefix}__{name}", getattr(self, name), row)
+        return row
+
+
+def _flatten(column: str, value: Any, row: Dict[str, float]):
+    if isinstance(value, AnalysisResult):
+        value.to_row(column, row)
+    elif isinstance(value, dict):
+        for name, item in value.items():
+            _flatten(f"{column}__{name}", item, row)
+    elif isinstance(value, _NUMERIC):
+        row[column] = float(value)
+
+
+# ----------------------------------------------------------------------
+# Image quality (ImageQualityAssessor)
+# ----------------------------------------------------------------------
+
+@dataclass(slots=True)
+class SharpnessScore(AnalysisResult):
+    laplacian_variance: float
+    score: float
+    quality: str
+    needs_sharpening: bool
+
+
+@dataclass(slots=True)
+class ContrastScore(AnalysisResult):
+    std_dev: float
+    dynamic_range: int
+    score: float
+    quality: str
+    needs_enhancement: bool
+
+
+@dataclass(slots=True)
+class NoiseScore(AnalysisResult):
+    noise_std: float
+    score: float
+    quality: str
+    needs_denoising: bool
+
+
+@dataclass(slots=True)
+class ResolutionScore(AnalysisResult):
+    width: int
+    height: int
+    pixel_count: int
+    score: float
+    quality: str
+
+
+@dataclass(slots=True)
+class BrightnessScore(AnalysisResult):
+    mean: float
+    score: float
+    quality: str
+    too_dark: bool
+    too_bright: bool
+
+
+@dataclass(slots=True)
+class ColorScore(AnalysisResult):
+    score: float
+    channel_std: Optional[Dict[str, float]] = None  # {r, g, b}; None for grayscale
+    channel_balance: Optional[float] = None
+
+
+@dataclass(slots=True)
+class QualityReport(AnalysisResult):
+    """Phase 1 quality assessment, plus what enhancement did"""
+
+    overall_quality: float = 0.5
+    sharpness: Optional[SharpnessScore] = None
+    contrast: Optional[ContrastScore] = None
+    noise: Optional[NoiseScore] = None
+    resolution: Optional[ResolutionScore] = None
+    brightness: Optional[BrightnessScore] = None
+    color: Optional[ColorScore] = None
+    denoise_tier: Optional[str] = None
+    denoise_ms: Optional[float] = None
+    enhancement_applied: Optional[str] = None
+    analysis_tiers: Optional[Dict[str, Dict[str, Any]]] = None
+    statistics_timing_ms: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+# ----------------------------------------------------------------------
+# Forensics (ForensicAnalyzer)
+# ----------------------------------------------------------------------
+
+@dataclass(slots=True)
+class ForensicHeatmaps(AnalysisResult):
+    """
+    Per-tile forensic maps, rows x cols cells of tile x tile pixels of the
+    analyzed image. Each map is uint8 (a base64 PNG or nested lists,
+    depending on format); a cell value v stands for v / 255 * scales[name]
+    in the units of the matching global field.
+    """
+
+    tile: int
+    rows: int
+    cols: int
+    format: str
+    maps: Dict[str, Any]
+    scales: Dict[str, float]
+    compute_ms: float
+
+    def to_row(self, prefix: str, row: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+        # Spatial maps, not features: no feature store columns
+        return {} if row is None else row
+
+
+@dataclass(slots=True)
+class ForensicResult(AnalysisResult):
+    """Phase 2 forensic checks; *_error fields name a check that failed"""
+
+    KEEP_NONE = ("format",)  # PIL reports no format for decoded/converted images
+
+    # Basic properties
+    width: Optional[int] = None
+    height: Optional[int] = None
+    format: Optional[str] = None
+    mode: Optional[str] = None
+    # EXIF
+    has_exif: Optional[bool] = None
+    exif_fields_count: Optional[int] = None
+    exif_data: Optional[Dict[str, str]] = None
+    exif_data_present: Optional[bool] = None
+    has_editing_software: Optional[bool] = None
+    exif_suspicious: Optional[bool] = None
+    exif_error: Optional[str] = None
+    # Noise
+    noise_level: Optional[float] = None
+    laplacian_variance: Optional[float] = None
+    uniform_noise_pattern: Optional[bool] = None
+    noise_analysis_error: Optional[str] = None
+    # Compression
+    block_variance_std: Optional[float] = None
+    inconsistent_compression: Optional[bool] = None
+    compression_artifacts_detected: Optional[bool] = None
+    compression_analysis_error: Optional[str] = None
+    compression_artifacts: Optional[float] = None
+    # Color
+    color_channel_std: Optional[Dict[str, float]] = None  # {red, green, blue}
+    region_color_consistency: Optional[float] = None
+    color_inconsistencies: Optional[bool] = None
+    unnaturally_consistent: Optional[bool] = None
+    color_analysis: Optional[str] = None
+    color_analysis_error: Optional[str] = None
+    color_saturation: Optional[float] = None
+    brightness: Optional[float] = None
+    contrast: Optional[float] = None
+    # Edges
+    edge_density: Optional[float] = None
+    average_edge_strength: Optional[float] = None
+    edge_artifacts: Optional[bool] = None
+    edge_analysis_error: Optional[str] = None
+    sharpness: Optional[float] = None
+    # Recompression (ELA / JPEG ghosts; only when enabled)
+    ela_quality: Optional[int] = None
+    ela_mean_error: Optional[float] = None
+    ela_outlier_fraction: Optional[float] = None
+    ela_inconsistent: Optional[bool] = None
+    jpeg_estimated_quality: Optional[int] = None
+    jpeg_ghost_fraction: Optional[float] = None
+    jpeg_ghost_quality: Optional[int] = None
+    jpeg_ghost_detected: Optional[bool] = None
+    recompression_qualities: Optional[List[int]] = None  # Qualities that fit the budget
+    recompression_ms: Optional[float] = None
+    recompression_analysis_error: Optional[str] = None
+    # Per-tile heatmaps (only when requested)
+    heatmaps: Optional[ForensicHeatmaps] = None
+    heatmaps_error: Optional[str] = None
+    # Overall
+    manipulation_likelihood: Optional[float] = None
+    error: Optional[str] = None
+
+
+# ----------------------------------------------------------------------
+# Frequency domain (FrequencyAnalyzer)
+# ----------------------------------------------------------------------
+
+@dataclass(slots=True)
+class FrequencyResult(AnalysisResult):
+    """Phase 3 DCT/FFT analysis (skipped=True when dropped for a latency budget)"""
+
+    # DCT
+    dct_avg_high_freq_energy: Optional[float] = None
+    dct_high_freq_uniformity: Optional[float] = None
+    dct_high_to_low_ratio: Optional[float] = None
+    dct_mid_to_low_ratio: Optional[float] = None
+    dct_ai_smoothness: Optional[bool] = None
+    dct_ai_score: Optional[float] = None
+    dct_analysis_error: Optional[str] = None
+    # FFT
+    fft_periodic_peaks: Optional[int] = None
+    fft_checkerboard_score: Optional[float] = None
+    fft_spectrum_uniformity: Optional[float] = None
+    fft_spectrum_mean: Optional[float] = None
+    fft_ai_score: Optional[float] = None
+    fft_gan_artifacts_detected: Optional[bool] = None
+    fft_analysis_error: Optional[str] = None
+    # Combined
+    frequency_ai_score: Optional[float] = None
+    frequency_analysis_error: Optional[str] = None
+    skipped: Optional[bool] = None
@@ -0,0 +1,66 @@
+"""
+JSON Rendering of Detection Responses
+
+The analyzers return native Python scalars, so a detection result is
+written as-is: no conversion pass over the nested dicts, and the detection
+endpoints return DetectionJSONResponse directly, so FastAPI does not
+validate and re-serialize the payload through DetectionResponse (the model
+still documents the schema in OpenAPI).
+
+With orjson installed responses are rendered by orjson, which also
+serializes NumPy scalars and arrays natively. Without it the standard json
+module is used; either way numpy_default only runs for the rare value the
+encoder cannot handle itself. orjson writes NaN/Infinity as null, where the
+json fallback (like Starlette) rejects them.
+"""
+import json
+from typing import Any
+
+import numpy as np
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # Optional: falls back to the json module
+    orjson = None
+
+ORJSON_OPTIONS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+def numpy_default(obj: Any) -> Any:
+    """Encoder hook for NumPy values (non-contiguous arrays under orjson)"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def json_dumps(content: Any) -> bytes:
+    """Render with the json module (same options as Starlette's JSONResponse)"""
+    return json.dumps(
+        content,
+        default=numpy_default,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def dumps(content: Any) -> bytes:
+    """Render with orjson when available, else with the json module"""
+    if orjson is not None:
+        return orjson.dumps(content, default=numpy_default, option=ORJSON_OPTIONS)
+    return json_dumps(content)
+
+
+class DetectionJSONResponse(JSONResponse):
+    """JSONResponse rendered by dumps() (orjson, NumPy-aware)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def backend() -> str:
+    return "orjson" if orjson is not None else "json"
@@ -0,0 +1,29 @@
+"""
+Shared fixtures for the ai-detection tests
+
+Tests run from the service directory (`pytest`) and import the service
+modules and the benchmark helpers the same way the service does.
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVICE_DIR not in sys.path:
+    sys.path.insert(0, SERVICE_DIR)
+
+from benchmarks.run_benchmarks import synthetic_image  # noqa: E402
+
+SYNTHETIC_KINDS = ("photo", "render", "texture")
+SYNTHETIC_SIZES = ((800, 600), (3000, 2000))  # The large size takes the native-tile path
+
+
+@pytest.fixture(scope="session")
+def synthetic_sources():
+    """Encoded photo/render/texture images at two sizes, as in the benchmarks"""
+    rng = np.random.default_rng(0)
+    return [
+        synthetic_image(kind, size, rng) for kind in SYNTHETIC_KINDS for size in SYNTHETIC_SIZES
+    ]
@@ -0,0 +1,86 @@
+"""
+Model cascade: the score bounds over a pending model's outcomes contain
+every combined score that model can produce, and an early exit keeps the
+verdict of the full run
+"""
+import functools
+import logging
+
+import numpy as np
+import pytest
+
+from benchmarks.run_benchmarks import stub_models
+import config
+from models import AIDetectionModels
+from results import ForensicResult, QualityReport
+
+
+@pytest.fixture(autouse=True)
+def quiet_ensemble():
+    logging.disable(logging.WARNING)
+    yield
+    logging.disable(logging.NOTSET)
+
+
+@pytest.fixture(scope="module")
+def detector():
+    detector = AIDetectionModels()
+    detector.loaded_models = stub_models(0.0)
+    detector.models_loaded = True
+    return detector
+
+
+def completed_predictions(detector, rng, keys):
+    """Predictions of the models already run, confidence varied to exercise gating"""
+    predictions = []
+    for key in keys:
+        score = float(np.round(rng.random(), 1) if rng.random() < 0.3 else rng.random())
+        prediction = detector._cascade_outcome(key, score)
+        if rng.random() < 0.5:
+            prediction["confidence"] = float(rng.uniform(0.2, 1.0))
+        predictions.append(prediction)
+    return predictions
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_bounds_contain_combined_scores(detector, seed):
+    rng = np.random.default_rng(seed)
+    keys = list(detector.loaded_models)
+    rng.shuffle(keys)
+    pending_key = keys[0]
+    completed = completed_predictions(detector, rng, keys[1:1 + rng.integers(1, len(keys))])
+    quality = QualityReport(overall_quality=float(rng.random())) if rng.random() < 0.8 else None
+    forensics = (
+        ForensicResult(manipulation_likelihood=float(rng.random())) if rng.random() < 0.8 else None
+    )
+    outcome = functools.partial(detector._cascade_outcome, pending_key)
+    ensemble = detector.smart_ensemble
+
+    low, high = ensemble.ai_score_bounds(
+        completed, [outcome], image_quality=quality, forensics=forensics,
+        grid_step=config.CASCADE_GRID_STEP,
+    )
+
+    # Dense grid, random points and the completed scores (+-1e-7) for the pending model
+    ties = [p["ai_score"] + delta for p in completed for delta in (-1e-7, 0.0, 1e-7)]
+    samples = np.clip(
+        np.concatenate([np.linspace(0.0, 1.0, 20001), rng.random(5000), ties]), 0.0, 1.0
+    )
+    columns = ensemble._columns(
+        [completed + [outcome(float(x))] for x in samples], quality, forensics
+    )
+    scores = ensemble.combine_batch(**columns)["ai_generated"]
+    assert scores.min() >= low - 1e-9
+    assert scores.max() <= high + 1e-9
+
+
+def test_cascade_keeps_full_verdict(detector, synthetic_sources):
+    threshold = config.AI_GENERATED_THRESHOLD
+    for image_bytes in synthetic_sources:
+        image = detector.preprocessor.prepare_bytes(image_bytes)
+        full = detector.detect(image, image_bytes, cascade=False)
+        fast = detector.detect(image, image_bytes, cascade=True)
+        assert (fast["ensembleScore"] >= threshold) == (full["ensembleScore"] >= threshold)
+        skipped = fast["modelScores"].get("cascade", {}).get("models_skipped", [])
+        if not skipped:
+            assert fast["ensembleScore"] == pytest.approx(full["ensembleScore"])
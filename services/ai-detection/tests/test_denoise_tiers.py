@@ -0,0 +1,56 @@
+"""
+Tiered denoising: the shared cost table changes only for the tier that ran,
+and the selected tier always fits the budget
+"""
+import numpy as np
+import pytest
+
+from image_quality import ImageQualityAssessor
+
+
+@pytest.fixture
+def noisy():
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, (256, 256, 3), dtype=np.uint8)
+
+
+def test_zero_budget_leaves_costs_alone(noisy):
+    assessor = ImageQualityAssessor()
+    before = dict(assessor.tier_cost_ms_per_mp)
+    tier_before = assessor.select_denoise_tier((512, 512), 250)
+    for _ in range(30):
+        _, tier, _ = assessor.denoise(noisy, 10, 0)
+        assert tier == "none"
+    assert assessor.tier_cost_ms_per_mp == before
+    assert assessor.select_denoise_tier((512, 512), 250) == tier_before
+
+
+def test_only_the_tier_run_is_updated(noisy):
+    assessor = ImageQualityAssessor()
+    before = dict(assessor.tier_cost_ms_per_mp)
+    _, tier, _ = assessor.denoise(noisy, 10, 40)
+    assert tier == "bilateral"
+    changed = {t for t in before if assessor.tier_cost_ms_per_mp[t] != before[t]}
+    assert changed == {"bilateral"}
+
+
+@pytest.mark.parametrize("budget_ms", [0, 5, 20, 80, 250, 1000])
+def test_selected_tier_fits_budget(noisy, budget_ms):
+    assessor = ImageQualityAssessor()
+    megapixels = noisy.shape[0] * noisy.shape[1] / 1e6
+    for _ in range(5):
+        costs = dict(assessor.tier_cost_ms_per_mp)  # Estimates at selection time
+        _, tier, _ = assessor.denoise(noisy, 10, budget_ms)
+        assert costs[tier] * megapixels <= budget_ms
+        # No stronger tier fits
+        stronger = assessor.DENOISE_TIERS[:assessor.DENOISE_TIERS.index(tier)]
+        assert all(costs[t] * megapixels > budget_ms for t in stronger)
+
+
+def test_calibration_measures_every_tier():
+    assessor = ImageQualityAssessor()
+    assessor.calibrate_denoise_tiers((128, 128))
+    costs = assessor.tier_cost_ms_per_mp
+    assert costs["none"] == 0.0
+    assert all(costs[tier] > 0 for tier in ("nlm", "nlm_downscaled", "bilateral"))
+    assert costs["nlm"] > costs["bilateral"]
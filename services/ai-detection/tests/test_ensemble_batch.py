@@ -0,0 +1,131 @@
+"""
+SmartEnsemble against the frozen per-image implementation it replaced
+(tests/reference_ensemble.py): combine_batch and combine_predictions give
+every image the result of the original scoring loop
+"""
+import logging
+
+import numpy as np
+import pytest
+
+from benchmarks.ensemble_batch import random_batch
+from ensemble import STATUS_DISAGREEMENT, STATUS_GATED, STATUS_NO_PREDICTIONS, STATUS_OK, SmartEnsemble
+from reference_ensemble import SmartEnsemble as ReferenceEnsemble
+from results import ForensicResult, QualityReport
+
+SCORES = ("ai_generated", "deepfake", "manipulation", "authenticity")
+METADATA = ("total_models", "active_models", "outliers_removed", "confidence_gating_removed")
+
+
+@pytest.fixture(autouse=True)
+def quiet_ensemble():
+    logging.disable(logging.WARNING)
+    yield
+    logging.disable(logging.NOTSET)
+
+
+def row_inputs(batch, row):
+    """Predictions of one batch row plus its quality/forensics (NaN = not given)"""
+    predictions = [
+        {
+            "model": name,
+            "weight": float(batch["weights"][column]),
+            "ai_score": float(batch["ai_scores"][row, column]),
+            "deepfake_score": float(batch["deepfake_scores"][row, column]),
+            "confidence": float(batch["confidences"][row, column]),
+        }
+        for column, name in enumerate(batch["model_names"])
+        if not np.isnan(batch["ai_scores"][row, column])
+    ]
+    quality = batch["overall_quality"][row]
+    manipulation = batch["manipulation_likelihood"][row]
+    return (
+        predictions,
+        None if np.isnan(quality) else float(quality),
+        None if np.isnan(manipulation) else float(manipulation),
+    )
+
+
+def reference(batch, row):
+    """The original per-image loop, fed the dict payloads it was written for"""
+    predictions, quality, manipulation = row_inputs(batch, row)
+    return ReferenceEnsemble().combine_predictions(
+        predictions,
+        image_quality=None if quality is None else {"overall_quality": quality},
+        forensics=None if manipulation is None else {"manipulation_likelihood": manipulation},
+    )
+
+
+def per_image(ensemble, batch, row):
+    """combine_predictions on one row of the batch"""
+    predictions, quality, manipulation = row_inputs(batch, row)
+    return ensemble.combine_predictions(
+        predictions,
+        image_quality=None if quality is None else QualityReport(overall_quality=quality),
+        forensics=None if manipulation is None else ForensicResult(manipulation_likelihood=manipulation),
+        verbose=False,
+    )
+
+
+def assert_same(actual, expected, path="result"):
+    """Nested equality, floats to 1e-12"""
+    if isinstance(expected, dict):
+        assert isinstance(actual, dict) and set(actual) == set(expected), path
+        for key in expected:
+            assert_same(actual[key], expected[key], f"{path}.{key}")
+    elif isinstance(expected, list):
+        assert isinstance(actual, list) and len(actual) == len(expected), path
+        for index, (a, e) in enumerate(zip(actual, expected)):
+            assert_same(a, e, f"{path}[{index}]")
+    elif isinstance(expected, float):
+        assert actual == pytest.approx(expected, abs=1e-12), path
+    else:
+        assert actual == expected, path
+
+
+def make_batch(seed, images, models):
+    rng = np.random.default_rng(seed)
+    batch = random_batch(rng, images, models)
+    batch["ai_scores"][rng.random(images) < 0.02] = np.nan  # No model ran
+    batch["overall_quality"][rng.random(images) < 0.1] = np.nan
+    batch["manipulation_likelihood"][rng.random(images) < 0.1] = np.nan
+    # Ties and near-agreement exercise the zero-MAD outlier rule
+    tied = rng.random(images) < 0.1
+    batch["ai_scores"][tied] = np.round(batch["ai_scores"][tied], 1)
+    return batch
+
+
+@pytest.mark.parametrize("models", [1, 2, 3, 5])
+def test_batch_matches_reference(models):
+    ensemble = SmartEnsemble()
+    images = 1500
+    batch = make_batch(models, images, models)
+    columnar = ensemble.combine_batch(**batch)
+
+    for row in range(images):
+        expected = reference(batch, row)
+        assert columnar["verdict"][row] == expected["verdict"], row
+        assert columnar["confidence"][row] == pytest.approx(expected["confidence"], abs=1e-12), row
+        for name in SCORES:
+            assert columnar[name][row] == pytest.approx(expected["scores"][name], abs=1e-12), (row, name)
+        if columnar["status"][row] == STATUS_OK:
+            for name in METADATA:
+                assert columnar[name][row] == expected["ensemble_metadata"][name], (row, name)
+
+
+@pytest.mark.parametrize("models", [1, 3, 5])
+def test_combine_predictions_matches_reference(models):
+    ensemble = SmartEnsemble()
+    batch = make_batch(100 + models, 500, models)
+    for row in range(500):
+        assert_same(per_image(ensemble, batch, row), reference(batch, row), f"row {row}")
+
+
+def test_batch_covers_every_regime():
+    """The comparison above spans decided, gated, disagreeing and empty rows"""
+    batch = make_batch(3, 1500, 3)
+    columnar = SmartEnsemble().combine_batch(**batch)
+    statuses = set(columnar["status"].tolist())
+    assert {STATUS_OK, STATUS_DISAGREEMENT, STATUS_GATED, STATUS_NO_PREDICTIONS} <= statuses
+    assert len(set(columnar["verdict"][columnar["status"] == STATUS_OK].tolist())) >= 2
+    assert np.any(columnar["outliers_removed"] > 0)
@@ -0,0 +1,62 @@
+"""
+Feature store replay: re-scoring stored rows without overrides reproduces
+the served scores and ensemble verdicts exactly
+"""
+import logging
+
+import numpy as np
+import pytest
+
+from benchmarks.run_benchmarks import stub_models
+from ensemble import SmartEnsemble
+from feature_store import FeatureStore, load_features
+from models import AIDetectionModels
+from rescore import rescore
+
+
+@pytest.fixture(autouse=True)
+def quiet_service():
+    logging.disable(logging.WARNING)
+    yield
+    logging.disable(logging.NOTSET)
+
+
+@pytest.mark.parametrize("file_format", ["npz", "parquet"])
+def test_replay_reproduces_served_scores(tmp_path, monkeypatch, synthetic_sources, file_format):
+    if file_format == "parquet":
+        pytest.importorskip("pyarrow")
+    detector = AIDetectionModels()
+    detector.loaded_models = stub_models(0.0)
+    detector.models_loaded = True
+    detector.feature_store = FeatureStore(str(tmp_path), file_format=file_format)
+
+    # Ensemble verdicts as served (before the frequency adjustment, like rescore)
+    verdicts = []
+    combine_predictions = detector.smart_ensemble.combine_predictions
+
+    def record_verdict(*args, **kwargs):
+        result = combine_predictions(*args, **kwargs)
+        verdicts.append(result["verdict"])
+        return result
+
+    monkeypatch.setattr(detector.smart_ensemble, "combine_predictions", record_verdict)
+
+    # Full runs, runs with one model missing and runs where a tiny latency
+    # budget skips the models and stages (NaN in the store)
+    models = detector.loaded_models
+    partial = dict(list(models.items())[1:])
+    served = []
+    for image_bytes in synthetic_sources:
+        image = detector.preprocessor.prepare_bytes(image_bytes)
+        for loaded, budget_ms in ((models, None), (partial, None), (models, 1.0)):
+            detector.loaded_models = loaded
+            result = detector.detect(image, image_bytes, latency_budget_ms=budget_ms)
+            served.append(result["ensembleScore"])
+    detector.feature_store.flush()
+
+    columns = load_features(str(tmp_path))
+    replay = rescore(columns, SmartEnsemble())
+    assert len(replay["ai_score"]) == len(served)
+    assert np.max(np.abs(replay["ai_score"] - columns["ensemble_score"])) == 0.0
+    assert np.array_equal(columns["ensemble_score"], served)
+    assert list(replay["verdict"]) == verdicts
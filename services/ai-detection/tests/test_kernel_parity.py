@@ -0,0 +1,88 @@
+"""
+The float32/int16 edge, noise and sharpness kernels against their former
+float64 implementations (benchmarks/kernel_parity.py) on the 54-image
+synthetic set: values agree and every derived flag classifies the same
+"""
+import cv2
+import numpy as np
+import pytest
+
+from benchmarks.kernel_parity import (
+    analyzer,
+    current_edges,
+    current_laplacian_variance,
+    current_tile_noise,
+    edge_artifacts,
+    legacy_edges,
+    legacy_laplacian_variance,
+    legacy_tile_noise,
+    sharpness_label,
+    uniform_noise,
+    variants,
+)
+from preprocessing import ImagePreprocessor
+
+VARIANTS_PER_SOURCE = 9  # Original, 3 blurred, 2 noised, 3 low contrast
+IMAGES = 6 * VARIANTS_PER_SOURCE
+
+
+@pytest.fixture(scope="module")
+def kernel_values(synthetic_sources):
+    """Former and current kernel values for every image of the set"""
+    preprocessor = ImagePreprocessor()
+    values = []
+    for source in synthetic_sources:
+        for image_bytes in variants(source):
+            prepared = preprocessor.prepare_bytes(image_bytes)
+            gray = cv2.cvtColor(np.asarray(prepared.forensic), cv2.COLOR_RGB2GRAY)
+            entry = {
+                "gray_std": float(np.std(gray)),
+                "legacy_edges": legacy_edges(gray),
+                "edges": current_edges(gray),
+                "legacy_laplacian": legacy_laplacian_variance(gray),
+                "laplacian": current_laplacian_variance(gray),
+            }
+            if prepared.forensic_tiles:
+                grays = [analyzer._to_gray(tile) for tile in prepared.forensic_tiles]
+                entry["legacy_tiles"] = legacy_tile_noise(grays)
+                entry["tiles"] = current_tile_noise(prepared.forensic_tiles)
+            values.append(entry)
+    assert len(values) == IMAGES
+    return values
+
+
+@pytest.mark.parametrize("index", range(IMAGES))
+def test_kernels_match_float64(kernel_values, index):
+    entry = kernel_values[index]
+    assert entry["edges"] == pytest.approx(entry["legacy_edges"], rel=1e-6, abs=1e-9)
+    assert entry["laplacian"] == pytest.approx(entry["legacy_laplacian"], rel=1e-6, abs=1e-9)
+    if "tiles" in entry:
+        assert entry["tiles"] == pytest.approx(entry["legacy_tiles"], rel=1e-6, abs=1e-9)
+
+
+@pytest.mark.parametrize("index", range(IMAGES))
+def test_flags_classify_the_same(kernel_values, index):
+    entry = kernel_values[index]
+    assert edge_artifacts(entry["edges"][1]) == edge_artifacts(entry["legacy_edges"][1])
+    assert sharpness_label(entry["laplacian"]) == sharpness_label(entry["legacy_laplacian"])
+    assert uniform_noise(entry["gray_std"], entry["laplacian"]) == uniform_noise(
+        entry["gray_std"], entry["legacy_laplacian"]
+    )
+    if "tiles" in entry:
+        assert uniform_noise(*entry["tiles"]) == uniform_noise(*entry["legacy_tiles"])
+
+
+def test_set_covers_both_sides_of_each_threshold(kernel_values):
+    """Parity only means something if the images fall on both sides"""
+    flags = {
+        "edge_artifacts": [edge_artifacts(e["legacy_edges"][1]) for e in kernel_values],
+        "needs_sharpening": [sharpness_label(e["legacy_laplacian"])[0] for e in kernel_values],
+        "uniform_noise_pattern": [
+            uniform_noise(e["gray_std"], e["legacy_laplacian"]) for e in kernel_values
+        ],
+        "uniform_noise_pattern_tiles": [
+            uniform_noise(*e["legacy_tiles"]) for e in kernel_values if "legacy_tiles" in e
+        ],
+    }
+    for name, values in flags.items():
+        assert any(values) and not all(values), name
@@ -0,0 +1,114 @@
+"""
+Latency planner: estimates change only from measured timings, plans never
+exceed the budget, and stages skipped too often are handed out for a probe
+"""
+import logging
+
+import pytest
+
+from benchmarks.run_benchmarks import stub_models
+import config
+from latency_planner import LatencyPlanner
+from models import AIDetectionModels
+
+WEIGHTS = {"hemg": 0.3, "smogy": 0.2, "deepfake": 0.12}
+
+
+def warm_planner(**kwargs) -> LatencyPlanner:
+    """Planner with measured (warm) timings for every phase and model"""
+    planner = LatencyPlanner(**kwargs)
+    for _ in range(2):  # The first timing of each is a dropped cold start
+        for stage, ms in config.LATENCY_PHASE_ESTIMATES_MS.items():
+            planner.record(stage, ms)
+        for key in WEIGHTS:
+            planner.record_model(key, 100.0)
+    return planner
+
+
+def planned_ms(planner: LatencyPlanner, plan) -> float:
+    """Estimated cost of the stages a plan runs (enhancement excluded)"""
+    cost = planner.estimate("quality") + planner.estimate("ensemble")
+    cost += planner.estimate("frequency") if plan.frequency else 0.0
+    cost += sum(planner.model_estimate(key) for key in plan.models)
+    if plan.forensics:
+        cost += planner.estimate("forensics_deep" if plan.forensic_tiles else "forensics")
+    return cost
+
+
+def test_cold_timing_not_folded_in():
+    planner = LatencyPlanner()
+    planner.record("frequency", 5000.0)
+    planner.record_model("hemg", 5000.0)
+    assert planner.estimate("frequency") == config.LATENCY_PHASE_ESTIMATES_MS["frequency"]
+    assert planner.model_estimate("hemg") == config.LATENCY_DEFAULT_MODEL_MS
+    planner.record("frequency", 100.0)
+    assert planner.estimate("frequency") == pytest.approx(
+        0.8 * config.LATENCY_PHASE_ESTIMATES_MS["frequency"] + 0.2 * 100.0
+    )
+
+
+def test_small_budgets_leave_estimates_alone():
+    planner = warm_planner()
+    before = (planner.status(), planner.model_status())
+    for _ in range(25):
+        planner.plan(5, WEIGHTS)
+    assert (planner.status(), planner.model_status()) == before
+
+    plan = planner.plan(300, WEIGHTS)
+    assert planned_ms(planner, plan) <= 300
+    assert len(plan.models) < len(WEIGHTS)
+
+
+@pytest.mark.parametrize("budget_ms", [1, 60, 150, 250, 400, 700, 2000])
+@pytest.mark.parametrize("forensic_tiles", [True, False])
+def test_plan_fits_budget(budget_ms, forensic_tiles):
+    planner = warm_planner()
+    for _ in range(30):
+        plan = planner.plan(budget_ms, WEIGHTS, forensic_tiles=forensic_tiles)
+        mandatory = planner.estimate("quality") + planner.estimate("ensemble")
+        assert planned_ms(planner, plan) <= max(budget_ms, mandatory)
+
+
+def test_skipped_stage_probed_once_until_timed():
+    planner = warm_planner(probe_after_skips=3)
+    probes = [planner.plan(5, WEIGHTS).probes for _ in range(5)]
+    assert probes[:2] == [[], []]
+    assert set(probes[2]) == {"frequency", "forensics", "forensics_deep"} | {
+        f"model:{key}" for key in WEIGHTS
+    }
+    # Handed out stages are not handed out again while their probe runs
+    assert probes[3] == probes[4] == []
+
+    planner.record("frequency", 80.0)
+    planner.finish_probe(probes[2])
+    again = [planner.plan(5, WEIGHTS).probes for _ in range(3)]
+    assert "frequency" not in again[0]
+    assert "model:hemg" in again[0]
+    assert "frequency" in again[2]
+
+
+def test_probe_retimes_skipped_stages(synthetic_sources):
+    logging.disable(logging.WARNING)
+    try:
+        detector = AIDetectionModels()
+        detector.loaded_models = stub_models(0.0)
+        detector.models_loaded = True
+        detector.latency_planner = planner = warm_planner(probe_after_skips=1)
+        before = (planner.status(), planner.model_status())
+
+        image_bytes = synthetic_sources[0]
+        prepared = detector.preprocessor.prepare_bytes(image_bytes)
+        result = detector.detect(prepared, image_bytes, latency_budget_ms=1)
+        detector._probe_executor.shutdown(wait=True)
+    finally:
+        logging.disable(logging.NOTSET)
+
+    # Nothing optional ran in the request, the probe timed it afterwards
+    assert result["modelScores"]["ensemble_model_count"] == 0
+    assert "frequency" in result["skippedStages"]
+    status, model_status = planner.status(), planner.model_status()
+    assert status["frequency"] != before[0]["frequency"]
+    assert status["forensics"] != before[0]["forensics"]
+    assert all(model_status[key] != before[1][key] for key in WEIGHTS)
+    assert planner._skips == {}
+    assert planner._probing == set()
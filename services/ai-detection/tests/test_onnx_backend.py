@@ -0,0 +1,71 @@
+"""
+ONNX backend against the PyTorch pipeline: same scores, including heads the
+pipeline scores with a sigmoid (multi-label and single-logit)
+"""
+import numpy as np
+import pytest
+from PIL import Image
+
+from model_inputs import DirectClassifier, is_multi_label
+
+HEADS = {
+    "multi_label": {
+        "id2label": {0: "artificial", 1: "real"},
+        "problem_type": "multi_label_classification",
+    },
+    "single_logit": {"id2label": {0: "artificial"}},
+    "softmax": {"id2label": {0: "artificial", 1: "real"}},
+}
+
+
+@pytest.mark.parametrize("head", list(HEADS))
+def test_score_activation(head):
+    labels = list(HEADS[head]["id2label"].values())
+    multi_label = is_multi_label(HEADS[head].get("problem_type"), len(labels))
+    assert multi_label == (head != "softmax")
+
+    logits = np.linspace(-1.0, 2.0, len(labels))
+    direct = DirectClassifier(lambda values: logits[None], None, labels, multi_label)
+    scores = {p["label"]: p["score"] for p in direct.to_predictions(logits)}
+    expected = 1 / (1 + np.exp(-logits)) if multi_label else np.exp(logits) / np.exp(logits).sum()
+    assert [scores[label] for label in labels] == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("head", list(HEADS))
+def test_onnx_matches_pytorch(tmp_path, head):
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("onnx")
+    torch = pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+    from onnx_backend import OnnxImageClassifier, export_model
+
+    # Tiny random-weight 32x32 ViT with the given head
+    model_dir = str(tmp_path / head)
+    model_config = transformers.ViTConfig(
+        image_size=32,
+        patch_size=8,
+        hidden_size=32,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=64,
+        label2id={label: index for index, label in HEADS[head]["id2label"].items()},
+        **HEADS[head],
+    )
+    torch.manual_seed(0)
+    transformers.ViTForImageClassification(model_config).eval().save_pretrained(model_dir)
+    transformers.ViTImageProcessor(size={"height": 32, "width": 32}).save_pretrained(model_dir)
+
+    export_model(model_dir, str(tmp_path / "onnx"))
+    onnx_classifier = OnnxImageClassifier(model_dir, str(tmp_path / "onnx"))
+    pipe = transformers.pipeline("image-classification", model=model_dir, device=-1)
+    assert onnx_classifier.multi_label == (head != "softmax")
+
+    rng = np.random.default_rng(0)
+    for _ in range(4):
+        # Model-sized inputs: no resize, so only the backends differ
+        image = Image.fromarray(rng.integers(0, 256, (32, 32, 3), dtype=np.uint8))
+        expected = {p["label"]: p["score"] for p in pipe(image)}
+        actual = {p["label"]: p["score"] for p in onnx_classifier(image)}
+        assert actual.keys() == expected.keys()
+        for label, score in expected.items():
+            assert actual[label] == pytest.approx(score, abs=1e-5), label
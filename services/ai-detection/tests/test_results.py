@@ -0,0 +1,97 @@
+"""
+Result dataclasses against the dict payloads the analyzers returned before
+them: to_dict() emits the same (nested) keys for the same images
+"""
+import cv2
+import numpy as np
+import pytest
+
+from forensics import ForensicAnalyzer
+from frequency_analysis import FrequencyAnalyzer
+from image_quality import ImageQualityAssessor
+from preprocessing import ImagePreprocessor
+
+# Keys of the former dict payloads on the synthetic images (nested dicts as
+# parent.child; exif_data is empty for them)
+_FORENSIC_COMMON = {
+    "width", "height", "format", "mode", "exif_data",
+    "noise_level", "laplacian_variance", "uniform_noise_pattern",
+    "block_variance_std", "inconsistent_compression", "compression_artifacts_detected",
+    "compression_artifacts",
+    "color_channel_std.red", "color_channel_std.green", "color_channel_std.blue",
+    "region_color_consistency", "color_inconsistencies", "unnaturally_consistent",
+    "color_saturation", "brightness", "contrast",
+    "edge_density", "average_edge_strength", "edge_artifacts", "sharpness",
+    "manipulation_likelihood",
+}
+LEGACY_FORENSICS = _FORENSIC_COMMON | {
+    "has_exif", "exif_fields_count", "has_editing_software", "exif_suspicious",
+}
+LEGACY_FORENSICS_WITHOUT_BYTES = _FORENSIC_COMMON | {"exif_data_present"}
+LEGACY_FREQUENCY = {
+    "dct_avg_high_freq_energy", "dct_high_freq_uniformity", "dct_high_to_low_ratio",
+    "dct_mid_to_low_ratio", "dct_ai_smoothness", "dct_ai_score",
+    "fft_periodic_peaks", "fft_checkerboard_score", "fft_spectrum_uniformity",
+    "fft_spectrum_mean", "fft_ai_score", "fft_gan_artifacts_detected",
+    "frequency_ai_score",
+}
+LEGACY_QUALITY = {
+    "overall_quality", "enhancement_applied",
+    "sharpness.laplacian_variance", "sharpness.score", "sharpness.quality",
+    "sharpness.needs_sharpening",
+    "contrast.std_dev", "contrast.dynamic_range", "contrast.score", "contrast.quality",
+    "contrast.needs_enhancement",
+    "noise.noise_std", "noise.score", "noise.quality", "noise.needs_denoising",
+    "resolution.width", "resolution.height", "resolution.pixel_count", "resolution.score",
+    "resolution.quality",
+    "brightness.mean", "brightness.score", "brightness.quality", "brightness.too_dark",
+    "brightness.too_bright",
+    "color.score", "color.channel_std.r", "color.channel_std.g", "color.channel_std.b",
+    "color.channel_balance",
+}
+
+
+def keys(payload: dict, prefix: str = "") -> set:
+    """Nested keys of a payload as parent.child (empty dicts count as a key)"""
+    found = set()
+    for name, value in payload.items():
+        if isinstance(value, dict) and value:
+            found |= keys(value, f"{prefix}{name}.")
+        else:
+            found.add(f"{prefix}{name}")
+    return found
+
+
+@pytest.fixture(scope="module")
+def images(synthetic_sources):
+    """The synthetic sources plus a grayscale upload"""
+    photo = cv2.imdecode(np.frombuffer(synthetic_sources[0], np.uint8), cv2.IMREAD_GRAYSCALE)
+    return synthetic_sources + [cv2.imencode(".png", photo)[1].tobytes()]
+
+
+@pytest.fixture(scope="module")
+def prepared(images):
+    preprocessor = ImagePreprocessor()
+    return [(image_bytes, preprocessor.prepare_bytes(image_bytes)) for image_bytes in images]
+
+
+def test_forensic_keys(prepared):
+    analyzer = ForensicAnalyzer()
+    for image_bytes, image in prepared:
+        result = analyzer.analyze(image.forensic, image_bytes, native_tiles=image.forensic_tiles or None)
+        assert keys(result.to_dict()) == LEGACY_FORENSICS
+        assert keys(analyzer.analyze(image.forensic).to_dict()) == LEGACY_FORENSICS_WITHOUT_BYTES
+
+
+def test_frequency_keys(prepared):
+    analyzer = FrequencyAnalyzer()
+    for _, image in prepared:
+        assert keys(analyzer.analyze(image.frequency).to_dict()) == LEGACY_FREQUENCY
+
+
+@pytest.mark.parametrize("enhance", [True, False])
+def test_quality_keys(prepared, enhance):
+    assessor = ImageQualityAssessor()
+    for _, image in prepared:
+        _, report = assessor.assess_and_enhance(image.model, image.quality, enhance=enhance)
+        assert keys(report.to_dict()) == LEGACY_QUALITY
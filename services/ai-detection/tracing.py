@@ -0,0 +1,22 @@
+"""
+Request Tracing
+
+Spans, exporters and traceparent handling are shared with the other Python
+services (services/common/tracing_core.py); this module re-exports them and
+lists the requests this service does not trace.
+
+ResourceManager copies the active span onto inference lanes, so model
+spans join the request's trace.
+"""
+import os
+import sys
+
+# services/common sits next to the service directory (also in the images)
+_COMMON = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common")
+if _COMMON not in sys.path:
+    sys.path.append(_COMMON)
+
+from tracing_core import *  # noqa: E402,F401,F403
+
+# Requests that are not worth a trace
+UNTRACED_PATHS = ("/health", "/ready", "/metrics")
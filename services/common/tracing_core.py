@@ -0,0 +1,480 @@
+"""
+Request Tracing Core (W3C Trace Context, OpenTelemetry-compatible spans)
+
+Shared by the Python services: each service's tracing.py re-exports this
+module and adds its own UNTRACED_PATHS. Settings (TRACE_*) come from the
+importing service's config module.
+
+Spans carry 128-bit trace and 64-bit span IDs and follow the W3C
+`traceparent` header, so a trace started by the backend continues through
+the service and lines up with any OpenTelemetry collector:
+
+    with tracing.span("phash_search", entries=len(db)) as span:
+        ...
+        span.set_attribute("matches", len(matches))
+
+The active span lives in a context variable: nested spans become children
+and asyncio tasks inherit it (code that hands work to threads copies the
+context). Exporters (TRACE_EXPORTER):
+- otlp: batched OTLP/JSON over HTTP from a background thread (any
+  OpenTelemetry collector, Jaeger, Tempo)
+- log: one JSON line per finished span
+- memory: kept in InMemoryExporter.spans, for tests and benchmarks
+- none: tracing off; span() hands out a shared no-op span
+
+Sampling is decided once per trace: TRACE_SAMPLE_RATE for traces started
+here, the caller's sampled flag for propagated ones. Unsampled spans are
+not recorded but still keep the trace context for their children.
+"""
+import contextlib
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT = "traceparent"
+
+# OTLP span kinds and status codes
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+__all__ = [
+    "TRACEPARENT", "KIND_INTERNAL", "KIND_SERVER", "KIND_CLIENT",
+    "STATUS_UNSET", "STATUS_OK", "STATUS_ERROR",
+    "SpanContext", "Span", "NOOP_SPAN", "InMemoryExporter", "LogExporter", "OtlpExporter",
+    "EXPORTERS", "set_exporter", "get_exporter", "enabled", "span", "traced", "server_span",
+    "current_span", "current_traceparent", "current_trace_id", "shutdown", "status",
+]
+
+
+@dataclass(frozen=True)
+class SpanContext:
+    """Identity of a span as propagated in the traceparent header"""
+
+    trace_id: str  # 32 lowercase hex chars
+    span_id: str  # 16 lowercase hex chars
+    sampled: bool
+
+    @classmethod
+    def from_traceparent(cls, header: str) -> Optional["SpanContext"]:
+        """Parse "00-<trace_id>-<span_id>-<flags>"; None if malformed"""
+        parts = header.strip().lower().split("-")
+        if len(parts) < 4 or parts[0] == "ff" or len(parts[0]) != 2:
+            return None
+        version, trace_id, span_id, flags = parts[:4]
+        if version == "00" and len(parts) != 4:
+            return None
+        if len(trace_id) != 32 or len(span_id) != 16 or len(flags) != 2:
+            return None
+        try:
+            sampled = bool(int(flags, 16) & 1)
+            if int(trace_id, 16) == 0 or int(span_id, 16) == 0:
+                return None
+        except ValueError:
+            return None
+        return cls(trace_id, span_id, sampled)
+
+    def to_traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+class _NonRecordingSpan:
+    """Span that is not exported: tracing off, unsampled or a remote parent"""
+
+    __slots__ = ("context",)
+
+    def __init__(self, context: Optional[SpanContext] = None):
+        self.context = context
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, **attributes):
+        pass
+
+    def set_error(self, message: str):
+        pass
+
+
+NOOP_SPAN = _NonRecordingSpan()
+
+
+class Span:
+    """A recorded span; exported when its block exits"""
+
+    __slots__ = (
+        "name", "context", "parent_id", "kind", "start_ns", "end_ns",
+        "attributes", "status", "status_message",
+    )
+
+    def __init__(self, name: str, context: SpanContext, parent_id: Optional[str], kind: int, attributes: Dict):
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes
+        self.status = STATUS_UNSET
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        self.attributes.update(attributes)
+
+    def set_error(self, message: str):
+        self.status = STATUS_ERROR
+        self.status_message = message
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_id": self.parent_id,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "status": self.status,
+            "status_message": self.status_message,
+        }
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.context.trace_id,
+            "spanId": self.context.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": self.status, "message": self.status_message},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict]:
+    encoded = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            encoded_value = {"boolValue": value}
+        elif isinstance(value, int):
+            encoded_value = {"intValue": str(value)}
+        elif isinstance(value, float):
+            encoded_value = {"doubleValue": value}
+        else:
+            encoded_value = {"stringValue": str(value)}
+        encoded.append({"key": key, "value": encoded_value})
+    return encoded
+
+
+class InMemoryExporter:
+    """Keeps finished spans in a list (tests, benchmarks)"""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def find(self, name: str) -> List[Span]:
+        with self._lock:
+            return [span for span in self.spans if span.name == name]
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+
+    def shutdown(self):
+        pass
+
+
+class LogExporter:
+    """One JSON log line per finished span"""
+
+    def export(self, span: Span):
+        logger.info(json.dumps(span.to_dict(), default=str))
+
+    def shutdown(self):
+        pass
+
+
+class OtlpExporter:
+    """
+    Batched OTLP/JSON export over HTTP
+
+    export() only enqueues; a daemon thread posts batches of up to
+    TRACE_EXPORT_BATCH_SIZE spans every TRACE_EXPORT_INTERVAL seconds. When
+    the collector falls behind, spans beyond TRACE_EXPORT_QUEUE_SIZE are
+    dropped (and counted) instead of slowing requests down. The thread is
+    started lazily per process, so pre-fork workers each get their own.
+    """
+
+    def __init__(
+        self,
+        endpoint: str = config.TRACE_OTLP_ENDPOINT,
+        service_name: str = config.TRACE_SERVICE_NAME,
+        batch_size: int = config.TRACE_EXPORT_BATCH_SIZE,
+        interval: float = config.TRACE_EXPORT_INTERVAL,
+        queue_size: int = config.TRACE_EXPORT_QUEUE_SIZE,
+    ):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.interval = interval
+        self.queue_size = queue_size
+        self.dropped = 0
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def export(self, span: Span):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._post(batch)
+
+    def _next_batch(self) -> List[Span]:
+        batch = []
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _post(self, spans: List[Span]):
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": self.service_name})},
+                "scopeSpans": [{
+                    "scope": {"name": __name__},
+                    "spans": [span.to_otlp() for span in spans],
+                }],
+            }]
+        }
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                response.read()
+        except Exception as e:
+            logger.warning(f"Trace export of {len(spans)} span(s) to {self.endpoint} failed: {e}")
+
+    def shutdown(self):
+        """Send what is queued (best effort, on service shutdown)"""
+        if self._pid != os.getpid():
+            return
+        spans = []
+        while True:
+            try:
+                spans.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for start in range(0, len(spans), self.batch_size):
+            self._post(spans[start:start + self.batch_size])
+
+
+EXPORTERS = {"memory": InMemoryExporter, "log": LogExporter, "otlp": OtlpExporter}
+
+_exporter = None
+_current: contextvars.ContextVar = contextvars.ContextVar("trace_span", default=None)
+
+
+def _exporter_from_config():
+    name = config.TRACE_EXPORTER.lower()
+    if name in ("", "none"):
+        return None
+    if name not in EXPORTERS:
+        logger.warning(f"Unknown TRACE_EXPORTER {config.TRACE_EXPORTER!r}, tracing disabled")
+        return None
+    return EXPORTERS[name]()
+
+
+def set_exporter(exporter) -> Any:
+    """Replace the exporter (None disables tracing); returns the previous one"""
+    global _exporter
+    previous, _exporter = _exporter, exporter
+    return previous
+
+
+def get_exporter():
+    return _exporter
+
+
+def enabled() -> bool:
+    return _exporter is not None
+
+
+def _new_id(num_bytes: int) -> str:
+    return f"{random.getrandbits(num_bytes * 8) or 1:0{num_bytes * 2}x}"
+
+
+@contextlib.contextmanager
+def span(name: str, kind: int = KIND_INTERNAL, **attributes):
+    """Open a child of the active span (or a new trace) for the block"""
+    exporter = _exporter
+    if exporter is None:
+        yield NOOP_SPAN
+        return
+
+    parent = _current.get()
+    parent_context = parent.context if parent is not None else None
+    if parent_context is None:
+        context = SpanContext(_new_id(16), _new_id(8), random.random() < config.TRACE_SAMPLE_RATE)
+    else:
+        context = SpanContext(parent_context.trace_id, _new_id(8), parent_context.sampled)
+
+    if not context.sampled:
+        token = _current.set(_NonRecordingSpan(context))
+        try:
+            yield NOOP_SPAN
+        finally:
+            _current.reset(token)
+        return
+
+    recorded = Span(name, context, parent_context.span_id if parent_context else None, kind, attributes)
+    token = _current.set(recorded)
+    try:
+        yield recorded
+    except BaseException as e:
+        recorded.set_error(f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        recorded.end_ns = time.time_ns()
+        _current.reset(token)
+        try:
+            exporter.export(recorded)
+        except Exception as e:
+            logger.warning(f"Span export failed: {e}")
+
+
+def traced(name: Optional[str] = None, kind: int = KIND_INTERNAL):
+    """Decorator running a function (sync or async) inside a span"""
+
+    def decorate(fn):
+        span_name = name or fn.__qualname__
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name, kind):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name, kind):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+@contextlib.contextmanager
+def server_span(method: str, path: str, traceparent: Optional[str] = None):
+    """
+    Span for an incoming HTTP request, continuing the caller's trace when
+    the request carries a valid traceparent header
+    """
+    remote = SpanContext.from_traceparent(traceparent) if traceparent and _exporter else None
+    token = _current.set(_NonRecordingSpan(remote)) if remote else None
+    try:
+        with span(
+            f"{method} {path}", KIND_SERVER, **{"http.method": method, "http.target": path}
+        ) as request_span:
+            yield request_span
+    finally:
+        if token is not None:
+            _current.reset(token)
+
+
+def current_span():
+    """The active span (a no-op span outside of any trace)"""
+    active = _current.get()
+    return active if isinstance(active, Span) else NOOP_SPAN
+
+
+def current_traceparent() -> Optional[str]:
+    """traceparent header value for calls made from the active span"""
+    active = _current.get()
+    return active.context.to_traceparent() if active is not None and active.context else None
+
+
+def current_trace_id() -> Optional[str]:
+    active = _current.get()
+    return active.context.trace_id if active is not None and active.context else None
+
+
+def shutdown():
+    if _exporter is not None:
+        _exporter.shutdown()
+
+
+def status() -> Dict[str, Any]:
+    return {
+        "exporter": type(_exporter).__name__ if _exporter else None,
+        "sample_rate": config.TRACE_SAMPLE_RATE,
+        "dropped_spans": getattr(_exporter, "dropped", 0),
+    }
+
+
+_exporter = _exporter_from_config()
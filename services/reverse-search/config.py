@@ -28,6 +28,13 @@ MIN_MATCH_QUALITY = 0.6  # Lowered from 0.7 to include more results
 PHASH_THRESHOLD = 10  # Hamming distance threshold for pHash
 PHASH_DB_PATH = os.getenv("PHASH_DB_PATH", "./phash_db.json")
 
+# External endpoints (overridable to point the service at local stand-ins,
+# e.g. for load testing - see loadtest/ at the repository root)
+SERPAPI_BASE_URL = os.getenv("SERPAPI_BASE_URL", "https://serpapi.com")
+IMAGE_HOST_0X0_URL = os.getenv("IMAGE_HOST_0X0_URL", "https://0x0.st")
+IMAGE_HOST_CATBOX_URL = os.getenv("IMAGE_HOST_CATBOX_URL", "https://catbox.moe/user/api.php")
+IMAGE_HOST_IMGBB_URL = os.getenv("IMAGE_HOST_IMGBB_URL", "https://api.imgbb.com/1/upload")
+
 # Rate limiting
 GOOGLE_RATE_LIMIT = 100  # requests per day (SerpAPI free tier)
 TINEYE_RATE_LIMIT = 5000  # requests per month
@@ -36,6 +43,18 @@ TINEYE_RATE_LIMIT = 5000  # requests per month
 REQUEST_TIMEOUT = 30  # seconds
 CRAWLER_TIMEOUT = 10  # seconds for metadata crawling
 
+# Tracing (tracing.py): W3C traceparent propagation, spans exported as
+# OTLP/JSON ("otlp"), one JSON log line per span ("log") or kept in memory
+# for tests ("memory"); "none" disables tracing. TRACE_SAMPLE_RATE applies to
+# traces started here, propagated traces follow the caller's sampled flag
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "reverse-search")
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none")  # none|log|otlp|memory
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_EXPORT_BATCH_SIZE = int(os.getenv("TRACE_EXPORT_BATCH_SIZE", "256"))
+TRACE_EXPORT_INTERVAL = float(os.getenv("TRACE_EXPORT_INTERVAL", "5"))  # seconds
+TRACE_EXPORT_QUEUE_SIZE = int(os.getenv("TRACE_EXPORT_QUEUE_SIZE", "4096"))  # spans; extras are dropped
+
 # Logging
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 
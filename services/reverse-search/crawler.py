@@ -9,6 +9,7 @@ from datetime import datetime
 import re
 
 import config
+import tracing
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +23,7 @@ class MetadataCrawler:
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
         })
     
+    @tracing.traced("crawl", kind=tracing.KIND_CLIENT)
     def crawl(self, url: str) -> Dict:
         """
         Crawl a URL and extract metadata
@@ -34,12 +36,15 @@ class MetadataCrawler:
         """
         try:
             logger.info(f"Crawling metadata from: {url}")
+            span = tracing.current_span()
+            span.set_attribute("http.url", url)
             
             response = self.session.get(
                 url,
                 timeout=config.CRAWLER_TIMEOUT,
                 allow_redirects=True
             )
+            span.set_attribute("http.status_code", response.status_code)
             response.raise_for_status()
             
             soup = BeautifulSoup(response.content, 'html.parser')
@@ -72,12 +77,15 @@ class MetadataCrawler:
             
         except requests.Timeout:
             logger.warning(f"Timeout crawling {url}")
+            tracing.current_span().set_error("timeout")
             return {"url": url, "error": "timeout"}
         except requests.RequestException as e:
             logger.warning(f"Error crawling {url}: {e}")
+            tracing.current_span().set_error(str(e))
             return {"url": url, "error": str(e)}
         except Exception as e:
             logger.error(f"Unexpected error crawling {url}: {e}")
+            tracing.current_span().set_error(str(e))
             return {"url": url, "error": str(e)}
     
     def _extract_title(self, soup: BeautifulSoup) -> Optional[str]:
@@ -11,6 +11,7 @@ import random
 import requests
 
 import config
+import tracing
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +28,7 @@ class GoogleReverseSearch:
         else:
             logger.warning("Google Reverse Search disabled - no API key")
     
+    @tracing.traced("google_search")
     async def search(self, image: Image.Image) -> List[Dict]:
         """
         Perform Google reverse image search
@@ -66,7 +68,10 @@ class GoogleReverseSearch:
             
             logger.info("Performing Google Lens search via SerpAPI...")
             search = GoogleSearch(params)
-            results = search.get_dict()
+            search.BACKEND = config.SERPAPI_BASE_URL
+            with tracing.span("serpapi", tracing.KIND_CLIENT, engine=params["engine"]) as span:
+                results = search.get_dict()
+                span.set_attribute("visual_matches", len(results.get("visual_matches", [])))
             
             # Parse results
             matches = self._parse_serpapi_results(results)
@@ -81,6 +86,7 @@ class GoogleReverseSearch:
             logger.error(f"SerpAPI search error: {e}")
             raise
     
+    @tracing.traced("image_upload", kind=tracing.KIND_CLIENT)
     async def _upload_image_temp(self, image: Image.Image) -> str:
         """
         Upload image to temporary hosting and return public URL
@@ -106,12 +112,13 @@ class GoogleReverseSearch:
             # Method 1: Try 0x0.st (simple, no auth needed)
             try:
                 files = {"file": ("image.jpg", img_bytes, "image/jpeg")}
-                response = requests.post("https://0x0.st", files=files, timeout=15)
+                response = requests.post(config.IMAGE_HOST_0X0_URL, files=files, timeout=15)
                 
                 if response.status_code == 200:
                     url = response.text.strip()
                     if url.startswith("http"):
                         logger.info(f"Image uploaded to 0x0.st: {url}")
+                        tracing.current_span().set_attribute("host", "0x0.st")
                         return url
             except Exception as e:
                 logger.warning(f"0x0.st upload error: {e}")
@@ -121,7 +128,7 @@ class GoogleReverseSearch:
                 data = {"reqtype": "fileupload"}
                 files = {"fileToUpload": ("image.jpg", img_bytes, "image/jpeg")}
                 response = requests.post(
-                    "https://catbox.moe/user/api.php",
+                    config.IMAGE_HOST_CATBOX_URL,
                     data=data,
                     files=files,
                     timeout=15
@@ -131,6 +138,7 @@ class GoogleReverseSearch:
                     url = response.text.strip()
                     if url.startswith("http"):
                         logger.info(f"Image uploaded to catbox.moe: {url}")
+                        tracing.current_span().set_attribute("host", "catbox.moe")
                         return url
             except Exception as e:
                 logger.warning(f"catbox.moe upload error: {e}")
@@ -143,7 +151,7 @@ class GoogleReverseSearch:
                     "image": img_base64,
                 }
                 response = requests.post(
-                    "https://api.imgbb.com/1/upload",
+                    config.IMAGE_HOST_IMGBB_URL,
                     data=payload,
                     timeout=15
                 )
@@ -153,6 +161,7 @@ class GoogleReverseSearch:
                     if result.get("success"):
                         url = result["data"]["url"]
                         logger.info(f"Image uploaded to ImgBB: {url}")
+                        tracing.current_span().set_attribute("host", "imgbb")
                         return url
             except Exception as e:
                 logger.warning(f"ImgBB upload error: {e}")
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import base64
@@ -9,6 +9,7 @@ from typing import List, Optional
 
 from search_engines import ReverseSearchEngine
 import config
+import tracing
 
 # Configure logging
 logging.basicConfig(
@@ -32,6 +33,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Server span per request, continuing the caller's traceparent"""
+    if not tracing.enabled() or request.url.path in tracing.UNTRACED_PATHS:
+        return await call_next(request)
+    with tracing.server_span(
+        request.method, request.url.path, request.headers.get(tracing.TRACEPARENT)
+    ) as span:
+        response = await call_next(request)
+        span.set_attribute("http.status_code", response.status_code)
+        if response.status_code >= 500:
+            span.set_error(f"HTTP {response.status_code}")
+        return response
+
 # Initialize search engine
 search_engine = None
 
@@ -70,6 +86,12 @@ async def startup_event():
     get_search_engine()
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Send spans still queued for export"""
+    tracing.shutdown()
+
+
 @app.get("/health")
 async def health():
     return {
@@ -10,6 +10,7 @@ import imagehash
 from datetime import datetime
 
 import config
+import tracing
 
 logger = logging.getLogger(__name__)
 
@@ -66,6 +67,7 @@ class PHashDatabase:
         except Exception as e:
             logger.error(f"Error adding image to pHash database: {e}")
     
+    @tracing.traced("phash_search")
     def search(self, image: Image.Image, threshold: int = config.PHASH_THRESHOLD) -> List[Dict]:
         """
         Search for similar images by perceptual hash
@@ -114,6 +116,7 @@ class PHashDatabase:
             
             # Sort by similarity (highest first)
             matches.sort(key=lambda x: x["similarity"], reverse=True)
+            tracing.current_span().set_attributes(entries=len(self.db), matches=len(matches))
             
             logger.info(f"Found {len(matches)} pHash matches")
             return matches[:config.MAX_RESULTS_PER_ENGINE]
@@ -6,6 +6,7 @@ from typing import List, Dict, Optional
 import random
 
 import config
+import tracing
 from google_search import GoogleReverseSearch
 from phash_db import PHashDatabase
 from crawler import MetadataCrawler
@@ -33,6 +34,7 @@ class ReverseSearchEngine:
         logger.info(f"  - pHash Database: {len(self.phash_db.db)} entries")
         logger.info(f"  - Metadata Crawler: Enabled")
         
+    @tracing.traced("reverse_search")
     async def search(self, image: Image.Image, filename: Optional[str] = None) -> dict:
         """
         Perform comprehensive reverse image search
@@ -74,7 +76,8 @@ class ReverseSearchEngine:
         
         # 5. Enrich top matches with crawled metadata
         if unique_matches:
-            unique_matches = await self._enrich_with_metadata(unique_matches[:5])
+            with tracing.span("enrich_metadata", matches=min(len(unique_matches), 5)):
+                unique_matches = await self._enrich_with_metadata(unique_matches[:5])
         
         # 6. Build provenance chain
         provenance_chain = [match["url"] for match in unique_matches]
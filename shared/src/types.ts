@@ -127,6 +127,7 @@ export interface AIDetectionResult {
   frequencyAnalysis: FrequencyMetrics;
   qualityMetrics: QualityMetrics;
   metadata?: any;
+  skippedStages?: string[]; // Stages dropped to fit the latency budget
 }
 
 export interface AnalysisData {